@@ -4,11 +4,31 @@ This module provides a Python implementation of Vega-Lite transforms.
 The main function is the ``altair_transform.apply()`` function.
 """
 __version__ = "0.3.0.dev0"
-__all__ = ["apply", "extract_data", "transform_chart", "extract_transform"]
+__all__ = [
+    "apply",
+    "extract_data",
+    "transform_chart",
+    "extract_transform",
+    "TransformCache",
+    "AggregateCube",
+    "trace",
+    "ChromeTrace",
+    "explain",
+    "confidence_intervals",
+    "approximate",
+    "engines",
+]
 
+from altair_transform import engines
 from altair_transform.core import (
     apply,
     extract_data,
     transform_chart,
     extract_transform,
 )
+from altair_transform.transform.aggregate import confidence_intervals
+from altair_transform.transform.cache import TransformCache
+from altair_transform.transform.cube import AggregateCube
+from altair_transform.transform.sketch import approximate
+from altair_transform.transform.trace import trace, ChromeTrace
+from altair_transform.explain import explain
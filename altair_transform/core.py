@@ -1,38 +1,94 @@
 """Core altair_transform routines."""
 
-from typing import List, Union
+from typing import Any, Iterable, List, Optional, Union
 
 import pandas as pd
 import altair as alt
 
+from altair_transform import engines
+from altair_transform.engines import Engine, PandasEngine
 from altair_transform.transform import visit
-from altair_transform.utils import to_dataframe
+from altair_transform.transform.cache import TransformCache, pipeline_keys
+from altair_transform.transform.spec import normalize_list
+from altair_transform.transform.stream import visit_stream
+from altair_transform.utils import is_arrow, is_polars, iter_dataframes, to_dataframe
 from altair_transform.extract import extract_transform
 
 __all__ = ["apply", "extract_data", "transform_chart"]
 
+OUTPUTS = ["pandas", "arrow", "polars"]
+
 
 def apply(
-    df: pd.DataFrame,
+    df: Union[pd.DataFrame, Iterable[pd.DataFrame]],
     transform: Union[alt.Transform, List[alt.Transform]],
     inplace: bool = False,
-) -> pd.DataFrame:
+    validate: bool = True,
+    cache: Optional[TransformCache] = None,
+    chunksize: Optional[int] = None,
+    n_jobs: Optional[int] = None,
+    engine: Union[str, Engine, None] = None,
+    output: Optional[str] = None,
+    sorted_by: Optional[List[str]] = None,
+) -> Any:
     """Apply transform or transforms to dataframe.
 
     Parameters
     ----------
-    df : pd.DataFrame
+    df : pd.DataFrame, pyarrow.Table, polars.DataFrame, or iterable of pd.DataFrame
+        The data to transform. Data that does not fit in memory may be passed
+        as an iterable of chunks of rows, such as the reader returned by
+        ``pd.read_csv(..., chunksize=...)``; the chunks are streamed through
+        the pipeline, and aggregates are computed from mergeable per-chunk
+        states, so that memory is bounded by the size of the result rather
+        than the size of the input. Arrow tables and record batches, and
+        Polars DataFrames and LazyFrames, are transformed by the "arrow" and
+        "polars" engines respectively unless another engine is specified or
+        enabled, without conversion to a pandas dataframe.
     transform : list|dict
         A transform specification or list of transform specifications.
         Each specification must be valid according to Altair's transform
         schema.
     inplace : bool
         If True, then dataframe may be modified in-place. Default: False.
+    validate : bool
+        If True (default), validate each transform against the Vega-Lite schema.
+        Set to False for trusted specifications to skip schema validation,
+        which can dominate the cost of transforming small datasets.
+    cache : TransformCache, optional
+        If specified, intermediate results are stored in and reused from this
+        cache, so that pipelines sharing a prefix with an earlier pipeline over
+        the same data resume from the longest cached prefix.
+    chunksize : int, optional
+        If specified, consecutive row-local transforms (calculate, filter,
+        timeUnit, fold, flatten, sample, and bin with an explicit extent) are
+        evaluated together over chunks of this many rows, so that intermediate
+        results are never materialized for the whole dataset.
+    n_jobs : int, optional
+        If specified, regression, quantile, impute and window transforms with
+        a groupby are evaluated in parallel over partitions of the groups, in
+        a pool of this many worker processes. Results are identical to those
+        of serial evaluation.
+    engine : str or Engine, optional
+        The engine evaluating the transforms (see :mod:`altair_transform.engines`).
+        Transforms not supported by the engine are evaluated with pandas.
+        Default: the active engine, initially "pandas". Caching and chunked
+        evaluation are only supported by the pandas engine.
+    output : str, optional
+        The type of the result: "pandas" for a dataframe, "arrow" for a
+        pyarrow Table, or "polars" for a Polars DataFrame. Default: the type
+        of the input.
+    sorted_by : list of str, optional
+        Fields by which the rows of the data are sorted, in ascending order.
+        Transforms grouping by a prefix of these fields then find groups as
+        runs of equal keys, without checking the order. Sorted data is also
+        detected, at the cost of a pass over the keys. Only supported by the
+        pandas engine, for data that is not passed as chunks.
 
     Returns
     -------
-    df_transformed : pd.DataFrame
-        The transformed dataframe.
+    df_transformed : pd.DataFrame, pyarrow.Table, or polars.DataFrame
+        The transformed data.
 
     Example
     -------
@@ -45,16 +101,162 @@ def apply(
     1  B      5
     2  C      2
     """
+    if cache is not None and _data_kind(df) != "pandas":
+        raise ValueError("cache is not supported for Arrow or Polars data.")
+    if cache is not None and not isinstance(df, pd.DataFrame):
+        raise ValueError("cache is not supported for data passed as chunks.")
+    # Fingerprint before copying, so that buffer identity is stable across calls.
+    fingerprint = None if cache is None else cache.fingerprint(df)
+    return _apply(
+        df,
+        transform,
+        inplace,
+        validate,
+        cache,
+        fingerprint,
+        chunksize,
+        n_jobs,
+        engine,
+        output,
+        sorted_by,
+    )
+
+
+def _apply(
+    df: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    transform: Union[alt.Transform, List[alt.Transform]],
+    inplace: bool,
+    validate: bool,
+    cache: Optional[TransformCache],
+    fingerprint: Optional[str],
+    chunksize: Optional[int],
+    n_jobs: Optional[int],
+    engine: Union[str, Engine, None] = None,
+    output: Optional[str] = None,
+    sorted_by: Optional[List[str]] = None,
+) -> Any:
+    kind = _data_kind(df)
+    if output is None:
+        output = kind
+    elif output not in OUTPUTS:
+        raise ValueError(f"Unknown output: {output!r}. Expected one of {OUTPUTS}.")
+    if kind == "arrow":
+        import pyarrow as pa
+
+        if isinstance(df, pa.RecordBatch):
+            df = pa.Table.from_batches([df])
+    if kind != "pandas" and engine is None and engines.registry.active == "pandas":
+        engine = kind
+    resolved = engines.registry.resolve(engine)
+    if kind != "pandas" and not resolved.is_native(df):
+        # Arrow and Polars data are left as is, so the dataframe is not copied.
+        df, inplace = to_dataframe(df), True
+    if not isinstance(resolved, PandasEngine):
+        if cache is not None or chunksize is not None or sorted_by is not None:
+            raise ValueError(
+                "cache, chunksize and sorted_by are not supported by engine "
+                f"{resolved.name!r}"
+            )
+        if not isinstance(df, pd.DataFrame) and not resolved.is_native(df):
+            raise ValueError(f"engine {resolved.name!r} requires a DataFrame input")
+    elif not isinstance(df, pd.DataFrame):
+        if sorted_by is not None:
+            raise ValueError("sorted_by is not supported for streamed data.")
+        result = _apply_stream(
+            df, transform, validate, cache, fingerprint, chunksize, n_jobs
+        )
+        return _to_output(result, output, resolved)
+    if not isinstance(resolved, PandasEngine) and transform is not alt.Undefined:
+        # Engines copy the data only if evaluating transforms with pandas.
+        specs = normalize_list(transform, validate=validate)
+        result = engines.execute(resolved, specs, df, n_jobs)
+        if result is df and not inplace and isinstance(df, pd.DataFrame):
+            result = df.copy()
+        return _to_output(result, output, resolved)
+    if not isinstance(df, pd.DataFrame):
+        return _to_output(df, output, resolved)
     if not inplace:
         df = df.copy()
-    if transform is alt.Undefined:
-        return df
-    return visit(transform, df)
+    if transform is not alt.Undefined:
+        df = visit(
+            normalize_list(transform, validate=validate),
+            df,
+            cache=cache,
+            fingerprint=fingerprint,
+            chunksize=chunksize,
+            n_jobs=n_jobs,
+            sorted_by=sorted_by,
+        )
+    return _to_output(df, output, resolved)
 
 
-def extract_data(
-    chart: alt.Chart, apply_encoding_transforms: bool = True
+def _data_kind(data: Any) -> str:
+    """Return the kind of data, as the name of its output type."""
+    if is_arrow(data):
+        return "arrow"
+    if is_polars(data):
+        return "polars"
+    return "pandas"
+
+
+def _to_output(data: Any, output: str, engine: Engine) -> Any:
+    """Convert a result to a pandas or Polars dataframe, or an Arrow table."""
+    kind = _data_kind(data)
+    if output == kind == "arrow":
+        return data
+    if kind == "polars" and output != "pandas":
+        data = data.lazy().collect()
+        return data if output == "polars" else data.to_arrow()
+    if kind == "arrow" and output == "polars":
+        import polars as pl
+
+        return pl.from_arrow(data)
+    if not isinstance(data, pd.DataFrame):
+        data = engine.to_pandas(data)
+    if output == "arrow":
+        import pyarrow as pa
+
+        return pa.Table.from_pandas(data, preserve_index=False)
+    if output == "polars":
+        import polars as pl
+
+        return pl.from_pandas(data)
+    return data
+
+
+def _apply_stream(
+    chunks: Iterable[pd.DataFrame],
+    transform: Union[alt.Transform, List[alt.Transform]],
+    validate: bool,
+    cache: Optional[TransformCache],
+    fingerprint: Optional[str],
+    chunksize: Optional[int],
+    n_jobs: Optional[int],
 ) -> pd.DataFrame:
+    specs = [] if transform is alt.Undefined else normalize_list(transform, validate)
+    # Streamed data are not materialized, so only complete results are cached.
+    keys = [] if cache is None else pipeline_keys(specs)
+    if cache is None or fingerprint is None or len(keys) < len(specs):
+        return visit_stream(specs, chunks, chunksize=chunksize, n_jobs=n_jobs)
+    end, cached = cache.lookup(fingerprint, keys)
+    if cached is not None and end == len(keys):
+        return cached
+    df = visit_stream(specs, chunks, chunksize=chunksize, n_jobs=n_jobs)
+    cache.put(fingerprint, keys, df)
+    return df
+
+
+def extract_data(
+    chart: alt.Chart,
+    apply_encoding_transforms: bool = True,
+    validate: bool = True,
+    cache: Optional[TransformCache] = None,
+    chunksize: Optional[int] = None,
+    n_jobs: Optional[int] = None,
+    engine: Union[str, Engine, None] = None,
+    output: str = "pandas",
+    sorted_by: Optional[List[str]] = None,
+) -> Any:
     """Extract transformed data from a chart.
 
     This only works with data and transform defined at the
@@ -69,11 +271,31 @@ def extract_data(
         If True (default), then apply transforms specified within an
         encoding as well as those specified directly in the transforms
         attribute.
+    validate : bool
+        If True (default), validate each transform against the Vega-Lite schema.
+    cache : TransformCache, optional
+        If specified, cache intermediate results (see :func:`apply`).
+    chunksize : int, optional
+        If specified, evaluate row-local transforms in chunks (see :func:`apply`).
+        Data specified by URL (CSV, TSV, or Parquet) is then also read in chunks
+        of this many rows and streamed through the pipeline, so that it never
+        needs to fit in memory.
+    n_jobs : int, optional
+        If specified, evaluate grouped transforms in parallel (see :func:`apply`).
+    engine : str or Engine, optional
+        The engine evaluating the transforms (see :func:`apply`). Engines
+        may load data in their own representation: the "arrow" engine reads
+        Parquet files as Arrow tables, and the "polars" engine scans them.
+    output : str
+        The type of the result: "pandas" (default) for a dataframe, "arrow"
+        for a pyarrow Table, or "polars" for a Polars DataFrame.
+    sorted_by : list of str, optional
+        Fields by which the rows of the data are sorted (see :func:`apply`).
 
     Returns
     -------
-    df_transformed : pd.DataFrame
-        The extracted and transformed dataframe.
+    df_transformed : pd.DataFrame, pyarrow.Table, or polars.DataFrame
+        The extracted and transformed data.
 
     Example
     -------
@@ -88,7 +310,34 @@ def extract_data(
     """
     if apply_encoding_transforms:
         chart = extract_transform(chart)
-    return apply(to_dataframe(chart.data, chart), chart.transform)
+    # Fingerprint the data specification rather than the loaded dataframe, so
+    # that reloading the same URL or inline data produces the same fingerprint.
+    fingerprint = None if cache is None else cache.fingerprint(chart.data, chart)
+    resolved = engines.registry.resolve(engine)
+    data: Union[pd.DataFrame, Iterable[pd.DataFrame]]
+    if chunksize is not None and _is_url_data(chart.data):
+        data = iter_dataframes(chart.data, chart, chunksize=chunksize)
+    else:
+        data = resolved.load(chart.data, chart)
+    return _apply(
+        data,
+        chart.transform,
+        inplace=False,
+        validate=validate,
+        cache=cache,
+        fingerprint=fingerprint,
+        chunksize=chunksize,
+        n_jobs=n_jobs,
+        engine=resolved,
+        output=output,
+        sorted_by=sorted_by,
+    )
+
+
+def _is_url_data(data: object) -> bool:
+    if isinstance(data, alt.UrlData):
+        return True
+    return isinstance(data, dict) and "url" in data
 
 
 def transform_chart(
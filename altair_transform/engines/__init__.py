@@ -0,0 +1,69 @@
+"""Pluggable execution engines.
+
+The same normalized pipeline can be evaluated by different engines. Engines
+are registered by name; pass ``engine=`` to :func:`~altair_transform.apply`
+or :func:`~altair_transform.extract_data` to select one for a call, or enable
+one globally. Besides the default pandas engine, the SQL engine compiles
+transforms to SQL evaluated by DuckDB (``"duckdb"``) or SQLite (``"sqlite"``);
+``"sql"`` selects DuckDB if it is installed. The Arrow engine (``"arrow"``)
+evaluates transforms on pyarrow Tables with Arrow compute kernels, and the
+Polars engine (``"polars"``) translates pipelines to lazy Polars queries; they
+are used for Arrow and Polars data respectively unless another engine is
+enabled:
+
+>>> import altair_transform
+>>> altair_transform.engines.enable("pandas")
+>>> altair_transform.engines.active()
+'pandas'
+"""
+from functools import partial
+
+from .base import Engine, EngineRegistry, PandasEngine, execute, split_runs
+from .sql import SQLEngine
+
+__all__ = [
+    "Engine",
+    "EngineRegistry",
+    "PandasEngine",
+    "SQLEngine",
+    "registry",
+    "register",
+    "enable",
+    "active",
+    "get",
+    "names",
+    "execute",
+    "split_runs",
+]
+
+
+def _arrow_engine() -> Engine:
+    # pyarrow and polars are optional, and only imported when engines are used.
+    from .arrow import ArrowEngine
+
+    return ArrowEngine()
+
+
+def _polars_engine() -> Engine:
+    from .polars import PolarsEngine
+
+    return PolarsEngine()
+
+
+registry = EngineRegistry()
+registry.register("pandas", PandasEngine)
+registry.register("sql", SQLEngine)
+registry.register("duckdb", partial(SQLEngine, "duckdb"))
+registry.register("sqlite", partial(SQLEngine, "sqlite"))
+registry.register("arrow", _arrow_engine)
+registry.register("polars", _polars_engine)
+
+register = registry.register
+enable = registry.enable
+get = registry.get
+names = registry.names
+
+
+def active() -> str:
+    """Return the name of the engine used by default."""
+    return registry.active
@@ -0,0 +1,828 @@
+"""Arrow engine, evaluating transforms with pyarrow compute kernels.
+
+Data are represented as ``pyarrow.Table``: Arrow tables and record batches
+passed to :func:`~altair_transform.apply` are transformed without converting
+them to pandas, and Parquet files referenced by charts are read directly as
+Arrow tables. Vega expressions of filter and calculate transforms are
+evaluated column-wise from their syntax tree, with Javascript semantics for
+arithmetic and truthiness.
+
+This module requires pyarrow, and is imported when the engine is first used.
+"""
+from functools import singledispatch
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .base import (
+    BOOLEAN,
+    CONSTANTS,
+    DATE,
+    KEY,
+    NUMBER,
+    OTHER,
+    OTHER_ROW,
+    ROW,
+    STRING,
+    TIMEUNIT_DEFAULTS,
+    Engine,
+    check_aggregates,
+    datum_field,
+    fold_fields,
+    lookup_outputs,
+    parse_expression,
+    timeunit_parts,
+)
+from ..transform.spec import (
+    AggregateSpec,
+    BinSpec,
+    CalculateSpec,
+    FilterSpec,
+    FoldSpec,
+    JoinAggregateSpec,
+    LookupSpec,
+    TimeUnitSpec,
+    TransformSpec,
+)
+from ..transform.vega_utils import calculate_bins
+from ..utils import ast, to_dataframe
+from ..utils.data import _url_format
+from ..vegaexpr import VEGAJS_NAMESPACE
+
+__all__ = ["ArrowEngine", "evaluate_expression"]
+
+# Errors of compute kernels for unsupported types, which fall back to pandas.
+FALLBACK_ERRORS = (
+    NotImplementedError,
+    pa.ArrowNotImplementedError,
+    pa.ArrowTypeError,
+    pa.ArrowInvalid,
+)
+
+Value = Union[pa.ChunkedArray, pa.Array, pa.Scalar]
+
+
+class ArrowEngine(Engine):
+    """Engine evaluating transforms on Arrow tables with ``pyarrow.compute``."""
+
+    name = "arrow"
+
+    def supports(self, spec: TransformSpec) -> bool:
+        if type(spec) not in compile_spec.registry:
+            return False
+        try:
+            check_spec(spec)
+        except NotImplementedError:
+            return False
+        return True
+
+    def execute(self, specs: List[TransformSpec], data: Any) -> Any:
+        for spec in specs:
+            try:
+                data = compile_spec(spec, data)
+            except FALLBACK_ERRORS:
+                data = self.fallback(spec, data)
+        return data
+
+    def is_native(self, data: Any) -> bool:
+        return isinstance(data, pa.Table)
+
+    def from_pandas(self, df: pd.DataFrame) -> pa.Table:
+        try:
+            return pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowTypeError, pa.ArrowInvalid) as err:
+            raise NotImplementedError(f"Conversion to Arrow: {err}") from err
+
+    def to_pandas(self, data: pa.Table) -> pd.DataFrame:
+        return data.to_pandas()
+
+    def load(self, data: Any, context: Any = None) -> Any:
+        if isinstance(data, dict) or hasattr(data, "to_dict"):
+            spec = data if isinstance(data, dict) else data.to_dict()
+            if "url" in spec and _url_format(spec) == "parquet":
+                import pyarrow.parquet as pq
+
+                return pq.read_table(spec["url"])
+        return super().load(data, context)
+
+
+# Expressions
+
+
+def value_type(value: Value) -> str:
+    """Return the type of an array or scalar."""
+    type_ = value.type
+    if pa.types.is_dictionary(type_):
+        type_ = type_.value_type
+    if pa.types.is_boolean(type_):
+        return BOOLEAN
+    if pa.types.is_integer(type_) or pa.types.is_floating(type_):
+        return NUMBER
+    if pa.types.is_string(type_) or pa.types.is_large_string(type_):
+        return STRING
+    if pa.types.is_timestamp(type_) or pa.types.is_date(type_):
+        return DATE
+    return OTHER
+
+
+def number(value: Value) -> Value:
+    """Cast a numeric value to float64, as Javascript numbers are doubles."""
+    if pa.types.is_floating(value.type):
+        return value
+    return pc.cast(value, pa.float64())
+
+
+def truthy(value: Value) -> Value:
+    """Return a boolean mask, true where values are truthy in Javascript."""
+    type_ = value_type(value)
+    if type_ == BOOLEAN:
+        mask = value
+    elif type_ == NUMBER:
+        mask = pc.and_(pc.not_equal(value, 0), pc.invert(pc.is_nan(number(value))))
+    elif type_ == STRING:
+        mask = pc.not_equal(value, "")
+    else:
+        mask = pc.is_valid(value)
+    return pc.fill_null(mask, False)
+
+
+def evaluate_expression(expression: str, table: pa.Table) -> Value:
+    """Evaluate a Vega expression over the rows of a table.
+
+    Returns an array, or a scalar for expressions not depending on the data.
+    Raises NotImplementedError if the expression uses unsupported features.
+    """
+    return _evaluate(parse_expression(expression), table)
+
+
+@singledispatch
+def _evaluate(node: Any, table: pa.Table) -> Value:
+    raise NotImplementedError(f"{type(node).__name__} in Arrow")
+
+
+@_evaluate.register(ast.Expr)
+def _evaluate_expr(node: ast.Expr, table: pa.Table) -> Value:
+    return _evaluate(node.value, table)
+
+
+@_evaluate.register(ast.Number)
+def _evaluate_number(node: ast.Number, table: pa.Table) -> Value:
+    return pa.scalar(float(node.value))
+
+
+@_evaluate.register(ast.String)
+def _evaluate_string(node: ast.String, table: pa.Table) -> Value:
+    return pa.scalar(node.value)
+
+
+@_evaluate.register(ast.Global)
+def _evaluate_global(node: ast.Global, table: pa.Table) -> Value:
+    if node.name == "null":
+        return pa.scalar(None)
+    if node.name in ("true", "false"):
+        return pa.scalar(node.name == "true")
+    if node.name in CONSTANTS:
+        return pa.scalar(VEGAJS_NAMESPACE[node.name])
+    raise NotImplementedError(f"Name {node.name!r} in Arrow")
+
+
+@_evaluate.register(ast.Attr)
+@_evaluate.register(ast.Item)
+def _evaluate_field(node: Any, table: pa.Table) -> Value:
+    field = datum_field(node)
+    if field not in table.column_names:
+        raise NotImplementedError(f"Undefined field {field!r} in Arrow")
+    return table[field]
+
+
+@_evaluate.register(ast.UnOp)
+def _evaluate_unop(node: ast.UnOp, table: pa.Table) -> Value:
+    rhs = _evaluate(node.rhs, table)
+    if node.op == "!":
+        return pc.invert(truthy(rhs))
+    if node.op == "-":
+        return pc.negate(number(rhs))
+    if node.op == "+":
+        return number(rhs)
+    raise NotImplementedError(f"Unary Operator {node.op}x in Arrow")
+
+
+def _comparison(
+    func: Callable[[Value, Value], Value], missing: bool = False
+) -> Callable[[Value, Value], Value]:
+    def compare(lhs: Value, rhs: Value) -> Value:
+        # As in pandas, comparisons to missing values are false, and so
+        # inequalities are true.
+        return pc.fill_null(func(lhs, rhs), missing)
+
+    return compare
+
+
+COMPARISONS: Dict[str, Callable[[Value, Value], Value]] = {
+    "<": _comparison(pc.less),
+    "<=": _comparison(pc.less_equal),
+    ">": _comparison(pc.greater),
+    ">=": _comparison(pc.greater_equal),
+    "==": _comparison(pc.equal),
+    "===": _comparison(pc.equal),
+    "!=": _comparison(pc.not_equal, missing=True),
+    "!==": _comparison(pc.not_equal, missing=True),
+}
+
+
+def _is_null_literal(value: Value) -> bool:
+    return isinstance(value, pa.Scalar) and pa.types.is_null(value.type)
+
+
+def _remainder(lhs: Value, rhs: Value) -> Value:
+    # The remainder has the sign of the dividend, as in Javascript.
+    lhs, rhs = number(lhs), number(rhs)
+    return pc.subtract(lhs, pc.multiply(pc.trunc(pc.divide(lhs, rhs)), rhs))
+
+
+ARITHMETIC: Dict[str, Callable[..., Value]] = {
+    "+": pc.add,
+    "-": pc.subtract,
+    "*": pc.multiply,
+    "/": pc.divide,
+    "%": _remainder,
+    "**": pc.power,
+}
+
+
+@_evaluate.register(ast.BinOp)
+def _evaluate_binop(node: ast.BinOp, table: pa.Table) -> Value:
+    op = node.op
+    lhs, rhs = _evaluate(node.lhs, table), _evaluate(node.rhs, table)
+    if op in COMPARISONS:
+        # Comparisons to null test for missing values, as in Javascript.
+        if op in ("==", "===", "!=", "!==") and (
+            _is_null_literal(lhs) or _is_null_literal(rhs)
+        ):
+            other = rhs if _is_null_literal(lhs) else lhs
+            return pc.is_null(other) if op.startswith("=") else pc.is_valid(other)
+        return COMPARISONS[op](lhs, rhs)
+    if op in ("&&", "||"):
+        # Javascript returns one of the operands.
+        if value_type(lhs) == value_type(rhs) == BOOLEAN:
+            func = pc.and_kleene if op == "&&" else pc.or_kleene
+            return func(lhs, rhs)
+        first, second = (rhs, lhs) if op == "&&" else (lhs, rhs)
+        return pc.if_else(truthy(lhs), first, second)
+    if op == "+" and STRING in (value_type(lhs), value_type(rhs)):
+        lhs, rhs = pc.cast(lhs, pa.string()), pc.cast(rhs, pa.string())
+        return pc.binary_join_element_wise(lhs, rhs, "")
+    if op in ARITHMETIC:
+        return ARITHMETIC[op](number(lhs), number(rhs))
+    raise NotImplementedError(f"Binary Operator A {op} B in Arrow")
+
+
+@_evaluate.register(ast.TernOp)
+def _evaluate_ternop(node: ast.TernOp, table: pa.Table) -> Value:
+    if node.op != ("?", ":"):
+        raise NotImplementedError(f"Ternary Operator A {node.op[0]} B {node.op[1]} C")
+    test, a, b = (_evaluate(n, table) for n in (node.lhs, node.mid, node.rhs))
+    return pc.if_else(truthy(test), a, b)
+
+
+def _unary(func: Callable[[Value], Value], cast: bool = True) -> Callable[..., Value]:
+    def evaluate(*args: Value) -> Value:
+        if len(args) != 1:
+            raise NotImplementedError(f"{func.__name__} of {len(args)} arguments")
+        return func(number(args[0]) if cast else args[0])
+
+    return evaluate
+
+
+def _binary(func: Callable[[Value, Value], Value]) -> Callable[..., Value]:
+    def evaluate(*args: Value) -> Value:
+        if len(args) != 2:
+            raise NotImplementedError(f"{func.__name__} of {len(args)} arguments")
+        return func(number(args[0]), number(args[1]))
+
+    return evaluate
+
+
+def _extremum(func: Callable[..., Value]) -> Callable[..., Value]:
+    def evaluate(*args: Value) -> Value:
+        if len(args) < 2:
+            raise NotImplementedError("min() or max() of fewer than two values")
+        return func(*(number(arg) for arg in args))
+
+    return evaluate
+
+
+def _is_valid(value: Value) -> Value:
+    valid = pc.is_valid(value)
+    if value_type(value) == NUMBER:
+        valid = pc.and_(valid, pc.invert(pc.fill_null(pc.is_nan(number(value)), True)))
+    return valid
+
+
+def _if(*args: Value) -> Value:
+    if len(args) != 3:
+        raise NotImplementedError(f"if() of {len(args)} arguments")
+    return pc.if_else(truthy(args[0]), args[1], args[2])
+
+
+def _date_part(func: Callable[[Value], Value], offset: int = 0) -> Callable[..., Value]:
+    def evaluate(*args: Value) -> Value:
+        if len(args) != 1 or value_type(args[0]) != DATE:
+            raise NotImplementedError(f"{func.__name__} of non-date values")
+        _check_local(args[0])
+        part = func(args[0])
+        return pc.subtract(part, offset) if offset else part
+
+    return evaluate
+
+
+FUNCTIONS: Dict[str, Callable[..., Value]] = {
+    "isValid": _unary(_is_valid, cast=False),
+    "toNumber": _unary(lambda value: value),
+    "toString": _unary(lambda value: pc.cast(value, pa.string()), cast=False),
+    "if": _if,
+    "abs": _unary(pc.abs),
+    "acos": _unary(pc.acos),
+    "asin": _unary(pc.asin),
+    "atan": _unary(pc.atan),
+    "atan2": _binary(pc.atan2),
+    "ceil": _unary(pc.ceil),
+    "cos": _unary(pc.cos),
+    "exp": _unary(lambda value: pc.power(np.e, value)),
+    "floor": _unary(pc.floor),
+    "log": _unary(pc.ln),
+    "max": _extremum(pc.max_element_wise),
+    "min": _extremum(pc.min_element_wise),
+    "pow": _binary(pc.power),
+    # Math.round rounds halves up.
+    "round": _unary(lambda value: pc.floor(pc.add(value, 0.5))),
+    "sin": _unary(pc.sin),
+    "sqrt": _unary(pc.sqrt),
+    "tan": _unary(pc.tan),
+    "year": _date_part(pc.year),
+    "quarter": _date_part(pc.quarter, 1),
+    "month": _date_part(pc.month, 1),
+    "date": _date_part(pc.day),
+    "day": _date_part(lambda value: pc.day_of_week(value, week_start=7)),
+    "hours": _date_part(pc.hour),
+    "minutes": _date_part(pc.minute),
+    "seconds": _date_part(pc.second),
+    "milliseconds": _date_part(pc.millisecond),
+    "length": _unary(pc.utf8_length, cast=False),
+    "lower": _unary(pc.utf8_lower, cast=False),
+    "trim": _unary(pc.utf8_trim_whitespace, cast=False),
+    "upper": _unary(pc.utf8_upper, cast=False),
+}
+
+
+@_evaluate.register(ast.Func)
+def _evaluate_func(node: ast.Func, table: pa.Table) -> Value:
+    if not isinstance(node.func, ast.Global) or node.func.name not in FUNCTIONS:
+        raise NotImplementedError(f"Function {node.func} in Arrow")
+    args = [_evaluate(arg, table) for arg in node.args]
+    return FUNCTIONS[node.func.name](*args)
+
+
+def check_expression(node: Any) -> None:
+    """Raise NotImplementedError if an expression cannot be evaluated."""
+    if isinstance(node, str):
+        node = parse_expression(node)
+    if isinstance(node, (ast.Attr, ast.Item)):
+        datum_field(node)
+        return
+    if isinstance(node, ast.Func):
+        if not isinstance(node.func, ast.Global) or node.func.name not in FUNCTIONS:
+            raise NotImplementedError(f"Function {node.func} in Arrow")
+        children: List[Any] = node.args
+    elif isinstance(node, ast.Global):
+        if node.name not in CONSTANTS + ["null", "true", "false"]:
+            raise NotImplementedError(f"Name {node.name!r} in Arrow")
+        children = []
+    elif isinstance(node, ast.UnOp):
+        if node.op not in ("!", "-", "+"):
+            raise NotImplementedError(f"Unary Operator {node.op}x in Arrow")
+        children = [node.rhs]
+    elif isinstance(node, ast.BinOp):
+        if node.op not in {**COMPARISONS, **ARITHMETIC, "&&": 0, "||": 0}:
+            raise NotImplementedError(f"Binary Operator A {node.op} B in Arrow")
+        children = [node.lhs, node.rhs]
+    elif isinstance(node, ast.TernOp):
+        children = [node.lhs, node.mid, node.rhs]
+    elif isinstance(node, ast.Expr):
+        children = [node.value]
+    elif isinstance(node, (ast.Number, ast.String)):
+        children = []
+    else:
+        raise NotImplementedError(f"{type(node).__name__} in Arrow")
+    for child in children:
+        check_expression(child)
+
+
+# Predicates
+
+
+def evaluate_predicate(predicate: Any, table: pa.Table) -> Value:
+    """Evaluate a filter predicate, in expression or JSON form, to a mask.
+
+    Masks are true or false, never null: as in pandas, tests of missing values
+    are false, and their negations true.
+    """
+    if isinstance(predicate, str):
+        mask = truthy(evaluate_expression(predicate, table))
+        if isinstance(mask, pa.Scalar):
+            mask = pa.repeat(mask, table.num_rows)
+        return mask
+    check_predicate(predicate)
+    if "not" in predicate:
+        return pc.invert(
+            pc.fill_null(evaluate_predicate(predicate["not"], table), False)
+        )
+    if "and" in predicate:
+        masks = [evaluate_predicate(p, table) for p in predicate["and"]]
+        return _reduce(pc.and_kleene, masks, True, table)
+    if "or" in predicate:
+        masks = [evaluate_predicate(p, table) for p in predicate["or"]]
+        return _reduce(pc.or_kleene, masks, False, table)
+    field = predicate["field"]
+    if field not in table.column_names:
+        raise NotImplementedError(f"Undefined field {field!r} in Arrow")
+    column = table[field]
+    if "equal" in predicate:
+        return COMPARISONS["=="](column, predicate["equal"])
+    if "range" in predicate:
+        min_, max_ = predicate["range"]
+        masks = [] if min_ is None else [COMPARISONS[">="](column, min_)]
+        masks += [] if max_ is None else [COMPARISONS["<="](column, max_)]
+        return _reduce(pc.and_kleene, masks, True, table, pc.is_valid(column))
+    if "oneOf" in predicate:
+        return pc.is_in(column, value_set=pa.array(predicate["oneOf"]))
+    for op, symbol in [("lt", "<"), ("lte", "<="), ("gt", ">"), ("gte", ">=")]:
+        if op in predicate:
+            return COMPARISONS[symbol](column, predicate[op])
+    raise NotImplementedError(f"Predicate with properties {sorted(predicate)}")
+
+
+def _reduce(
+    func: Callable[[Value, Value], Value],
+    masks: List[Value],
+    empty: bool,
+    table: pa.Table,
+    default: Optional[Value] = None,
+) -> Value:
+    if not masks:
+        return default if default is not None else pa.repeat(empty, table.num_rows)
+    result = masks[0]
+    for mask in masks[1:]:
+        result = func(result, mask)
+    return result
+
+
+def check_predicate(predicate: Any) -> None:
+    """Raise NotImplementedError if a predicate cannot be evaluated."""
+    if isinstance(predicate, str):
+        check_expression(predicate)
+        return
+    if not isinstance(predicate, dict):
+        raise NotImplementedError(f"Predicate of type {type(predicate)}")
+    if "not" in predicate:
+        check_predicate(predicate["not"])
+    elif "and" in predicate or "or" in predicate:
+        for p in predicate.get("and", predicate.get("or")):
+            check_predicate(p)
+    elif "timeUnit" in predicate:
+        raise NotImplementedError("timeUnit in predicates in Arrow")
+    else:
+        values = [predicate.get(op) for op in ("equal", "lt", "lte", "gt", "gte")]
+        values += list(predicate.get("range", [])) + list(predicate.get("oneOf", []))
+        if any(isinstance(value, dict) for value in values):
+            raise NotImplementedError("DateTime objects in predicates in Arrow")
+
+
+# Transforms
+
+
+@singledispatch
+def check_spec(spec: TransformSpec) -> None:
+    """Raise NotImplementedError if a transform cannot be evaluated with Arrow."""
+
+
+@singledispatch
+def compile_spec(spec: TransformSpec, table: pa.Table) -> pa.Table:
+    """Evaluate a transform over an Arrow table."""
+    raise NotImplementedError(f"{type(spec).__name__} in Arrow")
+
+
+def _assign(table: pa.Table, columns: Dict[str, Value]) -> pa.Table:
+    """Assign columns, replacing existing columns in place, as in pandas."""
+    for name, value in columns.items():
+        if isinstance(value, pa.Scalar):
+            value = pa.repeat(value, table.num_rows)
+        if name in table.column_names:
+            table = table.set_column(table.column_names.index(name), name, value)
+        else:
+            table = table.append_column(name, value)
+    return table
+
+
+def _with_row(table: pa.Table, name: str = ROW) -> pa.Table:
+    return table.append_column(name, pa.array(np.arange(table.num_rows)))
+
+
+# Hash aggregate functions and their options, by aggregate op.
+AGGREGATES: Dict[str, Any] = {
+    "count": ("count_all", None),
+    "valid": ("count", pc.CountOptions(mode="only_valid")),
+    "missing": ("count", pc.CountOptions(mode="only_null")),
+    "distinct": ("count_distinct", pc.CountOptions(mode="only_valid")),
+    "sum": ("sum", pc.ScalarAggregateOptions(min_count=0)),
+    "product": ("product", pc.ScalarAggregateOptions(min_count=0)),
+    "mean": ("mean", None),
+    "average": ("mean", None),
+    "min": ("min", None),
+    "max": ("max", None),
+    "variance": ("variance", pc.VarianceOptions(ddof=1)),
+    "variancep": ("variance", pc.VarianceOptions(ddof=0)),
+    "stdev": ("stddev", pc.VarianceOptions(ddof=1)),
+    "stdevp": ("stddev", pc.VarianceOptions(ddof=0)),
+    "stderr": ("stddev", pc.VarianceOptions(ddof=1)),
+}
+
+
+def _aggregate_request(aggregate: Dict[str, Any], table: pa.Table) -> tuple:
+    op, field = aggregate["op"], aggregate.get("field", "*")
+    if op == "count":
+        return ([], "count_all", None)
+    func, options = AGGREGATES[op]
+    return (field, func, options)
+
+
+def _group_by(table: pa.Table, groupby: List[str], requests: List[tuple]) -> pa.Table:
+    """Aggregate a table, returning the keys followed by one column per request."""
+    result = table.group_by(groupby, use_threads=False).aggregate(requests)
+    # Keys precede or follow aggregates depending on the version of pyarrow, and
+    # aggregates are renamed, as several requests may share a name.
+    keys = [result.column_names.index(key) for key in groupby]
+    values = [i for i in range(result.num_columns) if i not in keys]
+    names = [f"_{i}" for i in range(len(requests))]
+    return result.select(keys + values).rename_columns(groupby + names)
+
+
+def _aggregate_columns(
+    table: pa.Table, groupby: List[str], aggregates: List[Dict[str, Any]]
+) -> pa.Table:
+    """Aggregate a table, returning the keys and one column per aggregate."""
+    table = _decode(table, groupby)
+    requests = [_aggregate_request(aggregate, table) for aggregate in aggregates]
+    # The standard error is the standard deviation over the root of the count.
+    requests += [
+        (aggregate["field"], "count", AGGREGATES["valid"][1])
+        for aggregate in aggregates
+        if aggregate["op"] == "stderr"
+    ]
+    grouped = _group_by(table, groupby, requests)
+    columns = {key: grouped[key] for key in groupby}
+    counts = iter(range(len(groupby) + len(aggregates), grouped.num_columns))
+    for i, aggregate in enumerate(aggregates):
+        value = grouped.column(len(groupby) + i)
+        if aggregate["op"] == "stderr":
+            count = pc.cast(grouped.column(next(counts)), pa.float64())
+            value = pc.divide(value, pc.sqrt(count))
+        columns[aggregate["as"]] = value
+    return pa.table(columns)
+
+
+def _decode(table: pa.Table, fields: List[str]) -> pa.Table:
+    """Decode dictionary-encoded columns, which cannot be used as keys."""
+    for field in fields:
+        type_ = table[field].type
+        if pa.types.is_dictionary(type_):
+            index = table.column_names.index(field)
+            table = table.set_column(
+                index, field, pc.cast(table[field], type_.value_type)
+            )
+    return table
+
+
+@check_spec.register(AggregateSpec)
+def _check_aggregate(spec: AggregateSpec) -> None:
+    check_aggregates(spec["aggregate"], AGGREGATES)
+
+
+@compile_spec.register(AggregateSpec)
+def _compile_aggregate(spec: AggregateSpec, table: pa.Table) -> pa.Table:
+    groupby = spec.get("groupby", [])
+    # As with pandas, null keys are dropped, and groups are sorted by key.
+    for key in groupby:
+        table = table.filter(_is_valid(table[key]))
+    result = _aggregate_columns(table, groupby, spec["aggregate"])
+    if groupby:
+        result = result.sort_by([(key, "ascending") for key in groupby])
+    return result
+
+
+@check_spec.register(JoinAggregateSpec)
+def _check_joinaggregate(spec: JoinAggregateSpec) -> None:
+    check_aggregates(spec["joinaggregate"], AGGREGATES)
+
+
+@compile_spec.register(JoinAggregateSpec)
+def _compile_joinaggregate(spec: JoinAggregateSpec, table: pa.Table) -> pa.Table:
+    groupby = spec.get("groupby", [])
+    aggregates = spec["joinaggregate"]
+    grouped = _aggregate_columns(table, groupby, aggregates)
+    values = grouped.drop(groupby)
+    if groupby:
+        # Rows with null keys are in no group, and get null values.
+        joined = (
+            _with_row(_decode(table, groupby).select(groupby))
+            .join(grouped, groupby, join_type="left outer", use_threads=False)
+            .sort_by(ROW)
+        )
+        values = joined.select(values.column_names)
+    else:
+        values = pa.table(
+            {
+                name: pa.repeat(values[name][0], table.num_rows)
+                for name in values.column_names
+            }
+        )
+    return _assign(table, {name: values[name] for name in values.column_names})
+
+
+@check_spec.register(FilterSpec)
+def _check_filter(spec: FilterSpec) -> None:
+    check_predicate(spec["filter"])
+
+
+@compile_spec.register(FilterSpec)
+def _compile_filter(spec: FilterSpec, table: pa.Table) -> pa.Table:
+    # Rows for which the predicate is null are dropped.
+    return table.filter(evaluate_predicate(spec["filter"], table))
+
+
+@check_spec.register(CalculateSpec)
+def _check_calculate(spec: CalculateSpec) -> None:
+    check_expression(spec["calculate"])
+
+
+@compile_spec.register(CalculateSpec)
+def _compile_calculate(spec: CalculateSpec, table: pa.Table) -> pa.Table:
+    return _assign(table, {spec["as"]: evaluate_expression(spec["calculate"], table)})
+
+
+@compile_spec.register(FoldSpec)
+def _compile_fold(spec: FoldSpec, table: pa.Table) -> pa.Table:
+    key, value = spec.get("as", ("key", "value"))
+    fields, ids = fold_fields(spec, table.column_names)
+    types = {table[field].type for field in fields}
+    if len(types) == 1:
+        fold_type = types.pop()
+    elif all(value_type(table[field]) == NUMBER for field in fields):
+        fold_type = pa.float64()
+    else:
+        fold_type = pa.string()
+    table = _with_row(table)
+    folds = []
+    for field in fields:
+        folds.append(
+            table.select(ids)
+            .append_column(key, pa.repeat(pa.scalar(field), table.num_rows))
+            .append_column(value, pc.cast(table[field], fold_type))
+            .append_column(ROW, table[ROW])
+        )
+    folded = pa.concat_tables(folds)
+    # The concatenation is stable-sorted to interleave the folds of each row.
+    folded = folded.take(pc.sort_indices(folded[ROW]))
+    other = table.select(fields + [ROW]).take(folded[ROW])
+    for field in fields:
+        folded = folded.append_column(field, other[field])
+    return folded.drop([ROW])
+
+
+@check_spec.register(LookupSpec)
+def _check_lookup(spec: LookupSpec) -> None:
+    if not isinstance(spec.get("default", ""), str):
+        raise NotImplementedError("Lookup with a non-string default in Arrow")
+
+
+@compile_spec.register(LookupSpec)
+def _compile_lookup(spec: LookupSpec, table: pa.Table) -> pa.Table:
+    key = spec["from"]["key"]
+    other = spec["from"]["data"]
+    if not isinstance(other, pa.Table):
+        other = pa.Table.from_pandas(to_dataframe(other), preserve_index=False)
+    lookup = spec["lookup"]
+    default = spec.get("default")
+    outputs = lookup_outputs(spec, table.column_names, other.column_names)
+
+    right = _with_row(other.select(outputs), OTHER_ROW).append_column(
+        KEY, _decode(other, [key])[key]
+    )
+    joined = (
+        _with_row(_decode(table, [lookup]))
+        .join(right, lookup, KEY, join_type="left outer", use_threads=False)
+        .sort_by([(ROW, "ascending"), (OTHER_ROW, "ascending")])
+    )
+    if default is not None:
+        missing = pc.is_null(joined[OTHER_ROW])
+        for field in outputs:
+            value = pc.cast(joined[field], pa.string())
+            value = pc.if_else(missing, pa.scalar(default), value)
+            joined = _assign(joined, {field: value})
+    return joined.select(table.column_names + outputs)
+
+
+@compile_spec.register(BinSpec)
+def _compile_bin(spec: BinSpec, table: pa.Table) -> pa.Table:
+    column = table[spec["field"]]
+    if value_type(column) != NUMBER:
+        raise NotImplementedError("Bin of a non-numeric field in Arrow")
+    column = number(column)
+    bin_ = {} if spec["bin"] is True else dict(spec["bin"])
+    if "extent" not in bin_:
+        extent = pc.min_max(column)
+        bin_["extent"] = [extent["min"].as_py(), extent["max"].as_py()]
+    edges = calculate_bins(**bin_)
+    start, stop, nbins = edges[0], edges[-1], len(edges) - 1
+    step = (stop - start) / nbins
+    # Values out of the extent are null, and the upper bound is in the last bin.
+    index = pc.min_element_wise(
+        pc.floor(pc.divide(pc.subtract(column, start), step)), nbins - 1
+    )
+    inside = pc.and_(pc.greater_equal(column, start), pc.less_equal(column, stop))
+    null = pa.scalar(None, pa.float64())
+    bin_start = pc.if_else(inside, pc.add(start, pc.multiply(step, index)), null)
+    bin_end = pc.if_else(
+        inside, pc.add(start, pc.multiply(step, pc.add(index, 1))), null
+    )
+    col = spec["as"]
+    names = (col, col + "_end") if isinstance(col, str) else tuple(col)
+    return _assign(table, {names[0]: bin_start, names[1]: bin_end})
+
+
+def _check_local(date: Value) -> None:
+    # Dates with a time zone would be converted to local time, as in pandas.
+    if pa.types.is_timestamp(date.type) and date.type.tz is not None:
+        raise NotImplementedError("Dates with a time zone in Arrow")
+
+
+def _days_from_civil(year: Value, month: Value, day: Value) -> Value:
+    """Return the number of days since 1970-01-01 of dates of the calendar."""
+    # See http://howardhinnant.github.io/date_algorithms.html#days_from_civil
+    year = pc.subtract(number(year), pc.cast(pc.less_equal(month, 2), pa.float64()))
+    era = pc.floor(pc.divide(year, 400))
+    yoe = pc.subtract(year, pc.multiply(era, 400))
+    shifted = pc.if_else(pc.greater(month, 2), pc.subtract(month, 3), pc.add(month, 9))
+    doy = pc.add(
+        pc.floor(pc.divide(pc.add(pc.multiply(number(shifted), 153), 2), 5)),
+        pc.subtract(number(day), 1),
+    )
+    doe = pc.add(
+        pc.add(pc.multiply(yoe, 365), pc.floor(pc.divide(yoe, 4))),
+        pc.subtract(doy, pc.floor(pc.divide(yoe, 100))),
+    )
+    return pc.subtract(pc.add(pc.multiply(era, 146097), doe), 719468)
+
+
+@check_spec.register(TimeUnitSpec)
+def _check_timeunit(spec: TimeUnitSpec) -> None:
+    timeunit_parts(spec["timeUnit"])
+
+
+@compile_spec.register(TimeUnitSpec)
+def _compile_timeunit(spec: TimeUnitSpec, table: pa.Table) -> pa.Table:
+    date = table[spec["field"]]
+    if value_type(date) == STRING:
+        # As in Vega-Lite, fields with a timeUnit are parsed as dates.
+        date = pc.cast(date, pa.timestamp("ns"))
+    elif value_type(date) != DATE:
+        raise NotImplementedError("timeUnit of a non-date field in Arrow")
+    _check_local(date)
+    units = timeunit_parts(spec["timeUnit"])
+
+    def part(unit: str, func: Callable[[Value], Value]) -> Value:
+        return func(date) if unit in units else pa.scalar(TIMEUNIT_DEFAULTS[unit])
+
+    month = part("month", pc.month)
+    if "quarter" in units and "month" not in units:
+        month = pc.subtract(pc.multiply(pc.quarter(date), 3), 2)
+    days = _days_from_civil(part("year", pc.year), month, part("date", pc.day))
+    if units == ["day"]:
+        days = pc.add(days, number(pc.day_of_week(date, week_start=7)))
+    seconds = pc.add(
+        pc.add(
+            pc.multiply(days, 86400), pc.multiply(number(part("hours", pc.hour)), 3600)
+        ),
+        pc.add(
+            pc.multiply(number(part("minutes", pc.minute)), 60),
+            number(part("seconds", pc.second)),
+        ),
+    )
+    millis = pc.add(
+        pc.multiply(seconds, 1000), number(part("milliseconds", pc.millisecond))
+    )
+    nanos = pc.multiply(pc.cast(millis, pa.int64()), 1000000)
+    return _assign(table, {spec["as"]: pc.cast(nanos, pa.timestamp("ns"))})
@@ -0,0 +1,322 @@
+"""Execution engines for normalized transform pipelines.
+
+An engine evaluates transforms on its own representation of the data (for
+example a database relation or an Arrow table). Engines declare which
+transforms they support: a pipeline is split into runs of consecutive
+supported transforms, each of which the engine executes as a whole (so that
+it may compile the run into a single query), while unsupported transforms are
+evaluated one by one by the pandas visitors.
+
+This module also holds what the engines compiling transforms share: the types
+of values they track, the parsing of Vega expressions, and the parts of
+transforms which do not depend on the representation of the data.
+"""
+import threading
+from typing import Any, Callable, Container, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from ..transform import visit
+from ..transform.pipeline import visit_spec
+from ..transform.spec import FoldSpec, LookupSpec, TransformSpec
+from ..utils import Parser, ast, to_dataframe
+from ..utils.timeunit import _parse_timeunit_string
+
+__all__ = ["Engine", "PandasEngine", "EngineRegistry", "split_runs", "execute"]
+
+
+class Engine:
+    """Base class of execution engines.
+
+    Subclasses implement :meth:`supports` and :meth:`execute`, and convert
+    data from and to pandas with :meth:`from_pandas` and :meth:`to_pandas`.
+    """
+
+    #: The name under which the engine is registered.
+    name = ""
+
+    def supports(self, spec: TransformSpec) -> bool:
+        """Return True if the engine can evaluate this transform."""
+        return False
+
+    def execute(self, specs: List[TransformSpec], data: Any) -> Any:
+        """Evaluate a run of supported transforms.
+
+        Parameters
+        ----------
+        specs : list of TransformSpec
+            Consecutive transforms, all supported by the engine.
+        data : native data
+            The input data, as returned by :meth:`from_pandas` or by a
+            previous call.
+
+        Returns
+        -------
+        data : native data
+            The transformed data, in any representation accepted by
+            :meth:`execute` and :meth:`to_pandas`.
+        """
+        raise NotImplementedError()
+
+    def is_native(self, data: Any) -> bool:
+        """Return True if data is in the engine's representation.
+
+        Native data passed to :func:`~altair_transform.apply` is evaluated
+        without conversion to a dataframe.
+        """
+        return False
+
+    def load(self, data: Any, context: Any = None) -> Any:
+        """Load chart data, as a dataframe or in the engine's representation."""
+        return to_dataframe(data, context)
+
+    def from_pandas(self, df: pd.DataFrame) -> Any:
+        """Convert a dataframe to the engine's representation.
+
+        Raises NotImplementedError if the dataframe cannot be represented, in
+        which case transforms are evaluated with pandas.
+        """
+        return df
+
+    def to_pandas(self, data: Any) -> pd.DataFrame:
+        """Convert data in the engine's representation to a dataframe."""
+        return data
+
+    def fallback(self, spec: TransformSpec, data: Any) -> Any:
+        """Evaluate a transform with pandas, for data the engine does not support.
+
+        Engines call this from :meth:`execute` for transforms they support but
+        cannot evaluate on these data (e.g. because of the column types).
+        """
+        return self.from_pandas(visit_spec(spec, self.to_pandas(data)))
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+class PandasEngine(Engine):
+    """The default engine, evaluating each transform with the pandas visitors."""
+
+    name = "pandas"
+
+    def supports(self, spec: TransformSpec) -> bool:
+        return True
+
+    def execute(self, specs: List[TransformSpec], data: Any) -> Any:
+        return visit(specs, data)
+
+
+EngineFactory = Callable[[], Engine]
+
+
+class EngineRegistry:
+    """Registry of engines, by name.
+
+    Engines are registered as factories, which are called once on first use,
+    so that engines with optional dependencies only import them when used.
+    """
+
+    def __init__(self, default: str = "pandas"):
+        self._factories: Dict[str, EngineFactory] = {}
+        self._engines: Dict[str, Engine] = {}
+        self._active = default
+
+    def register(self, name: str, factory: EngineFactory) -> None:
+        """Register an engine factory under a name."""
+        self._factories[name] = factory
+        self._engines.pop(name, None)
+
+    def names(self) -> List[str]:
+        """Return the names of the registered engines."""
+        return list(self._factories)
+
+    @property
+    def active(self) -> str:
+        """The name of the engine used by default."""
+        return self._active
+
+    def enable(self, name: str) -> None:
+        """Set the engine used by default."""
+        self.get(name)
+        self._active = name
+
+    def get(self, name: Optional[str] = None) -> Engine:
+        """Return the engine registered under a name (default: the active one)."""
+        if name is None:
+            name = self._active
+        if name not in self._factories:
+            raise ValueError(
+                f"Unknown engine: {name!r}. Registered engines: {self.names()}"
+            )
+        if name not in self._engines:
+            self._engines[name] = self._factories[name]()
+        return self._engines[name]
+
+    def resolve(self, engine: Union[str, Engine, None]) -> Engine:
+        """Return an engine given by name or instance, or the active engine."""
+        if isinstance(engine, Engine):
+            return engine
+        return self.get(engine)
+
+
+def split_runs(
+    engine: Engine, specs: List[TransformSpec]
+) -> List[Tuple[bool, List[TransformSpec]]]:
+    """Split a pipeline into runs of transforms supported or not by an engine.
+
+    Returns
+    -------
+    runs : list of (supported, specs) tuples
+        Maximal runs of consecutive transforms which are all supported, or all
+        unsupported, by the engine.
+    """
+    runs: List[Tuple[bool, List[TransformSpec]]] = []
+    for spec in specs:
+        supported = engine.supports(spec)
+        if runs and runs[-1][0] == supported:
+            runs[-1][1].append(spec)
+        else:
+            runs.append((supported, [spec]))
+    return runs
+
+
+def execute(
+    engine: Engine, specs: List[TransformSpec], data: Any, n_jobs: Optional[int] = None,
+) -> Any:
+    """Evaluate a pipeline with an engine, falling back to pandas per transform.
+
+    Returns the result in the engine's representation, or as a dataframe if
+    the last transform was evaluated by pandas. An input dataframe is copied
+    before any transform is evaluated by pandas, and is otherwise left as is.
+    """
+    input_data = data
+    for supported, run in split_runs(engine, specs):
+        if supported and isinstance(data, pd.DataFrame):
+            try:
+                data = engine.from_pandas(data)
+            except NotImplementedError:
+                supported = False
+        if supported:
+            data = engine.execute(run, data)
+            continue
+        if not isinstance(data, pd.DataFrame):
+            data = engine.to_pandas(data)
+        elif data is input_data:
+            data = data.copy()
+        for spec in run:
+            data = visit_spec(spec, data, n_jobs)
+    return data
+
+
+# Shared by the engines compiling transforms.
+
+# Temporary columns holding the position of rows.
+ROW = "__altair_transform_row"
+OTHER_ROW = "__altair_transform_other_row"
+KEY = "__altair_transform_key"
+
+# Types of values, as far as the compilation of expressions needs to know them.
+NUMBER, STRING, BOOLEAN, DATE, NULL, OTHER = (
+    "number",
+    "string",
+    "boolean",
+    "date",
+    "null",
+    "other",
+)
+
+# Constants of the Vega expression language, besides null, true and false.
+CONSTANTS = ["E", "LN2", "LN10", "LOG2E", "LOG10E", "PI", "SQRT1_2", "SQRT2"]
+
+_parser = Parser()
+_parser_lock = threading.Lock()
+
+
+def parse_expression(expression: str) -> Any:
+    """Parse a Vega expression to its syntax tree."""
+    # The lexer of the parser is stateful.
+    with _parser_lock:
+        return _parser.parse(expression)
+
+
+def datum_field(node: Any) -> str:
+    """Return the field accessed by a datum.field or datum["field"] node."""
+    if isinstance(node, (ast.Attr, ast.Item)):
+        obj = node.obj
+        if isinstance(obj, ast.Global) and obj.name == "datum":
+            if isinstance(node, ast.Attr):
+                return node.attr.name if isinstance(node.attr, ast.Name) else node.attr
+            if isinstance(node.item, ast.String):
+                return node.item.value
+    raise NotImplementedError("Access to properties other than datum fields")
+
+
+def check_aggregates(aggregates: List[Dict[str, Any]], ops: Container[str]) -> None:
+    """Raise NotImplementedError unless all aggregates are of supported ops.
+
+    As in Vega, count is the number of records, valid or not, and is the only
+    aggregate op which does not need a field.
+    """
+    for aggregate in aggregates:
+        op = aggregate["op"]
+        if op not in ops:
+            raise NotImplementedError(f"Aggregate {op!r}")
+        if op != "count" and aggregate.get("field", "*") == "*":
+            raise NotImplementedError(f"Aggregate {op!r} without a field")
+
+
+def fold_fields(spec: FoldSpec, columns: List[str]) -> Tuple[List[str], List[str]]:
+    """Return the folded fields and the other columns of a fold transform.
+
+    As with pandas, folded fields keep the order of the input columns.
+    """
+    fields = [col for col in columns if col in spec["fold"]]
+    if not fields:
+        raise NotImplementedError("Fold of no fields")
+    return fields, [col for col in columns if col not in spec["fold"]]
+
+
+def lookup_outputs(
+    spec: LookupSpec, columns: List[str], other_columns: List[str]
+) -> List[str]:
+    """Return the fields added by a lookup transform.
+
+    Engines join the lookup data to the input as pandas does: rows with several
+    matches are repeated, in the order of the lookup data.
+    """
+    key = spec["from"]["key"]
+    fields = spec["from"].get("fields") or other_columns
+    # A key of the same name as the lookup field is merged with it.
+    outputs = [field for field in fields if not field == key == spec["lookup"]]
+    if any(col in columns for col in outputs):
+        # pandas suffixes conflicting columns.
+        raise NotImplementedError("Lookup of fields conflicting with input columns")
+    return outputs
+
+
+# Values of the parts of dates which a time unit does not keep.
+TIMEUNIT_DEFAULTS = {
+    "year": 2012,
+    "month": 1,
+    "date": 1,
+    "hours": 0,
+    "minutes": 0,
+    "seconds": 0,
+    "milliseconds": 0,
+}
+
+
+def timeunit_parts(timeunit: str) -> List[str]:
+    """Return the sorted parts of dates kept by a local time unit.
+
+    The "day" time unit returns ``["day"]``: days of the week are mapped to the
+    first week of 2012, which starts on Sunday the 1st of January.
+    """
+    if timeunit.startswith("utc"):
+        raise NotImplementedError("UTC time units")
+    if timeunit == "day":
+        return ["day"]
+    units = _parse_timeunit_string(timeunit)
+    if "day" in units:
+        raise NotImplementedError("quarter and day timeunit")
+    return sorted(units)
@@ -0,0 +1,841 @@
+"""Polars engine, translating pipelines to lazy Polars queries.
+
+Data are represented as ``polars.LazyFrame``: each transform extends the
+query, and the whole pipeline is evaluated at once when the result is
+collected, so that Polars' optimizer pushes predicates and projections down
+and its executor evaluates the query on all cores. Vega expressions compile to
+Polars expressions, aggregate to ``group_by().agg()``, and window to ``over()``
+with cumulative and rolling expressions. Polars DataFrames and LazyFrames
+passed to :func:`~altair_transform.apply` are transformed without conversion
+to pandas, and Parquet files referenced by charts are scanned lazily.
+
+This module requires polars, and is imported when the engine is first used.
+"""
+from functools import singledispatch
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+import polars as pl
+
+from .base import (
+    BOOLEAN,
+    CONSTANTS,
+    DATE,
+    KEY,
+    NULL,
+    NUMBER,
+    OTHER,
+    OTHER_ROW,
+    ROW,
+    STRING,
+    TIMEUNIT_DEFAULTS,
+    Engine,
+    check_aggregates,
+    datum_field,
+    fold_fields,
+    lookup_outputs,
+    parse_expression,
+    timeunit_parts,
+)
+from ..transform.spec import (
+    AggregateSpec,
+    BinSpec,
+    CalculateSpec,
+    FilterSpec,
+    FoldSpec,
+    JoinAggregateSpec,
+    LookupSpec,
+    TimeUnitSpec,
+    TransformSpec,
+    WindowSpec,
+)
+from ..transform.vega_utils import calculate_bins
+from ..utils import ast, is_arrow, to_dataframe
+from ..utils.data import _url_format
+from ..vegaexpr import VEGAJS_NAMESPACE
+
+__all__ = ["PolarsEngine", "compile_expression"]
+
+# The type of columns where the input is not known.
+UNKNOWN = "unknown"
+
+
+def column_type(dtype: Any) -> str:
+    """Return the type of the values of a Polars data type."""
+    if dtype == pl.Boolean:
+        return BOOLEAN
+    if dtype.is_numeric():
+        return NUMBER
+    if dtype in (pl.String, pl.Categorical):
+        return STRING
+    if isinstance(dtype, pl.Datetime) or dtype == pl.Date:
+        return DATE
+    return OTHER
+
+
+def schema_types(frame: pl.LazyFrame) -> Dict[str, str]:
+    """Return the types of the columns of a query."""
+    return {name: column_type(dtype) for name, dtype in frame.collect_schema().items()}
+
+
+class PolarsEngine(Engine):
+    """Engine translating transforms to a ``polars.LazyFrame`` query."""
+
+    name = "polars"
+
+    def supports(self, spec: TransformSpec) -> bool:
+        if type(spec) not in compile_spec.registry:
+            return False
+        try:
+            check_spec(spec)
+        except NotImplementedError:
+            return False
+        return True
+
+    def execute(self, specs: List[TransformSpec], data: Any) -> Any:
+        frame = data.lazy()
+        for spec in specs:
+            try:
+                result = compile_spec(spec, frame)
+                # Resolving the schema raises errors of types at planning time.
+                result.collect_schema()
+            except (NotImplementedError, pl.exceptions.PolarsError):
+                result = self.fallback(spec, frame)
+            frame = result
+        return frame
+
+    def is_native(self, data: Any) -> bool:
+        return isinstance(data, (pl.DataFrame, pl.LazyFrame))
+
+    def from_pandas(self, df: pd.DataFrame) -> pl.LazyFrame:
+        try:
+            frame = pl.from_pandas(df)
+        except Exception as err:
+            # pyarrow raises errors of its own for columns of mixed types.
+            raise NotImplementedError(f"Conversion to Polars: {err}") from err
+        return frame.lazy().with_columns(pl.col(pl.Categorical).cast(pl.String))
+
+    def to_pandas(self, data: Any) -> pd.DataFrame:
+        return data.lazy().collect().to_pandas()
+
+    def load(self, data: Any, context: Any = None) -> Any:
+        if isinstance(data, dict) or hasattr(data, "to_dict"):
+            spec = data if isinstance(data, dict) else data.to_dict()
+            if "url" in spec and _url_format(spec) == "parquet":
+                return pl.scan_parquet(spec["url"])
+        return super().load(data, context)
+
+
+# Expressions
+
+
+class Context:
+    """Context of the compilation of an expression.
+
+    ``columns`` maps the columns of the input to their types, or is None where
+    they are not known (when checking if an expression can be compiled).
+    """
+
+    def __init__(self, columns: Optional[Dict[str, str]] = None):
+        self.columns = columns
+
+    def column(self, name: Any) -> "Compiled":
+        if not isinstance(name, str):
+            raise NotImplementedError(f"Field {name!r} in Polars")
+        if self.columns is None:
+            return pl.col(name), UNKNOWN
+        if name not in self.columns:
+            raise NotImplementedError(f"Undefined field {name!r} in Polars")
+        return pl.col(name), self.columns[name]
+
+
+Compiled = Tuple[pl.Expr, str]
+
+
+def compile_expression(
+    expression: str, columns: Optional[Dict[str, str]] = None
+) -> Compiled:
+    """Compile a Vega expression to a Polars expression.
+
+    Returns
+    -------
+    expr, type : pl.Expr, str
+        The Polars expression and the type of its values.
+
+    Raises
+    ------
+    NotImplementedError
+        If the expression uses features without a Polars translation.
+    """
+    return _compile(parse_expression(expression), Context(columns))
+
+
+def number(compiled: Compiled) -> pl.Expr:
+    """Return a value as a float, as Javascript numbers are doubles."""
+    return compiled[0].cast(pl.Float64)
+
+
+def truthy(compiled: Compiled) -> pl.Expr:
+    """Return a boolean expression, true where a value is truthy in Javascript."""
+    expr, type_ = compiled
+    if type_ == BOOLEAN:
+        mask = expr
+    elif type_ == NUMBER:
+        mask = (expr != 0) & expr.cast(pl.Float64).is_not_nan()
+    elif type_ == STRING:
+        mask = expr != ""
+    else:
+        mask = expr.is_not_null()
+    return mask.fill_null(False)
+
+
+@singledispatch
+def _compile(node: Any, context: Context) -> Compiled:
+    raise NotImplementedError(f"{type(node).__name__} in Polars")
+
+
+@_compile.register(ast.Expr)
+def _compile_expr(node: ast.Expr, context: Context) -> Compiled:
+    return _compile(node.value, context)
+
+
+@_compile.register(ast.Number)
+def _compile_number(node: ast.Number, context: Context) -> Compiled:
+    return pl.lit(float(node.value)), NUMBER
+
+
+@_compile.register(ast.String)
+def _compile_string(node: ast.String, context: Context) -> Compiled:
+    return pl.lit(node.value), STRING
+
+
+@_compile.register(ast.Global)
+def _compile_global(node: ast.Global, context: Context) -> Compiled:
+    if node.name == "null":
+        return pl.lit(None), NULL
+    if node.name in ("true", "false"):
+        return pl.lit(node.name == "true"), BOOLEAN
+    if node.name in CONSTANTS:
+        return pl.lit(VEGAJS_NAMESPACE[node.name]), NUMBER
+    raise NotImplementedError(f"Name {node.name!r} in Polars")
+
+
+@_compile.register(ast.Attr)
+@_compile.register(ast.Item)
+def _compile_field(node: Any, context: Context) -> Compiled:
+    return context.column(datum_field(node))
+
+
+@_compile.register(ast.UnOp)
+def _compile_unop(node: ast.UnOp, context: Context) -> Compiled:
+    rhs = _compile(node.rhs, context)
+    if node.op == "!":
+        return ~truthy(rhs), BOOLEAN
+    if node.op == "-":
+        return -number(rhs), NUMBER
+    if node.op == "+":
+        return number(rhs), NUMBER
+    raise NotImplementedError(f"Unary Operator {node.op}x in Polars")
+
+
+# As in pandas, comparisons to missing values are false, and so inequalities
+# are true.
+COMPARISONS: Dict[str, Callable[[pl.Expr, pl.Expr], pl.Expr]] = {
+    "<": lambda a, b: (a < b).fill_null(False),
+    "<=": lambda a, b: (a <= b).fill_null(False),
+    ">": lambda a, b: (a > b).fill_null(False),
+    ">=": lambda a, b: (a >= b).fill_null(False),
+    "==": lambda a, b: (a == b).fill_null(False),
+    "===": lambda a, b: (a == b).fill_null(False),
+    "!=": lambda a, b: (a != b).fill_null(True),
+    "!==": lambda a, b: (a != b).fill_null(True),
+}
+
+
+def _trunc(expr: pl.Expr) -> pl.Expr:
+    return pl.when(expr >= 0).then(expr.floor()).otherwise(expr.ceil())
+
+
+ARITHMETIC: Dict[str, Callable[[pl.Expr, pl.Expr], pl.Expr]] = {
+    "+": lambda a, b: a + b,
+    "-": lambda a, b: a - b,
+    "*": lambda a, b: a * b,
+    "/": lambda a, b: a / b,
+    # The remainder has the sign of the dividend, as in Javascript.
+    "%": lambda a, b: a - _trunc(a / b) * b,
+    "**": lambda a, b: a.pow(b),
+}
+
+
+@_compile.register(ast.BinOp)
+def _compile_binop(node: ast.BinOp, context: Context) -> Compiled:
+    op = node.op
+    lhs, rhs = _compile(node.lhs, context), _compile(node.rhs, context)
+    if op in COMPARISONS:
+        # Comparisons to null test for missing values, as in Javascript.
+        if NULL in (lhs[1], rhs[1]) and op in ("==", "===", "!=", "!=="):
+            other = rhs[0] if lhs[1] == NULL else lhs[0]
+            test = other.is_null() if op.startswith("=") else other.is_not_null()
+            return test, BOOLEAN
+        return COMPARISONS[op](lhs[0], rhs[0]), BOOLEAN
+    if op in ("&&", "||"):
+        if lhs[1] == rhs[1] == BOOLEAN:
+            if op == "&&":
+                return truthy(lhs) & truthy(rhs), BOOLEAN
+            return truthy(lhs) | truthy(rhs), BOOLEAN
+        # Javascript returns one of the operands.
+        first, second = (rhs, lhs) if op == "&&" else (lhs, rhs)
+        return _case(lhs, first, second)
+    if op == "+" and STRING in (lhs[1], rhs[1]):
+        return (
+            pl.concat_str([lhs[0].cast(pl.String), rhs[0].cast(pl.String)]),
+            STRING,
+        )
+    if op in ARITHMETIC:
+        return ARITHMETIC[op](number(lhs), number(rhs)), NUMBER
+    raise NotImplementedError(f"Binary Operator A {op} B in Polars")
+
+
+@_compile.register(ast.TernOp)
+def _compile_ternop(node: ast.TernOp, context: Context) -> Compiled:
+    if node.op != ("?", ":"):
+        raise NotImplementedError(f"Ternary Operator A {node.op[0]} B {node.op[1]} C")
+    test, a, b = (_compile(n, context) for n in (node.lhs, node.mid, node.rhs))
+    return _case(test, a, b)
+
+
+def _case(test: Compiled, a: Compiled, b: Compiled) -> Compiled:
+    type_ = a[1] if a[1] == b[1] or b[1] == NULL else b[1] if a[1] == NULL else OTHER
+    return pl.when(truthy(test)).then(a[0]).otherwise(b[0]), type_
+
+
+def _function(
+    func: Callable[..., pl.Expr], type_: str, nargs: int
+) -> Callable[..., Compiled]:
+    def compile_function(*args: Compiled) -> Compiled:
+        if len(args) != nargs:
+            raise NotImplementedError(f"Function of {len(args)} arguments in Polars")
+        return func(*(number(arg) for arg in args)), type_
+
+    return compile_function
+
+
+def _string_function(
+    func: Callable[[pl.Expr], pl.Expr], type_: str
+) -> Callable[..., Compiled]:
+    def compile_function(*args: Compiled) -> Compiled:
+        if len(args) != 1:
+            raise NotImplementedError(f"Function of {len(args)} arguments in Polars")
+        # Javascript also applies these to arrays, which are not supported.
+        if args[0][1] not in (STRING, NULL, UNKNOWN):
+            raise NotImplementedError("String function of a non-string value")
+        return func(args[0][0]), type_
+
+    return compile_function
+
+
+def _date_part(func: Callable[[pl.Expr], pl.Expr]) -> Callable[..., Compiled]:
+    def compile_part(*args: Compiled) -> Compiled:
+        if len(args) != 1:
+            raise NotImplementedError(f"Date part of {len(args)} arguments in Polars")
+        date, type_ = args[0]
+        if type_ == STRING:
+            date = date.str.to_datetime()
+        return func(date.dt).cast(pl.Float64), NUMBER
+
+    return compile_part
+
+
+def _extremum(func: Callable[..., pl.Expr]) -> Callable[..., Compiled]:
+    def compile_extremum(*args: Compiled) -> Compiled:
+        if len(args) < 2:
+            raise NotImplementedError("min() or max() of fewer than two values")
+        return func([number(arg) for arg in args]), NUMBER
+
+    return compile_extremum
+
+
+def _is_valid(value: Compiled) -> Compiled:
+    expr, type_ = value
+    valid = expr.is_not_null()
+    if type_ == NUMBER:
+        valid = valid & expr.cast(pl.Float64).is_not_nan().fill_null(False)
+    return valid, BOOLEAN
+
+
+def _if(*args: Compiled) -> Compiled:
+    if len(args) != 3:
+        raise NotImplementedError(f"if() with {len(args)} arguments in Polars")
+    return _case(*args)
+
+
+def _to_string(*args: Compiled) -> Compiled:
+    if len(args) != 1:
+        raise NotImplementedError(f"toString() of {len(args)} arguments in Polars")
+    return args[0][0].cast(pl.String), STRING
+
+
+FUNCTIONS: Dict[str, Callable[..., Compiled]] = {
+    "isValid": lambda *args: _is_valid(*args),
+    "toNumber": _function(lambda x: x, NUMBER, 1),
+    "toString": _to_string,
+    "if": _if,
+    "abs": _function(pl.Expr.abs, NUMBER, 1),
+    "acos": _function(pl.Expr.arccos, NUMBER, 1),
+    "asin": _function(pl.Expr.arcsin, NUMBER, 1),
+    "atan": _function(pl.Expr.arctan, NUMBER, 1),
+    "atan2": _function(pl.arctan2, NUMBER, 2),
+    "ceil": _function(pl.Expr.ceil, NUMBER, 1),
+    "cos": _function(pl.Expr.cos, NUMBER, 1),
+    "exp": _function(pl.Expr.exp, NUMBER, 1),
+    "floor": _function(pl.Expr.floor, NUMBER, 1),
+    "log": _function(pl.Expr.log, NUMBER, 1),
+    "max": _extremum(pl.max_horizontal),
+    "min": _extremum(pl.min_horizontal),
+    "pow": _function(pl.Expr.pow, NUMBER, 2),
+    # Math.round rounds halves up.
+    "round": _function(lambda x: (x + 0.5).floor(), NUMBER, 1),
+    "sin": _function(pl.Expr.sin, NUMBER, 1),
+    "sqrt": _function(pl.Expr.sqrt, NUMBER, 1),
+    "tan": _function(pl.Expr.tan, NUMBER, 1),
+    "year": _date_part(lambda dt: dt.year()),
+    "quarter": _date_part(lambda dt: dt.quarter() - 1),
+    "month": _date_part(lambda dt: dt.month() - 1),
+    "date": _date_part(lambda dt: dt.day()),
+    "day": _date_part(lambda dt: dt.weekday() % 7),
+    "hours": _date_part(lambda dt: dt.hour()),
+    "minutes": _date_part(lambda dt: dt.minute()),
+    "seconds": _date_part(lambda dt: dt.second()),
+    "milliseconds": _date_part(lambda dt: dt.millisecond()),
+    "length": _string_function(lambda x: x.str.len_chars(), NUMBER),
+    "lower": _string_function(lambda x: x.str.to_lowercase(), STRING),
+    "trim": _string_function(lambda x: x.str.strip_chars(), STRING),
+    "upper": _string_function(lambda x: x.str.to_uppercase(), STRING),
+}
+
+
+@_compile.register(ast.Func)
+def _compile_func(node: ast.Func, context: Context) -> Compiled:
+    if not isinstance(node.func, ast.Global) or node.func.name not in FUNCTIONS:
+        raise NotImplementedError(f"Function {node.func} in Polars")
+    args = [_compile(arg, context) for arg in node.args]
+    return FUNCTIONS[node.func.name](*args)
+
+
+# Predicates
+
+
+def compile_predicate(
+    predicate: Any, columns: Optional[Dict[str, str]] = None
+) -> pl.Expr:
+    """Compile a filter predicate, in expression or JSON form, to a mask.
+
+    Masks are true or false, never null: as in pandas, tests of missing values
+    are false, and their negations true.
+    """
+    if isinstance(predicate, str):
+        return truthy(compile_expression(predicate, columns))
+    if not isinstance(predicate, dict):
+        raise NotImplementedError(f"Predicate of type {type(predicate)} in Polars")
+    if "not" in predicate:
+        return ~compile_predicate(predicate["not"], columns).fill_null(False)
+    if "and" in predicate:
+        terms = [compile_predicate(p, columns) for p in predicate["and"]]
+        return pl.all_horizontal(terms) if terms else pl.lit(True)
+    if "or" in predicate:
+        terms = [compile_predicate(p, columns) for p in predicate["or"]]
+        return pl.any_horizontal(terms) if terms else pl.lit(False)
+    if "timeUnit" in predicate:
+        raise NotImplementedError("timeUnit in predicates in Polars")
+    values = [predicate.get(op) for op in ("equal", "lt", "lte", "gt", "gte")]
+    values += list(predicate.get("range", [])) + list(predicate.get("oneOf", []))
+    if any(isinstance(value, dict) for value in values):
+        raise NotImplementedError("DateTime objects in predicates in Polars")
+    field, _ = Context(columns).column(predicate.get("field"))
+    if "equal" in predicate:
+        return COMPARISONS["=="](field, pl.lit(predicate["equal"]))
+    if "range" in predicate:
+        min_, max_ = predicate["range"]
+        terms = [COMPARISONS[">="](field, pl.lit(min_))] if min_ is not None else []
+        terms += [COMPARISONS["<="](field, pl.lit(max_))] if max_ is not None else []
+        return pl.all_horizontal(terms) if terms else field.is_not_null()
+    if "oneOf" in predicate:
+        return field.is_in(predicate["oneOf"]).fill_null(False)
+    for op, func in [
+        ("lt", COMPARISONS["<"]),
+        ("lte", COMPARISONS["<="]),
+        ("gt", COMPARISONS[">"]),
+        ("gte", COMPARISONS[">="]),
+    ]:
+        if op in predicate:
+            return func(field, pl.lit(predicate[op]))
+    raise NotImplementedError(
+        f"Predicate with properties {sorted(predicate)} in Polars"
+    )
+
+
+# Transforms
+
+
+@singledispatch
+def check_spec(spec: TransformSpec) -> None:
+    """Raise NotImplementedError if a transform cannot be translated to Polars."""
+
+
+@singledispatch
+def compile_spec(spec: TransformSpec, frame: pl.LazyFrame) -> pl.LazyFrame:
+    """Extend a query with a transform."""
+    raise NotImplementedError(f"{type(spec).__name__} in Polars")
+
+
+def _stderr(col: pl.Expr) -> pl.Expr:
+    return col.std() / col.count().cast(pl.Float64).sqrt()
+
+
+AGGREGATES: Dict[str, Callable[[pl.Expr], pl.Expr]] = {
+    "count": lambda col: col.len().cast(pl.Int64),
+    "valid": lambda col: col.count().cast(pl.Int64),
+    "missing": lambda col: col.null_count().cast(pl.Int64),
+    "distinct": lambda col: col.drop_nulls().n_unique().cast(pl.Int64),
+    "sum": lambda col: col.sum(),
+    "product": lambda col: col.product(),
+    "mean": lambda col: col.mean(),
+    "average": lambda col: col.mean(),
+    "median": lambda col: col.median(),
+    "q1": lambda col: col.quantile(0.25, "linear"),
+    "q3": lambda col: col.quantile(0.75, "linear"),
+    "min": lambda col: col.min(),
+    "max": lambda col: col.max(),
+    "variance": lambda col: col.var(ddof=1),
+    "variancep": lambda col: col.var(ddof=0),
+    "stdev": lambda col: col.std(ddof=1),
+    "stdevp": lambda col: col.std(ddof=0),
+    "stderr": _stderr,
+}
+
+
+def _aggregate_expr(aggregate: Dict[str, Any], columns: Dict[str, str]) -> pl.Expr:
+    op, field = aggregate["op"], aggregate.get("field", "*")
+    if op == "count":
+        expr = pl.len().cast(pl.Int64)
+    else:
+        expr = AGGREGATES[op](Context(columns).column(field)[0])
+    return expr.alias(aggregate["as"])
+
+
+def _valid_keys(groupby: List[str]) -> pl.Expr:
+    return pl.all_horizontal([pl.col(key).is_not_null() for key in groupby])
+
+
+@check_spec.register(AggregateSpec)
+def _check_aggregate(spec: AggregateSpec) -> None:
+    check_aggregates(spec["aggregate"], AGGREGATES)
+
+
+@compile_spec.register(AggregateSpec)
+def _compile_aggregate(spec: AggregateSpec, frame: pl.LazyFrame) -> pl.LazyFrame:
+    columns = schema_types(frame)
+    groupby = spec.get("groupby", [])
+    aggregates = [_aggregate_expr(a, columns) for a in spec["aggregate"]]
+    if not groupby:
+        return frame.select(aggregates)
+    # As with pandas, null keys are dropped, and groups are sorted by key.
+    return (
+        frame.filter(_valid_keys(groupby))
+        .group_by(groupby)
+        .agg(aggregates)
+        .sort(groupby)
+    )
+
+
+@check_spec.register(JoinAggregateSpec)
+def _check_joinaggregate(spec: JoinAggregateSpec) -> None:
+    check_aggregates(spec["joinaggregate"], AGGREGATES)
+
+
+@compile_spec.register(JoinAggregateSpec)
+def _compile_joinaggregate(
+    spec: JoinAggregateSpec, frame: pl.LazyFrame
+) -> pl.LazyFrame:
+    columns = schema_types(frame)
+    groupby = spec.get("groupby", [])
+    values = []
+    for aggregate in spec["joinaggregate"]:
+        expr = _aggregate_expr(aggregate, columns)
+        if groupby:
+            # Rows with null keys are in no group, and get null values.
+            expr = pl.when(_valid_keys(groupby)).then(expr.over(groupby))
+        values.append(expr.alias(aggregate["as"]))
+    return frame.with_columns(values)
+
+
+def _ones() -> pl.Expr:
+    return pl.repeat(1, pl.len(), dtype=pl.Int64)
+
+
+# Window functions ranking rows among their peers, of equal sort values.
+RANKING = ["row_number", "rank", "dense_rank"]
+
+# Window aggregates over cumulative or sliding frames, and their kernels.
+CUMULATIVE: Dict[str, Callable[[pl.Expr], pl.Expr]] = {
+    "sum": lambda col: col.cum_sum(),
+    "count": lambda col: pl.int_range(1, pl.len() + 1, dtype=pl.Int64),
+    "valid": lambda col: col.is_not_null().cast(pl.Int64).cum_sum(),
+    "mean": lambda col: col.cum_sum() / col.is_not_null().cum_sum(),
+    "average": lambda col: col.cum_sum() / col.is_not_null().cum_sum(),
+    "min": lambda col: col.cum_min(),
+    "max": lambda col: col.cum_max(),
+}
+ROLLING: Dict[str, Callable[..., pl.Expr]] = {
+    "sum": lambda col, **kwds: col.rolling_sum(**kwds),
+    "count": lambda col, **kwds: _ones().rolling_sum(**kwds),
+    "valid": lambda col, **kwds: col.is_not_null().cast(pl.Int64).rolling_sum(**kwds),
+    "mean": lambda col, **kwds: col.rolling_mean(**kwds),
+    "average": lambda col, **kwds: col.rolling_mean(**kwds),
+    "min": lambda col, **kwds: col.rolling_min(**kwds),
+    "max": lambda col, **kwds: col.rolling_max(**kwds),
+}
+
+
+def _frame(spec: WindowSpec) -> str:
+    """Return the kind of frame of a window transform."""
+    start, end = spec.get("frame", [None, 0])
+    if (start, end) == (None, None):
+        return "group"
+    if start is None and end == 0:
+        return "cumulative"
+    if isinstance(start, int) and start <= 0 and end in (0, -start):
+        return "rolling"
+    raise NotImplementedError(f"frame={[start, end]} in Polars")
+
+
+@check_spec.register(WindowSpec)
+def _check_window(spec: WindowSpec) -> None:
+    if spec.get("ignorePeers", False):
+        raise NotImplementedError("Window transform with ignorePeers=True")
+    frame = _frame(spec)
+    for w in spec["window"]:
+        op = w["op"]
+        if "param" in w:
+            raise NotImplementedError("window function with param")
+        if op in RANKING:
+            continue
+        if op not in (AGGREGATES if frame == "group" else CUMULATIVE):
+            raise NotImplementedError(f"Window {op!r} over a {frame} frame in Polars")
+
+
+def _window_expr(
+    w: Dict[str, Any], spec: WindowSpec, columns: Dict[str, str]
+) -> pl.Expr:
+    op = w["op"]
+    sort = [s["field"] for s in spec.get("sort", [])]
+    if op in RANKING:
+        position = pl.int_range(1, pl.len() + 1, dtype=pl.Int64)
+        if op == "row_number" or not sort:
+            return position
+        # Rows start a group of peers where a sort field differs from the last.
+        new = pl.any_horizontal(
+            [pl.col(field).ne_missing(pl.col(field).shift(1)) for field in sort]
+        ) | (position == 1)
+        if op == "rank":
+            return pl.when(new).then(position).forward_fill()
+        return new.cast(pl.Int64).cum_sum()
+    field = w.get("field", "*")
+    if field == "*" and field not in columns:
+        field = next(iter(columns))
+    col = Context(columns).column(field)[0]
+    frame = _frame(spec)
+    if frame == "group":
+        expr = AGGREGATES[op](col)
+        if op == "sum":
+            # As with pandas rolling windows, the sum of no values is null.
+            expr = pl.when(col.count() > 0).then(expr)
+        return expr
+    if frame == "cumulative":
+        # Positions of missing values take the value of the frame before them.
+        return CUMULATIVE[op](col).forward_fill()
+    start, end = spec["frame"]
+    return ROLLING[op](col, window_size=end - start + 1, min_samples=1, center=end != 0)
+
+
+@compile_spec.register(WindowSpec)
+def _compile_window(spec: WindowSpec, frame: pl.LazyFrame) -> pl.LazyFrame:
+    columns = schema_types(frame)
+    groupby = spec.get("groupby", [])
+    sort = spec.get("sort", [])
+    frame = frame.with_row_index(ROW)
+    if sort:
+        # Sorting is stable, with missing values last as in pandas.
+        frame = frame.sort(
+            [s["field"] for s in sort],
+            descending=[s.get("order") == "descending" for s in sort],
+            nulls_last=True,
+            maintain_order=True,
+        )
+    values = []
+    for w in spec["window"]:
+        expr = _window_expr(w, spec, columns)
+        if groupby:
+            # Rows with null keys are in no group, and get null values.
+            expr = pl.when(_valid_keys(groupby)).then(expr.over(groupby))
+        values.append(expr.alias(w["as"]))
+    return frame.with_columns(values).sort(ROW).drop(ROW)
+
+
+@check_spec.register(FilterSpec)
+def _check_filter(spec: FilterSpec) -> None:
+    compile_predicate(spec["filter"])
+
+
+@compile_spec.register(FilterSpec)
+def _compile_filter(spec: FilterSpec, frame: pl.LazyFrame) -> pl.LazyFrame:
+    return frame.filter(compile_predicate(spec["filter"], schema_types(frame)))
+
+
+@check_spec.register(CalculateSpec)
+def _check_calculate(spec: CalculateSpec) -> None:
+    compile_expression(spec["calculate"])
+
+
+@compile_spec.register(CalculateSpec)
+def _compile_calculate(spec: CalculateSpec, frame: pl.LazyFrame) -> pl.LazyFrame:
+    expr, _ = compile_expression(spec["calculate"], schema_types(frame))
+    return frame.with_columns(expr.alias(spec["as"]))
+
+
+@compile_spec.register(FoldSpec)
+def _compile_fold(spec: FoldSpec, frame: pl.LazyFrame) -> pl.LazyFrame:
+    key, value = spec.get("as", ("key", "value"))
+    schema = frame.collect_schema()
+    fields, ids = fold_fields(spec, list(schema))
+    dtypes = {schema[field] for field in fields}
+    if len(dtypes) == 1:
+        fold_type = dtypes.pop()
+    elif all(column_type(dtype) == NUMBER for dtype in dtypes):
+        fold_type = pl.Float64
+    else:
+        fold_type = pl.String
+    frame = frame.with_row_index(ROW)
+    folds = [
+        frame.select(
+            ids
+            + [
+                pl.lit(field).alias(key),
+                pl.col(field).cast(fold_type).alias(value),
+                *fields,
+                ROW,
+            ]
+        )
+        for field in fields
+    ]
+    # The concatenation is stable-sorted to interleave the folds of each row.
+    return pl.concat(folds).sort(ROW, maintain_order=True).drop(ROW)
+
+
+@check_spec.register(LookupSpec)
+def _check_lookup(spec: LookupSpec) -> None:
+    if not isinstance(spec.get("default", ""), str):
+        raise NotImplementedError("Lookup with a non-string default in Polars")
+
+
+def _to_polars(data: Any) -> pl.LazyFrame:
+    if isinstance(data, (pl.DataFrame, pl.LazyFrame)):
+        return data.lazy()
+    if is_arrow(data):
+        return pl.from_arrow(data).lazy()
+    return PolarsEngine().from_pandas(to_dataframe(data))
+
+
+@compile_spec.register(LookupSpec)
+def _compile_lookup(spec: LookupSpec, frame: pl.LazyFrame) -> pl.LazyFrame:
+    key = spec["from"]["key"]
+    other = _to_polars(spec["from"]["data"])
+    lookup = spec["lookup"]
+    default = spec.get("default")
+    columns = list(frame.collect_schema())
+    outputs = lookup_outputs(spec, columns, list(other.collect_schema()))
+
+    right = other.with_row_index(OTHER_ROW).select(
+        [*outputs, OTHER_ROW, pl.col(key).alias(KEY)]
+    )
+    joined = frame.join(
+        right, left_on=lookup, right_on=KEY, how="left", maintain_order="left_right"
+    )
+    if default is not None:
+        missing = pl.col(OTHER_ROW).is_null()
+        joined = joined.with_columns(
+            [
+                pl.when(missing)
+                .then(pl.lit(default))
+                .otherwise(pl.col(field).cast(pl.String))
+                .alias(field)
+                for field in outputs
+            ]
+        )
+    return joined.select(columns + outputs)
+
+
+@compile_spec.register(BinSpec)
+def _compile_bin(spec: BinSpec, frame: pl.LazyFrame) -> pl.LazyFrame:
+    field = spec["field"]
+    if schema_types(frame).get(field) != NUMBER:
+        raise NotImplementedError("Bin of a non-numeric field in Polars")
+    bin_ = {} if spec["bin"] is True else dict(spec["bin"])
+    if "extent" not in bin_:
+        # The extent is computed eagerly, as bins depend on it.
+        extent = frame.select(pl.col(field).min(), pl.col(field).max()).collect()
+        bin_["extent"] = list(extent.row(0))
+    edges = calculate_bins(**bin_)
+    start, stop, nbins = edges[0], edges[-1], len(edges) - 1
+    step = (stop - start) / nbins
+    col = pl.col(field).cast(pl.Float64)
+    # Values out of the extent are null, and the upper bound is in the last bin.
+    index = pl.min_horizontal(((col - start) / step).floor(), pl.lit(nbins - 1.0))
+    inside = (col >= start) & (col <= stop)
+    name = spec["as"]
+    names = (name, name + "_end") if isinstance(name, str) else tuple(name)
+    return frame.with_columns(
+        pl.when(inside).then(start + step * index).alias(names[0]),
+        pl.when(inside).then(start + step * (index + 1)).alias(names[1]),
+    )
+
+
+@check_spec.register(TimeUnitSpec)
+def _check_timeunit(spec: TimeUnitSpec) -> None:
+    timeunit_parts(spec["timeUnit"])
+
+
+@compile_spec.register(TimeUnitSpec)
+def _compile_timeunit(spec: TimeUnitSpec, frame: pl.LazyFrame) -> pl.LazyFrame:
+    field = spec["field"]
+    dtype = frame.collect_schema()[field]
+    date = pl.col(field)
+    if column_type(dtype) == STRING:
+        # As in Vega-Lite, fields with a timeUnit are parsed as dates.
+        date = date.str.to_datetime()
+    elif column_type(dtype) != DATE:
+        raise NotImplementedError("timeUnit of a non-date field in Polars")
+    elif isinstance(dtype, pl.Datetime) and dtype.time_zone is not None:
+        # Dates with a time zone would be converted to local time, as in pandas.
+        raise NotImplementedError("Dates with a time zone in Polars")
+    units = timeunit_parts(spec["timeUnit"])
+
+    def part(unit: str, func: Callable[[Any], pl.Expr]) -> Any:
+        return func(date.dt) if unit in units else TIMEUNIT_DEFAULTS[unit]
+
+    month = part("month", lambda dt: dt.month())
+    day = part("date", lambda dt: dt.day())
+    if units == ["day"]:
+        day = day + date.dt.weekday() % 7
+    elif "quarter" in units and "month" not in units:
+        month = date.dt.quarter() * 3 - 2
+    value = pl.datetime(
+        part("year", lambda dt: dt.year()),
+        month,
+        day,
+        part("hours", lambda dt: dt.hour()),
+        part("minutes", lambda dt: dt.minute()),
+        part("seconds", lambda dt: dt.second()),
+        part("milliseconds", lambda dt: dt.millisecond() * 1000),
+    )
+    return frame.with_columns(value.cast(pl.Datetime("ns")).alias(spec["as"]))
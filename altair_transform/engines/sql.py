@@ -0,0 +1,1135 @@
+"""SQL engine, evaluating transforms in an embedded database.
+
+Transforms are compiled to SQL: the input dataframe is registered as a table,
+each transform becomes a common table expression selecting from the previous
+one, and a run of transforms is evaluated by a single query when its result
+is read back. Vega expressions of filter and calculate transforms are
+translated from their syntax tree.
+
+Queries run in-process on DuckDB when it is installed, or on SQLite otherwise.
+Row order follows that of the pandas engine: a hidden column holds the
+position of each row, and is carried through every transform.
+"""
+import importlib.util
+import itertools
+import math
+from functools import singledispatch
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .base import (
+    BOOLEAN,
+    CONSTANTS,
+    DATE,
+    NUMBER,
+    OTHER,
+    ROW,
+    STRING,
+    TIMEUNIT_DEFAULTS,
+    Engine,
+    datum_field,
+    fold_fields,
+    lookup_outputs,
+    parse_expression,
+    timeunit_parts,
+)
+from ..transform.spec import (
+    AggregateSpec,
+    BinSpec,
+    CalculateSpec,
+    FilterSpec,
+    FoldSpec,
+    JoinAggregateSpec,
+    LookupSpec,
+    TimeUnitSpec,
+    TransformSpec,
+    WindowSpec,
+)
+from ..transform.vega_utils import calculate_bins
+from ..utils import ast, to_dataframe
+from ..vegaexpr import VEGAJS_NAMESPACE
+
+__all__ = ["SQLEngine", "Relation", "compile_expression"]
+
+
+def quote(name: str) -> str:
+    """Quote an identifier."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def literal(value: Any) -> str:
+    """Render a Python value as a SQL literal."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (bool, np.bool_)):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)):
+        if not np.isfinite(value):
+            raise NotImplementedError(f"Non-finite literal {value} in SQL")
+        if float(value).is_integer() and abs(value) < 2 ** 53:
+            return str(int(value))
+        # An exponent makes the literal a double rather than a decimal.
+        text = repr(float(value))
+        return text if "e" in text else text + "e0"
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    raise NotImplementedError(f"Literal of type {type(value).__name__} in SQL")
+
+
+def column_type(series: pd.Series) -> str:
+    """Return the type of a column of a dataframe."""
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+        series = pd.Series(series.cat.categories)
+    if pd.api.types.is_bool_dtype(dtype):
+        return BOOLEAN
+    if pd.api.types.is_numeric_dtype(dtype):
+        return NUMBER
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return DATE
+    if pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+        return STRING
+    return OTHER
+
+
+class Dialect:
+    """The SQL dialect and database API of an embedded database."""
+
+    name = ""
+    double = "DOUBLE"
+    text = "VARCHAR"
+
+    #: Templates of aggregate functions, formatted with the field.
+    aggregates = {
+        "count": "COUNT(*)",
+        "valid": "COUNT({0})",
+        "missing": "COUNT(*) - COUNT({0})",
+        "distinct": "COUNT(DISTINCT {0})",
+        "sum": "SUM({0})",
+        "mean": "AVG({0})",
+        "average": "AVG({0})",
+        "min": "MIN({0})",
+        "max": "MAX({0})",
+    }
+
+    #: Templates of window-only functions.
+    window_functions = {
+        "row_number": "ROW_NUMBER()",
+        "rank": "RANK()",
+        "dense_rank": "DENSE_RANK()",
+        "percent_rank": "PERCENT_RANK()",
+        "cume_dist": "CUME_DIST()",
+        "first_value": "FIRST_VALUE({0})",
+        "last_value": "LAST_VALUE({0})",
+    }
+
+    def connect(self) -> Any:
+        raise NotImplementedError()
+
+    def register(self, connection: Any, name: str, df: pd.DataFrame) -> None:
+        raise NotImplementedError()
+
+    def unregister(self, connection: Any, name: str) -> None:
+        raise NotImplementedError()
+
+    def query(self, connection: Any, sql: str, types: Dict[str, str]) -> pd.DataFrame:
+        raise NotImplementedError()
+
+    def part(self, unit: str, date: str) -> str:
+        """Extract a date part: year, month (1-12), date, day (0 for Sunday),
+        hours, minutes, seconds, or milliseconds (0-999)."""
+        raise NotImplementedError()
+
+    def timestamp(self, parts: List[str], date: str) -> str:
+        """Build a timestamp from year, month, date, hours, minutes and
+        (fractional) seconds; null where ``date`` is null."""
+        raise NotImplementedError()
+
+    def to_date(self, expr: str, type_: str) -> str:
+        """Convert a date or a date string to a value accepted by :meth:`part`."""
+        return expr
+
+    def least(self, *args: str) -> str:
+        return f"LEAST({', '.join(args)})"
+
+    def greatest(self, *args: str) -> str:
+        return f"GREATEST({', '.join(args)})"
+
+    def divide(self, lhs: str, rhs: str) -> str:
+        return f"({lhs} / {rhs})"
+
+    def modulo(self, lhs: str, rhs: str) -> str:
+        return f"({lhs} % {rhs})"
+
+
+class DuckDBDialect(Dialect):
+    name = "duckdb"
+    aggregates = {
+        **Dialect.aggregates,
+        "median": "QUANTILE_CONT({0}, 0.5)",
+        "q1": "QUANTILE_CONT({0}, 0.25)",
+        "q3": "QUANTILE_CONT({0}, 0.75)",
+        "variance": "VAR_SAMP({0})",
+        "variancep": "VAR_POP({0})",
+        "stdev": "STDDEV_SAMP({0})",
+        "stdevp": "STDDEV_POP({0})",
+        "stderr": "STDDEV_SAMP({0}) / SQRT(COUNT({0}))",
+        "product": "PRODUCT({0})",
+    }
+
+    def connect(self) -> Any:
+        import duckdb
+
+        return duckdb.connect()
+
+    def register(self, connection: Any, name: str, df: pd.DataFrame) -> None:
+        # The dataframe is scanned in place, without copying it into the database.
+        connection.register(name, df)
+
+    def unregister(self, connection: Any, name: str) -> None:
+        connection.unregister(name)
+
+    def query(self, connection: Any, sql: str, types: Dict[str, str]) -> pd.DataFrame:
+        return connection.execute(sql).df()
+
+    def part(self, unit: str, date: str) -> str:
+        if unit == "milliseconds":
+            return f"(MILLISECOND({date}) % 1000)"
+        func = {
+            "year": "YEAR",
+            "month": "MONTH",
+            "date": "DAY",
+            "day": "DAYOFWEEK",
+            "hours": "HOUR",
+            "minutes": "MINUTE",
+            "seconds": "SECOND",
+        }[unit]
+        return f"{func}({date})"
+
+    def timestamp(self, parts: List[str], date: str) -> str:
+        return f"MAKE_TIMESTAMP({', '.join(parts)})"
+
+    def to_date(self, expr: str, type_: str) -> str:
+        return expr if type_ == DATE else f"CAST({expr} AS TIMESTAMP)"
+
+
+class SQLiteDialect(Dialect):
+    name = "sqlite"
+    double = "REAL"
+    text = "TEXT"
+
+    _formats = {
+        "year": "%Y",
+        "month": "%m",
+        "date": "%d",
+        "day": "%w",
+        "hours": "%H",
+        "minutes": "%M",
+        "seconds": "%S",
+    }
+
+    # Math functions, which SQLite only provides if built with them, and their
+    # number of arguments.
+    _math_functions: Dict[str, Tuple[int, Callable[..., float]]] = {
+        "ACOS": (1, math.acos),
+        "ASIN": (1, math.asin),
+        "ATAN": (1, math.atan),
+        "ATAN2": (2, math.atan2),
+        "CEIL": (1, math.ceil),
+        "COS": (1, math.cos),
+        "EXP": (1, math.exp),
+        "FLOOR": (1, math.floor),
+        "LN": (1, math.log),
+        "MOD": (2, math.fmod),
+        "POWER": (2, math.pow),
+        "SIN": (1, math.sin),
+        "SQRT": (1, math.sqrt),
+        "TAN": (1, math.tan),
+    }
+
+    def connect(self) -> Any:
+        import sqlite3
+
+        connection = sqlite3.connect(":memory:", check_same_thread=False)
+        for name, (nargs, func) in self._math_functions.items():
+            if not self._has_function(connection, name, nargs):
+                connection.create_function(name, nargs, _sqlite_function(func))
+        return connection
+
+    @staticmethod
+    def _has_function(connection: Any, name: str, nargs: int) -> bool:
+        import sqlite3
+
+        try:
+            connection.execute(f"SELECT {name}({', '.join(['1'] * nargs)})")
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    def register(self, connection: Any, name: str, df: pd.DataFrame) -> None:
+        df.to_sql(name, connection, index=False)
+
+    def unregister(self, connection: Any, name: str) -> None:
+        connection.execute(f"DROP TABLE {quote(name)}")
+
+    def query(self, connection: Any, sql: str, types: Dict[str, str]) -> pd.DataFrame:
+        dates = [col for col, type_ in types.items() if type_ == DATE]
+        df = pd.read_sql_query(sql, connection, parse_dates=dates)
+        # Booleans are stored as integers.
+        for col, type_ in types.items():
+            if type_ == BOOLEAN and df[col].notnull().all():
+                df[col] = df[col].astype(bool)
+        return df
+
+    def part(self, unit: str, date: str) -> str:
+        if unit == "milliseconds":
+            return f"CAST(SUBSTR(STRFTIME('%f', {date}), 4) AS INTEGER)"
+        return f"CAST(STRFTIME('{self._formats[unit]}', {date}) AS INTEGER)"
+
+    def timestamp(self, parts: List[str], date: str) -> str:
+        values = ", ".join(parts)
+        return (
+            f"CASE WHEN {date} IS NOT NULL THEN"
+            f" PRINTF('%04d-%02d-%02d %02d:%02d:%06.3f', {values}) END"
+        )
+
+    def least(self, *args: str) -> str:
+        return f"MIN({', '.join(args)})"
+
+    def greatest(self, *args: str) -> str:
+        return f"MAX({', '.join(args)})"
+
+    def divide(self, lhs: str, rhs: str) -> str:
+        # Division of integers is integral in SQLite.
+        return f"(CAST({lhs} AS REAL) / {rhs})"
+
+    def modulo(self, lhs: str, rhs: str) -> str:
+        return f"MOD({lhs}, {rhs})"
+
+
+def _sqlite_function(func: Callable[..., float]) -> Callable[..., Optional[float]]:
+    """Wrap a math function as a SQLite function, null for null arguments or
+    outside of its domain, as the functions built in SQLite are."""
+
+    def sqlite_function(*args: Optional[float]) -> Optional[float]:
+        if any(arg is None for arg in args):
+            return None
+        try:
+            return func(*args)
+        except (ValueError, OverflowError, ZeroDivisionError):
+            return None
+
+    return sqlite_function
+
+
+DIALECTS: Dict[str, Dialect] = {
+    dialect.name: dialect for dialect in [DuckDBDialect(), SQLiteDialect()]
+}
+
+
+class Relation:
+    """The result of transforms compiled to SQL.
+
+    A relation is a chain of common table expressions over registered tables,
+    along with the columns of its result and their types.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        columns: Dict[str, str],
+        ctes: Optional[List[Tuple[str, str]]] = None,
+        tables: Optional[List[str]] = None,
+    ):
+        self.source = source
+        self.columns = columns
+        self.ctes = ctes or []
+        self.tables = tables or [source]
+
+    @property
+    def name(self) -> str:
+        """The name of the table or expression to select from."""
+        return self.ctes[-1][0] if self.ctes else self.source
+
+    def derive(self, select: str, columns: Dict[str, str]) -> "Relation":
+        """Return a relation selecting from this one.
+
+        ``select`` is a query over ``{input}``, which must include the row
+        position column.
+        """
+        name = f"_q{len(self.ctes)}"
+        ctes = self.ctes + [(name, select.format(input=self.name))]
+        return Relation(self.source, columns, ctes, list(self.tables))
+
+    @property
+    def sql(self) -> str:
+        """The query returning the rows of the relation, in order."""
+        select = ", ".join(quote(col) for col in self.columns)
+        query = f"SELECT {select} FROM {self.name} ORDER BY {quote(ROW)}"
+        if not self.ctes:
+            return query
+        ctes = ",\n".join(f"{name} AS (\n{cte}\n)" for name, cte in self.ctes)
+        return f"WITH {ctes}\n{query}"
+
+    def __repr__(self) -> str:
+        return f"Relation({self.sql!r})"
+
+
+class SQLEngine(Engine):
+    """Engine evaluating transforms in an embedded database.
+
+    Parameters
+    ----------
+    dialect : {"duckdb", "sqlite"}, optional
+        The database to use. Default: DuckDB if installed, otherwise SQLite.
+    """
+
+    def __init__(self, dialect: Optional[str] = None):
+        if dialect is None:
+            dialect = "duckdb" if importlib.util.find_spec("duckdb") else "sqlite"
+        if dialect not in DIALECTS:
+            raise ValueError(
+                f"Unknown SQL dialect: {dialect!r}. Supported: {sorted(DIALECTS)}"
+            )
+        self.name = dialect
+        self.dialect = DIALECTS[dialect]
+        self._connection: Any = None
+        self._names = itertools.count()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r})"
+
+    @property
+    def connection(self) -> Any:
+        """The connection to the database, opened on first use."""
+        if self._connection is None:
+            self._connection = self.dialect.connect()
+        return self._connection
+
+    def supports(self, spec: TransformSpec) -> bool:
+        if type(spec) not in compile_spec.registry:
+            return False
+        try:
+            check_spec(spec, self.dialect)
+        except NotImplementedError:
+            return False
+        return True
+
+    def execute(self, specs: List[TransformSpec], data: Any) -> Any:
+        for spec in specs:
+            try:
+                data = compile_spec(spec, data, self)
+            except NotImplementedError:
+                data = self.fallback(spec, data)
+        return data
+
+    def register(self, df: pd.DataFrame) -> Tuple[str, Dict[str, str]]:
+        """Register a dataframe as a table, with the row position column.
+
+        Returns the name of the table and the types of its columns.
+        """
+        name = f"altair_transform_{next(self._names)}"
+        columns = {col: column_type(df[col]) for col in df.columns}
+        table = df.assign(**{ROW: np.arange(len(df))})
+        self.dialect.register(self.connection, name, table)
+        return name, columns
+
+    def from_pandas(self, df: pd.DataFrame) -> Relation:
+        name, columns = self.register(df)
+        return Relation(name, columns)
+
+    def to_pandas(self, data: Relation) -> pd.DataFrame:
+        try:
+            return self.dialect.query(self.connection, data.sql, data.columns)
+        finally:
+            for table in data.tables:
+                self.dialect.unregister(self.connection, table)
+
+    def fetch(self, relation: Relation, select: str) -> Tuple[Any, ...]:
+        """Evaluate an aggregate query over a relation, returning its single row."""
+        sql = relation.derive(f"SELECT {select} FROM {{input}}", {}).ctes
+        query = ",\n".join(f"{name} AS (\n{cte}\n)" for name, cte in sql)
+        cursor = self.connection.execute(f"WITH {query}\nSELECT * FROM {sql[-1][0]}")
+        return tuple(cursor.fetchone())
+
+
+# Expressions
+
+
+class Context:
+    """Context of the compilation of an expression.
+
+    ``columns`` maps the columns of the input to their types, or is None where
+    they are not known (when checking if an expression can be compiled).
+    """
+
+    def __init__(self, dialect: Dialect, columns: Optional[Dict[str, str]] = None):
+        self.dialect = dialect
+        self.columns = columns
+
+    def column(self, name: Any) -> Tuple[str, str]:
+        if not isinstance(name, str):
+            raise NotImplementedError(f"Field {name!r} in SQL")
+        if self.columns is None:
+            return quote(name), OTHER
+        if name not in self.columns:
+            raise NotImplementedError(f"Undefined field {name!r} in SQL")
+        return quote(name), self.columns[name]
+
+
+Compiled = Tuple[str, str]
+
+
+def compile_expression(
+    expression: str, dialect: Dialect, columns: Optional[Dict[str, str]] = None
+) -> Compiled:
+    """Compile a Vega expression to SQL.
+
+    Returns
+    -------
+    sql, type : str, str
+        The SQL expression and the type of its values.
+
+    Raises
+    ------
+    NotImplementedError
+        If the expression uses features without a SQL translation.
+    """
+    return _compile(parse_expression(expression), Context(dialect, columns))
+
+
+def truthy(compiled: Compiled) -> str:
+    """Return a SQL condition true where a value is truthy in Javascript."""
+    sql, type_ = compiled
+    if type_ == BOOLEAN:
+        return f"COALESCE({sql}, FALSE)"
+    if type_ == NUMBER:
+        return f"COALESCE({sql} <> 0, FALSE)"
+    if type_ == STRING:
+        return f"COALESCE({sql} <> '', FALSE)"
+    return f"({sql} IS NOT NULL)"
+
+
+@singledispatch
+def _compile(node: Any, context: Context) -> Compiled:
+    raise NotImplementedError(f"{type(node).__name__} in SQL")
+
+
+@_compile.register(ast.Expr)
+def _compile_expr(node: ast.Expr, context: Context) -> Compiled:
+    return _compile(node.value, context)
+
+
+@_compile.register(ast.Number)
+def _compile_number(node: ast.Number, context: Context) -> Compiled:
+    return literal(node.value), NUMBER
+
+
+@_compile.register(ast.String)
+def _compile_string(node: ast.String, context: Context) -> Compiled:
+    return literal(node.value), STRING
+
+
+@_compile.register(ast.Global)
+def _compile_global(node: ast.Global, context: Context) -> Compiled:
+    if node.name == "null":
+        return "NULL", OTHER
+    if node.name in ("true", "false"):
+        return node.name.upper(), BOOLEAN
+    if node.name in CONSTANTS:
+        return literal(VEGAJS_NAMESPACE[node.name]), NUMBER
+    raise NotImplementedError(f"Name {node.name!r} in SQL")
+
+
+@_compile.register(ast.Attr)
+@_compile.register(ast.Item)
+def _compile_field(node: Any, context: Context) -> Compiled:
+    return context.column(datum_field(node))
+
+
+@_compile.register(ast.UnOp)
+def _compile_unop(node: ast.UnOp, context: Context) -> Compiled:
+    rhs = _compile(node.rhs, context)
+    if node.op == "!":
+        return f"(NOT {truthy(rhs)})", BOOLEAN
+    if node.op == "-":
+        return f"(-{rhs[0]})", NUMBER
+    if node.op == "+":
+        return (
+            rhs
+            if rhs[1] == NUMBER
+            else (f"CAST({rhs[0]} AS {context.dialect.double})", NUMBER)
+        )
+    raise NotImplementedError(f"Unary Operator {node.op}x in SQL")
+
+
+COMPARISONS = {
+    "<": "<",
+    "<=": "<=",
+    ">": ">",
+    ">=": ">=",
+    "==": "=",
+    "===": "=",
+    "!=": "<>",
+    "!==": "<>",
+}
+
+
+@_compile.register(ast.BinOp)
+def _compile_binop(node: ast.BinOp, context: Context) -> Compiled:
+    op = node.op
+    lhs, rhs = _compile(node.lhs, context), _compile(node.rhs, context)
+    dialect = context.dialect
+    if op in COMPARISONS:
+        # Comparisons to null test for missing values, as in Javascript.
+        if "NULL" in (lhs[0], rhs[0]) and op in ("==", "===", "!=", "!=="):
+            other = rhs[0] if lhs[0] == "NULL" else lhs[0]
+            test = "IS NULL" if op.startswith("=") else "IS NOT NULL"
+            return f"({other} {test})", BOOLEAN
+        # As in pandas, comparisons to missing values are false, and so
+        # inequalities are true.
+        default = "TRUE" if op.startswith("!") else "FALSE"
+        return f"COALESCE({lhs[0]} {COMPARISONS[op]} {rhs[0]}, {default})", BOOLEAN
+    if op in ("&&", "||"):
+        if lhs[1] == rhs[1] == BOOLEAN:
+            return (
+                f"({truthy(lhs)} {'AND' if op == '&&' else 'OR'} {truthy(rhs)})",
+                BOOLEAN,
+            )
+        # Javascript returns one of the operands.
+        first, second = (rhs, lhs) if op == "&&" else (lhs, rhs)
+        type_ = lhs[1] if lhs[1] == rhs[1] else OTHER
+        return f"(CASE WHEN {truthy(lhs)} THEN {first[0]} ELSE {second[0]} END)", type_
+    if op == "+" and STRING in (lhs[1], rhs[1]):
+        return f"({lhs[0]} || {rhs[0]})", STRING
+    if op in ("+", "-", "*"):
+        return f"({lhs[0]} {op} {rhs[0]})", NUMBER
+    if op == "/":
+        return dialect.divide(lhs[0], rhs[0]), NUMBER
+    if op == "%":
+        return dialect.modulo(lhs[0], rhs[0]), NUMBER
+    if op == "**":
+        return f"POWER({lhs[0]}, {rhs[0]})", NUMBER
+    raise NotImplementedError(f"Binary Operator A {op} B in SQL")
+
+
+@_compile.register(ast.TernOp)
+def _compile_ternop(node: ast.TernOp, context: Context) -> Compiled:
+    if node.op != ("?", ":"):
+        raise NotImplementedError(f"Ternary Operator A {node.op[0]} B {node.op[1]} C")
+    test, a, b = (_compile(n, context) for n in (node.lhs, node.mid, node.rhs))
+    return _case(test, a, b)
+
+
+def _case(test: Compiled, a: Compiled, b: Compiled) -> Compiled:
+    type_ = (
+        a[1] if a[1] == b[1] or b[0] == "NULL" else b[1] if a[0] == "NULL" else OTHER
+    )
+    return f"(CASE WHEN {truthy(test)} THEN {a[0]} ELSE {b[0]} END)", type_
+
+
+def _function(template: str, type_: str, nargs: int) -> Callable[..., Compiled]:
+    def compile_function(context: Context, *args: Compiled) -> Compiled:
+        if len(args) != nargs:
+            raise NotImplementedError(f"{template} with {len(args)} arguments in SQL")
+        return template.format(*(sql for sql, _ in args)), type_
+
+    return compile_function
+
+
+def _date_part(unit: str, offset: int = 0) -> Callable[..., Compiled]:
+    def compile_part(context: Context, *args: Compiled) -> Compiled:
+        if len(args) != 1:
+            raise NotImplementedError(f"{unit}() with {len(args)} arguments in SQL")
+        date = context.dialect.to_date(*args[0])
+        part = context.dialect.part(unit, date)
+        return (f"({part} - {offset})" if offset else part), NUMBER
+
+    return compile_part
+
+
+def _extremum(least: bool) -> Callable[..., Compiled]:
+    def compile_extremum(context: Context, *args: Compiled) -> Compiled:
+        if len(args) < 2:
+            raise NotImplementedError("min() or max() of fewer than two values in SQL")
+        func = context.dialect.least if least else context.dialect.greatest
+        return func(*(sql for sql, _ in args)), NUMBER
+
+    return compile_extremum
+
+
+def _cast(to: str) -> Callable[..., Compiled]:
+    def compile_cast(context: Context, *args: Compiled) -> Compiled:
+        if len(args) != 1:
+            raise NotImplementedError(f"Conversion of {len(args)} arguments in SQL")
+        if to == NUMBER:
+            return f"CAST({args[0][0]} AS {context.dialect.double})", NUMBER
+        return f"CAST({args[0][0]} AS {context.dialect.text})", STRING
+
+    return compile_cast
+
+
+def _if(context: Context, *args: Compiled) -> Compiled:
+    if len(args) != 3:
+        raise NotImplementedError(f"if() with {len(args)} arguments in SQL")
+    return _case(*args)
+
+
+def _quarter(context: Context, *args: Compiled) -> Compiled:
+    sql, type_ = _date_part("month", 1)(context, *args)
+    return f"CAST(FLOOR({sql} / 3) AS INTEGER)", type_
+
+
+FUNCTIONS: Dict[str, Callable[..., Compiled]] = {
+    "isValid": _function("({0} IS NOT NULL)", BOOLEAN, 1),
+    "toNumber": _cast(NUMBER),
+    "toString": _cast(STRING),
+    "if": _if,
+    "abs": _function("ABS({0})", NUMBER, 1),
+    "acos": _function("ACOS({0})", NUMBER, 1),
+    "asin": _function("ASIN({0})", NUMBER, 1),
+    "atan": _function("ATAN({0})", NUMBER, 1),
+    "atan2": _function("ATAN2({0}, {1})", NUMBER, 2),
+    "ceil": _function("CEIL({0})", NUMBER, 1),
+    "cos": _function("COS({0})", NUMBER, 1),
+    "exp": _function("EXP({0})", NUMBER, 1),
+    "floor": _function("FLOOR({0})", NUMBER, 1),
+    "log": _function("LN({0})", NUMBER, 1),
+    "max": _extremum(least=False),
+    "min": _extremum(least=True),
+    "pow": _function("POWER({0}, {1})", NUMBER, 2),
+    # Math.round rounds halves up.
+    "round": _function("FLOOR({0} + 0.5)", NUMBER, 1),
+    "sin": _function("SIN({0})", NUMBER, 1),
+    "sqrt": _function("SQRT({0})", NUMBER, 1),
+    "tan": _function("TAN({0})", NUMBER, 1),
+    "year": _date_part("year"),
+    "quarter": _quarter,
+    "month": _date_part("month", 1),
+    "date": _date_part("date"),
+    "day": _date_part("day"),
+    "hours": _date_part("hours"),
+    "minutes": _date_part("minutes"),
+    "seconds": _date_part("seconds"),
+    "milliseconds": _date_part("milliseconds"),
+    "length": _function("LENGTH({0})", NUMBER, 1),
+    "lower": _function("LOWER({0})", STRING, 1),
+    "trim": _function("TRIM({0})", STRING, 1),
+    "upper": _function("UPPER({0})", STRING, 1),
+}
+
+
+@_compile.register(ast.Func)
+def _compile_func(node: ast.Func, context: Context) -> Compiled:
+    if not isinstance(node.func, ast.Global) or node.func.name not in FUNCTIONS:
+        raise NotImplementedError(f"Function {node.func} in SQL")
+    args = [_compile(arg, context) for arg in node.args]
+    return FUNCTIONS[node.func.name](context, *args)
+
+
+# Predicates
+
+
+def compile_predicate(
+    predicate: Any, dialect: Dialect, columns: Optional[Dict[str, str]] = None
+) -> str:
+    """Compile a filter predicate, in expression or JSON form, to a SQL condition.
+
+    Conditions are true or false, never null: as in pandas, tests of missing
+    values are false, and their negations true.
+    """
+    if isinstance(predicate, str):
+        return truthy(compile_expression(predicate, dialect, columns))
+    if not isinstance(predicate, dict):
+        raise NotImplementedError(f"Predicate of type {type(predicate)} in SQL")
+    if "not" in predicate:
+        return f"(NOT {compile_predicate(predicate['not'], dialect, columns)})"
+    for op in ("and", "or"):
+        if op in predicate:
+            terms = [compile_predicate(p, dialect, columns) for p in predicate[op]]
+            return "(" + f" {op.upper()} ".join(terms) + ")"
+    if "timeUnit" in predicate:
+        raise NotImplementedError("timeUnit in predicates in SQL")
+    field, _ = Context(dialect, columns).column(predicate.get("field"))
+    if "equal" in predicate:
+        return f"COALESCE({field} = {literal(predicate['equal'])}, FALSE)"
+    if "range" in predicate:
+        min_, max_ = predicate["range"]
+        terms = [f"{field} >= {literal(min_)}"] if min_ is not None else []
+        terms += [f"{field} <= {literal(max_)}"] if max_ is not None else []
+        if not terms:
+            return f"({field} IS NOT NULL)"
+        return f"COALESCE({' AND '.join(terms)}, FALSE)"
+    if "oneOf" in predicate:
+        options = ", ".join(literal(value) for value in predicate["oneOf"])
+        return f"COALESCE({field} IN ({options}), FALSE)" if options else "FALSE"
+    for op, sql in [("lt", "<"), ("lte", "<="), ("gt", ">"), ("gte", ">=")]:
+        if op in predicate:
+            return f"COALESCE({field} {sql} {literal(predicate[op])}, FALSE)"
+    raise NotImplementedError(f"Predicate with properties {sorted(predicate)} in SQL")
+
+
+# Transforms
+
+
+@singledispatch
+def check_spec(spec: TransformSpec, dialect: Dialect) -> None:
+    """Raise NotImplementedError if a transform cannot be compiled to SQL."""
+
+
+@singledispatch
+def compile_spec(
+    spec: TransformSpec, relation: Relation, engine: SQLEngine
+) -> Relation:
+    """Compile a transform over a relation."""
+    raise NotImplementedError(f"{type(spec).__name__} in SQL")
+
+
+def _select(columns: Dict[str, str]) -> List[str]:
+    return [quote(col) for col in columns] + [quote(ROW)]
+
+
+def _assign(relation: Relation, values: Dict[str, Compiled]) -> Relation:
+    """Select the columns of a relation, with columns assigned to SQL values.
+
+    As in pandas, existing columns are replaced in place, and new columns are
+    appended.
+    """
+    columns = dict(relation.columns)
+    columns.update({col: type_ for col, (_, type_) in values.items()})
+    select = [
+        f"{values[col][0]} AS {quote(col)}" if col in values else quote(col)
+        for col in columns
+    ]
+    select.append(quote(ROW))
+    return relation.derive(f"SELECT {', '.join(select)} FROM {{input}}", columns)
+
+
+def _mask_null_keys(sql: str, groupby: List[str]) -> str:
+    """Return null for rows with a null group key, which pandas leaves ungrouped."""
+    if not groupby:
+        return sql
+    test = " OR ".join(f"{quote(key)} IS NULL" for key in groupby)
+    return f"CASE WHEN {test} THEN NULL ELSE {sql} END"
+
+
+def _aggregate_sql(dialect: Dialect, op: str, field: Optional[str]) -> str:
+    if op not in dialect.aggregates:
+        raise NotImplementedError(f"Aggregate {op!r} in {dialect.name}")
+    template = dialect.aggregates[op]
+    if field is None and "{0}" in template:
+        raise NotImplementedError(f"Aggregate {op!r} without a field in SQL")
+    return template.format(quote(field) if field is not None else "")
+
+
+def _aggregate_type(op: str, field: Optional[str], columns: Dict[str, str]) -> str:
+    if op in ("min", "max", "first_value", "last_value") and field in columns:
+        return columns[field]
+    return NUMBER
+
+
+def _field(aggregate: Dict[str, Any], columns: Dict[str, str]) -> Optional[str]:
+    field = aggregate.get("field")
+    if field == "*" and field not in columns:
+        field = None
+    return field
+
+
+@check_spec.register(AggregateSpec)
+def _check_aggregate(spec: AggregateSpec, dialect: Dialect) -> None:
+    for aggregate in spec["aggregate"]:
+        op = aggregate["op"]
+        if op != "count" and aggregate.get("field", "*") == "*":
+            raise NotImplementedError(f"Aggregate {op!r} without a field in SQL")
+        _aggregate_sql(dialect, op, aggregate.get("field"))
+
+
+@compile_spec.register(AggregateSpec)
+def _compile_aggregate(
+    spec: AggregateSpec, relation: Relation, engine: SQLEngine
+) -> Relation:
+    groupby = spec.get("groupby", [])
+    keys = [quote(key) for key in groupby]
+    columns = {key: relation.columns[key] for key in groupby}
+    select = list(keys)
+    for aggregate in spec["aggregate"]:
+        field = _field(aggregate, relation.columns)
+        sql = _aggregate_sql(engine.dialect, aggregate["op"], field)
+        if aggregate["op"] == "sum":
+            sql = f"COALESCE({sql}, 0)"
+        select.append(f"{sql} AS {quote(aggregate['as'])}")
+        columns[aggregate["as"]] = _aggregate_type(
+            aggregate["op"], field, relation.columns
+        )
+    if not groupby:
+        select.append(f"0 AS {quote(ROW)}")
+        return relation.derive(f"SELECT {', '.join(select)} FROM {{input}}", columns)
+    # As with pandas, groups are sorted by key, and null keys are dropped.
+    order = ", ".join(keys)
+    select.append(f"ROW_NUMBER() OVER (ORDER BY {order}) AS {quote(ROW)}")
+    where = " AND ".join(f"{key} IS NOT NULL" for key in keys)
+    return relation.derive(
+        f"SELECT {', '.join(select)} FROM {{input}} WHERE {where} GROUP BY {order}",
+        columns,
+    )
+
+
+@check_spec.register(JoinAggregateSpec)
+def _check_joinaggregate(spec: JoinAggregateSpec, dialect: Dialect) -> None:
+    for aggregate in spec["joinaggregate"]:
+        _aggregate_sql(dialect, aggregate["op"], aggregate.get("field"))
+
+
+@compile_spec.register(JoinAggregateSpec)
+def _compile_joinaggregate(
+    spec: JoinAggregateSpec, relation: Relation, engine: SQLEngine
+) -> Relation:
+    groupby = spec.get("groupby", [])
+    window = "OVER ()"
+    if groupby:
+        window = f"OVER (PARTITION BY {', '.join(quote(key) for key in groupby)})"
+    values = {}
+    for aggregate in spec["joinaggregate"]:
+        field = _field(aggregate, relation.columns)
+        sql = f"{_aggregate_sql(engine.dialect, aggregate['op'], field)} {window}"
+        if aggregate["op"] == "sum":
+            sql = f"COALESCE({sql}, 0)"
+        type_ = _aggregate_type(aggregate["op"], field, relation.columns)
+        values[aggregate["as"]] = (_mask_null_keys(sql, groupby), type_)
+    return _assign(relation, values)
+
+
+def _frame_bound(offset: Optional[int], side: str) -> str:
+    if offset is None:
+        return f"UNBOUNDED {side}"
+    if offset == 0:
+        return "CURRENT ROW"
+    return f"{abs(offset)} {'PRECEDING' if offset < 0 else 'FOLLOWING'}"
+
+
+@check_spec.register(WindowSpec)
+def _check_window(spec: WindowSpec, dialect: Dialect) -> None:
+    if spec.get("ignorePeers", False):
+        raise NotImplementedError("Window transform with ignorePeers=True")
+    frame = spec.get("frame", [None, 0])
+    if not all(bound is None or isinstance(bound, int) for bound in frame):
+        raise NotImplementedError(f"frame={frame} in SQL")
+    for w in spec["window"]:
+        if "param" in w:
+            raise NotImplementedError("window function with param")
+        if w["op"] not in dialect.window_functions:
+            _aggregate_sql(dialect, w["op"], w.get("field"))
+
+
+@compile_spec.register(WindowSpec)
+def _compile_window(
+    spec: WindowSpec, relation: Relation, engine: SQLEngine
+) -> Relation:
+    dialect = engine.dialect
+    groupby = spec.get("groupby", [])
+    start, end = spec.get("frame", [None, 0])
+    partition = ""
+    if groupby:
+        partition = f"PARTITION BY {', '.join(quote(key) for key in groupby)} "
+    # Sorting is stable: ties are in input order, except for ranking functions.
+    sort = [
+        f"{quote(s['field'])} {'DESC' if s.get('order') == 'descending' else 'ASC'}"
+        " NULLS LAST"
+        for s in spec.get("sort", [])
+    ]
+    rows = f"ORDER BY {', '.join(sort + [quote(ROW)])}"
+    peers = f"ORDER BY {', '.join(sort or [quote(ROW)])}"
+    frame = (
+        f"ROWS BETWEEN {_frame_bound(start, 'PRECEDING')}"
+        f" AND {_frame_bound(end, 'FOLLOWING')}"
+    )
+    values = {}
+    for w in spec["window"]:
+        op = w["op"]
+        field = _field(w, relation.columns)
+        if op in dialect.window_functions:
+            template = dialect.window_functions[op]
+            if field is None and "{0}" in template:
+                raise NotImplementedError(f"Window {op!r} without a field in SQL")
+            sql = template.format(quote(field) if field is not None else "")
+            if op in ("rank", "dense_rank", "percent_rank", "cume_dist"):
+                over = f"({partition}{peers})"
+            elif op == "row_number":
+                over = f"({partition}{rows})"
+            else:
+                over = f"({partition}{rows} {frame})"
+        else:
+            sql = _aggregate_sql(dialect, op, field)
+            over = f"({partition}{rows} {frame})"
+        sql = f"{sql} OVER {over}"
+        if op == "percent_rank":
+            # As in Vega, partitions of a single row have a percent rank of NaN.
+            sql = f"CASE WHEN COUNT(*) OVER ({partition}) > 1 THEN {sql} END"
+        values[w["as"]] = (
+            _mask_null_keys(sql, groupby),
+            _aggregate_type(op, field, relation.columns),
+        )
+    return _assign(relation, values)
+
+
+@check_spec.register(FilterSpec)
+def _check_filter(spec: FilterSpec, dialect: Dialect) -> None:
+    compile_predicate(spec["filter"], dialect)
+
+
+@compile_spec.register(FilterSpec)
+def _compile_filter(
+    spec: FilterSpec, relation: Relation, engine: SQLEngine
+) -> Relation:
+    condition = compile_predicate(spec["filter"], engine.dialect, relation.columns)
+    select = ", ".join(_select(relation.columns))
+    return relation.derive(
+        f"SELECT {select} FROM {{input}} WHERE {condition}", relation.columns
+    )
+
+
+@check_spec.register(CalculateSpec)
+def _check_calculate(spec: CalculateSpec, dialect: Dialect) -> None:
+    compile_expression(spec["calculate"], dialect)
+
+
+@compile_spec.register(CalculateSpec)
+def _compile_calculate(
+    spec: CalculateSpec, relation: Relation, engine: SQLEngine
+) -> Relation:
+    sql, type_ = compile_expression(spec["calculate"], engine.dialect, relation.columns)
+    return _assign(relation, {spec["as"]: (sql, type_)})
+
+
+@compile_spec.register(FoldSpec)
+def _compile_fold(spec: FoldSpec, relation: Relation, engine: SQLEngine) -> Relation:
+    key, value = spec.get("as", ("key", "value"))
+    fields, ids = fold_fields(spec, list(relation.columns))
+    types = {relation.columns[field] for field in fields}
+    value_type = types.pop() if len(types) == 1 else STRING
+    columns = {col: relation.columns[col] for col in ids}
+    columns.update({key: STRING, value: value_type})
+    columns.update({field: relation.columns[field] for field in fields})
+
+    def folded(i: int, field: str) -> str:
+        value_sql = quote(field)
+        if len(types) > 1 or value_type != relation.columns[field]:
+            value_sql = f"CAST({value_sql} AS {engine.dialect.text})"
+        select = [quote(col) for col in ids]
+        select += [
+            f"{literal(field)} AS {quote(key)}",
+            f"{value_sql} AS {quote(value)}",
+        ]
+        select += [quote(field) for field in fields]
+        select += [quote(ROW), f"{i} AS _fold"]
+        return f"SELECT {', '.join(select)} FROM {{input}}"
+
+    union = "\nUNION ALL\n".join(folded(i, field) for i, field in enumerate(fields))
+    outputs = [quote(col) for col in columns]
+    return relation.derive(
+        f"SELECT {', '.join(outputs)},"
+        f" ROW_NUMBER() OVER (ORDER BY {quote(ROW)}, _fold) AS {quote(ROW)}"
+        f" FROM ({union}) AS _folded",
+        columns,
+    )
+
+
+@compile_spec.register(LookupSpec)
+def _compile_lookup(
+    spec: LookupSpec, relation: Relation, engine: SQLEngine
+) -> Relation:
+    key = spec["from"]["key"]
+    other = to_dataframe(spec["from"]["data"])
+    lookup = spec["lookup"]
+    default = spec.get("default")
+    outputs = lookup_outputs(spec, list(relation.columns), list(other.columns))
+
+    table, types = engine.register(other[list(dict.fromkeys(outputs + [key]))])
+    columns = dict(relation.columns)
+    select = [f"_l.{quote(col)}" for col in relation.columns]
+    for field in outputs:
+        sql, type_ = f"_r.{quote(field)}", types[field]
+        if default is not None:
+            if type_ != STRING:
+                sql, type_ = f"CAST({sql} AS {engine.dialect.text})", STRING
+            sql = f"CASE WHEN _r.{quote(ROW)} IS NULL THEN {literal(default)} ELSE {sql} END"
+        select.append(f"{sql} AS {quote(field)}")
+        columns[field] = type_
+    select.append(
+        f"ROW_NUMBER() OVER (ORDER BY _l.{quote(ROW)}, _r.{quote(ROW)}) AS {quote(ROW)}"
+    )
+    derived = relation.derive(
+        f"SELECT {', '.join(select)} FROM {{input}} AS _l LEFT JOIN {quote(table)} AS _r"
+        f" ON _l.{quote(lookup)} = _r.{quote(key)}",
+        columns,
+    )
+    derived.tables.append(table)
+    return derived
+
+
+@compile_spec.register(BinSpec)
+def _compile_bin(spec: BinSpec, relation: Relation, engine: SQLEngine) -> Relation:
+    field = quote(spec["field"])
+    if relation.columns.get(spec["field"]) != NUMBER:
+        raise NotImplementedError("Bin of a non-numeric field in SQL")
+    bin_ = {} if spec["bin"] is True else dict(spec["bin"])
+    if "extent" not in bin_:
+        bin_["extent"] = list(engine.fetch(relation, f"MIN({field}), MAX({field})"))
+    edges = calculate_bins(**bin_)
+    start, stop, nbins = edges[0], edges[-1], len(edges) - 1
+    step = (stop - start) / nbins
+    # Values out of the extent are null, and the upper bound is in the last bin.
+    index = engine.dialect.least(
+        f"FLOOR(({field} - {literal(start)}) / {literal(step)})", str(nbins - 1)
+    )
+    inside = f"{field} >= {literal(start)} AND {field} <= {literal(stop)}"
+    bin_start = (
+        f"CASE WHEN {inside} THEN {literal(start)} + {literal(step)} * {index} END"
+    )
+    bin_end = f"CASE WHEN {inside} THEN {literal(start)} + {literal(step)} * ({index} + 1) END"
+    col = spec["as"]
+    names = (col, col + "_end") if isinstance(col, str) else tuple(col)
+    return _assign(
+        relation, {names[0]: (bin_start, NUMBER), names[1]: (bin_end, NUMBER)}
+    )
+
+
+@check_spec.register(TimeUnitSpec)
+def _check_timeunit(spec: TimeUnitSpec, dialect: Dialect) -> None:
+    timeunit_parts(spec["timeUnit"])
+
+
+@compile_spec.register(TimeUnitSpec)
+def _compile_timeunit(
+    spec: TimeUnitSpec, relation: Relation, engine: SQLEngine
+) -> Relation:
+    dialect = engine.dialect
+    field, type_ = Context(dialect, relation.columns).column(spec["field"])
+    if type_ not in (DATE, STRING):
+        raise NotImplementedError(f"timeUnit of a field of type {type_} in SQL")
+    # Naive dates are in local time, as in the pandas engine.
+    date = dialect.to_date(field, type_)
+    units = timeunit_parts(spec["timeUnit"])
+
+    def part(unit: str) -> str:
+        return (
+            dialect.part(unit, date) if unit in units else str(TIMEUNIT_DEFAULTS[unit])
+        )
+
+    month, day = part("month"), part("date")
+    if units == ["day"]:
+        day = f"1 + {dialect.part('day', date)}"
+    elif "quarter" in units and "month" not in units:
+        month = (
+            f"({dialect.part('month', date)} - ({dialect.part('month', date)} - 1) % 3)"
+        )
+    seconds = part("seconds")
+    if "milliseconds" in units:
+        seconds = f"{seconds} + {dialect.part('milliseconds', date)} / 1000.0"
+    parts = [part("year"), month, day, part("hours"), part("minutes"), seconds]
+    return _assign(relation, {spec["as"]: (dialect.timestamp(parts, date), DATE)})
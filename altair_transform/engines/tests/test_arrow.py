@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import altair as alt
+import altair_transform
+from altair_transform.transform.spec import normalize
+
+from .test_sql import TRANSFORMS
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from altair_transform.engines.arrow import ArrowEngine, evaluate_expression  # noqa
+
+
+@pytest.fixture
+def engine() -> ArrowEngine:
+    return ArrowEngine()
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(42)
+    df = pd.DataFrame(
+        {
+            "x": rand.randint(0, 100, 40),
+            "y": rand.randn(40),
+            "c": rand.choice(list("abc"), 40),
+            "t": pd.Timestamp("2020-01-01")
+            + pd.to_timedelta(rand.randint(0, 2000, 40), unit="h"),
+        }
+    )
+    df.loc[3, "y"] = np.nan
+    return df
+
+
+# The pandas engine uses APIs deprecated in recent versions of pandas.
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize("transform", TRANSFORMS)
+def test_arrow_engine(data: pd.DataFrame, engine: ArrowEngine, transform: list) -> None:
+    if "window" not in transform[0]:
+        assert all(engine.supports(normalize(t)) for t in transform)
+    expected = altair_transform.apply(data, transform)
+    out = altair_transform.apply(data, transform, engine=engine)
+    pd.testing.assert_frame_equal(
+        out.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False
+    )
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+def test_arrow_input(data: pd.DataFrame) -> None:
+    transform = TRANSFORMS[-1]
+    expected = altair_transform.apply(data, transform)
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    for arrow_data in [table, table.to_batches()[0]]:
+        out = altair_transform.apply(arrow_data, transform)
+        assert isinstance(out, pa.Table)
+        pd.testing.assert_frame_equal(out.to_pandas(), expected, check_dtype=False)
+    out = altair_transform.apply(table, transform, output="pandas")
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+def test_arrow_output(data: pd.DataFrame) -> None:
+    transform = {"calculate": "datum.x + 1", "as": "z"}
+    for engine in ["pandas", "arrow"]:
+        out = altair_transform.apply(data, transform, engine=engine, output="arrow")
+        assert isinstance(out, pa.Table)
+        assert out.column_names == ["x", "y", "c", "t", "z"]
+    with pytest.raises(ValueError, match="Unknown output"):
+        altair_transform.apply(data, transform, output="numpy")
+
+
+def test_arrow_input_other_engine(data: pd.DataFrame) -> None:
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    transform = {"calculate": "datum.x + 1", "as": "z"}
+    out = altair_transform.apply(table, transform, engine="pandas")
+    assert isinstance(out, pa.Table)
+    assert out["z"].to_pylist() == (data["x"] + 1).tolist()
+
+
+def test_arrow_engine_fallback(data: pd.DataFrame, engine: ArrowEngine) -> None:
+    transform = [
+        {"calculate": "2 * datum.x", "as": "x2"},
+        {"impute": "y", "key": "x", "method": "mean"},
+        {"filter": "datum.x2 > 10"},
+    ]
+    assert not engine.supports(normalize(transform[1]))
+    expected = altair_transform.apply(data, transform)
+    out = altair_transform.apply(data, transform, engine=engine)
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+def test_arrow_engine_data_dependent_fallback(
+    data: pd.DataFrame, engine: ArrowEngine
+) -> None:
+    # Looked up fields conflicting with input columns are suffixed by pandas.
+    transform = {
+        "lookup": "c",
+        "from": {
+            "data": {"values": [{"c": "a", "x": 1}, {"c": "b", "x": 2}]},
+            "key": "c",
+            "fields": ["x"],
+        },
+    }
+    expected = altair_transform.apply(data, transform)
+    out = altair_transform.apply(data, transform, engine=engine)
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+def test_arrow_engine_unconvertible(engine: ArrowEngine) -> None:
+    # Columns of mixed types cannot be represented in Arrow.
+    df = pd.DataFrame({"x": [1, 2, 3], "y": [1, "a", None]})
+    transform = {"filter": "datum.x > 1"}
+    expected = altair_transform.apply(df, transform)
+    out = altair_transform.apply(df, transform, engine=engine)
+    pd.testing.assert_frame_equal(out, expected)
+
+
+def test_arrow_engine_input_unchanged(data: pd.DataFrame, engine: ArrowEngine) -> None:
+    original = data.copy()
+    altair_transform.apply(data, TRANSFORMS[0], engine=engine)
+    pd.testing.assert_frame_equal(data, original)
+
+
+def test_extract_data_parquet(data: pd.DataFrame, tmp_path) -> None:
+    path = str(tmp_path / "data.parquet")
+    data.to_parquet(path)
+    chart = alt.Chart(alt.UrlData(path)).mark_bar().encode(x="c:N", y="sum(x):Q")
+    expected = altair_transform.extract_data(chart)
+    out = altair_transform.extract_data(chart, engine="arrow", output="arrow")
+    assert isinstance(out, pa.Table)
+    pd.testing.assert_frame_equal(out.to_pandas(), expected, check_dtype=False)
+
+
+@pytest.mark.parametrize(
+    "expression,expected",
+    [
+        ("datum.x + 1", [2.0, 3.0, None]),
+        ("datum.x % 2", [1.0, 0.0, None]),
+        ("datum.s + '!'", ["a!", "!", None]),
+        ("datum.x == null", [False, False, True]),
+        ("datum.s || 'none'", ["a", "none", "none"]),
+        ("!datum.s", [False, True, True]),
+        ("datum.x > 1 ? 'big' : 'small'", ["small", "big", "small"]),
+        ("round(datum.x / 4)", [0.0, 1.0, None]),
+        ("max(datum.x, 1.5)", [1.5, 2.0, 1.5]),
+    ],
+)
+def test_evaluate_expression(expression: str, expected: list) -> None:
+    table = pa.table({"x": [1, 2, None], "s": ["a", "", None]})
+    assert evaluate_expression(expression, table).to_pylist() == expected
+
+
+@pytest.mark.parametrize(
+    "expression", ["datum.x.y", "random()", "test(/a/, datum.s)", "datum.x << 2"]
+)
+def test_evaluate_expression_unsupported(expression: str, engine: ArrowEngine) -> None:
+    assert not engine.supports(normalize({"calculate": expression, "as": "z"}))
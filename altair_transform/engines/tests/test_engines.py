@@ -0,0 +1,233 @@
+from typing import Any, List
+
+import altair as alt
+import numpy as np
+import pandas as pd
+import pytest
+
+import altair_transform
+from altair_transform import engines
+from altair_transform.engines import Engine, EngineRegistry, split_runs
+from altair_transform.transform.spec import TransformSpec, normalize_list
+
+
+class RecordsEngine(Engine):
+    """Toy engine evaluating folds and calculates on lists of records."""
+
+    name = "records"
+
+    def __init__(self) -> None:
+        self.runs: List[List[str]] = []
+
+    def supports(self, spec: TransformSpec) -> bool:
+        return spec.key == "fold"
+
+    def execute(self, specs: List[TransformSpec], data: Any) -> Any:
+        self.runs.append([spec.key for spec in specs])
+        for spec in specs:
+            key, value = spec.get("as", ["key", "value"])
+            data = [
+                {**row, key: field, value: row[field]}
+                for row in data
+                for field in spec["fold"]
+            ]
+        return data
+
+    def from_pandas(self, df: pd.DataFrame) -> Any:
+        return df.to_dict(orient="records")
+
+    def to_pandas(self, data: Any) -> pd.DataFrame:
+        return pd.DataFrame.from_records(data)
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(0)
+    return pd.DataFrame(
+        {
+            "x": rand.randint(0, 10, 12),
+            "y": rand.randint(0, 10, 12),
+            "c": list("ab") * 6,
+        }
+    )
+
+
+TRANSFORMS = [
+    {"fold": ["x", "y"]},
+    {"filter": {"field": "value", "gt": 3}},
+    {"fold": ["value"], "as": ["k", "v"]},
+    {"aggregate": [{"op": "sum", "field": "v", "as": "total"}], "groupby": ["c"]},
+]
+
+
+@pytest.fixture
+def engine() -> RecordsEngine:
+    engine = RecordsEngine()
+    engines.register("records", lambda: engine)
+    yield engine
+    engines.registry._factories.pop("records")
+    engines.registry._engines.pop("records", None)
+    engines.enable("pandas")
+
+
+def test_split_runs(engine: RecordsEngine) -> None:
+    runs = split_runs(engine, normalize_list(TRANSFORMS + TRANSFORMS[:1]))
+    assert [(supported, [s.key for s in specs]) for supported, specs in runs] == [
+        (True, ["fold"]),
+        (False, ["filter"]),
+        (True, ["fold"]),
+        (False, ["aggregate"]),
+        (True, ["fold"]),
+    ]
+
+
+def test_registry() -> None:
+    registry = EngineRegistry()
+    registry.register("pandas", engines.PandasEngine)
+    assert registry.names() == ["pandas"]
+    assert registry.active == "pandas"
+    assert registry.get() is registry.get("pandas")
+    with pytest.raises(ValueError, match="Unknown engine: 'duck'"):
+        registry.get("duck")
+    with pytest.raises(ValueError, match="Unknown engine"):
+        registry.enable("duck")
+    assert registry.active == "pandas"
+
+
+@pytest.mark.parametrize("by_name", [True, False])
+def test_apply_engine(data: pd.DataFrame, engine: RecordsEngine, by_name: bool) -> None:
+    expected = altair_transform.apply(data, TRANSFORMS)
+    out = altair_transform.apply(
+        data, TRANSFORMS, engine="records" if by_name else engine
+    )
+    pd.testing.assert_frame_equal(out, expected)
+    assert engine.runs == [["fold"], ["fold"]]
+
+
+def test_apply_engine_native_result(data: pd.DataFrame, engine: RecordsEngine) -> None:
+    expected = altair_transform.apply(data, TRANSFORMS[:1])
+    out = altair_transform.apply(data, TRANSFORMS[:1], engine=engine)
+    assert isinstance(out, pd.DataFrame)
+    pd.testing.assert_frame_equal(out, expected, check_like=True)
+
+
+def test_enable(data: pd.DataFrame, engine: RecordsEngine) -> None:
+    engines.enable("records")
+    assert engines.active() == "records"
+    altair_transform.apply(data, TRANSFORMS)
+    assert engine.runs == [["fold"], ["fold"]]
+    altair_transform.apply(data, TRANSFORMS, engine="pandas")
+    assert len(engine.runs) == 2
+
+
+def test_extract_data_engine(data: pd.DataFrame, engine: RecordsEngine) -> None:
+    chart = (
+        alt.Chart(data)
+        .transform_fold(["x", "y"])
+        .mark_bar()
+        .encode(x="c:N", y="sum(value):Q")
+    )
+    expected = altair_transform.extract_data(chart)
+    out = altair_transform.extract_data(chart, engine="records")
+    pd.testing.assert_frame_equal(out, expected)
+    assert engine.runs == [["fold"]]
+
+
+def test_engine_unsupported_options(data: pd.DataFrame, engine: RecordsEngine) -> None:
+    with pytest.raises(ValueError, match="not supported by engine 'records'"):
+        altair_transform.apply(data, TRANSFORMS, engine=engine, chunksize=5)
+    with pytest.raises(ValueError, match="not supported by engine 'records'"):
+        altair_transform.apply(data, TRANSFORMS, engine=engine, sorted_by=["c"])
+    with pytest.raises(ValueError, match="requires a DataFrame"):
+        altair_transform.apply(iter([data]), TRANSFORMS, engine=engine)
+
+
+COUNTS = [
+    {"op": "count", "as": "count"},
+    {"op": "count", "field": "x", "as": "count_x"},
+    {"op": "valid", "field": "x", "as": "valid_x"},
+]
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize(
+    "backend", ["pandas", "stream", "cube", "sqlite", "duckdb", "arrow", "polars"]
+)
+@pytest.mark.parametrize(
+    "transform,expected",
+    [
+        ({"aggregate": COUNTS}, [[6, 6, 4]]),
+        ({"aggregate": COUNTS, "groupby": ["c"]}, [[4, 4, 3], [2, 2, 1]]),
+        (
+            {"joinaggregate": COUNTS[:2], "groupby": ["c"]},
+            [[4, 4], [4, 4], [2, 2], [2, 2], [4, 4], [4, 4]],
+        ),
+        ({"window": COUNTS[:2]}, [[i, i] for i in range(1, 7)]),
+        (
+            {"window": COUNTS[:2], "groupby": ["c"]},
+            [[1, 1], [2, 2], [1, 1], [2, 2], [3, 3], [4, 4]],
+        ),
+    ],
+)
+def test_count_records(backend: str, transform: dict, expected: list) -> None:
+    # As in Vega, count is the number of records, whether or not a field is given.
+    data = pd.DataFrame(
+        {"x": [1, np.nan, 3, np.nan, 5, 6], "c": ["a", "a", "b", "b", "a", "a"]}
+    )
+    key = next(iter(transform))
+    if backend == "cube":
+        if key != "aggregate":
+            pytest.skip("cubes serve aggregate transforms")
+        cube = altair_transform.AggregateCube(data, ["c"], COUNTS)
+        assert cube.supports(transform)
+        out = cube.apply(transform)
+    elif backend == "stream":
+        out = altair_transform.apply([data.iloc[:3], data.iloc[3:]], transform)
+    else:
+        if backend in ("duckdb", "arrow", "polars"):
+            pytest.importorskip("pyarrow" if backend == "arrow" else backend)
+        out = altair_transform.apply(data, transform, engine=backend)
+    names = [count["as"] for count in transform[key]]
+    assert out[names].astype(int).values.tolist() == expected
+
+
+NULL_TRANSFORMS = [
+    {"filter": "datum.x != 5"},
+    {"filter": "datum.x !== datum.y"},
+    {"filter": "datum.s != 'a'"},
+    {"filter": "!(datum.x < 5)"},
+    {"filter": {"not": {"field": "x", "equal": 5}}},
+    {"filter": {"not": {"field": "x", "range": [2, 8]}}},
+    {"filter": {"not": {"field": "x", "lt": 5}}},
+    {"filter": {"not": {"field": "s", "oneOf": ["a"]}}},
+    {"filter": {"not": {"field": "s", "equal": "a"}}},
+    {"filter": {"or": [{"field": "x", "gt": 5}, {"not": {"field": "y", "lte": 2}}]}},
+    {"calculate": "datum.x != 5", "as": "r"},
+    {"calculate": "datum.x == datum.y", "as": "r"},
+    {"calculate": "datum.x >= 5", "as": "r"},
+    {"calculate": "datum.s !== 'a'", "as": "r"},
+]
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize("backend", ["sqlite", "duckdb", "arrow", "polars"])
+@pytest.mark.parametrize("transform", NULL_TRANSFORMS)
+def test_null_semantics(backend: str, transform: dict) -> None:
+    # Tests of missing values are false, and their negations true, as in pandas.
+    data = pd.DataFrame(
+        {
+            "x": [1.0, 5.0, np.nan, 7.0, np.nan],
+            "y": [1.0, np.nan, 3.0, 7.0, np.nan],
+            "s": ["a", None, "b", "a", None],
+        }
+    )
+    if backend in ("duckdb", "arrow", "polars"):
+        pytest.importorskip("pyarrow" if backend == "arrow" else backend)
+    assert altair_transform.engines.get(backend).supports(
+        normalize_list([transform])[0]
+    )
+    expected = altair_transform.apply(data, transform)
+    out = altair_transform.apply(data, transform, engine=backend)
+    pd.testing.assert_frame_equal(
+        out.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False
+    )
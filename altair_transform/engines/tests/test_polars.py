@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import altair as alt
+import altair_transform
+from altair_transform.transform.spec import normalize
+
+from .test_sql import TRANSFORMS
+
+pl = pytest.importorskip("polars")
+
+from altair_transform.engines.polars import PolarsEngine, compile_expression  # noqa
+
+
+@pytest.fixture
+def engine() -> PolarsEngine:
+    return PolarsEngine()
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(42)
+    df = pd.DataFrame(
+        {
+            "x": rand.randint(0, 100, 40),
+            "y": rand.randn(40),
+            "c": rand.choice(list("abc"), 40),
+            "t": pd.Timestamp("2020-01-01")
+            + pd.to_timedelta(rand.randint(0, 2000, 40), unit="h"),
+        }
+    )
+    df.loc[3, "y"] = np.nan
+    return df
+
+
+# The pandas engine uses APIs deprecated in recent versions of pandas.
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize("transform", TRANSFORMS)
+def test_polars_engine(
+    data: pd.DataFrame, engine: PolarsEngine, transform: list
+) -> None:
+    assert all(engine.supports(normalize(t)) for t in transform)
+    expected = altair_transform.apply(data, transform)
+    out = altair_transform.apply(data, transform, engine=engine)
+    pd.testing.assert_frame_equal(
+        out.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False
+    )
+
+
+@pytest.mark.parametrize(
+    "transform",
+    [
+        {"window": [{"op": "count", "field": "y", "as": "n"}], "groupby": ["c"]},
+        {"window": [{"op": "max", "field": "y", "as": "m"}], "frame": [None, None]},
+        {"window": [{"op": "sum", "field": "x", "as": "s"}], "frame": [-1, 1]},
+    ],
+)
+def test_polars_engine_window_frames(
+    data: pd.DataFrame, engine: PolarsEngine, transform: dict
+) -> None:
+    expected = altair_transform.apply(data, transform)
+    out = altair_transform.apply(data, transform, engine=engine)
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+def test_polars_engine_ranking(engine: PolarsEngine) -> None:
+    df = pd.DataFrame({"x": [3, 1, 3, 2, 5]})
+    transform = {
+        "window": [
+            {"op": "row_number", "as": "row_number"},
+            {"op": "rank", "as": "rank"},
+            {"op": "dense_rank", "as": "dense_rank"},
+        ],
+        "sort": [{"field": "x"}],
+    }
+    out = altair_transform.apply(df, transform, engine=engine)
+    assert out["row_number"].tolist() == [3, 1, 4, 2, 5]
+    assert out["rank"].tolist() == [3, 1, 3, 2, 5]
+    assert out["dense_rank"].tolist() == [3, 1, 3, 2, 4]
+
+
+def test_polars_engine_fallback(data: pd.DataFrame, engine: PolarsEngine) -> None:
+    transform = [
+        {"calculate": "2 * datum.x", "as": "x2"},
+        {"impute": "y", "key": "x", "method": "mean"},
+        {"filter": "datum.x2 > 10"},
+    ]
+    assert not engine.supports(normalize(transform[1]))
+    expected = altair_transform.apply(data, transform)
+    out = altair_transform.apply(data, transform, engine=engine)
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+def test_polars_engine_data_dependent_fallback(
+    data: pd.DataFrame, engine: PolarsEngine
+) -> None:
+    # Looked up fields conflicting with input columns are suffixed by pandas.
+    transform = {
+        "lookup": "c",
+        "from": {
+            "data": {"values": [{"c": "a", "x": 1}, {"c": "b", "x": 2}]},
+            "key": "c",
+            "fields": ["x"],
+        },
+    }
+    expected = altair_transform.apply(data, transform)
+    out = altair_transform.apply(data, transform, engine=engine)
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+def test_polars_engine_type_dependent_fallback(engine: PolarsEngine) -> None:
+    # length() of arrays is not translated to Polars.
+    df = pd.DataFrame({"v": [[1], [], [2, 3]]})
+    transform = {"calculate": "length(datum.v)", "as": "n"}
+    expected = altair_transform.apply(df, transform)
+    out = altair_transform.apply(df, transform, engine=engine)
+    pd.testing.assert_frame_equal(out, expected)
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+def test_polars_input(data: pd.DataFrame) -> None:
+    transform = TRANSFORMS[-1]
+    expected = altair_transform.apply(data, transform)
+    frame = pl.from_pandas(data)
+    for polars_data in [frame, frame.lazy()]:
+        out = altair_transform.apply(polars_data, transform)
+        assert isinstance(out, pl.DataFrame)
+        pd.testing.assert_frame_equal(out.to_pandas(), expected, check_dtype=False)
+    out = altair_transform.apply(frame, transform, output="pandas")
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+def test_polars_output(data: pd.DataFrame) -> None:
+    transform = {"calculate": "datum.x + 1", "as": "z"}
+    for engine in ["pandas", "polars"]:
+        out = altair_transform.apply(data, transform, engine=engine, output="polars")
+        assert isinstance(out, pl.DataFrame)
+        assert out.columns == ["x", "y", "c", "t", "z"]
+
+
+def test_extract_data_parquet(data: pd.DataFrame, tmp_path) -> None:
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "data.parquet")
+    data.to_parquet(path)
+    chart = alt.Chart(alt.UrlData(path)).mark_bar().encode(x="c:N", y="sum(x):Q")
+    expected = altair_transform.extract_data(chart)
+    out = altair_transform.extract_data(chart, engine="polars")
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+@pytest.mark.parametrize(
+    "expression,expected",
+    [
+        ("datum.x + 1", [2.0, 3.0, None]),
+        ("-7 % 3 + datum.x * 0", [-1.0, -1.0, None]),
+        ("datum.s + '!'", ["a!", "!", None]),
+        ("datum.x == null", [False, False, True]),
+        ("datum.s || 'none'", ["a", "none", "none"]),
+        ("!datum.s", [False, True, True]),
+        ("datum.x > 1 ? 'big' : 'small'", ["small", "big", "small"]),
+        ("round(datum.x / 4)", [0.0, 1.0, None]),
+    ],
+)
+def test_compile_expression(expression: str, expected: list) -> None:
+    frame = pl.DataFrame({"x": [1, 2, None], "s": ["a", "", None]})
+    expr, _ = compile_expression(expression, {"x": "number", "s": "string"})
+    assert frame.select(expr).to_series().to_list() == expected
+
+
+@pytest.mark.parametrize(
+    "expression", ["datum.x.y", "random()", "test(/a/, datum.s)", "datum.x << 2"]
+)
+def test_compile_expression_unsupported(expression: str) -> None:
+    with pytest.raises(NotImplementedError):
+        compile_expression(expression)
@@ -0,0 +1,260 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import altair_transform
+from altair_transform.engines import SQLEngine
+from altair_transform.engines.sql import DIALECTS, SQLiteDialect, compile_expression
+from altair_transform.transform.spec import normalize
+
+
+@pytest.fixture(params=["duckdb", "sqlite"])
+def engine(request) -> SQLEngine:
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb")
+    return SQLEngine(request.param)
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(42)
+    df = pd.DataFrame(
+        {
+            "x": rand.randint(0, 100, 40),
+            "y": rand.randn(40),
+            "c": rand.choice(list("abc"), 40),
+            "t": pd.Timestamp("2020-01-01")
+            + pd.to_timedelta(rand.randint(0, 2000, 40), unit="h"),
+        }
+    )
+    df.loc[3, "y"] = np.nan
+    return df
+
+
+TRANSFORMS = [
+    [{"calculate": "2 * datum.x + 1", "as": "z"}],
+    [{"calculate": "datum.x / 3", "as": "x"}],
+    [{"calculate": "datum.c + '-' + upper(datum.c)", "as": "z"}],
+    [{"calculate": "datum.x > 50 ? 'high' : 'low'", "as": "z"}],
+    [{"calculate": "year(datum.t) * 100 + month(datum.t)", "as": "z"}],
+    [{"filter": "datum.x > 30 && datum.c != 'a'"}],
+    [{"filter": "isValid(datum.y)"}],
+    [{"filter": {"field": "c", "oneOf": ["a", "b"]}}],
+    [{"filter": {"not": {"field": "x", "range": [10, 60]}}}],
+    [
+        {
+            "aggregate": [
+                {"op": "count", "as": "count"},
+                {"op": "mean", "field": "y", "as": "mean"},
+                {"op": "max", "field": "x", "as": "max"},
+                {"op": "distinct", "field": "x", "as": "distinct"},
+                {"op": "missing", "field": "y", "as": "missing"},
+            ],
+            "groupby": ["c"],
+        }
+    ],
+    [{"aggregate": [{"op": "sum", "field": "x", "as": "sum"}]}],
+    [{"joinaggregate": [{"op": "mean", "field": "x", "as": "mean"}], "groupby": ["c"]}],
+    [
+        {
+            "window": [{"op": "sum", "field": "x", "as": "cumsum"}],
+            "sort": [{"field": "y", "order": "descending"}],
+            "groupby": ["c"],
+        }
+    ],
+    [{"window": [{"op": "mean", "field": "x", "as": "mean"}], "frame": [-2, 2]}],
+    [{"fold": ["x", "y"]}, {"filter": "datum.value > 1"}],
+    [{"bin": True, "field": "x", "as": "binned"}],
+    [{"bin": {"maxbins": 5}, "field": "x", "as": ["start", "end"]}],
+    [{"timeUnit": "yearmonth", "field": "t", "as": "month"}],
+    [{"timeUnit": "quarter", "field": "t", "as": "quarter"}],
+    [{"timeUnit": "day", "field": "t", "as": "day"}],
+    [{"timeUnit": "hoursminutes", "field": "t", "as": "time"}],
+    [
+        {
+            "lookup": "c",
+            "from": {
+                "data": {"values": [{"k": "a", "v": "A"}, {"k": "b", "v": "B"}]},
+                "key": "k",
+                "fields": ["v"],
+            },
+            "default": "other",
+        }
+    ],
+    [
+        {"calculate": "datum.x % 7", "as": "m"},
+        {"filter": "datum.m < 3"},
+        {"aggregate": [{"op": "mean", "field": "y", "as": "y"}], "groupby": ["m", "c"]},
+    ],
+]
+
+
+# The pandas engine uses APIs deprecated in recent versions of pandas.
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize("transform", TRANSFORMS)
+def test_sql_engine(data: pd.DataFrame, engine: SQLEngine, transform: list) -> None:
+    assert all(engine.supports(normalize(t)) for t in transform)
+    expected = altair_transform.apply(data, transform)
+    out = altair_transform.apply(data, transform, engine=engine)
+    pd.testing.assert_frame_equal(
+        out.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False
+    )
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize(
+    "transform",
+    [
+        {"joinaggregate": [{"op": "sum", "field": "x", "as": "s"}], "groupby": ["c"]},
+        {
+            "window": [{"op": "mean", "field": "x", "as": "m"}],
+            "frame": [None, None],
+            "groupby": ["c"],
+        },
+        {
+            "window": [{"op": "rank", "as": "r"}],
+            "sort": [{"field": "x"}],
+            "groupby": ["c"],
+        },
+    ],
+)
+def test_sql_engine_null_keys(engine: SQLEngine, transform: dict) -> None:
+    df = pd.DataFrame({"x": [1, 2, 3, 4, 5], "c": ["a", None, "b", "a", None]})
+    expected = altair_transform.apply(df, transform)
+    out = altair_transform.apply(df, transform, engine=engine)
+    assert out.iloc[:, -1].isnull().tolist() == [False, True, False, False, True]
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+def test_sql_engine_ranking(engine: SQLEngine) -> None:
+    df = pd.DataFrame({"x": [3, 1, 3, 2, 5]})
+    transform = {
+        "window": [
+            {"op": "row_number", "as": "row_number"},
+            {"op": "rank", "as": "rank"},
+            {"op": "dense_rank", "as": "dense_rank"},
+        ],
+        "sort": [{"field": "x"}],
+    }
+    out = altair_transform.apply(df, transform, engine=engine)
+    assert out["row_number"].tolist() == [3, 1, 4, 2, 5]
+    assert out["rank"].tolist() == [3, 1, 3, 2, 5]
+    assert out["dense_rank"].tolist() == [3, 1, 3, 2, 4]
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+def test_sql_engine_percent_rank(engine: SQLEngine) -> None:
+    # As in Vega, partitions of a single row have a percent rank of NaN.
+    df = pd.DataFrame({"x": [3, 1, 3, 2, 5], "c": list("aabaa")})
+    transform = {
+        "window": [{"op": "percent_rank", "as": "p"}],
+        "sort": [{"field": "x"}],
+        "groupby": ["c"],
+    }
+    out = altair_transform.apply(df, transform, engine=engine)
+    expected = altair_transform.apply(df, transform)
+    assert np.isnan(out["p"][2])
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+def test_sqlite_math_functions(data: pd.DataFrame, monkeypatch) -> None:
+    # SQLite built without math functions is given Python implementations.
+    monkeypatch.setattr(
+        SQLiteDialect, "_has_function", staticmethod(lambda *args: False)
+    )
+    transform = [
+        {"calculate": "floor(datum.y) + ceil(datum.y) + round(datum.y)", "as": "a"},
+        {"calculate": "pow(datum.x, 2) + exp(datum.y) + datum.x % 7", "as": "b"},
+        {"calculate": "sqrt(abs(datum.y)) + log(datum.x + 1)", "as": "c"},
+        {"calculate": "atan2(datum.y, datum.x) + cos(datum.x)", "as": "d"},
+    ]
+    expected = altair_transform.apply(data, transform)
+    out = altair_transform.apply(data, transform, engine=SQLEngine("sqlite"))
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+def test_sql_engine_fallback(data: pd.DataFrame, engine: SQLEngine) -> None:
+    transform = [
+        {"calculate": "2 * datum.x", "as": "x2"},
+        {"impute": "y", "key": "x", "method": "mean"},
+        {"filter": "datum.x2 > 10"},
+    ]
+    assert not engine.supports(normalize(transform[1]))
+    expected = altair_transform.apply(data, transform)
+    out = altair_transform.apply(data, transform, engine=engine)
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+def test_sql_engine_date_strings(data: pd.DataFrame, engine: SQLEngine) -> None:
+    data["s"] = data["t"].astype(str)
+    transform = {"timeUnit": "yearmonthdate", "field": "s", "as": "date"}
+    expected = altair_transform.apply(data, transform)
+    out = altair_transform.apply(data, transform, engine=engine)
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+def test_sql_engine_data_dependent_fallback(
+    data: pd.DataFrame, engine: SQLEngine
+) -> None:
+    # Looked up fields conflicting with input columns are suffixed by pandas.
+    transform = {
+        "lookup": "c",
+        "from": {
+            "data": {"values": [{"c": "a", "x": 1}, {"c": "b", "x": 2}]},
+            "key": "c",
+            "fields": ["x"],
+        },
+    }
+    expected = altair_transform.apply(data, transform)
+    assert "x_y" in expected.columns
+    out = altair_transform.apply(data, transform, engine=engine)
+    pd.testing.assert_frame_equal(out, expected, check_dtype=False)
+
+
+def test_sql_engine_single_query(data: pd.DataFrame, engine: SQLEngine) -> None:
+    relation = engine.execute(
+        [normalize(t) for t in TRANSFORMS[-1]], engine.from_pandas(data)
+    )
+    assert relation.sql.startswith("WITH _q0 AS")
+    assert relation.sql.count("SELECT") == 4
+    engine.to_pandas(relation)
+
+
+def test_sql_engine_input_unchanged(data: pd.DataFrame, engine: SQLEngine) -> None:
+    original = data.copy()
+    altair_transform.apply(data, TRANSFORMS[0], engine=engine)
+    pd.testing.assert_frame_equal(data, original)
+
+
+@pytest.mark.parametrize(
+    "expression,sql",
+    [
+        ("datum.x + 1", '("x" + 1)'),
+        ("datum['a b'] * 0.5", '("a b" * 0.5e0)'),
+        ("!datum.flag", '(NOT COALESCE("flag" <> 0, FALSE))'),
+        ("datum.x == null", '("x" IS NULL)'),
+        (
+            "datum.s || 'none'",
+            "(CASE WHEN COALESCE(\"s\" <> '', FALSE) THEN \"s\" ELSE 'none' END)",
+        ),
+        ("pow(datum.x, 2)", 'POWER("x", 2)'),
+    ],
+)
+def test_compile_expression(expression: str, sql: str) -> None:
+    columns = {"x": "number", "a b": "number", "flag": "number", "s": "string"}
+    assert compile_expression(expression, DIALECTS["duckdb"], columns)[0] == sql
+
+
+@pytest.mark.parametrize(
+    "expression", ["datum.x.y", "random()", "test(/a/, datum.s)", "datum.x << 2"]
+)
+def test_compile_expression_unsupported(expression: str) -> None:
+    with pytest.raises(NotImplementedError):
+        compile_expression(expression, DIALECTS["sqlite"])
+
+
+def test_unknown_dialect() -> None:
+    with pytest.raises(ValueError, match="Unknown SQL dialect"):
+        SQLEngine("oracle")
@@ -0,0 +1,348 @@
+"""Explanation of the execution plan of transform pipelines."""
+import json
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional, TextIO, Tuple, Union
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from altair_transform.core import apply
+from altair_transform.extract import extract_transform
+from altair_transform.transform.cache import TransformCache, pipeline_keys
+from altair_transform.transform.chunked import fuse
+from altair_transform.transform.parallel import is_parallelizable
+from altair_transform.transform.spec import (
+    AggregateSpec,
+    CalculateSpec,
+    FilterSpec,
+    FlattenSpec,
+    FoldSpec,
+    ImputeSpec,
+    PivotSpec,
+    QuantileSpec,
+    RegressionSpec,
+    SampleSpec,
+    TransformSpec,
+    normalize_list,
+)
+from altair_transform.transform.trace import TraceEvent, trace
+from altair_transform.utils import to_dataframe
+
+__all__ = ["explain", "PlanStep"]
+
+# Estimated fraction of rows passing a filter whose selectivity is unknown.
+DEFAULT_SELECTIVITY = 1 / 3
+
+
+class PlanStep(NamedTuple):
+    """A transform of a pipeline, with its planned and actual execution."""
+
+    spec: TransformSpec
+    #: How the transform is evaluated, e.g. "row-wise expression".
+    path: str
+    #: The estimated number of output rows, or None if unknown.
+    estimated_rows: Optional[int]
+    #: The actual numbers of input and output rows, when analyzed.
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    #: The total wall-clock time in seconds, when analyzed.
+    wall_time: Optional[float] = None
+    #: The number of times the transform was applied (e.g. once per chunk).
+    calls: int = 0
+    #: The peak memory allocated by a single application, and the memory usage
+    #: of the result, in bytes, when analyzed with memory accounting.
+    peak_memory: Optional[int] = None
+    memory_usage: Optional[int] = None
+
+
+def explain(
+    chart_or_transforms: Union[alt.Chart, alt.Transform, List[alt.Transform]],
+    df: Optional[pd.DataFrame] = None,
+    analyze: bool = False,
+    validate: bool = True,
+    cache: Optional[TransformCache] = None,
+    chunksize: Optional[int] = None,
+    n_jobs: Optional[int] = None,
+    memory: bool = False,
+    file: Optional[TextIO] = None,
+) -> None:
+    """Print the execution plan of a transform pipeline.
+
+    For each normalized transform, the plan shows how it will be evaluated
+    (vectorized, or row-wise evaluation of a Vega expression; fused into a
+    chunked run; read from the cache; in parallel over groups) and an estimate
+    of the number of rows it produces.
+
+    Parameters
+    ----------
+    chart_or_transforms : alt.Chart, dict, or list
+        A chart, whose data and transforms (including those specified within
+        encodings) are explained, or a transform or list of transforms.
+    df : pd.DataFrame, optional
+        The input data. Defaults to the data of the chart. Without data, row
+        counts are not estimated.
+    analyze : bool
+        If True, run the pipeline and annotate each transform with its actual
+        row counts and timing. Default: False.
+    validate, cache, chunksize, n_jobs :
+        Options of the evaluation, as in :func:`~altair_transform.apply`.
+    memory : bool
+        If True, also report the peak memory allocated by each transform and
+        the memory usage of its result when analyzing (see
+        :func:`~altair_transform.trace`). Default: False.
+    file : file-like, optional
+        Where to print the plan. Default: ``sys.stdout``.
+
+    Example
+    -------
+    >>> import pandas as pd
+    >>> data = pd.DataFrame({'x': range(6), 'y': list('ABCABC')})
+    >>> explain([{'filter': {'field': 'y', 'equal': 'A'}},
+    ...          {'aggregate': [{'op': 'sum', 'field': 'x', 'as': 'x'}],
+    ...           'groupby': ['y']}], data)
+    Pipeline of 2 transforms over 6 rows x 2 columns
+    [0] filter {"filter": {"equal": "A", "field": "y"}}
+        path: vectorized predicate; estimated rows: 2
+    [1] aggregate {"aggregate": [{"as": "x", "field": "x", "op": "sum"}], "groupby": ["y"]}
+        path: vectorized groupby; estimated rows: 1
+    """
+    if isinstance(chart_or_transforms, alt.Chart):
+        chart = extract_transform(chart_or_transforms)
+        transform = chart.transform
+        if df is None and chart.data is not alt.Undefined:
+            df = to_dataframe(chart.data, chart)
+    else:
+        transform = chart_or_transforms
+    specs = [] if transform is alt.Undefined else normalize_list(transform, validate)
+    steps = _plan(specs, df, cache, chunksize, n_jobs)
+    result = None
+    if analyze:
+        if df is None:
+            raise ValueError("analyze=True requires input data.")
+        steps, result = _analyze(steps, df, cache, chunksize, n_jobs, memory)
+    _print_plan(steps, df, result, chunksize, n_jobs, file or sys.stdout)
+
+
+def _plan(
+    specs: List[TransformSpec],
+    df: Optional[pd.DataFrame],
+    cache: Optional[TransformCache],
+    chunksize: Optional[int],
+    n_jobs: Optional[int],
+) -> List[PlanStep]:
+    cached = 0
+    if cache is not None and df is not None:
+        cached = cache.peek(cache.fingerprint(df), pipeline_keys(specs))
+
+    fused: Dict[int, int] = {}
+    if chunksize is not None:
+        i = 0
+        for stage, (is_fused, stage_specs) in enumerate(fuse(specs)):
+            for _ in stage_specs:
+                if is_fused:
+                    fused[i] = stage
+                i += 1
+
+    estimator = _Estimator(df)
+    steps = []
+    for i, spec in enumerate(specs):
+        path = _path(spec)
+        if i < cached:
+            path = "cached"
+        elif i in fused:
+            path += f"; fused in stage {fused[i]} (chunks of {chunksize} rows)"
+        elif n_jobs is not None and n_jobs > 1 and is_parallelizable(spec):
+            path += f"; parallel over groups (n_jobs={n_jobs})"
+        steps.append(PlanStep(spec, path, estimator.update(spec)))
+    return steps
+
+
+def _path(spec: TransformSpec) -> str:
+    if isinstance(spec, CalculateSpec):
+        return "row-wise expression"
+    if isinstance(spec, FilterSpec):
+        if _has_expression(spec["filter"]):
+            return "row-wise expression"
+        return "vectorized predicate"
+    if isinstance(spec, FlattenSpec):
+        return "row-wise"
+    if isinstance(spec, (ImputeSpec, QuantileSpec, RegressionSpec)):
+        return "per-group" if spec.get("groupby") else "vectorized"
+    if isinstance(spec, SampleSpec):
+        return "random sample"
+    if spec.key in ("aggregate", "joinaggregate", "pivot", "window"):
+        return "vectorized groupby"
+    return "vectorized"
+
+
+def _has_expression(predicate: Any) -> bool:
+    if isinstance(predicate, str):
+        return True
+    if isinstance(predicate, dict):
+        for key in ("not", "and", "or"):
+            if key in predicate:
+                operands = predicate[key]
+                if not isinstance(operands, list):
+                    operands = [operands]
+                return any(_has_expression(p) for p in operands)
+    return False
+
+
+class _Estimator:
+    """Estimates of the number of rows produced by each transform."""
+
+    def __init__(self, df: Optional[pd.DataFrame]):
+        self.df = df
+        self.rows: Optional[float] = None if df is None else len(df)
+        # Distinct counts of fields restricted by filters.
+        self.restricted: Dict[str, int] = {}
+
+    def distinct(self, field: str) -> Optional[int]:
+        if field in self.restricted:
+            return self.restricted[field]
+        if self.df is None or field not in self.df.columns:
+            return None
+        return int(self.df[field].nunique(dropna=False))
+
+    def groups(self, groupby: List[str]) -> Optional[float]:
+        if self.rows is None:
+            return None
+        counts = [self.distinct(field) for field in groupby]
+        if any(count is None for count in counts):
+            return self.rows
+        return min(self.rows, float(np.prod(counts))) if self.rows else 0
+
+    def update(self, spec: TransformSpec) -> Optional[int]:
+        rows = self.rows
+        if rows is None:
+            return None
+        if isinstance(spec, FilterSpec):
+            rows *= self.selectivity(spec["filter"])
+        elif isinstance(spec, SampleSpec):
+            rows = min(rows, spec["sample"])
+        elif isinstance(spec, FoldSpec):
+            rows *= len(spec["fold"])
+        elif isinstance(spec, (AggregateSpec, PivotSpec)):
+            rows = self.groups(spec.get("groupby", [])) if rows else 0
+        elif isinstance(spec, QuantileSpec):
+            probs = spec.get("probs")
+            nprobs = len(probs) if probs else round(1 / spec.get("step", 0.01))
+            rows = self.groups(spec.get("groupby", [])) if rows else 0
+            rows = None if rows is None else rows * nprobs
+        elif isinstance(spec, RegressionSpec):
+            groups = self.groups(spec.get("groupby", [])) if rows else 0
+            # Predicted curves are sampled adaptively.
+            rows = groups if spec.get("params") else None
+        elif isinstance(spec, (FlattenSpec, ImputeSpec)):
+            # These only add rows; the output has at least as many as the input.
+            pass
+        self.rows = rows
+        return None if rows is None else int(round(rows))
+
+    def selectivity(self, predicate: Any) -> float:
+        if isinstance(predicate, dict) and "field" in predicate:
+            distinct = self.distinct(predicate["field"])
+            if distinct:
+                if "equal" in predicate:
+                    self.restricted[predicate["field"]] = 1
+                    return 1 / distinct
+                if "oneOf" in predicate:
+                    count = min(distinct, len(predicate["oneOf"]))
+                    self.restricted[predicate["field"]] = count
+                    return count / distinct
+        return DEFAULT_SELECTIVITY
+
+
+def _analyze(
+    steps: List[PlanStep],
+    df: pd.DataFrame,
+    cache: Optional[TransformCache],
+    chunksize: Optional[int],
+    n_jobs: Optional[int],
+    memory: bool,
+) -> Tuple[List[PlanStep], pd.DataFrame]:
+    events: List[TraceEvent] = []
+    specs = [step.spec for step in steps]
+    with trace(events.append, memory=memory):
+        result = apply(
+            df, specs, cache=cache, chunksize=chunksize, n_jobs=n_jobs, validate=False
+        )
+    analyzed = []
+    for step in steps:
+        # Nested events (e.g. a serial fallback within a parallel transform)
+        # are measured within the outermost one.
+        outer: List[TraceEvent] = []
+        for event in sorted(
+            (e for e in events if e.spec is step.spec), key=lambda e: e.start
+        ):
+            if not outer or event.start >= outer[-1].start + outer[-1].wall_time:
+                outer.append(event)
+        if not outer:
+            analyzed.append(step)
+            continue
+        analyzed.append(
+            step._replace(
+                rows_in=sum(e.rows_in for e in outer),
+                rows_out=sum(e.rows_out for e in outer),
+                wall_time=sum(e.wall_time for e in outer),
+                calls=len(outer),
+                peak_memory=max(e.peak_memory for e in outer) if memory else None,
+                memory_usage=sum(e.memory_usage for e in outer) if memory else None,
+            )
+        )
+    return analyzed, result
+
+
+def _print_plan(
+    steps: List[PlanStep],
+    df: Optional[pd.DataFrame],
+    result: Optional[pd.DataFrame],
+    chunksize: Optional[int],
+    n_jobs: Optional[int],
+    file: TextIO,
+) -> None:
+    header = f"Pipeline of {len(steps)} transform{'s' if len(steps) != 1 else ''}"
+    if df is not None:
+        header += f" over {len(df)} rows x {df.shape[1]} columns"
+    options = [
+        f"{name}={value}"
+        for name, value in [("chunksize", chunksize), ("n_jobs", n_jobs)]
+        if value is not None
+    ]
+    if options:
+        header += f" ({', '.join(options)})"
+    print(header, file=file)
+
+    for i, step in enumerate(steps):
+        spec = json.dumps(step.spec.to_dict(), sort_keys=True, default=str)
+        print(f"[{i}] {step.spec.key} {spec}", file=file)
+        estimate = "?" if step.estimated_rows is None else step.estimated_rows
+        print(f"    path: {step.path}; estimated rows: {estimate}", file=file)
+        if result is None:
+            continue
+        if step.calls:
+            calls = f"{step.calls} call{'s' if step.calls != 1 else ''}"
+            print(
+                f"    actual: {step.rows_in} -> {step.rows_out} rows"
+                f" in {step.wall_time * 1e3:.3f} ms ({calls})",
+                file=file,
+            )
+            if step.peak_memory is not None:
+                print(
+                    f"    memory: peak {_mib(step.peak_memory)},"
+                    f" result {_mib(step.memory_usage)}",
+                    file=file,
+                )
+        elif step.path == "cached":
+            print("    actual: read from cache", file=file)
+        else:
+            print("    actual: not measured", file=file)
+
+    if result is not None:
+        total = sum(step.wall_time or 0 for step in steps)
+        print(f"Result: {len(result)} rows in {total * 1e3:.3f} ms", file=file)
+
+
+def _mib(nbytes: Optional[int]) -> str:
+    return f"{(nbytes or 0) / 2 ** 20:.2f} MiB"
@@ -0,0 +1,94 @@
+import io
+
+import altair as alt
+import numpy as np
+import pandas as pd
+import pytest
+
+import altair_transform
+from altair_transform import TransformCache, explain
+
+
+@pytest.fixture
+def data():
+    rand = np.random.RandomState(42)
+    return pd.DataFrame(
+        {"x": rand.randint(0, 100, 30), "y": rand.randn(30), "c": list("ABC") * 10}
+    )
+
+
+TRANSFORMS = [
+    {"calculate": "2 * datum.x", "as": "x2"},
+    {"filter": {"field": "c", "oneOf": ["A", "B"]}},
+    {"aggregate": [{"op": "mean", "field": "x2", "as": "x2"}], "groupby": ["c"]},
+]
+
+
+def _explain(*args, **kwargs) -> str:
+    buf = io.StringIO()
+    explain(*args, file=buf, **kwargs)
+    return buf.getvalue()
+
+
+def test_explain(data):
+    lines = _explain(TRANSFORMS, data).splitlines()
+    assert lines[0] == "Pipeline of 3 transforms over 30 rows x 3 columns"
+    assert lines[1].startswith('[0] calculate {"as": "x2"')
+    assert lines[2] == "    path: row-wise expression; estimated rows: 30"
+    assert lines[4] == "    path: vectorized predicate; estimated rows: 20"
+    assert lines[6] == "    path: vectorized groupby; estimated rows: 2"
+
+
+def test_explain_without_data():
+    out = _explain(TRANSFORMS[:1])
+    assert out.splitlines()[0] == "Pipeline of 1 transform"
+    assert "estimated rows: ?" in out
+
+
+def test_explain_chart(data):
+    chart = alt.Chart(data).mark_bar().encode(x="sum(x):Q", y="c:N")
+    lines = _explain(chart).splitlines()
+    assert lines[0] == "Pipeline of 1 transform over 30 rows x 3 columns"
+    assert lines[1].startswith("[0] aggregate")
+
+
+def test_explain_options(data):
+    window = {"window": [{"op": "rank", "as": "r"}], "groupby": ["c"]}
+    out = _explain(TRANSFORMS + [window], data, chunksize=10, n_jobs=2)
+    assert "(chunksize=10, n_jobs=2)" in out
+    assert out.count("fused in stage 0 (chunks of 10 rows)") == 2
+    assert "parallel over groups (n_jobs=2)" in out
+
+
+def test_explain_cached(data):
+    cache = TransformCache()
+    altair_transform.apply(data, TRANSFORMS[:2], cache=cache)
+    info = cache.info()
+    out = _explain(TRANSFORMS, data, cache=cache)
+    assert out.count("path: cached") == 2
+    assert cache.info() == info
+
+
+def test_explain_analyze(data):
+    out = _explain(TRANSFORMS, data, analyze=True, chunksize=7)
+    lines = out.splitlines()
+    assert lines[3].startswith("    actual: 30 -> 30 rows in ")
+    assert lines[3].endswith("(5 calls)")
+    assert lines[6].startswith("    actual: 30 -> 20 rows in ")
+    assert lines[9].startswith("    actual: 20 -> 2 rows in ")
+    assert lines[9].endswith("(1 call)")
+    assert lines[10].startswith("Result: 2 rows in ")
+
+
+def test_explain_analyze_requires_data():
+    with pytest.raises(ValueError):
+        explain(TRANSFORMS, analyze=True)
+
+
+def test_explain_analyze_memory(data):
+    transform = [TRANSFORMS[1], {"fold": ["x", "y"]}]
+    out = _explain(transform, data, analyze=True, memory=True)
+    lines = out.splitlines()
+    assert lines[4].startswith("    memory: peak ")
+    assert lines[8].endswith(" MiB")
+    assert "memory:" not in _explain(transform, data, analyze=True)
@@ -1,68 +1,406 @@
-import altair as alt
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
 import numpy as np
 import pandas as pd
 from .visitor import visit
+from .grouping import GroupIndex, group_index, groups_of
+from .sketch import approximate_aggregate, is_approximate
+from .spec import AggregateSpec, TransformSpec, cache_options
 
 
-@visit.register(alt.AggregateTransform)
-def visit_aggregate(
-    transform: alt.AggregateTransform, df: pd.DataFrame
-) -> pd.DataFrame:
-    transform = transform.to_dict()
+@visit.register(AggregateSpec)
+def visit_aggregate(transform: AggregateSpec, df: pd.DataFrame) -> pd.DataFrame:
     groupby = transform.get("groupby", [])
+    aggregates = transform["aggregate"]
+    if groupby:
+        groups = group_index(df, groupby)
+    else:
+        # A single group, which is present even if the dataframe is empty.
+        groups = GroupIndex.single(len(df))
+    # The grouping is computed once, and shared by all operations.
+    grouped = groups.groupby(df)
+
+    fields = []
+    for aggregate in aggregates:
+        field = aggregate.get("field", df.columns[0])
+        if field == "*" and field not in df.columns:
+            field = df.columns[0]
+        fields.append(field)
+
+    # Statistics of each field are computed in a single pass of named
+    # aggregation, and operations are derived from them. Statistics of
+    # contiguous groups of sorted data are computed by segmented reductions.
+    stats: Dict[Tuple[str, str], str] = {}
+    for aggregate, field in zip(aggregates, fields):
+        if _is_derived(aggregate["op"]):
+            for stat in OP_STATS[aggregate["op"]]:
+                stats.setdefault((field, stat), f"_{len(stats)}")
+    table = _stat_table(df, groups, grouped, stats)
+
+    def stat(field: str, name: str) -> pd.Series:
+        return table[stats[field, name]]
+
     agg_cols = {}
-    for aggregate in transform["aggregate"]:
+    bootstrapped: Dict[str, pd.DataFrame] = {}
+    for aggregate, field in zip(aggregates, fields):
         op = aggregate["op"]
-        col = aggregate["as"]
-        field = aggregate.get("field", df.columns[0])
+        if _is_derived(op):
+            result = DERIVED[op](lambda name: stat(field, name))
+        elif op in ("ci0", "ci1"):
+            if field not in bootstrapped:
+                bootstrapped[field] = bootstrap_ci(df, groups, field)
+            result = bootstrapped[field][op]
+        elif is_approximate(op):
+            result = approximate_aggregate(df, groups, field, op)
+        elif op == "values":
+            result = group_records(df, groups)
+        elif op in ("argmin", "argmax"):
+            result = arg_records(df, groups, field, op)
+        else:
+            result = grouped[field].aggregate(AGG_REPLACEMENTS.get(op, op))
+        # Results hold all groups, in order.
+        agg_cols[aggregate["as"]] = result.set_axis(groups.index)
 
-        if op == "argmin":
+    df = pd.DataFrame(agg_cols)
+    return df.reset_index() if groupby else df.reset_index(drop=True)
 
-            def op(col, df=df):
-                return df.loc[col.idxmin()].to_dict()
 
-        elif op == "argmax":
+def _stat_table(
+    df: pd.DataFrame,
+    groups: GroupIndex,
+    grouped: Any,
+    stats: Dict[Tuple[str, str], str],
+) -> pd.DataFrame:
+    """Compute the statistics of each group, as columns named by ``stats``."""
+    reduced = {}
+    for (field, stat), name in stats.items():
+        if stat == "nunique":
+            reduced[name] = _nunique(df[field], groups)
+        elif groups.can_reduce(df[field], stat):
+            reduced[name] = groups.reduce(df[field], stat)
+    named = {
+        name: (field, STATS[stat])
+        for (field, stat), name in stats.items()
+        if name not in reduced
+    }
+    table = grouped.agg(**named) if named else pd.DataFrame(index=groups.index)
+    for name, values in reduced.items():
+        table[name] = values
+    return table
 
-            def op(col, df=df):
-                return df.loc[col.idxmax()].to_dict()
 
-        else:
-            op = AGG_REPLACEMENTS.get(op, op)
+def _nunique(values: pd.Series, groups: GroupIndex) -> np.ndarray:
+    # The number of distinct (group, value) pairs of valid values in each
+    # group. Unlike nunique in named aggregation, this handles empty groups.
+    value_codes, uniques = pd.factorize(values)
+    valid = (groups.codes >= 0) & (value_codes >= 0)
+    width = max(len(uniques), 1)
+    pairs = np.unique(groups.codes[valid].astype(np.int64) * width + value_codes[valid])
+    return np.bincount(pairs // width, minlength=len(groups))
 
-        if field == "*" and field not in df.columns:
-            field = df.columns[0]
 
-        if op == "values":
-            if groupby:
-                agg_cols[col] = df.groupby(groupby).apply(
-                    lambda x: x.to_dict(orient="records")
-                )
-            else:
-                agg_cols[col] = [df.to_dict(orient="records")]
-        else:
-            if groupby:
-                agg_cols[col] = df.groupby(groupby)[field].aggregate(op)
-            else:
-                agg_cols[col] = [df[field].aggregate(op)]
+def _to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    # Equivalent to df.to_dict(orient="records"), zipping column lists.
+    if df.shape[1] == 0:
+        return [{} for _ in range(len(df))]
+    columns = [df.iloc[:, i].tolist() for i in range(df.shape[1])]
+    return [dict(zip(df.columns, row)) for row in zip(*columns)]
 
-    df = pd.DataFrame(agg_cols)
-    if groupby:
-        df = df.reset_index()
-    return df
+
+def group_records(df: pd.DataFrame, grouped: Any) -> pd.Series:
+    """Return the rows of each group as a list of records.
+
+    The rows are stably sorted by group once and converted to records in a
+    single call, and the list of records is then sliced at group boundaries,
+    rather than converting a sub-dataframe per group.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The data.
+    grouped : DataFrameGroupBy or GroupIndex
+        The grouping of ``df``.
+
+    Returns
+    -------
+    records : pd.Series
+        The list of records of each group, in row order, indexed by the group
+        keys.
+    """
+    groups = groups_of(grouped)
+    records = _to_records(df.take(groups.order))
+    result = np.empty(len(groups), dtype=object)
+    for i, (start, end) in enumerate(zip(groups.bounds[:-1], groups.bounds[1:])):
+        result[i] = records[start:end]
+    return pd.Series(result, index=groups.index)
+
+
+def arg_records(
+    df: pd.DataFrame, grouped: Any, field: str, op: str = "argmin"
+) -> pd.Series:
+    """Return the row of each group with the minimum or maximum of a field.
+
+    Rather than searching each group in Python, rows with a valid value are
+    stably sorted by group and by the rank of their value, and the first
+    (argmin) or last (argmax) row of each group is selected. The winning rows
+    are taken at once, and converted to records in bulk. As with
+    ``Series.idxmin`` and ``Series.idxmax``, ties go to the first row.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The data.
+    grouped : DataFrameGroupBy or GroupIndex
+        The grouping of ``df``.
+    field : str
+        The field to minimize or maximize.
+    op : str
+        Either "argmin" or "argmax".
+
+    Returns
+    -------
+    records : pd.Series
+        The row of each group, as a dict, indexed by the group keys. Groups
+        without a valid value of the field are None.
+    """
+    groups = groups_of(grouped)
+    codes, index = groups.codes, groups.index
+    rank = df[field].rank(method="dense").to_numpy()
+    positions = np.flatnonzero((codes >= 0) & ~np.isnan(rank))
+    if op == "argmax":
+        # The last of the maxima in reversed order is the first in row order.
+        positions = positions[::-1]
+    positions = positions[np.lexsort((rank[positions], codes[positions]))]
+    sorted_codes = codes[positions]
+    selected = np.ones(len(positions), dtype=bool)
+    boundary = sorted_codes[1:] != sorted_codes[:-1]
+    if op == "argmax":
+        selected[:-1] = boundary
+    else:
+        selected[1:] = boundary
+    winners = positions[selected]
+
+    result = np.full(len(index), None, dtype=object)
+    records = np.empty(len(winners), dtype=object)
+    records[:] = _to_records(df.take(winners))
+    result[codes[winners]] = records
+    return pd.Series(result, index=index)
+
+
+def _is_derived(op: str) -> bool:
+    """Return True if the operation is derived from named aggregation statistics."""
+    if op in ("ci0", "ci1") and _ci_options.get()["method"] == "bootstrap":
+        return False
+    return op in DERIVED and not is_approximate(op)
+
+
+# Statistics computed by named aggregation, and the operations derived from them.
+STATS: Dict[str, Any] = {
+    "count": "count",
+    "max": "max",
+    "mean": "mean",
+    "median": "median",
+    "min": "min",
+    "nunique": "nunique",
+    "prod": "prod",
+    "q1": lambda x: x.quantile(0.25),
+    "q3": lambda x: x.quantile(0.75),
+    "size": "size",
+    "sum": "sum",
+    "var": "var",
+}
+
+Stat = Callable[[str], pd.Series]
+
+
+def _variancep(stat: Stat) -> pd.Series:
+    # The population variance of a single value is zero.
+    count = stat("count")
+    return (stat("var") * (count - 1) / count).mask(count == 1, 0.0)
+
+
+def _t_interval(stat: Stat, bound: int) -> pd.Series:
+    from scipy import stats
+
+    count = stat("count")
+    alpha = _ci_options.get()["alpha"]
+    quantile = stats.t.ppf(1 - alpha / 2, count - 1)
+    delta = quantile * np.sqrt(stat("var") / count)
+    return stat("mean") + bound * delta
+
+
+DERIVED: Dict[str, Callable[[Stat], pd.Series]] = {
+    "average": lambda stat: stat("mean"),
+    "ci0": lambda stat: _t_interval(stat, -1),
+    "ci1": lambda stat: _t_interval(stat, 1),
+    "count": lambda stat: stat("size"),
+    "distinct": lambda stat: stat("nunique"),
+    "max": lambda stat: stat("max"),
+    "mean": lambda stat: stat("mean"),
+    "median": lambda stat: stat("median"),
+    "min": lambda stat: stat("min"),
+    "missing": lambda stat: stat("size") - stat("count"),
+    "product": lambda stat: stat("prod"),
+    "q1": lambda stat: stat("q1"),
+    "q3": lambda stat: stat("q3"),
+    "stderr": lambda stat: np.sqrt(stat("var") / stat("count")),
+    "stdev": lambda stat: np.sqrt(stat("var")),
+    "stdevp": lambda stat: np.sqrt(_variancep(stat)),
+    "sum": lambda stat: stat("sum"),
+    "valid": lambda stat: stat("count"),
+    "variance": lambda stat: stat("var"),
+    "variancep": _variancep,
+}
+
+OP_STATS: Dict[str, List[str]] = {
+    "average": ["mean"],
+    "ci0": ["mean", "var", "count"],
+    "ci1": ["mean", "var", "count"],
+    "count": ["size"],
+    "distinct": ["nunique"],
+    "max": ["max"],
+    "mean": ["mean"],
+    "median": ["median"],
+    "min": ["min"],
+    "missing": ["size", "count"],
+    "product": ["prod"],
+    "q1": ["q1"],
+    "q3": ["q3"],
+    "stderr": ["var", "count"],
+    "stdev": ["var"],
+    "stdevp": ["var", "count"],
+    "sum": ["sum"],
+    "valid": ["count"],
+    "variance": ["var"],
+    "variancep": ["var", "count"],
+}
+
+
+# Options of the ci0 and ci1 aggregates; see confidence_intervals(). They are
+# local to each thread (and asyncio task), and never modified in place.
+_ci_options: ContextVar[Dict[str, Any]] = ContextVar(
+    "ci_options", default={"method": "t", "alpha": 0.05, "samples": 1000, "seed": None}
+)
+
+
+@contextmanager
+def confidence_intervals(
+    method: str = "t",
+    alpha: float = 0.05,
+    samples: int = 1000,
+    seed: Optional[int] = None,
+) -> Iterator[None]:
+    """Set how ci0 and ci1 aggregates are computed for the duration of a with block.
+
+    Parameters
+    ----------
+    method : str
+        "t" (default) computes the Student's t confidence interval of the mean
+        in closed form. "bootstrap" computes, as in Vega, the quantiles of the
+        means of resamples of each group.
+    alpha : float
+        The confidence interval is at level 1 - alpha. Default: 0.05.
+    samples : int
+        The number of bootstrap resamples. Default: 1000.
+    seed : int, optional
+        The seed of bootstrap resampling, for reproducible intervals.
+    """
+    if method not in ("t", "bootstrap"):
+        raise ValueError(f"Unknown confidence interval method: {method!r}")
+    if samples < 1:
+        raise ValueError(f"samples must be positive; got {samples}")
+    token = _ci_options.set(
+        dict(method=method, alpha=alpha, samples=samples, seed=seed)
+    )
+    try:
+        yield
+    finally:
+        _ci_options.reset(token)
+
+
+def ci_options() -> Dict[str, Any]:
+    """Return a copy of the current options of ci0 and ci1 aggregates."""
+    return dict(_ci_options.get())
+
+
+@cache_options("ci")
+def _ci_cache_options(spec: TransformSpec) -> Optional[Dict[str, Any]]:
+    if not spec.ops() & {"ci0", "ci1"}:
+        return {}
+    options = ci_options()
+    if options["method"] == "bootstrap" and options["seed"] is None:
+        # Resamples without a seed differ between evaluations.
+        return None
+    return options
+
+
+def bootstrap_ci(df: pd.DataFrame, grouped: Any, field: str) -> pd.DataFrame:
+    """Return bootstrap confidence intervals of the mean of a field in each group.
+
+    The valid values are sorted by group once; each batch of resamples then
+    draws indices within every group at once, and the means of all groups are
+    computed with a weighted bincount. The bounds are the alpha / 2 and
+    1 - alpha / 2 quantiles of the resampled means.
+
+    Returns
+    -------
+    bounds : pd.DataFrame
+        The "ci0" and "ci1" columns, indexed by the group keys.
+    """
+    options = _ci_options.get()
+    alpha, samples = options["alpha"], options["samples"]
+    rng = np.random.default_rng(options["seed"])
+    groups = groups_of(grouped)
+    index = groups.index
+    values = df[field].to_numpy(dtype=float)
+    positions = groups.order[~np.isnan(values[groups.order])]
+    values, codes = values[positions], groups.codes[positions]
+
+    counts = np.bincount(codes, minlength=len(index))
+    starts = np.cumsum(counts) - counts
+    row_starts, row_counts = starts[codes], counts[codes]
+
+    # Resample in batches of about a million values.
+    batch = max(1, 2 ** 20 // max(len(values), 1))
+    means = np.empty((samples, len(index)))
+    for first in range(0, samples, batch):
+        size = min(batch, samples - first)
+        draws = row_starts + (rng.random((size, len(values))) * row_counts).astype(int)
+        offsets = np.arange(size)[:, None] * len(index)
+        sums = np.bincount(
+            (codes + offsets).ravel(),
+            weights=values[draws].ravel(),
+            minlength=size * len(index),
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means[first : first + size] = sums.reshape(size, len(index)) / counts
+    bounds = np.quantile(means, [alpha / 2, 1 - alpha / 2], axis=0)
+    return pd.DataFrame({"ci0": bounds[0], "ci1": bounds[1]}, index=index)
 
 
-def confidence_interval(x: np.ndarray, level: float):
+def confidence_interval(x: pd.Series) -> Tuple[float, float]:
+    """Return the confidence interval of the mean of a series."""
+    if _ci_options.get()["method"] == "bootstrap":
+        df = pd.DataFrame({"x": x.to_numpy()})
+        group = pd.Categorical(np.zeros(len(x), dtype=int), categories=[0])
+        bounds = bootstrap_ci(df, df.groupby(group, observed=False), "x")
+        return bounds["ci0"].iloc[0], bounds["ci1"].iloc[0]
     from scipy import stats
 
-    return stats.t.interval(level, len(x) - 1, loc=x.mean(), scale=x.sem())
+    x = x.dropna()
+    delta = stats.t.ppf(1 - _ci_options.get()["alpha"] / 2, len(x) - 1) * x.sem()
+    return x.mean() - delta, x.mean() + delta
 
 
 AGG_REPLACEMENTS = {
     "argmin": "idxmin",
     "argmax": "idxmax",
     "average": "mean",
-    "ci0": lambda x: confidence_interval(x, 0.05),
-    "ci1": lambda x: confidence_interval(x, 0.95),
+    "ci0": lambda x: confidence_interval(x)[0],
+    "ci1": lambda x: confidence_interval(x)[1],
+    "count": "size",
     "distinct": "nunique",
     "stderr": "sem",
     "stdev": "std",
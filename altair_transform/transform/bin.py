@@ -1,11 +1,11 @@
 """Implementation of the bin transform."""
 from typing import Tuple
 
-import altair as alt
 import pandas as pd
 import numpy as np
 
 from .visitor import visit
+from .spec import BinSpec
 from .vega_utils import calculate_bins
 
 
@@ -22,12 +22,11 @@ def _cut(series: pd.Series, edges: np.ndarray) -> Tuple[pd.Series, pd.Series]:
     return bins1, bins2
 
 
-@visit.register(alt.BinTransform)
-def visit_bin(transform: alt.BinTransform, df: pd.DataFrame) -> pd.DataFrame:
-    transform_dct: dict = transform.to_dict()
-    col = transform_dct["as"]
-    bin_ = {} if transform_dct["bin"] is True else transform_dct["bin"]
-    field = transform_dct["field"]
+@visit.register(BinSpec)
+def visit_bin(transform: BinSpec, df: pd.DataFrame) -> pd.DataFrame:
+    col = transform["as"]
+    bin_ = {} if transform["bin"] is True else dict(transform["bin"])
+    field = transform["field"]
 
     bin_.setdefault("extent", [df[field].min(), df[field].max()])
     bins = calculate_bins(**bin_)
@@ -0,0 +1,215 @@
+"""Cache of intermediate results of transform pipelines.
+
+Charts built over the same data often share a prefix of their transform lists
+(for example the same filter and calculate followed by different aggregates).
+:class:`TransformCache` stores the frame produced by each prefix of a pipeline,
+keyed by a fingerprint of the input data and the normalized prefix, so that
+later pipelines can resume from the longest prefix already computed.
+"""
+
+from collections import OrderedDict
+import json
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .spec import TransformSpec
+from ..utils.data import DataType, ChartType, fingerprint
+
+__all__ = ["TransformCache", "CacheInfo"]
+
+CacheKey = Tuple[str, Tuple[str, ...]]
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    nbytes: int
+    max_bytes: int
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, pd.DataFrame):
+        return fingerprint(obj, exact=True)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return repr(obj)
+
+
+def spec_key(spec: TransformSpec) -> Optional[str]:
+    """Return a canonical string identifying the results of a transform.
+
+    The key includes the current options affecting the results, from
+    :meth:`TransformSpec.cache_key`. Returns None if the results are not
+    reproducible (for example, of a sample), and must not be cached.
+    """
+    options = spec.cache_key()
+    if options is None:
+        return None
+    key = [type(spec).__name__, spec.to_dict(), options]
+    return json.dumps(key, sort_keys=True, default=_json_default)
+
+
+def pipeline_keys(specs: List[TransformSpec]) -> List[str]:
+    """Return the keys of the longest prefix of a pipeline that can be cached."""
+    keys = []
+    for spec in specs:
+        key = spec_key(spec)
+        if key is None:
+            break
+        keys.append(key)
+    return keys
+
+
+class TransformCache:
+    """LRU cache of intermediate pipeline results, bounded by memory.
+
+    Parameters
+    ----------
+    max_bytes : int
+        The maximum total size of cached frames, as measured by
+        ``DataFrame.memory_usage(deep=True)``. Least recently used entries
+        are evicted once this is exceeded. Default: 256 MB.
+    sample_size : int
+        The approximate number of rows hashed to fingerprint input data.
+        See :func:`altair_transform.utils.fingerprint`. Default: 1000.
+    exact : bool
+        If True, fingerprint input data by hashing all of its contents, so that
+        in-place modification of the data is always detected. Default: False.
+
+    Example
+    -------
+    >>> import pandas as pd
+    >>> import altair_transform
+    >>> cache = TransformCache()
+    >>> data = pd.DataFrame({'x': range(5), 'y': list('ABCAB')})
+    >>> transform = [{'filter': 'datum.x > 0'},
+    ...              {'aggregate': [{'op': 'sum', 'field': 'x', 'as': 'x'}]}]
+    >>> _ = altair_transform.apply(data, transform, cache=cache)
+    >>> _ = altair_transform.apply(data, transform[:1], cache=cache)
+    >>> info = cache.info()
+    >>> info.hits, info.misses, info.entries
+    (1, 1, 2)
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 2 ** 20,
+        sample_size: int = 1000,
+        exact: bool = False,
+    ):
+        self.max_bytes = max_bytes
+        self.sample_size = sample_size
+        self.exact = exact
+        self._entries: "OrderedDict[CacheKey, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._nbytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def info(self) -> CacheInfo:
+        """Return hit/miss statistics and the current size of the cache."""
+        return CacheInfo(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            entries=len(self._entries),
+            nbytes=self._nbytes,
+            max_bytes=self.max_bytes,
+        )
+
+    def fingerprint(self, data: DataType, context: Optional[ChartType] = None) -> str:
+        """Return the fingerprint used to identify input data."""
+        return fingerprint(
+            data, context, sample_size=self.sample_size, exact=self.exact
+        )
+
+    def lookup(
+        self, fingerprint: str, keys: List[str]
+    ) -> Tuple[int, Optional[pd.DataFrame]]:
+        """Find the longest cached prefix of a pipeline.
+
+        Parameters
+        ----------
+        fingerprint : str
+            The fingerprint of the pipeline's input data.
+        keys : list of str
+            The keys of the pipeline's transforms, from :func:`spec_key`.
+
+        Returns
+        -------
+        n, df : int, pd.DataFrame or None
+            The number of transforms covered by the cached result, and a copy
+            of that result. If no prefix is cached, returns ``(0, None)``.
+        """
+        for n in range(len(keys), 0, -1):
+            key = (fingerprint, tuple(keys[:n]))
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return n, self._entries[key][0].copy()
+        self._misses += 1
+        return 0, None
+
+    def peek(self, fingerprint: str, keys: List[str]) -> int:
+        """Return the length of the longest cached prefix of a pipeline.
+
+        Unlike :meth:`lookup`, this does not update statistics or the order
+        of eviction.
+        """
+        for n in range(len(keys), 0, -1):
+            if (fingerprint, tuple(keys[:n])) in self._entries:
+                return n
+        return 0
+
+    def put(self, fingerprint: str, keys: List[str], df: pd.DataFrame) -> None:
+        """Store the result of a pipeline prefix."""
+        key = (fingerprint, tuple(keys))
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            return
+        self._discard(key)
+        self._entries[key] = (df.copy(), nbytes)
+        self._nbytes += nbytes
+        while self._nbytes > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+            self._evictions += 1
+
+    def invalidate(
+        self, data: Optional[DataType] = None, context: Optional[ChartType] = None
+    ) -> None:
+        """Remove cached results.
+
+        Parameters
+        ----------
+        data : pd.DataFrame, dict, or alt.Data, optional
+            If specified, remove only results computed from this data.
+            Otherwise, remove all results.
+        context : dict or alt.Chart, optional
+            The chart containing top-level datasets, used for named data.
+        """
+        if data is None:
+            keys: List[CacheKey] = list(self._entries)
+        else:
+            fingerprint = self.fingerprint(data, context)
+            keys = [key for key in self._entries if key[0] == fingerprint]
+        for key in keys:
+            self._discard(key)
+
+    def clear(self) -> None:
+        """Remove all cached results and reset statistics."""
+        self.invalidate()
+        self._hits = self._misses = self._evictions = 0
+
+    def _discard(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._nbytes -= entry[1]
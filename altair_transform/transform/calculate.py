@@ -1,15 +1,16 @@
-import altair as alt
 import pandas as pd
 from .visitor import visit
+from .spec import CalculateSpec
 from ..vegaexpr import eval_vegajs
 
 
-@visit.register(alt.CalculateTransform)
-def visit_calculate(
-    transform: alt.CalculateTransform, df: pd.DataFrame
-) -> pd.DataFrame:
-    transform = transform.to_dict()
+@visit.register(CalculateSpec)
+def visit_calculate(transform: CalculateSpec, df: pd.DataFrame) -> pd.DataFrame:
     col = transform["as"]
     calc = transform["calculate"]
-    df[col] = df.apply(lambda datum: eval_vegajs(calc, datum), axis=1)
+    if df.empty:
+        # df.apply cannot infer the shape of the result without any rows.
+        df[col] = pd.Series(index=df.index, dtype=object)
+    else:
+        df[col] = df.apply(lambda datum: eval_vegajs(calc, datum), axis=1)
     return df
@@ -0,0 +1,172 @@
+"""Chunked execution of streamable transforms.
+
+Row-local transforms (calculate, filter, timeUnit, fold, flatten, and bin with
+an explicit extent) can be evaluated on any subset of rows independently. In
+chunked mode, consecutive runs of such transforms are fused: fixed-size chunks
+of rows are pushed through the whole run in one loop, so that intermediate
+columns exist only for one chunk at a time, and results are concatenated only
+before the next pipeline breaker (aggregate, window, pivot, impute, etc.).
+A sample transform terminates a fused run, using reservoir sampling over the
+chunks.
+"""
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .spec import (
+    BinSpec,
+    CalculateSpec,
+    FilterSpec,
+    FlattenSpec,
+    FoldSpec,
+    SampleSpec,
+    TimeUnitSpec,
+    TransformSpec,
+)
+from .visitor import visit
+
+__all__ = ["is_streamable", "fuse", "visit_fused", "visit_chunks", "concat_chunks"]
+
+# Transforms whose output has a fresh RangeIndex.
+_RESETS_INDEX = (FilterSpec, FlattenSpec, FoldSpec)
+
+
+def is_streamable(spec: TransformSpec) -> bool:
+    """Return True if the transform can be evaluated chunk by chunk."""
+    if isinstance(spec, BinSpec):
+        return isinstance(spec["bin"], dict) and "extent" in spec["bin"]
+    return isinstance(
+        spec,
+        (CalculateSpec, FilterSpec, FlattenSpec, FoldSpec, SampleSpec, TimeUnitSpec),
+    )
+
+
+def fuse(specs: List[TransformSpec]) -> List[Tuple[bool, List[TransformSpec]]]:
+    """Split a pipeline into stages.
+
+    Returns
+    -------
+    stages : list of (fused, specs) tuples
+        Each stage is either a fused run of streamable transforms, ending at
+        the latest with a sample transform, or a single pipeline breaker.
+    """
+    stages: List[Tuple[bool, List[TransformSpec]]] = []
+    run: List[TransformSpec] = []
+    for spec in specs:
+        if is_streamable(spec):
+            run.append(spec)
+            if isinstance(spec, SampleSpec):
+                stages.append((True, run))
+                run = []
+        else:
+            if run:
+                stages.append((True, run))
+                run = []
+            stages.append((False, [spec]))
+    if run:
+        stages.append((True, run))
+    return stages
+
+
+def visit_fused(
+    specs: List[TransformSpec], df: pd.DataFrame, chunksize: int
+) -> pd.DataFrame:
+    """Evaluate a run of streamable transforms over chunks of rows."""
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be positive; got {chunksize}")
+    # A trailing sample transform assigns the index of its result itself.
+    reset_index = not isinstance(specs[-1], SampleSpec) and any(
+        isinstance(spec, _RESETS_INDEX) for spec in specs
+    )
+    # Always process at least one chunk, so that empty input yields the
+    # correct output columns.
+    chunks = (
+        df.iloc[start : start + chunksize].copy()
+        for start in range(0, max(len(df), 1), chunksize)
+    )
+    return concat_chunks(visit_chunks(specs, chunks), reset_index)
+
+
+def visit_chunks(
+    specs: List[TransformSpec], chunks: Iterable[pd.DataFrame]
+) -> Iterator[pd.DataFrame]:
+    """Lazily evaluate a fused run of streamable transforms on each chunk.
+
+    If the run ends with a sample transform, the chunks are consumed and a
+    single chunk containing the sample is produced.
+    """
+    steps = specs
+    if specs and isinstance(specs[-1], SampleSpec):
+        steps = specs[:-1]
+        reservoir = _Reservoir(specs[-1]["sample"])
+        for chunk in visit_chunks(steps, chunks):
+            reservoir.add(chunk)
+        if reservoir.data is not None:
+            reset_index = any(isinstance(spec, _RESETS_INDEX) for spec in steps)
+            yield reservoir.result(reset_index)
+        return
+    for chunk in chunks:
+        for spec in steps:
+            chunk = visit(spec, chunk)
+        yield chunk
+
+
+def concat_chunks(chunks: Iterable[pd.DataFrame], reset_index: bool) -> pd.DataFrame:
+    """Concatenate transformed chunks into a single dataframe."""
+    chunks = list(chunks)
+    # Empty chunks are dropped so they do not affect the dtypes of the result.
+    chunks = [chunk for chunk in chunks if len(chunk)] or chunks[:1]
+    if not chunks:
+        return pd.DataFrame()
+    if len(chunks) == 1:
+        return chunks[0].reset_index(drop=True) if reset_index else chunks[0]
+    return pd.concat(chunks, ignore_index=reset_index)
+
+
+class _Reservoir:
+    """Uniform random sample of fixed size over a stream of chunks."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.seen = 0
+        self.data: Optional[pd.DataFrame] = None
+        self.positions = np.zeros(0, dtype=int)
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        positions = self.seen + np.arange(len(chunk))
+        self.seen += len(chunk)
+        if self.data is None:
+            self.data = chunk.iloc[:0]
+
+        # Fill the reservoir with the first rows of the stream.
+        nfill = max(0, min(self.size - len(self.data), len(chunk)))
+        if nfill:
+            self.data = pd.concat([self.data, chunk.iloc[:nfill]])
+            self.positions = np.concatenate([self.positions, positions[:nfill]])
+        if nfill == len(chunk):
+            return
+
+        # Algorithm R: row t replaces a random slot with probability size / (t + 1).
+        # When several rows of a chunk pick the same slot, the last one wins.
+        rest = positions[nfill:]
+        slots = (np.random.random(len(rest)) * (rest + 1)).astype(int)
+        rows = nfill + np.arange(len(rest))
+        accepted = slots < self.size
+        slots, rows = slots[accepted][::-1], rows[accepted][::-1]
+        slots, first = np.unique(slots, return_index=True)
+        rows = rows[first]
+        if not len(rows):
+            return
+        keep = np.ones(len(self.data), dtype=bool)
+        keep[slots] = False
+        self.data = pd.concat([self.data[keep], chunk.iloc[rows]])
+        self.positions = np.concatenate([self.positions[keep], positions[rows]])
+
+    def result(self, reset_index: bool) -> pd.DataFrame:
+        assert self.data is not None
+        order = np.argsort(self.positions, kind="mergesort")
+        data = self.data.iloc[order]
+        if reset_index:
+            data.index = self.positions[order]
+        return data
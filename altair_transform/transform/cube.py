@@ -0,0 +1,101 @@
+"""Rollup cubes of aggregate states for interactive drill-down.
+
+Dashboards often evaluate the same aggregate over the same data with
+different groupby fields. An :class:`AggregateCube` computes the mergeable
+partial states (see :mod:`.partial`) of a set of aggregates once, grouped by
+all of a declared set of dimensions; an aggregate transform grouped by any
+subset of the dimensions is then served by rolling up the states of the cube,
+whose size is the number of combinations of dimension values, rather than by
+rescanning the rows of the data.
+
+Operations whose state is as large as their data (median, q1, q3, ci0, ci1
+and values), or which depend on the order of rows (argmin and argmax), are not
+kept in the cube: aggregates using them, or grouped by fields which are not
+dimensions of the cube, are evaluated on the original data.
+"""
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from ..utils import to_dataframe
+from .partial import PartialAggregate
+from .spec import AggregateSpec, normalize
+from .visitor import visit
+
+__all__ = ["AggregateCube"]
+
+# Statistics which are not rolled up by a cube.
+_EXCLUDED_STATS = {"samples", "values", "argmin", "argmax"}
+
+
+class AggregateCube:
+    """Aggregate states over all combinations of a set of dimensions.
+
+    Parameters
+    ----------
+    data : pd.DataFrame, dict, or alt.Data
+        The data to aggregate.
+    dimensions : list of str
+        The fields by which aggregates served by the cube may be grouped.
+    aggregates : list of dict
+        Aggregate field definitions with "op", and optionally "field", as in
+        the aggregate transform, whose statistics are kept by the cube.
+
+    Example
+    -------
+    >>> cube = AggregateCube(df, ["region", "product"],  # doctest: +SKIP
+    ...                      [{"op": "sum", "field": "sales"}])
+    >>> cube.apply({"aggregate": [{"op": "sum", "field": "sales", "as": "total"}],
+    ...             "groupby": ["region"]})  # doctest: +SKIP
+    """
+
+    def __init__(
+        self, data: Any, dimensions: List[str], aggregates: List[Dict[str, Any]]
+    ):
+        self.data = to_dataframe(data)
+        self.dimensions = list(dimensions)
+        kept = [
+            {**aggregate, "as": f"_{i}"}
+            for i, aggregate in enumerate(aggregates)
+            if _keeps(aggregate, self.dimensions)
+        ]
+        self._state = PartialAggregate(kept, self.dimensions, dropna=False)
+        self._state.update(self.data)
+
+    def __repr__(self) -> str:
+        return f"AggregateCube(dimensions={self.dimensions!r})"
+
+    def supports(self, transform: Any) -> bool:
+        """Return True if the aggregate transform is served from the cube."""
+        spec = normalize(transform)
+        if not isinstance(spec, AggregateSpec):
+            return False
+        return self._state.can_rollup(spec.get("groupby", []), spec["aggregate"])
+
+    def apply(self, transform: Any) -> pd.DataFrame:
+        """Apply an aggregate transform to the data of the cube.
+
+        Parameters
+        ----------
+        transform : dict or alt.AggregateTransform
+            The aggregate transform.
+
+        Returns
+        -------
+        df_transformed : pd.DataFrame
+            The aggregated data, rolled up from the cube if possible, and
+            otherwise computed from the data.
+        """
+        spec = normalize(transform)
+        if not isinstance(spec, AggregateSpec):
+            raise ValueError(f"AggregateCube only applies aggregate transforms: {spec}")
+        groupby = spec.get("groupby", [])
+        if self._state.can_rollup(groupby, spec["aggregate"]):
+            return self._state.rollup(groupby, spec["aggregate"]).finalize()
+        return visit(spec, self.data)
+
+
+def _keeps(aggregate: Dict[str, Any], dimensions: List[str]) -> bool:
+    partial = PartialAggregate([{**aggregate, "as": "_"}], dimensions)
+    required = partial._required(pd.DataFrame(columns=["_"]))
+    return not any(_EXCLUDED_STATS.intersection(names) for names in required.values())
@@ -1,22 +1,23 @@
 from functools import singledispatch
-from typing import Any
+from typing import Any, Callable, Dict
 
 import altair as alt
 import numpy as np
 import pandas as pd
 from .visitor import visit
+from .spec import FilterSpec
 from ..vegaexpr import eval_vegajs
 
 
-@visit.register(alt.FilterTransform)
-def visit_filter(transform: alt.FilterTransform, df: pd.DataFrame) -> pd.DataFrame:
-    mask = eval_predicate(transform.filter, df).astype(bool)
+@visit.register(FilterSpec)
+def visit_filter(transform: FilterSpec, df: pd.DataFrame) -> pd.DataFrame:
+    mask = eval_predicate(transform["filter"], df).astype(bool)
     return df[mask].reset_index(drop=True)
 
 
-def get_column(df: pd.DataFrame, predicate: Any) -> pd.Series:
+def get_column(df: pd.DataFrame, predicate: dict) -> pd.Series:
     """Get the transformed column from the predicate."""
-    if predicate.timeUnit is not alt.Undefined:
+    if "timeUnit" in predicate:
         raise NotImplementedError("timeUnit Transform in Predicates")
     return df[eval_value(predicate["field"])]
 
@@ -26,10 +27,9 @@ def eval_predicate(predicate: Any, df: pd.DataFrame) -> pd.Series:
     raise NotImplementedError(f"Evaluating predicate of type {type(predicate)}")
 
 
-@singledispatch
-def eval_dict(predicate: dict, df: pd.DataFrame) -> pd.Series:
-    transform = alt.FilterTrasform({"filter": predicate})
-    return eval_predicate(transform.filter, df)
+@eval_predicate.register(alt.SchemaBase)
+def eval_schemabase_predicate(predicate: alt.SchemaBase, df: pd.DataFrame) -> pd.Series:
+    return eval_predicate(predicate.to_dict(validate=False), df)
 
 
 @eval_predicate.register(str)
@@ -37,14 +37,20 @@ def eval_string(predicate: str, df: pd.DataFrame) -> pd.Series:
     return df.apply(lambda datum: eval_vegajs(predicate, datum), axis=1)
 
 
-@eval_predicate.register(alt.FieldEqualPredicate)
-def eval_field_equal(predicate: alt.FieldEqualPredicate, df: pd.DataFrame) -> pd.Series:
-    return get_column(df, predicate) == eval_value(predicate.equal)
+@eval_predicate.register(dict)
+def eval_dict(predicate: dict, df: pd.DataFrame) -> pd.Series:
+    for key, func in PREDICATES.items():
+        if key in predicate:
+            return func(predicate, df)
+    raise NotImplementedError(f"Predicate with properties {sorted(predicate)}")
+
 
+def eval_field_equal(predicate: dict, df: pd.DataFrame) -> pd.Series:
+    return get_column(df, predicate) == eval_value(predicate["equal"])
 
-@eval_predicate.register(alt.FieldRangePredicate)
-def eval_field_range(predicate: alt.FieldRangePredicate, df: pd.DataFrame) -> pd.Series:
-    min_, max_ = [eval_value(val) for val in predicate.range]
+
+def eval_field_range(predicate: dict, df: pd.DataFrame) -> pd.Series:
+    min_, max_ = [eval_value(val) for val in predicate["range"]]
     column = get_column(df, predicate)
     if min_ is None:
         min_ = column.min()
@@ -53,58 +59,66 @@ def eval_field_range(predicate: alt.FieldRangePredicate, df: pd.DataFrame) -> pd
     return column.between(min_, max_, inclusive=True)
 
 
-@eval_predicate.register(alt.FieldOneOfPredicate)
-def eval_field_oneof(predicate: alt.FieldOneOfPredicate, df: pd.DataFrame) -> pd.Series:
-    options = [eval_value(val) for val in predicate.oneOf]
+def eval_field_oneof(predicate: dict, df: pd.DataFrame) -> pd.Series:
+    options = [eval_value(val) for val in predicate["oneOf"]]
     return get_column(df, predicate).isin(options)
 
 
-@eval_predicate.register(alt.FieldLTPredicate)
-def eval_field_lt(predicate: alt.FieldLTPredicate, df: pd.DataFrame) -> pd.Series:
-    return get_column(df, predicate) < eval_value(predicate.lt)
+def eval_field_lt(predicate: dict, df: pd.DataFrame) -> pd.Series:
+    return get_column(df, predicate) < eval_value(predicate["lt"])
 
 
-@eval_predicate.register(alt.FieldLTEPredicate)
-def eval_field_lte(predicate: alt.FieldLTEPredicate, df: pd.DataFrame) -> pd.Series:
-    return get_column(df, predicate) <= eval_value(predicate.lte)
+def eval_field_lte(predicate: dict, df: pd.DataFrame) -> pd.Series:
+    return get_column(df, predicate) <= eval_value(predicate["lte"])
 
 
-@eval_predicate.register(alt.FieldGTPredicate)
-def eval_field_gt(predicate: alt.FieldGTPredicate, df: pd.DataFrame) -> pd.Series:
-    return get_column(df, predicate) > eval_value(predicate.gt)
+def eval_field_gt(predicate: dict, df: pd.DataFrame) -> pd.Series:
+    return get_column(df, predicate) > eval_value(predicate["gt"])
 
 
-@eval_predicate.register(alt.FieldGTEPredicate)
-def eval_field_gte(predicate: alt.FieldGTEPredicate, df: pd.DataFrame) -> pd.Series:
-    return get_column(df, predicate) >= eval_value(predicate.gte)
+def eval_field_gte(predicate: dict, df: pd.DataFrame) -> pd.Series:
+    return get_column(df, predicate) >= eval_value(predicate["gte"])
 
 
-@eval_predicate.register(alt.LogicalNotPredicate)
-def eval_logical_not(predicate: alt.LogicalNotPredicate, df: pd.DataFrame) -> pd.Series:
+def eval_logical_not(predicate: dict, df: pd.DataFrame) -> pd.Series:
     return ~eval_predicate(predicate["not"], df)
 
 
-@eval_predicate.register(alt.LogicalAndPredicate)
-def eval_logical_and(predicate: alt.LogicalAndPredicate, df: pd.DataFrame) -> pd.Series:
+def eval_logical_and(predicate: dict, df: pd.DataFrame) -> pd.Series:
     return np.logical_and.reduce([eval_predicate(p, df) for p in predicate["and"]])
 
 
-@eval_predicate.register(alt.LogicalOrPredicate)
-def eval_logical_or(predicate: alt.LogicalOrPredicate, df: pd.DataFrame) -> pd.Series:
+def eval_logical_or(predicate: dict, df: pd.DataFrame) -> pd.Series:
     return np.logical_or.reduce([eval_predicate(p, df) for p in predicate["or"]])
 
 
+# Predicates in JSON form are identified by their distinguishing property.
+PREDICATES: Dict[str, Callable[[dict, pd.DataFrame], pd.Series]] = {
+    "not": eval_logical_not,
+    "and": eval_logical_and,
+    "or": eval_logical_or,
+    "equal": eval_field_equal,
+    "range": eval_field_range,
+    "oneOf": eval_field_oneof,
+    "lt": eval_field_lt,
+    "lte": eval_field_lte,
+    "gt": eval_field_gt,
+    "gte": eval_field_gte,
+}
+
+
 @singledispatch
 def eval_value(value: Any) -> Any:
     return value
 
 
+@eval_value.register(dict)
 @eval_value.register(alt.DateTime)
-def eval_datetime(value: alt.DateTime) -> pd.Series:
+def eval_datetime(value: Any) -> pd.Series:
     # TODO: implement datetime conversion & comparison
     raise NotImplementedError("Evaluating alt.DateTime object")
 
 
 @eval_value.register(alt.SchemaBase)
-def eval_schemabase(value: alt.SchemaBase) -> dict:
-    return value.to_dict()
+def eval_schemabase(value: alt.SchemaBase) -> Any:
+    return eval_value(value.to_dict())
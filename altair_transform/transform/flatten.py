@@ -1,11 +1,10 @@
-import altair as alt
 import pandas as pd
 from .visitor import visit
+from .spec import FlattenSpec
 
 
-@visit.register(alt.FlattenTransform)
-def visit_flatten(transform: alt.FlattenTransform, df: pd.DataFrame) -> pd.DataFrame:
-    transform = transform.to_dict()
+@visit.register(FlattenSpec)
+def visit_flatten(transform: FlattenSpec, df: pd.DataFrame) -> pd.DataFrame:
 
     fields = transform["flatten"]
     out = transform.get("as", [])
@@ -19,7 +18,9 @@ def visit_flatten(transform: alt.FlattenTransform, df: pd.DataFrame) -> pd.DataF
         return df
 
     to_flatten = df[fields]
-    others = df[[c for c in df.columns if c not in out]]
+    others = df[[c for c in df.columns if c not in out]].reset_index(drop=True)
+    if not len(df):
+        return pd.DataFrame(columns=out).join(others)
 
     def flatten_row(row):
         flattened = to_flatten.iloc[row].apply(pd.Series).T
@@ -1,11 +1,10 @@
-import altair as alt
 import pandas as pd
 from .visitor import visit
+from .spec import FoldSpec
 
 
-@visit.register(alt.FoldTransform)
-def visit_fold(transform: alt.FoldTransform, df: pd.DataFrame) -> pd.DataFrame:
-    transform = transform.to_dict()
+@visit.register(FoldSpec)
+def visit_fold(transform: FoldSpec, df: pd.DataFrame) -> pd.DataFrame:
     fold = transform["fold"]
     var_name, value_name = transform.get("as", ("key", "value"))
     value_vars = [c for c in df.columns if c in fold]
@@ -22,7 +21,7 @@ def visit_fold(transform: alt.FoldTransform, df: pd.DataFrame) -> pd.DataFrame:
     )
     return (
         pd.merge(melted, dfi, on=[index_name] + id_vars, how="left")
-        .sort_values(index_name)
+        .sort_values(index_name, kind="mergesort")
         .drop(index_name, axis=1)
         .reset_index(drop=True)
     )
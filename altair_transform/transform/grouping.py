@@ -0,0 +1,421 @@
+"""Group codes of rows, aligned with the groups of aggregate results.
+
+Pipelines often group by the same fields several times, for example in a
+joinaggregate followed by a window and an aggregate. Within
+:func:`group_cache`, which is active while a list of transforms is evaluated,
+the :class:`GroupIndex` of a dataframe by a set of fields is computed once,
+and shared by the transforms grouping by the same fields: grouping by the
+cached codes does not factorize the keys again. Cached indices are dropped by
+:func:`invalidate` once a transform filters or reorders rows, or overwrites
+a groupby field.
+
+Sorted input is grouped without hashing: if the rows are sorted by the
+groupby fields (which is checked cheaply, or known from the pipeline, see
+:func:`group_cache`), groups are the runs of equal keys. The rows of each
+group are then contiguous, and statistics of all groups are computed by
+segmented reductions (``np.add.reduceat`` and the like) in aggregate,
+joinaggregate and window transforms.
+"""
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .spec import (
+    AggregateSpec,
+    BinSpec,
+    CalculateSpec,
+    FilterSpec,
+    JoinAggregateSpec,
+    TimeUnitSpec,
+    TransformSpec,
+    WindowSpec,
+)
+
+__all__ = [
+    "GroupIndex",
+    "group_codes",
+    "group_index",
+    "groups_of",
+    "group_cache",
+    "invalidate",
+]
+
+# Transforms whose result has the rows of their input, in the same order.
+_KEEPS_ROWS = (BinSpec, CalculateSpec, JoinAggregateSpec, TimeUnitSpec, WindowSpec)
+
+# Transforms whose result has rows of their input, in the same order.
+_KEEPS_ORDER = _KEEPS_ROWS + (FilterSpec,)
+
+# Statistics computed by segmented reductions, and the dtypes they support.
+SEGMENTED_STATS = ("count", "size", "sum", "mean", "min", "max", "var")
+_SEGMENTED_DTYPES = (np.dtype("int64"), np.dtype("float64"))
+
+
+def group_codes(grouped: Any) -> Tuple[np.ndarray, pd.Index]:
+    """Return the position of the group of each row in the grouped result.
+
+    ``grouped.ngroup()`` numbers the observed groups only, while results of
+    grouping by categorical keys with ``observed=False`` also hold unobserved
+    categories; in that case, rows are located in the result index.
+
+    Parameters
+    ----------
+    grouped : DataFrameGroupBy
+        The grouping of a dataframe.
+
+    Returns
+    -------
+    codes : np.ndarray
+        The position of the group of each row in ``index``, or -1 for rows in
+        no group (with null keys).
+    index : pd.Index
+        The group keys, as in the index of ``grouped.size()``.
+    """
+    index = grouped.size().index
+    if grouped.ngroups == len(index):
+        codes = grouped.ngroup().to_numpy(dtype=float)
+        return np.where(np.isnan(codes), -1, codes).astype(np.intp), index
+    keys, df = grouped.keys, grouped.obj
+    if isinstance(keys, str):
+        keys = [keys]
+    if not isinstance(keys, list):
+        values: Any = keys
+    elif len(keys) == 1:
+        values = df[keys[0]]
+    else:
+        values = pd.MultiIndex.from_frame(df[keys])
+    return index.get_indexer(values), index
+
+
+class GroupIndex:
+    """The factorized group keys of the rows of a dataframe.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        The position of the group of each row in ``index``, or -1 for rows in
+        no group (with null keys).
+    index : pd.Index
+        The group keys, sorted, as in the index of ``grouped.size()``.
+    bounds : np.ndarray, optional
+        If the rows of each group are contiguous and in the order of the
+        groups, and every row is in a non-empty group, the start of each group
+        and the end of the last one. See :attr:`contiguous`.
+    """
+
+    def __init__(
+        self, codes: np.ndarray, index: pd.Index, bounds: Optional[np.ndarray] = None
+    ):
+        self.codes = codes
+        self.index = index
+        self.contiguous = bounds is not None
+        self._order = np.arange(len(codes)) if self.contiguous else None
+        self._bounds = bounds
+        self._groups: Optional[pd.Categorical] = None
+
+    @classmethod
+    def from_frame(
+        cls, df: pd.DataFrame, groupby: List[str], presorted: bool = False
+    ) -> "GroupIndex":
+        """Factorize the groupby fields of a dataframe.
+
+        If the rows are sorted by the groupby fields, groups are found as runs
+        of equal keys. With ``presorted=True``, the order is assumed rather
+        than checked.
+        """
+        groupby = list(groupby)
+        starts = _sorted_runs(df, groupby, presorted)
+        if starts is None:
+            return cls(*group_codes(df.groupby(groupby, sort=True, observed=False)))
+        bounds = np.append(starts, len(df))
+        codes = np.repeat(np.arange(len(starts)), np.diff(bounds))
+        keys = df[groupby].take(starts)
+        if len(groupby) == 1:
+            index = pd.Index(keys[groupby[0]], name=groupby[0])
+        else:
+            index = pd.MultiIndex.from_frame(keys)
+        return cls(codes, index, bounds)
+
+    @classmethod
+    def single(cls, n: int) -> "GroupIndex":
+        """A single group of n rows, which is present even if n is zero."""
+        bounds = np.array([0, n]) if n else None
+        return cls(np.zeros(n, dtype=np.intp), pd.RangeIndex(1), bounds)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def order(self) -> np.ndarray:
+        """The positions of the rows in a group, stably sorted by group."""
+        if self._order is None:
+            positions = np.flatnonzero(self.codes >= 0)
+            self._order = positions[np.argsort(self.codes[positions], kind="stable")]
+        return self._order
+
+    @property
+    def bounds(self) -> np.ndarray:
+        """The start of the rows of each group in :attr:`order`, and their end."""
+        if self._bounds is None:
+            counts = np.bincount(self.codes[self.order], minlength=len(self))
+            self._bounds = np.append(0, np.cumsum(counts))
+        return self._bounds
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """The number of rows in each group."""
+        return np.diff(self.bounds)
+
+    def take(self, positions: np.ndarray) -> "GroupIndex":
+        """Return the group index of the given rows, with the same groups."""
+        return GroupIndex(self.codes[positions], self.index)
+
+    def groupby(self, df: pd.DataFrame, observed: bool = False, **kwargs: Any) -> Any:
+        """Group the rows of a dataframe by their codes.
+
+        Results are indexed by the positions of the groups in :attr:`index`,
+        and hold all groups unless ``observed`` is true; see :meth:`relabel`.
+        """
+        if self._groups is None:
+            categories = pd.RangeIndex(len(self))
+            self._groups = pd.Categorical.from_codes(self.codes, categories)
+        groups = self._groups
+        if observed:
+            # Rather than observed=True, which does not sort groups in pandas<2.
+            groups = groups.remove_unused_categories()
+        return df.groupby(groups, observed=False, **kwargs)
+
+    def relabel(self, result: Any) -> Any:
+        """Replace the group positions leading the index of a result by their keys."""
+        positions = np.asarray(result.index.get_level_values(0), dtype=np.intp)
+        keys = self.index.take(positions)
+        if result.index.nlevels == 1:
+            return result.set_axis(keys)
+        levels = [keys.get_level_values(i) for i in range(keys.nlevels)]
+        levels += [
+            result.index.get_level_values(i) for i in range(1, result.index.nlevels)
+        ]
+        names = list(keys.names) + list(result.index.names[1:])
+        return result.set_axis(pd.MultiIndex.from_arrays(levels, names=names))
+
+    def broadcast(self, result: pd.Series) -> np.ndarray:
+        """Return the value of the group of each row, or null for rows in no group.
+
+        ``result`` holds the value of each group, in the order of :attr:`index`.
+        """
+        if self.contiguous:
+            return np.repeat(np.asarray(result), self.sizes)
+        values = pd.Series(result.to_numpy()).set_axis(pd.RangeIndex(len(self)))
+        return values.reindex(self.codes).to_numpy()
+
+    def can_reduce(self, values: pd.Series, stat: str) -> bool:
+        """Return True if :meth:`reduce` computes a statistic of the values."""
+        return (
+            self.contiguous
+            and stat in SEGMENTED_STATS
+            and (stat == "size" or values.dtype in _SEGMENTED_DTYPES)
+        )
+
+    def reduce(self, values: pd.Series, stat: str) -> np.ndarray:
+        """Compute a statistic of the values of each contiguous group.
+
+        As with pandas, null values are skipped, and the sum of a group of
+        null values is zero.
+        """
+        starts, sizes = self.bounds[:-1], self.sizes
+        if stat == "size":
+            return sizes
+        x = values.to_numpy()
+        valid = ~np.isnan(x) if x.dtype.kind == "f" else np.ones(len(x), dtype=bool)
+        count = np.add.reduceat(valid, starts, dtype=np.int64)
+        if stat == "count":
+            return count
+        if stat in ("min", "max"):
+            func = np.fmin if stat == "min" else np.fmax
+            return func.reduceat(x, starts)
+        total = np.add.reduceat(np.where(valid, x, 0), starts)
+        if stat == "sum":
+            return total
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            if stat == "mean":
+                return mean
+            deviations = np.where(valid, x - np.repeat(mean, sizes), 0)
+            squares = np.add.reduceat(deviations ** 2, starts)
+            return np.where(count > 1, squares / (count - 1), np.nan)
+
+    def accumulate(self, values: pd.Series, stat: str) -> np.ndarray:
+        """Compute a cumulative "sum", "count" or "mean" within contiguous groups.
+
+        As with ``rolling(..., min_periods=1)``, null values are skipped, and
+        the sum and mean are null until the first valid value of a group.
+        """
+        x = values.to_numpy(dtype=float)
+        valid = ~np.isnan(x)
+        counts = _segmented_cumsum(valid.astype(np.int64), self.bounds)
+        if stat == "count":
+            return counts.astype(float)
+        sums = _segmented_cumsum(np.where(valid, x, 0.0), self.bounds)
+        if stat == "mean":
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return np.where(counts > 0, sums / counts, np.nan)
+        return np.where(counts > 0, sums, np.nan)
+
+
+def _segmented_cumsum(x: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    # Cumulative sums restarting at the start of each segment.
+    totals = np.cumsum(x)
+    before = np.append(0, totals)[bounds[:-1]]
+    return totals - np.repeat(before, np.diff(bounds))
+
+
+def _sorted_runs(
+    df: pd.DataFrame, groupby: List[str], presorted: bool = False
+) -> Optional[np.ndarray]:
+    """Return the start of each run of equal keys, if rows are sorted by the keys.
+
+    Returns None if the rows are not sorted, or if keys are null or
+    categorical (whose groups include unobserved categories).
+    """
+    if not groupby or len(df) == 0:
+        return None
+    columns = [df[field] for field in groupby]
+    if any(isinstance(column.dtype, pd.CategoricalDtype) for column in columns):
+        return None
+    # Most unsorted data is rejected at the first decrease of the first field.
+    if not presorted and not columns[0].is_monotonic_increasing:
+        return None
+    # Whether the keys of each row equal those of the previous row so far.
+    equal = np.ones(len(df) - 1, dtype=bool)
+    try:
+        for i, column in enumerate(columns):
+            values = column.to_numpy()
+            previous, current = values[:-1], values[1:]
+            if not presorted and i > 0 and (equal & (previous > current)).any():
+                return None
+            equal &= previous == current
+    except TypeError:
+        # Keys of mixed types are not ordered.
+        return None
+    starts = np.append(0, np.flatnonzero(~equal) + 1)
+    # Rows equal the first row of their run, so nulls are found at run starts.
+    if any(column.take(starts).hasnans for column in columns):
+        return None
+    return starts
+
+
+def groups_of(grouped: Any) -> GroupIndex:
+    """Return the group index of a grouping, which may be a GroupIndex itself."""
+    if isinstance(grouped, GroupIndex):
+        return grouped
+    return GroupIndex(*group_codes(grouped))
+
+
+class GroupCache:
+    """The group indices of the data of a pipeline, and the order of its rows.
+
+    Attributes
+    ----------
+    indices : dict
+        The data (by weak reference), its row index and its group index, by
+        groupby fields.
+    sorted_by : tuple of str
+        Fields by which the rows of the data are known to be sorted.
+    """
+
+    def __init__(self, sorted_by: Sequence[str] = ()):
+        self.indices: Dict[
+            Tuple[str, ...], Tuple["weakref.ref[pd.DataFrame]", pd.Index, GroupIndex]
+        ] = {}
+        self.sorted_by = tuple(sorted_by)
+
+
+# The caches of the pipelines being evaluated in this context, innermost last.
+_caches: ContextVar[Tuple[GroupCache, ...]] = ContextVar("group_caches", default=())
+
+
+def group_index(df: pd.DataFrame, groupby: List[str]) -> GroupIndex:
+    """Return the group index of a dataframe, shared within :func:`group_cache`."""
+    key = tuple(groupby)
+    caches = _caches.get()
+    if not caches:
+        return GroupIndex.from_frame(df, groupby)
+    cache = caches[-1]
+    if key in cache.indices:
+        frame, rows, groups = cache.indices[key]
+        if frame() is df and rows.equals(df.index):
+            return groups
+    presorted = cache.sorted_by[: len(key)] == key
+    groups = GroupIndex.from_frame(df, groupby, presorted=presorted)
+    cache.indices[key] = (weakref.ref(df), df.index, groups)
+    return groups
+
+
+@contextmanager
+def group_cache(sorted_by: Optional[Sequence[str]] = None) -> Iterator[GroupCache]:
+    """Share group indices between the transforms evaluated within the block.
+
+    The cache is local to the current thread (or asyncio task).
+
+    Parameters
+    ----------
+    sorted_by : list of str, optional
+        Fields by which the rows of the input data are sorted, in ascending
+        order. This is trusted rather than checked.
+    """
+    cache = GroupCache(sorted_by or ())
+    token = _caches.set(_caches.get() + (cache,))
+    try:
+        yield cache
+    finally:
+        _caches.reset(token)
+
+
+def _outputs(spec: TransformSpec) -> List[str]:
+    if isinstance(spec, JoinAggregateSpec):
+        return [aggregate["as"] for aggregate in spec["joinaggregate"]]
+    if isinstance(spec, WindowSpec):
+        return [w["as"] for w in spec["window"]]
+    outputs = spec.get("as", [])
+    if isinstance(spec, BinSpec) and isinstance(outputs, str):
+        # visit_bin also writes the end of the bins to "<as>_end".
+        return [outputs, outputs + "_end"]
+    return [outputs] if isinstance(outputs, str) else list(outputs)
+
+
+def invalidate(spec: TransformSpec, df: Optional[pd.DataFrame] = None) -> None:
+    """Update the group indices and order of the pipeline after a transform.
+
+    Cached group indices which the transform may have changed are dropped.
+    The others are kept for ``df``, the result of the transform, if given.
+    The rows of aggregate results are sorted by their groupby fields, and
+    transforms keeping the order of rows keep the fields they do not write.
+    """
+    caches = _caches.get()
+    if not caches:
+        return
+    cache = caches[-1]
+    outputs = set(_outputs(spec))
+    if isinstance(spec, _KEEPS_ROWS):
+        for key in [key for key in cache.indices if outputs.intersection(key)]:
+            del cache.indices[key]
+        if df is not None:
+            for key, (_, rows, groups) in cache.indices.items():
+                cache.indices[key] = (weakref.ref(df), rows, groups)
+    else:
+        cache.indices.clear()
+    if isinstance(spec, AggregateSpec):
+        cache.sorted_by = tuple(spec.get("groupby", []))
+    elif isinstance(spec, _KEEPS_ORDER):
+        sorted_by = []
+        for field in cache.sorted_by:
+            if field in outputs:
+                break
+            sorted_by.append(field)
+        cache.sorted_by = tuple(sorted_by)
+    else:
+        cache.sorted_by = ()
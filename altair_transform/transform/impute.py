@@ -1,12 +1,12 @@
-import altair as alt
 import numpy as np
 import pandas as pd
 from .visitor import visit
+from .spec import ImputeSpec
+from .grouping import group_index
 
 
-@visit.register(alt.ImputeTransform)
-def visit_impute(transform: alt.ImputeTransform, df: pd.DataFrame) -> pd.DataFrame:
-    transform = transform.to_dict()
+@visit.register(ImputeSpec)
+def visit_impute(transform: ImputeSpec, df: pd.DataFrame) -> pd.DataFrame:
 
     field = transform["impute"]
     key = transform["key"]
@@ -15,15 +15,7 @@ def visit_impute(transform: alt.ImputeTransform, df: pd.DataFrame) -> pd.DataFra
     if frame:
         raise NotImplementedError("Impute Transform frame argument.")
 
-    # Keyvals are the values at which the field is imputed.
-    keyvals = transform.get("keyvals", [])
-    if isinstance(keyvals, dict):
-        start = keyvals.get("start", 0)
-        stop = keyvals["stop"]
-        step = keyvals.get("step", np.sign(stop - start))
-        keyvals = np.arange(start, stop, step)
-    keyvals = np.sort(np.unique(np.concatenate([keyvals, df[key].values])))
-    keyvals = pd.Series(keyvals, name=key)
+    keyvals = pd.Series(impute_keyvals(transform, df), name=key)
 
     groupby = transform.get("groupby", [])
 
@@ -46,8 +38,21 @@ def visit_impute(transform: alt.ImputeTransform, df: pd.DataFrame) -> pd.DataFra
         return imputed
 
     if groupby:
-        imputed = df.groupby(groupby).apply(_impute).reset_index(drop=True)
+        # Unused categories of the groupby fields would form empty groups.
+        grouped = group_index(df, groupby).groupby(df, observed=True)
+        imputed = grouped.apply(_impute).reset_index(drop=True)
     else:
         imputed = _impute(df)
 
     return imputed
+
+
+def impute_keyvals(transform: ImputeSpec, df: pd.DataFrame) -> np.ndarray:
+    """Return the sorted values of the key at which the field is imputed."""
+    keyvals = transform.get("keyvals", [])
+    if isinstance(keyvals, dict):
+        start = keyvals.get("start", 0)
+        stop = keyvals["stop"]
+        step = keyvals.get("step", np.sign(stop - start))
+        keyvals = np.arange(start, stop, step)
+    return np.sort(np.unique(np.concatenate([keyvals, df[transform["key"]].values])))
@@ -1,28 +1,38 @@
-import altair as alt
 import pandas as pd
 from .visitor import visit
+from .spec import JoinAggregateSpec
 from .aggregate import AGG_REPLACEMENTS
+from .grouping import GroupIndex, group_index
+from .sketch import approximate_aggregate, is_approximate
 
 
-@visit.register(alt.JoinAggregateTransform)
-def visit_joinaggregate(
-    transform: alt.JoinAggregateTransform, df: pd.DataFrame
-) -> pd.DataFrame:
-    transform = transform.to_dict()
+@visit.register(JoinAggregateSpec)
+def visit_joinaggregate(transform: JoinAggregateSpec, df: pd.DataFrame) -> pd.DataFrame:
     groupby = transform.get("groupby")
+    if groupby is not None:
+        groups = group_index(df, groupby)
+        grouped = groups.groupby(df)
     for aggregate in transform["joinaggregate"]:
         op = aggregate["op"]
-        field = aggregate["field"]
+        field = aggregate.get("field", "*")
         col = aggregate["as"]
 
-        op = AGG_REPLACEMENTS.get(op, op)
         if field == "*" and field not in df.columns:
             field = df.columns[0]
 
+        if is_approximate(op):
+            if groupby is None:
+                single = GroupIndex.single(len(df))
+                df[col] = approximate_aggregate(df, single, field, op).iloc[0]
+            else:
+                df[col] = groups.broadcast(approximate_aggregate(df, groups, field, op))
+            continue
+
+        op = AGG_REPLACEMENTS.get(op, op)
         if groupby is None:
             df[col] = df[field].aggregate(op)
+        elif isinstance(op, str) and groups.can_reduce(df[field], op):
+            df[col] = groups.broadcast(groups.reduce(df[field], op))
         else:
-            result = df.groupby(groupby)[field].aggregate(op)
-            result.name = col
-            df = df.join(result, on=groupby)
+            df[col] = groups.broadcast(grouped[field].aggregate(op))
     return df
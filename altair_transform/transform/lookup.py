@@ -1,22 +1,20 @@
 from typing import Union
 
-import altair as alt
 import pandas as pd
 from .visitor import visit
+from .spec import LookupSpec
 from ..utils import to_dataframe
 
 
-@visit.register(alt.LookupTransform)
-def visit_lookup(transform: alt.LookupTransform, df: pd.DataFrame) -> pd.DataFrame:
-    with alt.data_transformers.enable(consolidate_datasets=False):
-        transform = transform.to_dict()
+@visit.register(LookupSpec)
+def visit_lookup(transform: LookupSpec, df: pd.DataFrame) -> pd.DataFrame:
     lookup_data = transform["from"]
     data = lookup_data["data"]
     key = lookup_data["key"]
-    fields = lookup_data["fields"]
+    fields = lookup_data.get("fields")
 
     other_df = to_dataframe(data)
-    if fields is alt.Undefined:
+    if fields is None:
         fields = list(other_df.columns)
 
     cols_to_use = fields
@@ -0,0 +1,189 @@
+"""Parallel execution of grouped transforms on a process pool.
+
+Regression, quantile, impute and window transforms with a groupby evaluate
+each group independently, serially in a single thread. In parallel mode, the
+group keys are factorized, and the groups are divided into contiguous ranges
+of group codes holding roughly equal numbers of rows. Each partition is
+transformed in a worker process, and the results are concatenated in partition
+order, which reproduces the (sorted) group order of serial evaluation; window
+results are returned in the order of the input rows.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from . import sharedmem, sketch
+from .aggregate import ci_options, confidence_intervals
+from .grouping import group_index
+from .impute import impute_keyvals
+from .spec import ImputeSpec, QuantileSpec, RegressionSpec, TransformSpec, WindowSpec
+from .visitor import visit
+
+__all__ = ["is_parallelizable", "visit_parallel"]
+
+_PARALLEL_TYPES = (ImputeSpec, QuantileSpec, RegressionSpec, WindowSpec)
+
+_executors: Dict[int, ProcessPoolExecutor] = {}
+
+
+def is_parallelizable(spec: TransformSpec) -> bool:
+    """Return True if the transform can be evaluated in parallel over groups."""
+    return isinstance(spec, _PARALLEL_TYPES) and bool(spec.get("groupby"))
+
+
+def get_executor(n_jobs: int) -> Executor:
+    """Return a process pool with n_jobs workers, shared across calls."""
+    if n_jobs < 1:
+        raise ValueError(f"n_jobs must be positive; got {n_jobs}")
+    if n_jobs not in _executors:
+        _executors[n_jobs] = ProcessPoolExecutor(max_workers=n_jobs)
+    return _executors[n_jobs]
+
+
+def partition_groups(codes: np.ndarray, nparts: int) -> List[np.ndarray]:
+    """Divide rows into partitions of contiguous ranges of group codes.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        The group code of each row, in sorted group order. Rows with negative
+        codes belong to no group and are dropped.
+    nparts : int
+        The maximum number of partitions.
+
+    Returns
+    -------
+    partitions : list of np.ndarray
+        The (increasing) positions of the rows in each non-empty partition.
+    """
+    valid = codes >= 0
+    sizes = np.bincount(codes[valid], minlength=codes.max() + 1 if len(codes) else 0)
+    starts = np.cumsum(sizes) - sizes
+    part_of_group = np.minimum(starts * nparts // max(valid.sum(), 1), nparts - 1)
+    part_of_row = np.where(valid, part_of_group[np.maximum(codes, 0)], -1)
+    partitions = [np.flatnonzero(part_of_row == part) for part in range(nparts)]
+    return [positions for positions in partitions if len(positions)]
+
+
+def visit_parallel(
+    transform: TransformSpec,
+    df: pd.DataFrame,
+    n_jobs: int,
+    transport: str = "shared_memory",
+) -> pd.DataFrame:
+    """Evaluate a grouped transform in parallel over partitions of the groups.
+
+    Parameters
+    ----------
+    transform : TransformSpec
+        The transform, which must satisfy :func:`is_parallelizable`.
+    df : pd.DataFrame
+        The input data.
+    n_jobs : int
+        The number of worker processes.
+    transport : {"shared_memory", "pickle"}
+        How partitions and results are sent between processes. With
+        "shared_memory" (default), fixed-width columns are passed through
+        shared memory blocks (see :mod:`.sharedmem`), falling back to
+        "pickle" where shared memory is not supported.
+    """
+    if transport not in ("shared_memory", "pickle"):
+        raise ValueError(f"Unknown transport: {transport!r}")
+    executor = get_executor(n_jobs)
+    groupby = list(transform["groupby"])
+    codes = group_index(df, groupby).codes
+    is_window = isinstance(transform, WindowSpec)
+    if is_window and ((codes < 0).any() or not df.index.is_unique):
+        # Window results are aligned to the input rows by index.
+        return visit(transform, df)
+    partitions = partition_groups(codes, n_jobs)
+    if len(partitions) < 2:
+        return visit(transform, df)
+    if isinstance(transform, ImputeSpec):
+        # The imputed keys are those of the whole dataframe, not the partition.
+        keyvals = impute_keyvals(transform, df).tolist()
+        transform = ImputeSpec({**transform, "keyvals": keyvals})
+
+    try:
+        if transport == "shared_memory" and sharedmem.available():
+            results = _run_shared(executor, transform, df, partitions)
+        else:
+            futures = [
+                executor.submit(
+                    _visit_partition, transform, df.iloc[positions], _options()
+                )
+                for positions in partitions
+            ]
+            results = [future.result() for future in futures]
+    except BrokenProcessPool:
+        _executors.pop(n_jobs, None)
+        raise
+    if is_window:
+        return pd.concat(results).loc[df.index]
+    return pd.concat(results, ignore_index=True)
+
+
+def _run_shared(
+    executor: Executor,
+    transform: TransformSpec,
+    df: pd.DataFrame,
+    partitions: List[np.ndarray],
+) -> List[pd.DataFrame]:
+    # Blocks are owned by this process: the names of result blocks are chosen
+    # here, so that every block is unlinked even if a worker fails.
+    handles: List[sharedmem.SharedFrame] = []
+    names = [f"alttx_{uuid.uuid4().hex[:16]}" for _ in partitions]
+    try:
+        for positions in partitions:
+            handles.append(sharedmem.share_frame(df.iloc[positions]))
+        futures = [
+            executor.submit(_visit_shared, transform, handle, name, _options())
+            for handle, name in zip(handles, names)
+        ]
+        results = []
+        for future in futures:
+            handle = future.result()
+            results.append(sharedmem.open_frame(handle))
+            sharedmem.unlink(handle.name)
+        return results
+    finally:
+        for name in [handle.name for handle in handles] + names:
+            sharedmem.unlink(name)
+
+
+# Workers evaluate transforms with the sketch and confidence interval options
+# of the calling process.
+
+
+def _options() -> Dict[str, Any]:
+    return {"sketch": sketch.options(), "ci": ci_options()}
+
+
+@contextmanager
+def _with_options(options: Dict[str, Any]) -> Iterator[None]:
+    with sketch.approximate(**options["sketch"]):
+        with confidence_intervals(**options["ci"]):
+            yield
+
+
+def _visit_partition(
+    transform: TransformSpec, df: pd.DataFrame, options: Dict[str, Any]
+) -> pd.DataFrame:
+    with _with_options(options):
+        return visit(transform, df)
+
+
+def _visit_shared(
+    transform: TransformSpec,
+    handle: sharedmem.SharedFrame,
+    name: str,
+    options: Dict[str, Any],
+) -> sharedmem.SharedFrame:
+    with _with_options(options):
+        result = visit(transform, sharedmem.open_frame(handle))
+    return sharedmem.share_frame(result, name=name)
@@ -0,0 +1,541 @@
+"""Mergeable partial states for aggregate operations.
+
+An aggregate over a dataset that arrives in pieces is evaluated by computing,
+for each piece and each group, a small set of statistics that can be merged
+across pieces: row counts, valid counts, sums, means and sums of squared
+deviations (merged with Chan's parallel update), minima and maxima, exact sets
+of distinct values, and so on. Aggregate operations are computed from the
+merged statistics once all pieces have been seen.
+
+Operations without such a decomposition (median, q1, q3, ci0, ci1) keep the
+values of their field in each group, so memory is bounded by the size of that
+column rather than by the full dataset. Within ``with approximate():`` (see
+:mod:`.sketch`), distinct counts and quantiles are instead computed from
+mergeable sketches of bounded size.
+"""
+from copy import deepcopy
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .aggregate import AGG_REPLACEMENTS
+from .grouping import group_codes
+from .sketch import APPROXIMATE_OPS, QUANTILES, group_sketches, is_approximate, options
+
+__all__ = ["PartialAggregate", "is_decomposable"]
+
+# Statistics of a field required by each decomposable aggregate operation.
+# The "count" and "values" statistics are independent of the field.
+OP_STATS: Dict[str, Tuple[str, ...]] = {
+    "argmax": ("argmax",),
+    "argmin": ("argmin",),
+    "average": ("valid", "mean"),
+    "count": ("count",),
+    "distinct": ("distinct",),
+    "max": ("max",),
+    "mean": ("valid", "mean"),
+    "min": ("min",),
+    "missing": ("count", "valid"),
+    "product": ("product",),
+    "stderr": ("valid", "mean", "m2"),
+    "stdev": ("valid", "mean", "m2"),
+    "stdevp": ("valid", "mean", "m2"),
+    "sum": ("sum",),
+    "valid": ("valid",),
+    "values": ("values",),
+    "variance": ("valid", "mean", "m2"),
+    "variancep": ("valid", "mean", "m2"),
+}
+
+_FIELDLESS_STATS = ("count", "values")
+_SKETCH_STATS = ("hll", "kll")
+
+Stats = Dict[str, pd.Series]
+
+
+def is_decomposable(op: str) -> bool:
+    """Return True if the operation is computed from bounded partial states."""
+    return op in OP_STATS
+
+
+def _op_stats(op: str) -> Tuple[str, ...]:
+    return OP_STATS.get(op, ("samples",))
+
+
+class PartialAggregate:
+    """Mergeable state of an aggregate over a sequence of dataframes.
+
+    Parameters
+    ----------
+    aggregates : list of dict
+        Aggregate field definitions with "op", "as", and optionally "field",
+        as in the aggregate and joinaggregate transforms.
+    groupby : list of str
+        The fields by which to group.
+    dropna : bool
+        If True (default), rows with null groupby fields are dropped, as in
+        the aggregate transform. If False, they form their own groups, so that
+        they are kept by a :meth:`rollup` to fewer fields.
+
+    Example
+    -------
+    >>> partial = PartialAggregate([{"op": "mean", "field": "x", "as": "m"}], ["c"])
+    >>> for chunk in chunks:  # doctest: +SKIP
+    ...     partial.update(chunk)
+    >>> partial.finalize()  # doctest: +SKIP
+    """
+
+    def __init__(
+        self, aggregates: List[Dict[str, Any]], groupby: List[str], dropna: bool = True
+    ):
+        self.aggregates = [dict(aggregate) for aggregate in aggregates]
+        self.groupby = list(groupby)
+        self.dropna = dropna
+        self._fields: Optional[List[Optional[str]]] = None
+        self._default: Optional[str] = None
+        self._index: Optional[pd.Index] = None
+        self._stats: Dict[Optional[str], Stats] = {}
+        # Sketch options are fixed when the state is created, so that states
+        # updated in other processes can be merged.
+        self._sketch_options = options()
+        self._approximate = {
+            aggregate["op"]
+            for aggregate in self.aggregates
+            if aggregate["op"] in APPROXIMATE_OPS and is_approximate(aggregate["op"])
+        }
+
+    def _resolve_fields(self, df: pd.DataFrame) -> List[Optional[str]]:
+        if self._fields is None:
+            self._default = df.columns[0] if len(df.columns) else None
+            fields: List[Optional[str]] = []
+            for aggregate in self.aggregates:
+                if aggregate["op"] in ("count", "values"):
+                    fields.append(None)
+                    continue
+                field = aggregate.get("field", df.columns[0])
+                if field == "*" and field not in df.columns:
+                    field = df.columns[0]
+                fields.append(field)
+            self._fields = fields
+        return self._fields
+
+    def _required(self, df: pd.DataFrame) -> Dict[Optional[str], List[str]]:
+        required: Dict[Optional[str], List[str]] = {None: []}
+        for aggregate, field in zip(self.aggregates, self._resolve_fields(df)):
+            op = aggregate["op"]
+            if op in self._approximate:
+                op_stats: Tuple[str, ...] = (APPROXIMATE_OPS[op],)
+            else:
+                op_stats = _op_stats(op)
+            for stat in op_stats:
+                key = None if stat in _FIELDLESS_STATS else field
+                stats = required.setdefault(key, [])
+                if stat not in stats:
+                    stats.append(stat)
+        return required
+
+    def _keys(self, df: pd.DataFrame) -> Any:
+        if self.groupby:
+            return self.groupby
+        # A single group, which is present even if the dataframe is empty.
+        return pd.Categorical(np.zeros(len(df), dtype=int), categories=[0])
+
+    def update(self, df: pd.DataFrame) -> "PartialAggregate":
+        """Merge the statistics of a dataframe into this state."""
+        grouped = df.groupby(
+            self._keys(df), sort=True, observed=False, dropna=self.dropna
+        )
+        index: Optional[pd.Index] = None
+        stats: Dict[Optional[str], Stats] = {}
+        for field, names in self._required(df).items():
+            stats[field] = {}
+            for name in names:
+                if name in _SKETCH_STATS:
+                    stats[field][name] = group_sketches(
+                        df, grouped, field, name, self._sketch_options
+                    )
+                else:
+                    stats[field][name] = _STATS[name](df, grouped, field)
+                if index is None:
+                    index = stats[field][name].index
+        if index is None:
+            index = grouped.size().index
+        self._merge(index, stats)
+        return self
+
+    def merge(self, other: "PartialAggregate") -> "PartialAggregate":
+        """Merge the state of another partial aggregate into this state."""
+        if other._index is not None:
+            if self._fields is None:
+                self._fields, self._default = other._fields, other._default
+            self._merge(other._index, other._stats)
+        return self
+
+    def _merge(self, index: pd.Index, stats: Dict[Optional[str], Stats]) -> None:
+        if self._index is None:
+            self._index, self._stats = index, stats
+            return
+        union = self._index.union(index)
+        for field, new in stats.items():
+            old = self._stats.get(field, {})
+            self._stats[field] = _merge_stats(old, new, union)
+        self._index = union
+
+    def _columns(self) -> pd.DataFrame:
+        # Default fields resolve to the first column of the original data.
+        return pd.DataFrame(columns=[] if self._default is None else [self._default])
+
+    def can_rollup(
+        self, groupby: List[str], aggregates: Optional[List[Dict[str, Any]]] = None
+    ) -> bool:
+        """Return True if :meth:`rollup` can compute the given aggregates."""
+        if not set(groupby) <= set(self.groupby):
+            return False
+        if self._index is None:
+            return aggregates is None
+        rolled = PartialAggregate(
+            self.aggregates if aggregates is None else aggregates, groupby
+        )
+        for field, names in rolled._required(self._columns()).items():
+            if not set(names) <= set(self._stats.get(field, {})):
+                return False
+        return True
+
+    def rollup(
+        self, groupby: List[str], aggregates: Optional[List[Dict[str, Any]]] = None
+    ) -> "PartialAggregate":
+        """Return the state grouped by a subset of the groupby fields.
+
+        The states of the groups which share values of the new groupby fields
+        are merged, without access to the original data. Groups with null
+        values of the new fields are dropped.
+
+        Parameters
+        ----------
+        groupby : list of str
+            The new groupby fields, a subset of those of this state.
+        aggregates : list of dict, optional
+            The aggregates of the new state, whose statistics must be kept by
+            this state. By default, the aggregates of this state.
+        """
+        if not self.can_rollup(groupby, aggregates):
+            raise ValueError(
+                f"Cannot roll up to groupby {groupby} from the statistics of this state"
+            )
+        rolled = PartialAggregate(
+            self.aggregates if aggregates is None else aggregates, groupby
+        )
+        if self._index is None:
+            return rolled
+        keys = self._index.to_frame(index=False)
+        if groupby:
+            grouped = keys.groupby(groupby, sort=True, observed=False)
+        else:
+            group = pd.Categorical(np.zeros(len(keys), dtype=int), categories=[0])
+            grouped = keys.groupby(group, observed=False)
+        codes, index = group_codes(grouped)
+        for field, names in rolled._required(self._columns()).items():
+            stats = {
+                name: self._stats[field][name].reindex(self._index) for name in names
+            }
+            rolled._stats[field] = {
+                name: stat.set_axis(index)
+                for name, stat in _rollup_stats(stats, codes, len(index)).items()
+            }
+        rolled._index = index
+        return rolled
+
+    def result(self) -> pd.DataFrame:
+        """Compute the aggregates, indexed by the groupby fields."""
+        names = [aggregate["as"] for aggregate in self.aggregates]
+        if self._index is None or self._fields is None:
+            empty = pd.DataFrame(columns=self.groupby + names)
+            return empty.set_index(self.groupby) if self.groupby else empty
+        columns = {}
+        for aggregate, field in zip(self.aggregates, self._fields):
+            stats = dict(self._stats[None])
+            if field is not None:
+                stats.update(self._stats[field])
+            if aggregate["op"] in self._approximate:
+                columns[aggregate["as"]] = _finalize_sketch(aggregate["op"], stats)
+            else:
+                columns[aggregate["as"]] = _finalize(aggregate["op"], stats)
+        return pd.DataFrame(columns, index=self._index)
+
+    def finalize(self) -> pd.DataFrame:
+        """Compute the output of the aggregate transform."""
+        df = self.result()
+        if self.groupby:
+            return df.reset_index()
+        return df.reset_index(drop=True)
+
+
+def _samples(df: pd.DataFrame, grouped: Any, field: str) -> pd.Series:
+    return grouped[field].agg(list)
+
+
+def _values(df: pd.DataFrame, grouped: Any, field: None) -> pd.Series:
+    return grouped.apply(lambda x: x.to_dict(orient="records"))
+
+
+def _distinct(df: pd.DataFrame, grouped: Any, field: str) -> pd.Series:
+    return grouped[field].agg(lambda x: set(x.dropna()))
+
+
+def _m2(df: pd.DataFrame, grouped: Any, field: str) -> pd.Series:
+    return (grouped[field].var(ddof=0) * grouped[field].count()).fillna(0)
+
+
+def _arg(which: str) -> Callable[..., pd.Series]:
+    def stat(df: pd.DataFrame, grouped: Any, field: str) -> pd.Series:
+        best = grouped[field].idxmin() if which == "min" else grouped[field].idxmax()
+        values = grouped[field].min() if which == "min" else grouped[field].max()
+        found = best.notnull()
+        records = np.full(len(best), None, dtype=object)
+        rows = df.loc[best[found]].to_dict(orient="records")
+        for i, value, row in zip(np.flatnonzero(found), values[found], rows):
+            records[i] = (value, row)
+        return pd.Series(records, index=best.index)
+
+    return stat
+
+
+_STATS: Dict[str, Callable[..., pd.Series]] = {
+    "argmax": _arg("max"),
+    "argmin": _arg("min"),
+    "count": lambda df, grouped, field: grouped.size(),
+    "distinct": _distinct,
+    "m2": _m2,
+    "max": lambda df, grouped, field: grouped[field].max(),
+    "mean": lambda df, grouped, field: grouped[field].mean(),
+    "min": lambda df, grouped, field: grouped[field].min(),
+    "product": lambda df, grouped, field: grouped[field].prod(),
+    "samples": _samples,
+    "sum": lambda df, grouped, field: grouped[field].sum(),
+    "valid": lambda df, grouped, field: grouped[field].count(),
+    "values": _values,
+}
+
+
+def _additive(a: pd.Series, b: pd.Series, index: pd.Index) -> pd.Series:
+    return a.reindex(index, fill_value=0) + b.reindex(index, fill_value=0)
+
+
+def _extremum(func: Callable, ufunc: Callable) -> Callable[..., pd.Series]:
+    def merge(a: pd.Series, b: pd.Series, index: pd.Index) -> pd.Series:
+        dtype = np.result_type(a.dtype, b.dtype)
+        a, b = a.reindex(index), b.reindex(index)
+        if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+            result = pd.Series(ufunc(a.values, b.values), index=index)
+            if dtype.kind in "iu" and result.notnull().all():
+                result = result.astype(dtype)
+            return result
+        return a.combine(b, lambda x, y: _combine_objects(x, y, func))
+
+    return merge
+
+
+def _combine_objects(x: Any, y: Any, func: Callable) -> Any:
+    if _isnull(x):
+        return y
+    if _isnull(y):
+        return x
+    return func(x, y)
+
+
+def _isnull(x: Any) -> bool:
+    return x is None or (isinstance(x, float) and np.isnan(x))
+
+
+def _objects(func: Callable) -> Callable[..., pd.Series]:
+    def merge(a: pd.Series, b: pd.Series, index: pd.Index) -> pd.Series:
+        a, b = a.reindex(index), b.reindex(index)
+        return a.combine(b, lambda x, y: _combine_objects(x, y, func))
+
+    return merge
+
+
+def _better(which: str) -> Callable[[Tuple, Tuple], Tuple]:
+    # On ties, the record seen first wins.
+    if which == "min":
+        return lambda x, y: y if y[0] < x[0] else x
+    return lambda x, y: y if y[0] > x[0] else x
+
+
+_MERGE: Dict[str, Callable[..., pd.Series]] = {
+    "argmax": _objects(_better("max")),
+    "argmin": _objects(_better("min")),
+    "count": _additive,
+    "distinct": _objects(lambda x, y: x | y),
+    "hll": _objects(lambda x, y: x.merge(y)),
+    "kll": _objects(lambda x, y: x.merge(y)),
+    "max": _extremum(max, np.fmax),
+    "min": _extremum(min, np.fmin),
+    "product": lambda a, b, index: a.reindex(index, fill_value=1)
+    * b.reindex(index, fill_value=1),
+    "samples": _objects(lambda x, y: x + y),
+    "sum": _additive,
+    "valid": _additive,
+    "values": _objects(lambda x, y: x + y),
+}
+
+
+def _merge_stats(old: Stats, new: Stats, index: pd.Index) -> Stats:
+    merged = {}
+    for name in new:
+        if name in ("mean", "m2"):
+            continue
+        merged[name] = _MERGE[name](old[name], new[name], index)
+    if "mean" in new:
+        # Chan et al.'s update of the mean and sum of squared deviations.
+        na = old["valid"].reindex(index, fill_value=0)
+        nb = new["valid"].reindex(index, fill_value=0)
+        ma = old["mean"].reindex(index).fillna(0)
+        mb = new["mean"].reindex(index).fillna(0)
+        n = na + nb
+        delta = mb - ma
+        merged["mean"] = (ma + delta * nb / n).where(n > 0)
+        if "m2" in new:
+            m2a = old["m2"].reindex(index, fill_value=0)
+            m2b = new["m2"].reindex(index, fill_value=0)
+            correction = (delta ** 2 * na * nb / n.where(n > 0)).fillna(0)
+            merged["m2"] = m2a + m2b + correction
+    return merged
+
+
+# Rollups of statistics, from the statistics of each group and the position of
+# its group in the rolled up index (or -1 to drop it).
+Rollup = Callable[[pd.Series, np.ndarray, int], pd.Series]
+
+
+def _reduce(func: Callable, copy: bool = False) -> Rollup:
+    def rollup(stat: pd.Series, codes: np.ndarray, size: int) -> pd.Series:
+        result = np.full(size, None, dtype=object)
+        for code, value in zip(codes, stat.to_numpy()):
+            if code < 0 or _isnull(value):
+                continue
+            if result[code] is None:
+                # Sketches are merged in place, so those of this state are copied.
+                result[code] = deepcopy(value) if copy else value
+            else:
+                result[code] = func(result[code], value)
+        return pd.Series(result)
+
+    return rollup
+
+
+def _grouped(name: str, fill_value: Any = np.nan) -> Rollup:
+    def rollup(stat: pd.Series, codes: np.ndarray, size: int) -> pd.Series:
+        valid = codes >= 0
+        stat = stat.reset_index(drop=True)[valid]
+        result = getattr(stat.groupby(codes[valid]), name)()
+        return result.reindex(range(size), fill_value=fill_value)
+
+    return rollup
+
+
+def _rollup_extremum(func: Callable, name: str) -> Rollup:
+    def rollup(stat: pd.Series, codes: np.ndarray, size: int) -> pd.Series:
+        if pd.api.types.is_numeric_dtype(stat):
+            return _grouped(name)(stat, codes, size)
+        return _reduce(func)(stat, codes, size)
+
+    return rollup
+
+
+_ROLLUP: Dict[str, Rollup] = {
+    "argmax": _reduce(_better("max")),
+    "argmin": _reduce(_better("min")),
+    "count": _grouped("sum", 0),
+    "distinct": _reduce(lambda x, y: x | y),
+    "hll": _reduce(lambda x, y: x.merge(y), copy=True),
+    "kll": _reduce(lambda x, y: x.merge(y), copy=True),
+    "max": _rollup_extremum(max, "max"),
+    "min": _rollup_extremum(min, "min"),
+    "product": _grouped("prod"),
+    "samples": _reduce(lambda x, y: x + y),
+    "sum": _grouped("sum", 0),
+    "valid": _grouped("sum", 0),
+    "values": _reduce(lambda x, y: x + y),
+}
+
+
+def _rollup_stats(stats: Stats, codes: np.ndarray, size: int) -> Stats:
+    rolled = {}
+    for name, stat in stats.items():
+        if name not in ("mean", "m2"):
+            rolled[name] = _ROLLUP[name](stat, codes, size)
+    if "mean" in stats:
+        # The grouped form of Chan et al.'s update used by _merge_stats.
+        valid = stats["valid"].to_numpy(dtype=float)
+        mean = stats["mean"].to_numpy(dtype=float)
+        weighted = valid * np.nan_to_num(mean)
+        total = _grouped("sum", 0)(pd.Series(weighted), codes, size).to_numpy()
+        n = rolled["valid"].to_numpy(dtype=float)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rolled["mean"] = pd.Series(np.where(n > 0, total / n, np.nan))
+        if "m2" in stats:
+            grand = np.where(codes >= 0, rolled["mean"].to_numpy()[codes], np.nan)
+            deviation = pd.Series(np.nan_to_num(valid * (mean - grand) ** 2))
+            m2 = _grouped("sum", 0)(stats["m2"].fillna(0), codes, size)
+            rolled["m2"] = m2 + _grouped("sum", 0)(deviation, codes, size)
+    return rolled
+
+
+def _variance(stats: Stats, ddof: int) -> pd.Series:
+    valid = stats["valid"]
+    return (stats["m2"] / (valid - ddof)).where(valid > ddof)
+
+
+def _sample_op(op: str) -> Callable[[Stats], pd.Series]:
+    func = AGG_REPLACEMENTS.get(op, op)
+
+    def finalize(stats: Stats) -> pd.Series:
+        return stats["samples"].map(lambda values: pd.Series(values).aggregate(func))
+
+    return finalize
+
+
+def _arg_record(stats: Stats, name: str) -> pd.Series:
+    return stats[name].map(lambda best: None if _isnull(best) else best[1])
+
+
+_FINALIZE: Dict[str, Callable[[Stats], pd.Series]] = {
+    "argmax": lambda stats: _arg_record(stats, "argmax"),
+    "argmin": lambda stats: _arg_record(stats, "argmin"),
+    "average": lambda stats: stats["mean"],
+    "count": lambda stats: stats["count"],
+    "distinct": lambda stats: stats["distinct"].map(
+        lambda values: 0 if _isnull(values) else len(values)
+    ),
+    "max": lambda stats: stats["max"],
+    "mean": lambda stats: stats["mean"],
+    "min": lambda stats: stats["min"],
+    "missing": lambda stats: stats["count"] - stats["valid"],
+    "product": lambda stats: stats["product"],
+    "stderr": lambda stats: np.sqrt(_variance(stats, 1) / stats["valid"]),
+    "stdev": lambda stats: np.sqrt(_variance(stats, 1)),
+    "stdevp": lambda stats: np.sqrt(_variance(stats, 0)),
+    "sum": lambda stats: stats["sum"],
+    "valid": lambda stats: stats["valid"],
+    "values": lambda stats: stats["values"],
+    "variance": lambda stats: _variance(stats, 1),
+    "variancep": lambda stats: _variance(stats, 0),
+}
+
+
+def _finalize(op: str, stats: Stats) -> pd.Series:
+    if op in _FINALIZE:
+        return _FINALIZE[op](stats)
+    return _sample_op(op)(stats)
+
+
+def _finalize_sketch(op: str, stats: Stats) -> pd.Series:
+    if op == "distinct":
+        return stats["hll"].map(
+            lambda sketch: 0 if _isnull(sketch) else int(round(sketch.estimate()))
+        )
+    return stats["kll"].map(
+        lambda sketch: np.nan if _isnull(sketch) else sketch.quantile(QUANTILES[op])
+    )
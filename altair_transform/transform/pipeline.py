@@ -0,0 +1,102 @@
+"""Evaluation of lists of transforms."""
+from functools import partial
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from .cache import TransformCache, pipeline_keys
+from .chunked import fuse, visit_fused
+from .grouping import group_cache, invalidate
+from .parallel import is_parallelizable, visit_parallel
+from .spec import TransformSpec, normalize
+from .trace import traced
+from .visitor import visit
+
+
+@visit.register(list)
+def visit_list(
+    transform: list,
+    df: pd.DataFrame,
+    cache: Optional[TransformCache] = None,
+    fingerprint: Optional[str] = None,
+    chunksize: Optional[int] = None,
+    n_jobs: Optional[int] = None,
+    sorted_by: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    specs = [normalize(t) for t in transform]
+    # Group indices and the order of rows are tracked through the pipeline.
+    with group_cache(sorted_by):
+        return _visit_list(specs, df, cache, fingerprint, chunksize, n_jobs)
+
+
+def _visit_list(
+    specs: List[TransformSpec],
+    df: pd.DataFrame,
+    cache: Optional[TransformCache],
+    fingerprint: Optional[str],
+    chunksize: Optional[int],
+    n_jobs: Optional[int],
+) -> pd.DataFrame:
+    stages: List[Tuple[bool, List[TransformSpec]]]
+    if chunksize is None:
+        stages = [(False, [spec]) for spec in specs]
+    else:
+        stages = fuse(specs)
+
+    if cache is None:
+        for fused, stage in stages:
+            df = _visit_stage(fused, stage, df, chunksize, n_jobs)
+        return df
+
+    # Intermediate results are cached at stage boundaries, up to the first
+    # transform whose results are not reproducible.
+    keys = pipeline_keys(specs)
+    if fingerprint is None:
+        fingerprint = cache.fingerprint(df)
+    start, cached = cache.lookup(fingerprint, keys)
+    if cached is not None:
+        df = cached
+    end = 0
+    for fused, stage in stages:
+        end += len(stage)
+        if end - len(stage) < start:
+            # The order of rows is followed through the cached prefix.
+            skipped = stage[: min(start, end) - (end - len(stage))]
+            for spec in skipped:
+                invalidate(spec)
+            if end <= start:
+                continue
+            # The cached prefix ends within a fused stage: run the remainder.
+            stage = stage[len(skipped) :]
+        df = _visit_stage(fused, stage, df, chunksize, n_jobs)
+        if end <= len(keys):
+            cache.put(fingerprint, keys[:end], df)
+    return df
+
+
+def _visit_stage(
+    fused: bool,
+    stage: List[TransformSpec],
+    df: pd.DataFrame,
+    chunksize: Optional[int],
+    n_jobs: Optional[int],
+) -> pd.DataFrame:
+    if fused:
+        assert chunksize is not None
+        df = visit_fused(stage, df, chunksize)
+        for spec in stage:
+            invalidate(spec, df)
+        return df
+    for spec in stage:
+        df = visit_spec(spec, df, n_jobs)
+        invalidate(spec, df)
+    return df
+
+
+def visit_spec(
+    spec: TransformSpec, df: pd.DataFrame, n_jobs: Optional[int] = None
+) -> pd.DataFrame:
+    """Evaluate a single transform, in parallel over groups if requested."""
+    if n_jobs is not None and n_jobs > 1 and is_parallelizable(spec):
+        return traced(spec, df, partial(visit_parallel, spec, df, n_jobs))
+    return visit(spec, df)
@@ -1,12 +1,11 @@
-import altair as alt
 import pandas as pd
 from .visitor import visit
+from .spec import PivotSpec
 from .aggregate import AGG_REPLACEMENTS
 
 
-@visit.register(alt.PivotTransform)
-def visit_pivot(transform: alt.PivotTransform, df: pd.DataFrame) -> pd.DataFrame:
-    transform = transform.to_dict()
+@visit.register(PivotSpec)
+def visit_pivot(transform: PivotSpec, df: pd.DataFrame) -> pd.DataFrame:
     pivot = transform["pivot"]
     limit = transform.get("limit")
     if limit:
@@ -15,6 +14,9 @@ def visit_pivot(transform: alt.PivotTransform, df: pd.DataFrame) -> pd.DataFrame
     groupby = transform.get("groupby")
     agg = transform.get("op", "sum")
     agg = AGG_REPLACEMENTS.get(agg, agg)
+    if agg == "size":
+        # pivot_table does not accept "size" without an index.
+        agg = len
     out = df.pivot_table(
         columns=pivot, values=transform["value"], index=groupby, aggfunc=agg,
     ).reset_index(drop=not groupby)
@@ -1,12 +1,13 @@
-import altair as alt
 import numpy as np
 import pandas as pd
 from .visitor import visit
+from .grouping import group_index
+from .sketch import KLLSketch, is_approximate, options
+from .spec import QuantileSpec
 
 
-@visit.register(alt.QuantileTransform)
-def visit_quantile(transform: alt.QuantileTransform, df: pd.DataFrame) -> pd.DataFrame:
-    transform = transform.to_dict()
+@visit.register(QuantileSpec)
+def visit_quantile(transform: QuantileSpec, df: pd.DataFrame) -> pd.DataFrame:
     quantile = transform["quantile"]
     groupby = transform.get("groupby")
     pname, vname = transform.get("as", ["prob", "value"])
@@ -16,12 +17,16 @@ def visit_quantile(transform: alt.QuantileTransform, df: pd.DataFrame) -> pd.Dat
         probs = np.arange(0.5 * step, 1.0, step)
 
     def qq(s: pd.Series) -> pd.DataFrame:
+        if is_approximate("quantile"):
+            opts = options()
+            sketch = KLLSketch.from_error(opts["rank_error"], seed=opts["seed"])
+            return pd.DataFrame({pname: probs, vname: sketch.update(s).quantile(probs)})
         return pd.DataFrame({pname: probs, vname: np.quantile(s, probs)})
 
     if groupby:
+        groups = group_index(df, groupby)
         return (
-            df.groupby(groupby)[quantile]
-            .apply(qq)
+            groups.relabel(groups.groupby(df)[quantile].apply(qq))
             .reset_index(groupby)
             .reset_index(drop=True)
         )
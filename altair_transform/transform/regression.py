@@ -1,11 +1,12 @@
 import abc
 from typing import Dict, Optional, Tuple, Type
 
-import altair as alt
 import numpy as np
 from numpy.polynomial import Polynomial
 import pandas as pd
 from .visitor import visit
+from .grouping import group_index
+from .spec import RegressionSpec
 from .vega_utils import adaptive_sample
 
 
@@ -13,11 +14,8 @@ def _ensure_length(coef: np.ndarray, k: int) -> np.ndarray:
     return np.hstack([coef, np.zeros(k - len(coef), dtype=coef.dtype)])
 
 
-@visit.register(alt.RegressionTransform)
-def visit_regression(
-    transform: alt.RegressionTransform, df: pd.DataFrame
-) -> pd.DataFrame:
-    transform = transform.to_dict()
+@visit.register(RegressionSpec)
+def visit_regression(transform: RegressionSpec, df: pd.DataFrame) -> pd.DataFrame:
     reg = transform["regression"]
     on = transform["on"]
     extent = transform.get("extent")
@@ -42,9 +40,13 @@ def visit_regression(
     M = models[method]
     model = M(on=on, reg=reg, extent=extent, as_=as_, order=order)
 
+    if groupby:
+        groups = group_index(df, groupby)
+        grouped = groups.groupby(df)
+
     if params:
         if groupby:
-            params = df.groupby(groupby).apply(model.params)
+            params = groups.relabel(grouped.apply(model.params))
             params["keys"] = [list(p)[:-1] for p in params.index]
             return params.reset_index(drop=True)
         else:
@@ -52,8 +54,7 @@ def visit_regression(
     else:
         if groupby:
             return (
-                df.groupby(groupby)
-                .apply(model.predict)
+                groups.relabel(grouped.apply(model.predict))
                 .reset_index(groupby)
                 .reset_index(drop=True)
             )
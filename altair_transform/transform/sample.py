@@ -1,12 +1,11 @@
-import altair as alt
 import numpy as np
 import pandas as pd
 from .visitor import visit
+from .spec import SampleSpec
 
 
-@visit.register(alt.SampleTransform)
-def visit_sample(transform: alt.SampleTransform, df: pd.DataFrame) -> pd.DataFrame:
-    transform = transform.to_dict()
+@visit.register(SampleSpec)
+def visit_sample(transform: SampleSpec, df: pd.DataFrame) -> pd.DataFrame:
     sample = transform["sample"]
 
     if sample < df.shape[0]:
@@ -0,0 +1,215 @@
+"""Shared-memory transport of dataframes between processes.
+
+Sending a dataframe to a worker process pickles it, copying every column
+through a pipe. Here, the fixed-width columns of a dataframe (booleans,
+integers, floats, complex numbers, datetimes and timedeltas) and its index
+are instead copied once into a ``multiprocessing.shared_memory`` block, and
+only a small picklable handle is sent. The receiving process wraps NumPy views
+over the block without copying. Object, string, categorical and other
+extension columns are pickled with the handle.
+
+Consecutive columns of the same dtype are stored together as a 2D array, so
+that pandas can wrap them in a single block without consolidating (copying)
+them.
+
+The process creating a block owns it, and must ``unlink`` it once every
+receiver has opened it. Mappings opened by :func:`open_frame` remain valid
+after the block is unlinked, and are closed when the last view over them is
+garbage collected.
+"""
+import sys
+from typing import Any, List, Optional, Tuple
+import uuid
+
+import numpy as np
+import pandas as pd
+
+__all__ = ["SharedFrame", "available", "share_frame", "open_frame", "unlink"]
+
+# Alignment of arrays within a block, in bytes.
+_ALIGN = 64
+
+# A run of columns: (dtype, number of columns, offset) for shared columns,
+# or (None, series values, None) for a pickled column.
+_Run = Tuple[Optional[str], Any, Optional[int]]
+
+
+def available() -> bool:
+    """Return True if shared memory is supported by this Python."""
+    return sys.version_info >= (3, 8)
+
+
+def _is_fixed_width(values: Any) -> bool:
+    return isinstance(values, np.ndarray) and values.dtype.kind in "biufcmM"
+
+
+class SharedFrame:
+    """Picklable handle to a dataframe stored in a shared memory block."""
+
+    def __init__(
+        self,
+        name: Optional[str],
+        nrows: int,
+        columns: pd.Index,
+        runs: List[_Run],
+        index: Any,
+    ):
+        self.name = name
+        self.nrows = nrows
+        self.columns = columns
+        self.runs = runs
+        self.index = index
+
+    def __repr__(self) -> str:
+        return f"SharedFrame(name={self.name!r}, nrows={self.nrows})"
+
+
+def share_frame(df: pd.DataFrame, name: Optional[str] = None) -> SharedFrame:
+    """Copy a dataframe into a new shared memory block.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataframe to share.
+    name : str, optional
+        The name of the block. By default, a unique name is generated.
+
+    Returns
+    -------
+    handle : SharedFrame
+        The picklable handle to the shared dataframe. If the dataframe has
+        fixed-width columns or index, ``handle.name`` is the name of the new
+        block, which the caller is responsible for unlinking.
+    """
+    from multiprocessing import shared_memory
+
+    nrows = len(df)
+    runs: List[_Run] = []
+    arrays: List[Tuple[int, np.ndarray]] = []
+    size = 0
+
+    def allocate(values: np.ndarray) -> int:
+        nonlocal size
+        offset = -(-size // _ALIGN) * _ALIGN
+        arrays.append((offset, values))
+        size = offset + values.nbytes
+        return offset
+
+    i = 0
+    columns = [df.iloc[:, j] for j in range(df.shape[1])]
+    while i < len(columns):
+        values = columns[i].values
+        if not _is_fixed_width(values):
+            runs.append((None, values, None))
+            i += 1
+            continue
+        j = i + 1
+        while j < len(columns) and columns[j].dtype == values.dtype:
+            j += 1
+        block = np.empty((j - i, nrows), dtype=values.dtype)
+        for k in range(i, j):
+            block[k - i] = columns[k].values
+        runs.append((values.dtype.str, j - i, allocate(block)))
+        i = j
+
+    index: Any = df.index
+    if not isinstance(index, pd.RangeIndex) and _is_fixed_width(index.values):
+        index = (index.dtype.str, index.name, allocate(np.asarray(index.values)))
+
+    if not arrays:
+        return SharedFrame(None, nrows, df.columns, runs, index)
+
+    name = name or f"alttx_{uuid.uuid4().hex[:16]}"
+    shm = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+    try:
+        buf = np.frombuffer(shm.buf, dtype=np.uint8)
+        for offset, values in arrays:
+            buf[offset : offset + values.nbytes] = values.reshape(-1).view(np.uint8)
+        del buf
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    shm.close()
+    return SharedFrame(name, nrows, df.columns, runs, index)
+
+
+def open_frame(handle: SharedFrame) -> pd.DataFrame:
+    """Return a dataframe with views over the block of a shared frame."""
+    buf = _attach(handle.name) if handle.name else np.zeros(0, dtype=np.uint8)
+    n = handle.nrows
+
+    def view(dtype: str, offset: int, shape: Tuple[int, ...]) -> np.ndarray:
+        dt = np.dtype(dtype)
+        nbytes = dt.itemsize * int(np.prod(shape))
+        return buf[offset : offset + nbytes].view(dt).reshape(shape)
+
+    frames = []
+    start = 0
+    for dtype, payload, offset in handle.runs:
+        if dtype is None:
+            frame = pd.DataFrame({start: payload}, copy=False)
+            start += 1
+        else:
+            assert offset is not None
+            block = view(dtype, offset, (payload, n))
+            columns = range(start, start + payload)
+            frame = pd.DataFrame(block.T, columns=columns, copy=False)
+            start += payload
+        frames.append(frame)
+
+    if frames:
+        df = pd.concat(frames, axis=1, copy=False)
+    else:
+        df = pd.DataFrame(index=pd.RangeIndex(n))
+    df.columns = handle.columns
+    index = handle.index
+    if isinstance(index, tuple):
+        dtype, name, offset = index
+        index = pd.Index(view(dtype, offset, (n,)), name=name, copy=False)
+    df.index = index
+    return df
+
+
+def unlink(name: Optional[str]) -> None:
+    """Remove a shared memory block, if it exists."""
+    from multiprocessing import shared_memory
+
+    if name is None:
+        return
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def _attach(name: str) -> np.ndarray:
+    """Map a block, returning a byte array that keeps the mapping open."""
+    from multiprocessing import shared_memory
+
+    return np.asarray(_Mapping(shared_memory.SharedMemory(name=name)))
+
+
+class _Mapping:
+    """Owner of a mapped block, which is closed when the last view is released.
+
+    NumPy views record the object owning their memory as their base. Exposing
+    the block through ``__array_interface__`` makes this object the owner of
+    all views over it, rather than the underlying memoryview.
+    """
+
+    def __init__(self, shm: Any):
+        self._shm = shm
+        self._raw: Optional[np.ndarray] = np.frombuffer(shm.buf, dtype=np.uint8)
+        self.__array_interface__ = {
+            "shape": self._raw.shape,
+            "typestr": "|u1",
+            "data": (self._raw.ctypes.data, False),
+            "version": 3,
+        }
+
+    def __del__(self) -> None:
+        self._raw = None
+        self._shm.close()
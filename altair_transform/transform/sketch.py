@@ -0,0 +1,392 @@
+"""Mergeable sketches for approximate aggregates.
+
+Exact ``distinct`` counts and quantiles (``median``, ``q1``, ``q3`` and the
+quantile transform) need the values of each group, which is expensive for
+very large data. Within ``with approximate():``, they are instead computed from
+small sketches: a HyperLogLog [1]_ for distinct counts, and a KLL sketch [2]_
+for quantiles. Both are mergeable, so that the sketches of chunks of data, or
+of partitions evaluated in other processes (sketches can be pickled), combine
+into the sketch of the whole.
+
+.. [1] Flajolet et al., "HyperLogLog: the analysis of a near-optimal
+   cardinality estimation algorithm", 2007.
+.. [2] Karnin, Lang & Liberty, "Optimal quantile approximation in streams",
+   2016.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .grouping import groups_of
+from .spec import TransformSpec, cache_options
+
+__all__ = [
+    "APPROXIMATE_OPS",
+    "HyperLogLog",
+    "KLLSketch",
+    "approximate",
+    "is_approximate",
+    "group_sketches",
+    "approximate_aggregate",
+]
+
+# Operations which can be approximated, and the sketch used for each.
+APPROXIMATE_OPS: Dict[str, str] = {
+    "distinct": "hll",
+    "median": "kll",
+    "q1": "kll",
+    "q3": "kll",
+    "quantile": "kll",
+}
+
+QUANTILES: Dict[str, float] = {"median": 0.5, "q1": 0.25, "q3": 0.75}
+
+# The current options of approximate(). They are local to each thread (and
+# asyncio task), and never modified in place.
+_options: ContextVar[Dict[str, Any]] = ContextVar(
+    "sketch_options",
+    default={
+        "ops": frozenset(),
+        "relative_error": 0.02,
+        "rank_error": 0.01,
+        "seed": None,
+    },
+)
+
+
+@contextmanager
+def approximate(
+    ops: Iterable[str] = tuple(APPROXIMATE_OPS),
+    relative_error: float = 0.02,
+    rank_error: float = 0.01,
+    seed: Optional[int] = None,
+) -> Iterator[None]:
+    """Compute operations from sketches for the duration of a with block.
+
+    Parameters
+    ----------
+    ops : list of str
+        The operations to approximate, among "distinct", "median", "q1", "q3"
+        (aggregate and joinaggregate operations) and "quantile" (the quantile
+        transform). Default: all of them.
+    relative_error : float
+        The standard error of distinct counts, relative to the count. The
+        HyperLogLog of each group uses about (1.04 / relative_error) ** 2
+        bytes. Default: 0.02.
+    rank_error : float
+        The approximate error of quantiles, as a fraction of the number of
+        values. Default: 0.01.
+    seed : int, optional
+        The seed of the randomized compactions of KLL sketches, for
+        reproducible quantiles.
+
+    Example
+    -------
+    >>> import altair_transform
+    >>> with altair_transform.approximate(["distinct"]):  # doctest: +SKIP
+    ...     altair_transform.apply(df, transform)
+    """
+    ops = frozenset(ops)
+    unknown = sorted(ops - set(APPROXIMATE_OPS))
+    if unknown:
+        raise ValueError(f"Operations cannot be approximated: {unknown}")
+    if not 0 < relative_error < 1 or not 0 < rank_error < 1:
+        raise ValueError("Error bounds must be between 0 and 1.")
+    token = _options.set(
+        dict(ops=ops, relative_error=relative_error, rank_error=rank_error, seed=seed)
+    )
+    try:
+        yield
+    finally:
+        _options.reset(token)
+
+
+def is_approximate(op: str) -> bool:
+    """Return True if the operation is currently computed from sketches."""
+    return op in _options.get()["ops"]
+
+
+def options() -> Dict[str, Any]:
+    """Return a copy of the current sketch options."""
+    return dict(_options.get())
+
+
+@cache_options("sketch")
+def _cache_options(spec: TransformSpec) -> Optional[Dict[str, Any]]:
+    ops = spec.ops() & _options.get()["ops"]
+    if not ops:
+        return {}
+    options = dict(_options.get(), ops=sorted(ops))
+    if options["seed"] is None and ops != {"distinct"}:
+        # KLL sketches without a seed compact values at random offsets.
+        return None
+    return options
+
+
+class HyperLogLog:
+    """HyperLogLog sketch of the number of distinct values.
+
+    Parameters
+    ----------
+    precision : int
+        The sketch has 2 ** precision one-byte registers, and the relative
+        standard error of its estimate is about 1.04 / sqrt(2 ** precision).
+    """
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"precision must be between 4 and 18; got {precision}")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @classmethod
+    def from_error(cls, relative_error: float) -> "HyperLogLog":
+        """Return a sketch with at most the given relative standard error."""
+        return cls(_precision(relative_error))
+
+    def __repr__(self) -> str:
+        return f"HyperLogLog(precision={self.precision})"
+
+    def copy(self) -> "HyperLogLog":
+        other = HyperLogLog(self.precision)
+        other.registers = self.registers.copy()
+        return other
+
+    def update(self, values: Any) -> "HyperLogLog":
+        """Add the non-null values of an array to the sketch."""
+        index, rank = _hll_hash(values, self.precision)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Merge another sketch of the same precision into this one."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> float:
+        """Return the estimated number of distinct values."""
+        zeros = np.count_nonzero(self.registers == 0)
+        harmonic = np.ldexp(1.0, -self.registers.astype(int)).sum()
+        return float(_hll_estimate(len(self.registers), zeros, harmonic))
+
+
+def _precision(relative_error: float) -> int:
+    registers = (1.04 / relative_error) ** 2
+    return min(max(math.ceil(math.log2(registers)), 4), 18)
+
+
+def _leading_zeros(x: np.ndarray) -> np.ndarray:
+    # Binary search of the leading zeros of nonzero 64-bit integers.
+    x = x.copy()
+    count = np.zeros(len(x), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = x < np.uint64(1 << (64 - shift))
+        count[mask] += shift
+        x[mask] <<= np.uint64(shift)
+    return count
+
+
+def _hll_hash(values: Any, precision: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the register index and rank of each non-null value."""
+    values = pd.Series(values).dropna()
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    index = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    # A guard bit bounds the rank of the remaining bits.
+    rest = (hashes << np.uint64(precision)) | np.uint64(1 << (precision - 1))
+    return index, _leading_zeros(rest) + np.uint8(1)
+
+
+def _hll_estimate(m: int, zeros: Any, harmonic: Any) -> Any:
+    alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+    raw = alpha * m * m / harmonic
+    with np.errstate(divide="ignore"):
+        # Linear counting is more accurate for small cardinalities.
+        linear = m * np.log(m / np.maximum(zeros, 1e-300))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+class KLLSketch:
+    """KLL sketch of the distribution of numeric values.
+
+    Values are kept in levels of compactors; items at level h stand for 2 ** h
+    values. When a level exceeds its capacity, its items are sorted and every
+    other one, from a random offset, is promoted to the next level. The sketch
+    is exact as long as no compaction has occurred.
+
+    Parameters
+    ----------
+    k : int
+        The capacity of the highest level. The rank error of quantiles is
+        roughly 3 / k.
+    seed : int, optional
+        The seed of the random compaction offsets.
+    """
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        if k < 8:
+            raise ValueError(f"k must be at least 8; got {k}")
+        self.k = k
+        self.count = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_error(cls, rank_error: float, seed: Optional[int] = None) -> "KLLSketch":
+        """Return a sketch with roughly the given rank error."""
+        return cls(max(8, math.ceil(3 / rank_error)), seed=seed)
+
+    def __repr__(self) -> str:
+        return f"KLLSketch(k={self.k}, count={self.count})"
+
+    def update(self, values: Any) -> "KLLSketch":
+        """Add the non-null values of an array to the sketch."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Merge another sketch into this one."""
+        for h, items in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - 1 - h
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def _compress(self) -> None:
+        h = 0
+        while h < len(self.levels):
+            items = self.levels[h]
+            if len(items) <= self._capacity(h):
+                h += 1
+                continue
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            # With an odd number of items, one is held back at this level.
+            odd = len(items) % 2
+            held, items = items[len(items) - odd :], np.sort(items[: len(items) - odd])
+            offset = self._rng.integers(2)
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], items[offset::2]])
+            self.levels[h] = held
+            # Capacities shrink as levels are added: start again from the bottom.
+            h = 0
+
+    def quantile(self, q: Any) -> Any:
+        """Return the approximate quantiles q of the values."""
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        if len(self.levels) == 1:
+            return np.quantile(self.levels[0], q)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)]
+        )
+        order = np.argsort(items, kind="stable")
+        items, cumulative = items[order], np.cumsum(weights[order])
+        # The item whose weighted rank range covers the quantile.
+        ranks = np.asarray(q, dtype=float) * (cumulative[-1] - 1)
+        positions = np.searchsorted(cumulative, ranks, side="right")
+        return items[np.minimum(positions, len(items) - 1)]
+
+
+def _group_values(
+    df: pd.DataFrame, grouped: Any, field: str
+) -> Tuple[pd.Series, np.ndarray, pd.Index]:
+    """Return the non-null values of a field sorted by group, and their group codes."""
+    groups = groups_of(grouped)
+    values = df[field]
+    positions = groups.order[values.notnull().to_numpy()[groups.order]]
+    return values.take(positions), groups.codes[positions], groups.index
+
+
+def group_sketches(
+    df: pd.DataFrame, grouped: Any, field: str, kind: str, opts: Dict[str, Any]
+) -> pd.Series:
+    """Return the sketch ("hll" or "kll") of a field in each group.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The data.
+    grouped : DataFrameGroupBy or GroupIndex
+        The grouping of ``df``.
+    field : str
+        The field to sketch.
+    kind : str
+        "hll" for HyperLogLog, or "kll" for KLL sketches.
+    opts : dict
+        The sketch options, as returned by :func:`options`.
+
+    Returns
+    -------
+    sketches : pd.Series
+        The sketch of each group, indexed by the group keys.
+    """
+    values, codes, index = _group_values(df, grouped, field)
+    sketches = np.empty(len(index), dtype=object)
+    if kind == "hll":
+        precision = _precision(opts["relative_error"])
+        m = 1 << precision
+        registers = np.zeros(len(index) * m, dtype=np.uint8)
+        position, rank = _hll_hash(values, precision)
+        np.maximum.at(registers, codes * m + position, rank)
+        for i, row in enumerate(registers.reshape(len(index), m)):
+            sketches[i] = HyperLogLog(precision)
+            sketches[i].registers = row
+    else:
+        ends = np.cumsum(np.bincount(codes, minlength=len(index)))
+        data = values.to_numpy(dtype=float)
+        seed = np.random.SeedSequence(opts["seed"]).spawn(len(index))
+        for i, (start, end) in enumerate(zip(np.append(0, ends[:-1]), ends)):
+            sketch = KLLSketch.from_error(opts["rank_error"], seed=seed[i])
+            sketches[i] = sketch.update(data[start:end])
+    return pd.Series(sketches, index=index)
+
+
+def approximate_aggregate(
+    df: pd.DataFrame, grouped: Any, field: str, op: str
+) -> pd.Series:
+    """Return the approximate aggregate of a field in each group.
+
+    Distinct counts of all groups are estimated at once, from the sparse
+    registers of their HyperLogLogs. Quantiles are computed from a KLL sketch
+    of each group.
+
+    Returns
+    -------
+    result : pd.Series
+        The aggregate of each group, indexed by the group keys.
+    """
+    opts = options()
+    if op != "distinct":
+        sketches = group_sketches(df, grouped, field, "kll", opts)
+        return sketches.map(lambda sketch: sketch.quantile(QUANTILES[op]))
+    values, codes, index = _group_values(df, grouped, field)
+    precision = _precision(opts["relative_error"])
+    m = 1 << precision
+    position, rank = _hll_hash(values, precision)
+    # The maximum rank of each occupied register of each group.
+    registers = pd.Series(rank).groupby(codes * m + position).max()
+    group = (registers.index.to_numpy() // m).astype(int)
+    occupied = np.bincount(group, minlength=len(index))
+    harmonic = np.bincount(
+        group,
+        weights=np.ldexp(1.0, -registers.to_numpy().astype(int)),
+        minlength=len(index),
+    )
+    estimate = _hll_estimate(m, m - occupied, harmonic + (m - occupied))
+    return pd.Series(np.round(estimate).astype(int), index=index)
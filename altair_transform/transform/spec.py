@@ -0,0 +1,263 @@
+"""Lightweight normalized representation of transform specifications.
+
+Visitors consume the JSON form of a transform. Building that form from Altair
+objects (``to_dict()``) or building Altair objects from it (``from_dict()``)
+runs jsonschema validation, which can dominate the cost of transforming small
+datasets. The classes here wrap the JSON form directly, so that a transform is
+validated at most once, and not at all when the caller marks the specification
+as trusted.
+"""
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Type, Union
+
+import altair as alt
+
+__all__ = ["TransformSpec", "cache_options", "normalize", "normalize_list"]
+
+# Registry mapping the identifying property of a transform to its spec class.
+_SPEC_TYPES: Dict[str, Type["TransformSpec"]] = {}
+
+# Registry of the functions returning the current options that affect the
+# results of a transform, by name; see cache_options().
+_CACHE_OPTIONS: Dict[str, Callable[["TransformSpec"], Any]] = {}
+
+
+def cache_options(
+    name: str,
+) -> Callable[[Callable[["TransformSpec"], Any]], Callable[["TransformSpec"], Any]]:
+    """Register a function returning the options that affect a transform.
+
+    The modules defining options (such as ``confidence_intervals()``) register
+    a function of a spec returning the current options that affect its results,
+    an empty value if none do, or None if its results are not reproducible
+    under these options. See :meth:`TransformSpec.cache_key`.
+    """
+
+    def register(
+        func: Callable[["TransformSpec"], Any]
+    ) -> Callable[["TransformSpec"], Any]:
+        _CACHE_OPTIONS[name] = func
+        return func
+
+    return register
+
+
+class TransformSpec(Mapping):
+    """Base class for normalized transform specifications.
+
+    Each subclass corresponds to a single Vega-Lite transform type, identified
+    by the property named by ``key``. The specification is stored as the plain
+    JSON-style dict, which is exposed through a read-only mapping interface.
+    Visitors must not modify the wrapped dict.
+    """
+
+    __slots__ = ("_spec",)
+    key: str = ""
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)  # type: ignore
+        _SPEC_TYPES[cls.key] = cls
+
+    def __init__(self, spec: Dict[str, Any]):
+        self._spec = spec
+
+    def __getitem__(self, key: str) -> Any:
+        return self._spec[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._spec)
+
+    def __len__(self) -> int:
+        return len(self._spec)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TransformSpec):
+            return NotImplemented
+        return type(self) is type(other) and self._spec == other._spec
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._spec!r})"
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return self._spec
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self._spec = state
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the JSON-style specification."""
+        return self._spec
+
+    def ops(self) -> Set[str]:
+        """Return the names of the operations computed by the transform."""
+        return set()
+
+    def cache_key(self) -> Optional[Dict[str, Any]]:
+        """Return the current options that affect the results of the transform.
+
+        Together with the specification, these identify cached results. Returns
+        None if the results are not reproducible, and must not be reused.
+        """
+        key = {}
+        for name, options in _CACHE_OPTIONS.items():
+            value = options(self)
+            if value is None:
+                return None
+            if value:
+                key[name] = value
+        return key
+
+    @classmethod
+    def _from_altair(cls, transform: alt.Transform, validate: bool) -> dict:
+        return transform.to_dict(validate=validate)
+
+
+class AggregateSpec(TransformSpec):
+    __slots__ = ()
+    key = "aggregate"
+
+    def ops(self) -> Set[str]:
+        return {a["op"] for a in self["aggregate"]}
+
+
+class BinSpec(TransformSpec):
+    __slots__ = ()
+    key = "bin"
+
+
+class CalculateSpec(TransformSpec):
+    __slots__ = ()
+    key = "calculate"
+
+
+class FilterSpec(TransformSpec):
+    __slots__ = ()
+    key = "filter"
+
+
+class FlattenSpec(TransformSpec):
+    __slots__ = ()
+    key = "flatten"
+
+
+class FoldSpec(TransformSpec):
+    __slots__ = ()
+    key = "fold"
+
+
+class ImputeSpec(TransformSpec):
+    __slots__ = ()
+    key = "impute"
+
+
+class JoinAggregateSpec(TransformSpec):
+    __slots__ = ()
+    key = "joinaggregate"
+
+    def ops(self) -> Set[str]:
+        return {a["op"] for a in self["joinaggregate"]}
+
+
+class LookupSpec(TransformSpec):
+    __slots__ = ()
+    key = "lookup"
+
+    @classmethod
+    def _from_altair(cls, transform: alt.Transform, validate: bool) -> dict:
+        # Lookup data must be kept inline rather than moved to top-level datasets.
+        with alt.data_transformers.enable(consolidate_datasets=False):
+            return transform.to_dict(validate=validate)
+
+
+class PivotSpec(TransformSpec):
+    __slots__ = ()
+    key = "pivot"
+
+    def ops(self) -> Set[str]:
+        return {self.get("op", "sum")}
+
+
+class QuantileSpec(TransformSpec):
+    __slots__ = ()
+    key = "quantile"
+
+    def ops(self) -> Set[str]:
+        return {"quantile"}
+
+
+class RegressionSpec(TransformSpec):
+    __slots__ = ()
+    key = "regression"
+
+
+class SampleSpec(TransformSpec):
+    __slots__ = ()
+    key = "sample"
+
+    def cache_key(self) -> Optional[Dict[str, Any]]:
+        # Samples are random.
+        return None
+
+
+class TimeUnitSpec(TransformSpec):
+    __slots__ = ()
+    key = "timeUnit"
+
+
+class WindowSpec(TransformSpec):
+    __slots__ = ()
+    key = "window"
+
+    def ops(self) -> Set[str]:
+        return {w["op"] for w in self["window"]}
+
+
+def _spec_type(transform: Union[dict, alt.SchemaBase]) -> Type[TransformSpec]:
+    if isinstance(transform, dict):
+        keys = set(transform)
+    else:
+        keys = {k for k, v in transform._kwds.items() if v is not alt.Undefined}
+    for key, cls in _SPEC_TYPES.items():
+        if key in keys:
+            return cls
+    raise NotImplementedError(f"transform with properties {sorted(keys)}")
+
+
+def normalize(
+    transform: Union[TransformSpec, dict, alt.Transform], validate: bool = True
+) -> TransformSpec:
+    """Normalize a single transform to its lightweight representation.
+
+    Parameters
+    ----------
+    transform : TransformSpec, dict, or alt.Transform
+        The transform specification.
+    validate : bool
+        If True (default), validate the specification against the Vega-Lite
+        schema. If False, the specification is trusted and no jsonschema
+        validation is performed.
+
+    Returns
+    -------
+    spec : TransformSpec
+        The normalized specification.
+    """
+    if isinstance(transform, TransformSpec):
+        return transform
+    if isinstance(transform, dict):
+        if validate:
+            alt.Transform.validate(transform)
+        return _spec_type(transform)(transform)
+    if isinstance(transform, alt.SchemaBase):
+        cls = _spec_type(transform)
+        return cls(cls._from_altair(transform, validate=validate))
+    raise NotImplementedError(f"transform of type {type(transform)}")
+
+
+def normalize_list(
+    transform: Union[list, TransformSpec, dict, alt.Transform], validate: bool = True
+) -> List[TransformSpec]:
+    """Normalize a transform or list of transforms to a list of specs."""
+    if isinstance(transform, list):
+        return [normalize(t, validate=validate) for t in transform]
+    return [normalize(transform, validate=validate)]
@@ -0,0 +1,103 @@
+"""Out-of-core evaluation of transforms over a stream of dataframes.
+
+A dataset that does not fit in memory is passed as an iterable of dataframe
+chunks, for example the chunks of a CSV file read with ``pd.read_csv(...,
+chunksize=...)``. The leading row-local transforms of the pipeline are applied
+to each chunk as it is read. At the first pipeline breaker:
+
+- an aggregate transform accumulates mergeable partial states per group, and
+  its (small) result is computed once all chunks have been read;
+- a joinaggregate transform accumulates partial states while retaining the
+  transformed chunks, and joins the result to each chunk at the end;
+- any other transform requires the transformed chunks to be concatenated.
+
+The remaining transforms are then evaluated in memory.
+"""
+from typing import Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from .chunked import concat_chunks, fuse, visit_chunks
+from .partial import PartialAggregate
+from .pipeline import visit_spec
+from .spec import AggregateSpec, JoinAggregateSpec, TransformSpec, normalize
+from .visitor import visit
+
+__all__ = ["visit_stream"]
+
+
+def visit_stream(
+    transform: list,
+    chunks: Iterable[pd.DataFrame],
+    chunksize: Optional[int] = None,
+    n_jobs: Optional[int] = None,
+) -> pd.DataFrame:
+    """Evaluate a list of transforms over a stream of dataframe chunks.
+
+    Parameters
+    ----------
+    transform : list
+        The transforms to apply.
+    chunks : iterable of pd.DataFrame
+        The input data, in chunks of rows. The chunks are consumed once.
+    chunksize : int, optional
+        The chunk size used for transforms evaluated after the data has been
+        materialized (see :func:`altair_transform.apply`).
+    n_jobs : int, optional
+        The number of worker processes used for grouped transforms evaluated
+        after the data has been materialized (see :func:`altair_transform.apply`).
+
+    Returns
+    -------
+    df_transformed : pd.DataFrame
+        The transformed data, with a fresh index.
+    """
+    specs: List[TransformSpec] = [normalize(t) for t in transform]
+    # Transforms may modify their input in place, so chunks are copied.
+    stream: Iterator[pd.DataFrame] = (chunk.copy() for chunk in chunks)
+    stages = fuse(specs)
+    i = 0
+    for fused, stage in stages:
+        if not fused:
+            break
+        stream = visit_chunks(stage, stream)
+        i += len(stage)
+
+    if i == len(specs):
+        return concat_chunks(stream, reset_index=True)
+
+    spec = specs[i]
+    if isinstance(spec, AggregateSpec):
+        df = _aggregate_stream(spec, stream)
+    elif isinstance(spec, JoinAggregateSpec):
+        df = _joinaggregate_stream(spec, stream)
+    else:
+        df = visit_spec(spec, concat_chunks(stream, reset_index=True), n_jobs)
+    return visit(specs[i + 1 :], df, chunksize=chunksize, n_jobs=n_jobs)
+
+
+def _aggregate_stream(
+    transform: AggregateSpec, chunks: Iterator[pd.DataFrame]
+) -> pd.DataFrame:
+    partial = PartialAggregate(transform["aggregate"], transform.get("groupby", []))
+    for chunk in chunks:
+        partial.update(chunk)
+    return partial.finalize()
+
+
+def _joinaggregate_stream(
+    transform: JoinAggregateSpec, chunks: Iterator[pd.DataFrame]
+) -> pd.DataFrame:
+    groupby = transform.get("groupby", [])
+    partial = PartialAggregate(transform["joinaggregate"], groupby)
+    retained = []
+    for chunk in chunks:
+        partial.update(chunk)
+        retained.append(chunk)
+    df = concat_chunks(retained, reset_index=True)
+    result = partial.result()
+    if groupby:
+        return df.join(result, on=groupby)
+    for col in result.columns:
+        df[col] = result[col].iloc[0] if len(result) else None
+    return df
@@ -1,3 +1,4 @@
+import threading
 from typing import Any, Dict, List, Optional
 
 import numpy as np
@@ -6,7 +7,11 @@ from pandas.testing import assert_frame_equal
 import pytest
 
 import altair_transform
-from altair_transform.transform.aggregate import AGG_REPLACEMENTS
+from altair_transform.transform.aggregate import (
+    AGG_REPLACEMENTS,
+    ci_options,
+    confidence_intervals,
+)
 
 AGGREGATES = [
     "argmax",
@@ -33,7 +38,7 @@ AGGREGATES = [
     "variancep",
 ]
 
-AGG_SKIP = ["ci0", "ci1"]  # These require scipy.
+AGG_SKIP = ["ci0", "ci1"]  # Vega computes these by random resampling.
 
 
 @pytest.fixture
@@ -43,7 +48,7 @@ def data() -> pd.DataFrame:
 
 
 @pytest.mark.parametrize("groupby", [True, False])
-@pytest.mark.parametrize("op", set(AGGREGATES) - set(AGG_SKIP))
+@pytest.mark.parametrize("op", AGGREGATES)
 def test_aggregate_transform(data: pd.DataFrame, groupby: bool, op: Any):
     field = "x"
     col = "z"
@@ -87,6 +92,101 @@ def test_aggregate_transform(data: pd.DataFrame, groupby: bool, op: Any):
     assert_frame_equal(grouped, out)
 
 
+@pytest.mark.parametrize("op", ["argmin", "argmax"])
+def test_aggregate_arg_records(op: str):
+    data = pd.DataFrame(
+        {
+            "x": [3, np.nan, 1, 1, 5, 5, np.nan],
+            "c": ["a", "b", "a", "a", "a", None, "b"],
+            "s": list("qwertyu"),
+        },
+        index=[9, 8, 7, 6, 5, 4, 3],
+    )
+    transform = {"aggregate": [{"op": op, "field": "x", "as": "r"}], "groupby": ["c"]}
+    out = altair_transform.apply(data, transform)
+    # Ties go to the first row, and groups without valid values are None.
+    row = 2 if op == "argmin" else 4
+    assert out["c"].tolist() == ["a", "b"]
+    assert out["r"].tolist() == [data.iloc[row].to_dict(), None]
+
+
+def test_aggregate_values_unsorted():
+    data = pd.DataFrame({"x": [1, 2, 3, 4, 5], "c": ["b", "a", None, "b", "a"]})
+    transform = {"aggregate": [{"op": "values", "as": "v"}], "groupby": ["c"]}
+    out = altair_transform.apply(data, transform)
+    expected = data.groupby("c").apply(lambda x: x.to_dict(orient="records"))
+    assert out["c"].tolist() == ["a", "b"]
+    assert out["v"].tolist() == expected.tolist()
+
+
+def test_aggregate_empty():
+    data = pd.DataFrame({"x": pd.Series([], dtype=float), "y": []})
+    transform = {
+        "aggregate": [
+            {"op": "distinct", "field": "y", "as": "distinct"},
+            {"op": "sum", "field": "x", "as": "sum"},
+            {"op": "valid", "field": "x", "as": "valid"},
+        ]
+    }
+    out = altair_transform.apply(data, transform)
+    assert out.to_dict(orient="records") == [{"distinct": 0, "sum": 0, "valid": 0}]
+
+
+@pytest.mark.parametrize("groupby", [None, ["c"]])
+def test_aggregate_multiple(data: pd.DataFrame, groupby: Optional[List[str]]):
+    data.loc[[2, 7], "x"] = np.nan
+    transform: Dict[str, Any] = {
+        "aggregate": [{"op": op, "field": "x", "as": op} for op in AGGREGATES]
+    }
+    if groupby:
+        transform["groupby"] = groupby
+    out = altair_transform.apply(data, transform)
+    for op in AGGREGATES:
+        single = dict(transform, aggregate=[{"op": op, "field": "x", "as": op}])
+        expected = altair_transform.apply(data, single)
+        assert_frame_equal(out[expected.columns], expected)
+
+
+@pytest.mark.parametrize("groupby", [None, ["c"]])
+def test_aggregate_bootstrap_ci(groupby: Optional[List[str]]):
+    rand = np.random.RandomState(0)
+    data = pd.DataFrame({"x": rand.randn(600), "c": rand.choice(list("AB"), 600)})
+    data.loc[:5, "x"] = np.nan
+    transform: Dict[str, Any] = {
+        "aggregate": [
+            {"op": "ci0", "field": "x", "as": "ci0"},
+            {"op": "ci1", "field": "x", "as": "ci1"},
+        ]
+    }
+    if groupby:
+        transform["groupby"] = groupby
+    expected = altair_transform.apply(data, transform)
+    with confidence_intervals("bootstrap", seed=42):
+        out = altair_transform.apply(data, transform)
+    with confidence_intervals("bootstrap", seed=42):
+        assert_frame_equal(altair_transform.apply(data, transform), out)
+    # Both intervals are close for normally distributed data.
+    assert_frame_equal(out, expected, atol=0.05)
+    assert (out["ci0"] < out["ci1"]).all()
+
+
+def test_confidence_intervals_thread_local():
+    # Options set in one thread do not apply to pipelines in other threads.
+    methods = []
+    with confidence_intervals("bootstrap"):
+        thread = threading.Thread(target=lambda: methods.append(ci_options()["method"]))
+        thread.start()
+        thread.join()
+        methods.append(ci_options()["method"])
+    assert methods == ["t", "bootstrap"]
+
+
+def test_confidence_intervals_invalid():
+    with pytest.raises(ValueError, match="Unknown confidence interval method"):
+        with confidence_intervals("normal"):
+            pass
+
+
 @pytest.mark.parametrize("groupby", [None, ["c"]])
 @pytest.mark.parametrize("op", set(AGGREGATES) - set(AGG_SKIP))
 def test_aggregate_against_js(
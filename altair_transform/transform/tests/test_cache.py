@@ -0,0 +1,235 @@
+import altair as alt
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+import altair_transform
+from altair_transform.transform.cache import TransformCache
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(42)
+    return pd.DataFrame(
+        {
+            "x": rand.randint(0, 100, 12),
+            "y": rand.randint(0, 100, 12),
+            "c": list("AAABBBCCCDDD"),
+        }
+    )
+
+
+PREFIX = [
+    {"filter": "datum.x > 20"},
+    {"calculate": "datum.x + datum.y", "as": "xpy"},
+]
+
+
+@pytest.mark.parametrize("op", ["sum", "mean", "max"])
+def test_cache_results_match(data: pd.DataFrame, op: str) -> None:
+    cache = TransformCache()
+    transform = PREFIX + [
+        {"aggregate": [{"op": op, "field": "xpy", "as": "z"}], "groupby": ["c"]}
+    ]
+    expected = altair_transform.apply(data, transform)
+    got1 = altair_transform.apply(data, transform, cache=cache)
+    got2 = altair_transform.apply(data, transform, cache=cache)
+    assert_frame_equal(got1, expected)
+    assert_frame_equal(got2, expected)
+
+
+def test_cache_reuses_longest_prefix(data: pd.DataFrame) -> None:
+    cache = TransformCache()
+    agg1 = {"aggregate": [{"op": "sum", "field": "xpy", "as": "z"}], "groupby": ["c"]}
+    agg2 = {"aggregate": [{"op": "min", "field": "y", "as": "z"}], "groupby": ["c"]}
+
+    altair_transform.apply(data, PREFIX + [agg1], cache=cache)
+    assert cache.info().misses == 1
+    assert len(cache) == 3
+
+    keys = set(cache._entries)
+    out = altair_transform.apply(data, PREFIX + [agg2], cache=cache)
+    assert cache.info().hits == 1
+    assert len(cache) == 4
+    assert keys < set(cache._entries)
+    assert_frame_equal(out, altair_transform.apply(data, PREFIX + [agg2]))
+
+
+def test_cache_confidence_interval_options(data: pd.DataFrame) -> None:
+    cache = TransformCache()
+    transform = PREFIX + [
+        {"aggregate": [{"op": "ci0", "field": "xpy", "as": "ci0"}], "groupby": ["c"]}
+    ]
+    altair_transform.apply(data, transform, cache=cache)
+    with altair_transform.confidence_intervals("bootstrap", seed=1):
+        expected = altair_transform.apply(data, transform)
+        got = altair_transform.apply(data, transform, cache=cache)
+    assert_frame_equal(got, expected)
+    # The prefix does not depend on the options, and is reused.
+    assert cache.info().hits == 1
+
+
+def test_cache_approximate_options() -> None:
+    rand = np.random.RandomState(0)
+    data = pd.DataFrame({"u": rand.randint(0, 50000, 20000), "c": list("AB") * 10000})
+    cache = TransformCache()
+    transform = {
+        "aggregate": [{"op": "distinct", "field": "u", "as": "n"}],
+        "groupby": ["c"],
+    }
+    exact = altair_transform.apply(data, transform, cache=cache)
+    with altair_transform.approximate(["distinct"], seed=0):
+        expected = altair_transform.apply(data, transform)
+        got = altair_transform.apply(data, transform, cache=cache)
+    assert not expected.equals(exact)
+    assert_frame_equal(got, expected)
+    assert_frame_equal(altair_transform.apply(data, transform, cache=cache), exact)
+
+
+def test_cache_options_of_other_ops(data: pd.DataFrame) -> None:
+    cache = TransformCache()
+    transform = PREFIX + [
+        {"aggregate": [{"op": "sum", "field": "xpy", "as": "z"}], "groupby": ["c"]}
+    ]
+    altair_transform.apply(data, transform, cache=cache)
+    with altair_transform.confidence_intervals("bootstrap", seed=1):
+        with altair_transform.approximate(seed=0):
+            altair_transform.apply(data, transform, cache=cache)
+    # Options of operations the aggregate does not compute are not in its key.
+    assert cache.info().hits == 1
+    assert len(cache) == 3
+
+
+def test_cache_skips_unseeded_options(data: pd.DataFrame) -> None:
+    cache = TransformCache()
+    transform = PREFIX + [
+        {"aggregate": [{"op": "ci0", "field": "xpy", "as": "ci0"}], "groupby": ["c"]}
+    ]
+    with altair_transform.confidence_intervals("bootstrap"):
+        altair_transform.apply(data, transform, cache=cache)
+    assert len(cache) == len(PREFIX)
+    quantile = {"quantile": "x", "probs": [0.5]}
+    with altair_transform.approximate(seed=None):
+        altair_transform.apply(data, quantile, cache=cache)
+    assert len(cache) == len(PREFIX)
+
+
+def test_cache_skips_samples(data: pd.DataFrame, tmp_path) -> None:
+    cache = TransformCache()
+    transform = PREFIX + [{"sample": 4}, {"filter": "datum.y > 0"}]
+    np.random.seed(0)
+    altair_transform.apply(data, transform, cache=cache)
+    assert len(cache) == len(PREFIX)
+
+    np.random.seed(1)
+    got = altair_transform.apply(data, transform, cache=cache)
+    np.random.seed(1)
+    expected = altair_transform.apply(data, transform)
+    assert cache.info().hits == 1
+    assert_frame_equal(got, expected)
+
+    # Streamed results are not cached either.
+    path = str(tmp_path / "data.csv")
+    data.to_csv(path, index=False)
+    chart = (
+        alt.Chart(alt.UrlData(path)).transform_sample(4).mark_point().encode(x="x:Q")
+    )
+    cache = TransformCache()
+    altair_transform.extract_data(chart, cache=cache, chunksize=5)
+    assert len(cache) == 0
+
+
+def test_cache_distinguishes_data(data: pd.DataFrame) -> None:
+    cache = TransformCache()
+    altair_transform.apply(data, PREFIX, cache=cache)
+    data2 = data.copy()
+    data2.loc[0, "x"] = 99
+    out = altair_transform.apply(data2, PREFIX, cache=cache)
+    assert cache.info().hits == 0
+    assert_frame_equal(out, altair_transform.apply(data2, PREFIX))
+
+
+def test_cache_results_are_copies(data: pd.DataFrame) -> None:
+    cache = TransformCache()
+    out1 = altair_transform.apply(data, PREFIX, cache=cache)
+    out1["xpy"] = 0
+    out2 = altair_transform.apply(data, PREFIX, cache=cache)
+    assert (out2["xpy"] != 0).all()
+
+
+def test_cache_eviction(data: pd.DataFrame) -> None:
+    cache = TransformCache()
+    altair_transform.apply(data, {"calculate": "0", "as": "z"}, cache=cache)
+    nbytes = cache.info().nbytes
+
+    cache = TransformCache(max_bytes=3 * nbytes)
+    for i in range(5):
+        altair_transform.apply(data, {"calculate": str(i), "as": "z"}, cache=cache)
+    info = cache.info()
+    assert info.nbytes <= info.max_bytes
+    assert info.evictions > 0
+    assert info.entries == 3
+
+    # The least recently used entry is evicted first.
+    cache.clear()
+    for i in [1, 2, 1, 3, 4]:
+        altair_transform.apply(data, {"calculate": str(i), "as": "z"}, cache=cache)
+    assert cache.info().hits == 1
+    altair_transform.apply(data, {"calculate": "1", "as": "z"}, cache=cache)
+    assert cache.info().hits == 2
+    altair_transform.apply(data, {"calculate": "2", "as": "z"}, cache=cache)
+    assert cache.info().hits == 2
+
+
+def test_cache_invalidate(data: pd.DataFrame) -> None:
+    cache = TransformCache()
+    other = data.iloc[:5]
+    altair_transform.apply(data, PREFIX, cache=cache)
+    altair_transform.apply(other, PREFIX, cache=cache)
+    assert len(cache) == 4
+
+    cache.invalidate(other)
+    assert len(cache) == 2
+    altair_transform.apply(data, PREFIX, cache=cache)
+    assert cache.info().hits == 1
+
+    cache.invalidate()
+    assert len(cache) == 0
+    assert cache.info().nbytes == 0
+
+
+def test_cache_extract_data_from_url(data: pd.DataFrame, tmp_path) -> None:
+    path = str(tmp_path / "data.csv")
+    data.to_csv(path, index=False)
+    chart = (
+        alt.Chart(alt.UrlData(path))
+        .transform_filter("datum.x > 20")
+        .mark_point()
+        .encode(x="x:Q")
+    )
+
+    cache = TransformCache()
+    out1 = altair_transform.extract_data(chart, cache=cache)
+    out2 = altair_transform.extract_data(chart, cache=cache)
+    assert cache.info().hits == 1
+    assert_frame_equal(out1, out2)
+
+    cache.invalidate(alt.UrlData(path))
+    assert len(cache) == 0
+
+
+def test_cache_apply_sampled_fingerprint(data: pd.DataFrame) -> None:
+    cache = TransformCache(sample_size=2)
+    altair_transform.apply(data, PREFIX, cache=cache)
+    altair_transform.apply(data, PREFIX, cache=cache)
+    assert cache.info().hits == 1
+
+    # A copy of the data is recognized only by an exact fingerprint.
+    altair_transform.apply(data.copy(), PREFIX, cache=cache)
+    assert cache.info().hits == 1
+
+    cache = TransformCache(exact=True)
+    altair_transform.apply(data, PREFIX, cache=cache)
+    altair_transform.apply(data.copy(), PREFIX, cache=cache)
+    assert cache.info().hits == 1
@@ -0,0 +1,127 @@
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+import altair_transform
+from altair_transform.transform.cache import TransformCache
+from altair_transform.transform.chunked import fuse, is_streamable
+from altair_transform.transform.spec import normalize, normalize_list
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(42)
+    return pd.DataFrame(
+        {
+            "x": rand.randint(0, 100, 25),
+            "y": rand.randint(0, 100, 25),
+            "l": [list(range(i % 3 + 1)) for i in range(25)],
+            "c": list("ABCDE") * 5,
+        }
+    )
+
+
+PIPELINES: List[List[Dict[str, Any]]] = [
+    [{"calculate": "datum.x + datum.y", "as": "z"}],
+    [
+        {"calculate": "datum.x + datum.y", "as": "z"},
+        {"filter": "datum.z > 100"},
+        {"bin": {"extent": [0, 200], "maxbins": 5}, "field": "z", "as": "zbin"},
+    ],
+    [
+        {"filter": {"field": "x", "lt": 50}},
+        {"calculate": "length(datum.l)", "as": "l"},
+        {"fold": ["x", "y"]},
+        {"bin": {"extent": [0, 100]}, "field": "value", "as": "binned"},
+    ],
+    [{"flatten": ["l"]}, {"calculate": "2 * datum.l", "as": "l2"}],
+    [
+        {"filter": "datum.x > 20"},
+        {"aggregate": [{"op": "sum", "field": "y", "as": "y"}], "groupby": ["c"]},
+        {"calculate": "datum.y / 2", "as": "half"},
+    ],
+    [{"filter": "datum.x > 1000"}, {"calculate": "datum.x", "as": "z"}],
+]
+
+
+@pytest.mark.parametrize("chunksize", [1, 4, 10, 100])
+@pytest.mark.parametrize("transform", PIPELINES)
+def test_chunked_matches_unchunked(
+    data: pd.DataFrame, transform: List[Dict[str, Any]], chunksize: int
+) -> None:
+    expected = altair_transform.apply(data, transform)
+    got = altair_transform.apply(data, transform, chunksize=chunksize)
+    assert_frame_equal(got, expected)
+
+
+def test_is_streamable() -> None:
+    assert is_streamable(normalize({"calculate": "1", "as": "z"}))
+    assert is_streamable(normalize({"sample": 10}))
+    assert is_streamable(
+        normalize({"bin": {"extent": [0, 10]}, "field": "x", "as": "b"})
+    )
+    assert not is_streamable(normalize({"bin": True, "field": "x", "as": "b"}))
+    assert not is_streamable(
+        normalize({"aggregate": [{"op": "count", "as": "c"}], "groupby": ["x"]})
+    )
+
+
+def test_fuse() -> None:
+    specs = normalize_list(
+        [
+            {"calculate": "1", "as": "a"},
+            {"filter": "datum.a"},
+            {"sample": 5},
+            {"calculate": "2", "as": "b"},
+            {"window": [{"op": "sum", "field": "b", "as": "c"}]},
+            {"calculate": "3", "as": "d"},
+        ]
+    )
+    stages = fuse(specs)
+    assert [(fused, len(stage)) for fused, stage in stages] == [
+        (True, 3),
+        (True, 1),
+        (False, 1),
+        (True, 1),
+    ]
+
+
+@pytest.mark.parametrize("N", [1, 5, 50])
+@pytest.mark.parametrize("chunksize", [1, 3, 100])
+def test_chunked_sample(data: pd.DataFrame, N: int, chunksize: int) -> None:
+    out = altair_transform.apply(data, {"sample": N}, chunksize=chunksize)
+    assert out.shape == (min(N, data.shape[0]), data.shape[1])
+    assert_frame_equal(out, data.loc[out.index])
+    assert out.index.is_monotonic_increasing
+
+
+def test_chunked_sample_after_filter(data: pd.DataFrame) -> None:
+    transform = [{"filter": "datum.x > 20"}, {"sample": 5}]
+    filtered = altair_transform.apply(data, transform[:1])
+    out = altair_transform.apply(data, transform, chunksize=3)
+    assert out.shape == (5, data.shape[1])
+    assert_frame_equal(out, filtered.loc[out.index])
+
+
+def test_chunked_sample_is_uniform() -> None:
+    np.random.seed(0)
+    data = pd.DataFrame({"x": np.arange(20)})
+    counts = np.zeros(20)
+    for _ in range(500):
+        out = altair_transform.apply(data, {"sample": 5}, chunksize=3)
+        counts[out["x"]] += 1
+    # Each row is included with probability 1/4.
+    assert np.allclose(counts / 500, 0.25, atol=0.08)
+
+
+def test_chunked_with_cache(data: pd.DataFrame) -> None:
+    cache = TransformCache()
+    transform = PIPELINES[2]
+    expected = altair_transform.apply(data, transform)
+    altair_transform.apply(data, transform[:1], cache=cache)
+    out = altair_transform.apply(data, transform, cache=cache, chunksize=4)
+    assert cache.info().hits == 1
+    assert_frame_equal(out, expected)
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+import altair_transform
+from altair_transform.transform.cube import AggregateCube
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(42)
+    df = pd.DataFrame(
+        {
+            "i": np.arange(60),
+            "x": rand.randn(60),
+            "c": rand.choice(list("abc"), 60),
+            "d": rand.choice(["u", "v", None], 60),
+            "e": pd.Categorical(rand.choice(list("pr"), 60), categories=list("pqr")),
+        }
+    )
+    df.loc[[2, 7, 30], "x"] = np.nan
+    return df
+
+
+OPS = ["valid", "missing", "distinct", "sum", "mean", "variance", "stdevp", "stderr"]
+AGGREGATES = [{"op": "count"}] + [
+    {"op": op, "field": "x"} for op in OPS + ["min", "max"]
+]
+
+
+def _aggregate(groupby: list) -> dict:
+    return {
+        "aggregate": [{**agg, "as": f"a{i}"} for i, agg in enumerate(AGGREGATES)],
+        "groupby": groupby,
+    }
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize(
+    "groupby", [[], ["c"], ["d"], ["e"], ["c", "d"], ["e", "c"], ["c", "d", "e"]]
+)
+def test_cube_rollup(data: pd.DataFrame, groupby: list) -> None:
+    cube = AggregateCube(data, ["c", "d", "e"], AGGREGATES)
+    transform = _aggregate(groupby)
+    assert cube.supports(transform)
+    expected = altair_transform.apply(data, transform)
+    out = cube.apply(transform)
+    assert_frame_equal(
+        out.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False
+    )
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize(
+    "transform",
+    [
+        {"aggregate": [{"op": "median", "field": "x", "as": "m"}], "groupby": ["c"]},
+        {"aggregate": [{"op": "values", "as": "v"}], "groupby": ["c"]},
+        {"aggregate": [{"op": "argmax", "field": "x", "as": "a"}], "groupby": ["c"]},
+        {"aggregate": [{"op": "product", "field": "x", "as": "p"}], "groupby": ["c"]},
+        {"aggregate": [{"op": "sum", "field": "x", "as": "s"}], "groupby": ["i"]},
+    ],
+)
+def test_cube_fallback(data: pd.DataFrame, transform: dict) -> None:
+    cube = AggregateCube(
+        data, ["c", "d"], AGGREGATES + [{"op": "median", "field": "x"}]
+    )
+    assert not cube.supports(transform)
+    expected = altair_transform.apply(data, transform)
+    assert_frame_equal(cube.apply(transform), expected)
+
+
+def test_cube_invalid_transform(data: pd.DataFrame) -> None:
+    cube = AggregateCube(data, ["c"], AGGREGATES)
+    transform = {"filter": "datum.x > 0"}
+    assert not cube.supports(transform)
+    with pytest.raises(ValueError, match="aggregate transforms"):
+        cube.apply(transform)
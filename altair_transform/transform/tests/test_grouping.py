@@ -0,0 +1,286 @@
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+import altair_transform
+from altair_transform.transform import grouping, visit
+from altair_transform.transform.grouping import (
+    GroupIndex,
+    group_cache,
+    group_codes,
+    group_index,
+    invalidate,
+)
+from altair_transform.transform.spec import normalize
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(42)
+    return pd.DataFrame(
+        {
+            "x": rand.randint(0, 100, 30),
+            "c": rand.choice(["a", "b", None], 30),
+            "d": pd.Categorical(rand.choice(list("pr"), 30), categories=list("pqr")),
+        }
+    )
+
+
+def test_group_index(data: pd.DataFrame) -> None:
+    groups = GroupIndex.from_frame(data, ["c", "d"])
+    expected = data.groupby(["c", "d"], observed=False).size()
+    assert groups.index.equals(expected.index)
+    assert (groups.codes == -1).sum() == data["c"].isnull().sum()
+    counts = np.diff(groups.bounds)
+    np.testing.assert_array_equal(counts, expected.to_numpy())
+    assert (np.diff(groups.codes[groups.order]) >= 0).all()
+
+
+def test_group_cache_shares_indices(data: pd.DataFrame) -> None:
+    assert group_index(data, ["c"]) is not group_index(data, ["c"])
+    with group_cache() as cache:
+        reordered = group_index(data.iloc[::-1], ["c"])
+        groups = group_index(data, ["c"])
+        assert groups is not reordered
+        assert group_index(data, ["c"]) is groups
+        assert set(cache.indices) == {("c",)}
+
+        invalidate(normalize({"calculate": "datum.x + 1", "as": "y"}))
+        assert group_index(data, ["c"]) is groups
+        invalidate(normalize({"calculate": "datum.x + 1", "as": "c"}))
+        assert group_index(data, ["c"]) is not groups
+
+        invalidate(normalize({"filter": "datum.x > 10"}))
+        assert not cache.indices
+
+
+def test_group_cache_checks_frame(data: pd.DataFrame) -> None:
+    # Frames with equal indices do not share cached groups.
+    other = data.assign(c=data["c"].iloc[::-1].to_numpy())
+    with group_cache():
+        groups = group_index(data, ["c"])
+        assert group_index(other, ["c"]) is not groups
+        invalidate(normalize({"calculate": "datum.x + 1", "as": "y"}), other)
+        assert group_index(other, ["c"]) is group_index(other, ["c"])
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+def test_group_cache_threads() -> None:
+    # Pipelines evaluated in concurrent threads each use their own cache.
+    transform = [
+        {"joinaggregate": [{"op": "sum", "field": "x", "as": "s"}], "groupby": ["g"]},
+        {"window": [{"op": "sum", "field": "s", "as": "w"}], "groupby": ["g"]},
+        {"aggregate": [{"op": "max", "field": "w", "as": "m"}], "groupby": ["g"]},
+    ]
+    frames = []
+    for seed in range(8):
+        rand = np.random.RandomState(seed)
+        n = 1000 + 100 * seed
+        frames.append(
+            pd.DataFrame(
+                {"x": rand.randint(0, 10, n), "g": rand.randint(0, seed + 2, n)}
+            )
+        )
+    expected = [altair_transform.apply(df, transform) for df in frames]
+
+    barrier = threading.Barrier(len(frames))
+    results: list = [[] for _ in frames]
+
+    def run(i: int) -> None:
+        barrier.wait()
+        for _ in range(10):
+            results[i].append(altair_transform.apply(frames[i], transform))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(frames))]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    for outs, want in zip(results, expected):
+        for out in outs:
+            assert_frame_equal(out, want)
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+def test_group_cache_pipeline(data: pd.DataFrame) -> None:
+    transform = [
+        {
+            "joinaggregate": [{"op": "mean", "field": "x", "as": "mean_x"}],
+            "groupby": ["c"],
+        },
+        {
+            "window": [{"op": "sum", "field": "x", "as": "cumsum_x"}],
+            "sort": [{"field": "x", "order": "descending"}],
+            "groupby": ["c"],
+        },
+        {"calculate": "datum.x > datum.mean_x ? 'hi' : 'lo'", "as": "c"},
+        {"filter": "datum.x > 20"},
+        {
+            "aggregate": [{"op": "max", "field": "cumsum_x", "as": "max"}],
+            "groupby": ["c", "d"],
+        },
+    ]
+    expected = data.copy()
+    for t in transform:
+        expected = visit(normalize(t), expected)
+    assert_frame_equal(altair_transform.apply(data, transform), expected)
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+def test_group_cache_bin_end() -> None:
+    # Binning as a string also overwrites the "<as>_end" field.
+    x, y = np.arange(8) % 4 + 0.5, np.arange(8) + 0.5
+    data = pd.DataFrame({"x": x, "y": y, "v": np.arange(8)})
+    transform = [
+        {"bin": {"extent": [0, 10]}, "field": "x", "as": "b"},
+        {
+            "joinaggregate": [{"op": "sum", "field": "v", "as": "s1"}],
+            "groupby": ["b_end"],
+        },
+        {"bin": {"extent": [0, 10]}, "field": "y", "as": "b"},
+        {
+            "joinaggregate": [{"op": "sum", "field": "v", "as": "s2"}],
+            "groupby": ["b_end"],
+        },
+    ]
+    expected = data.copy()
+    for t in transform:
+        expected = visit(normalize(t), expected)
+    out = altair_transform.apply(data, transform)
+    assert_frame_equal(out, expected)
+    with group_cache():
+        invalidate(normalize(transform[0]))
+        assert group_index(data, ["y"]) is group_index(data, ["y"])
+        groups = group_index(expected, ["b_end"])
+        invalidate(normalize(transform[2]))
+        assert group_index(expected, ["b_end"]) is not groups
+
+
+@pytest.fixture
+def sorted_data() -> pd.DataFrame:
+    rand = np.random.RandomState(0)
+    df = pd.DataFrame(
+        {
+            "c": rand.choice(list("abc"), 40),
+            "d": rand.randint(0, 3, 40),
+            "x": rand.randn(40),
+            "i": rand.randint(0, 9, 40),
+        }
+    )
+    df.loc[[0, 5, 6, 30], "x"] = np.nan
+    return df.sort_values(["c", "d"]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("groupby", [["c"], ["c", "d"]])
+def test_sorted_group_index(sorted_data: pd.DataFrame, groupby: list) -> None:
+    groups = GroupIndex.from_frame(sorted_data, groupby)
+    assert groups.contiguous
+    codes, index = group_codes(sorted_data.groupby(groupby))
+    np.testing.assert_array_equal(groups.codes, codes)
+    assert groups.index.equals(index)
+    assert groups.index.names == index.names
+    np.testing.assert_array_equal(groups.order, np.arange(len(sorted_data)))
+
+
+@pytest.mark.parametrize(
+    "df,groupby",
+    [
+        (pd.DataFrame({"c": ["a", "b", "a"]}), ["c"]),
+        (pd.DataFrame({"c": ["a", "a", "b"], "d": [1, 0, 0]}), ["d"]),
+        (pd.DataFrame({"c": ["a", "a", "b"], "d": [1, 0, 0]}), ["c", "d"]),
+        (pd.DataFrame({"c": ["a", "b", None]}), ["c"]),
+        (pd.DataFrame({"c": pd.Categorical(["a", "c"], list("abc"))}), ["c"]),
+    ],
+)
+def test_unsorted_group_index(df: pd.DataFrame, groupby: list) -> None:
+    groups = GroupIndex.from_frame(df, groupby)
+    assert not groups.contiguous
+    codes, index = group_codes(df.groupby(groupby, observed=False))
+    np.testing.assert_array_equal(groups.codes, codes)
+    assert groups.index.equals(index)
+
+
+AGGREGATES = [
+    {"op": op, "field": field, "as": f"{op}_{field}"}
+    for op in ["count", "valid", "missing", "sum", "mean", "min", "max", "stdev"]
+    for field in ["x", "i"]
+]
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize(
+    "transform",
+    [
+        {"aggregate": AGGREGATES, "groupby": ["c", "d"]},
+        {"aggregate": AGGREGATES},
+        {"joinaggregate": AGGREGATES, "groupby": ["c"]},
+        {
+            "window": [
+                {"op": op, "field": field, "as": f"{op}_{field}"}
+                for op in ["count", "sum", "mean", "max"]
+                for field in ["x", "i"]
+            ],
+            "groupby": ["c", "d"],
+        },
+    ],
+)
+def test_sorted_fast_path(
+    sorted_data: pd.DataFrame, transform: dict, monkeypatch
+) -> None:
+    out = altair_transform.apply(sorted_data, transform)
+    monkeypatch.setattr(grouping, "_sorted_runs", lambda *args: None)
+    expected = altair_transform.apply(sorted_data, transform)
+    assert_frame_equal(out, expected)
+
+
+def test_group_cache_sorted_by() -> None:
+    with group_cache(["c", "d"]) as cache:
+        invalidate(normalize({"filter": "datum.x > 0"}))
+        assert cache.sorted_by == ("c", "d")
+        invalidate(normalize({"calculate": "datum.x", "as": "d"}))
+        assert cache.sorted_by == ("c",)
+        invalidate(normalize({"aggregate": [], "groupby": ["x", "y"]}))
+        assert cache.sorted_by == ("x", "y")
+        invalidate(normalize({"fold": ["x", "y"]}))
+        assert cache.sorted_by == ()
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+def test_sorted_by_hint(sorted_data: pd.DataFrame, monkeypatch) -> None:
+    transform = {"aggregate": AGGREGATES, "groupby": ["c"]}
+    expected = altair_transform.apply(sorted_data, transform)
+    checked = []
+    runs = grouping._sorted_runs
+
+    def _sorted_runs(df, groupby, presorted=False):
+        checked.append(presorted)
+        return runs(df, groupby, presorted)
+
+    monkeypatch.setattr(grouping, "_sorted_runs", _sorted_runs)
+    out = altair_transform.apply(sorted_data, transform, sorted_by=["c", "d"])
+    assert checked == [True]
+    assert_frame_equal(out, expected)
+
+    # Chunked evaluation of data in memory follows the hint too.
+    checked.clear()
+    out = altair_transform.apply(
+        sorted_data, transform, sorted_by=["c", "d"], chunksize=5
+    )
+    assert checked == [True]
+    assert_frame_equal(out, expected)
+
+
+def test_sorted_by_streamed(sorted_data: pd.DataFrame) -> None:
+    transform = {"aggregate": AGGREGATES, "groupby": ["c"]}
+    chunks = iter([sorted_data[:5], sorted_data[5:]])
+    with pytest.raises(ValueError, match="sorted_by is not supported"):
+        altair_transform.apply(chunks, transform, sorted_by=["c"])
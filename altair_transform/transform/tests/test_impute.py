@@ -34,3 +34,21 @@ def test_impute_transform_with_groupby() -> None:
     imputed = altair_transform.apply(data, transform)
     assert_equal(imputed.x.values, np.tile(range(1, 5), 2))
     assert_equal(imputed.y.values, [1, 2, 4, 4, 2, 5, 4, 5])
+
+
+def test_impute_transform_unused_categories() -> None:
+    # Unused categories of the groupby fields do not form groups.
+    data = pd.DataFrame(
+        {
+            "x": [1, 2, 4, 1, 3, 4],
+            "y": [1, 2, 4, 2, 4, 5],
+            "cat": pd.Categorical(list("AAABBB"), categories=list("ABC")),
+        }
+    )
+
+    transform = alt.ImputeTransform(impute="y", key="x", method="max", groupby=["cat"])
+
+    imputed = altair_transform.apply(data, transform)
+    assert_equal(imputed.x.values, np.tile(range(1, 5), 2))
+    assert_equal(imputed.y.values, [1, 2, 4, 4, 2, 5, 4, 5])
+    assert_equal(imputed.cat.astype(str).values, list("AAAABBBB"))
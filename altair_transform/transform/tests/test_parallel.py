@@ -0,0 +1,66 @@
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+import altair_transform
+from altair_transform.transform.parallel import is_parallelizable, partition_groups
+from altair_transform.transform.spec import normalize
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(42)
+    x = rand.randint(1, 20, 200)
+    return pd.DataFrame(
+        {
+            "x": x,
+            "y": 2 * x + rand.randn(200),
+            "c": rand.choice(list("ABCDEFG"), 200),
+            "d": rand.choice([1, 2], 200),
+        }
+    )
+
+
+TRANSFORMS = [
+    {"regression": "y", "on": "x", "groupby": ["c"]},
+    {"regression": "y", "on": "x", "groupby": ["c", "d"], "params": True},
+    {"regression": "y", "on": "x", "method": "poly", "order": 2, "groupby": ["c"]},
+    {"quantile": "y", "probs": [0.25, 0.5, 0.75], "groupby": ["c"]},
+    {"impute": "y", "key": "x", "method": "mean", "groupby": ["c"]},
+    {
+        "window": [{"op": "sum", "field": "y", "as": "cumsum"}],
+        "sort": [{"field": "x"}],
+        "groupby": ["c"],
+    },
+]
+
+
+@pytest.mark.parametrize("n_jobs", [2, 3])
+@pytest.mark.parametrize("transform", TRANSFORMS)
+def test_parallel_matches_serial(
+    data: pd.DataFrame, transform: Dict[str, Any], n_jobs: int
+) -> None:
+    expected = altair_transform.apply(data, transform)
+    got = altair_transform.apply(data, transform, n_jobs=n_jobs)
+    assert_frame_equal(got, expected)
+
+
+def test_is_parallelizable() -> None:
+    assert is_parallelizable(normalize(TRANSFORMS[0]))
+    assert not is_parallelizable(normalize({"regression": "y", "on": "x"}))
+    assert not is_parallelizable(
+        normalize({"aggregate": [{"op": "count", "as": "n"}], "groupby": ["c"]})
+    )
+
+
+def test_partition_groups() -> None:
+    codes = np.array([0, 2, 1, -1, 2, 2, 3, 0, 1])
+    parts = partition_groups(codes, 3)
+    assert np.array_equal(np.sort(np.concatenate(parts)), [0, 1, 2, 4, 5, 6, 7, 8])
+    groups = [set(codes[part]) for part in parts]
+    # Groups are not split, and partitions hold increasing ranges of groups.
+    assert all(max(a) < min(b) for a, b in zip(groups, groups[1:]))
+    assert len(partition_groups(np.array([0, 0, 0]), 4)) == 1
@@ -0,0 +1,94 @@
+from concurrent.futures.process import BrokenProcessPool
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+from altair_transform.transform import parallel, sharedmem
+from altair_transform.transform.spec import normalize
+
+pytestmark = pytest.mark.skipif(
+    not sharedmem.available(), reason="shared memory not supported"
+)
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(42)
+    return pd.DataFrame(
+        {
+            "x": rand.randint(0, 100, 20),
+            "y": rand.randn(20),
+            "z": rand.randn(20),
+            "b": rand.randint(0, 2, 20).astype(bool),
+            "t": pd.date_range("2020-01-01", periods=20, freq="D"),
+            "c": rand.choice(list("ABCD"), 20),
+            "k": pd.Categorical(rand.choice(list("XY"), 20)),
+        },
+        index=np.arange(20) * 3,
+    )
+
+
+def _segments() -> set:
+    if not os.path.isdir("/dev/shm"):
+        return set()
+    return {name for name in os.listdir("/dev/shm") if name.startswith("alttx_")}
+
+
+def _owner(arr: np.ndarray) -> object:
+    while isinstance(arr, np.ndarray):
+        arr = arr.base
+    return arr
+
+
+def test_share_frame_roundtrip(data: pd.DataFrame) -> None:
+    handle = sharedmem.share_frame(data)
+    try:
+        out = sharedmem.open_frame(handle)
+    finally:
+        sharedmem.unlink(handle.name)
+    assert_frame_equal(out, data)
+    # Fixed-width columns are views over the block; the mapping stays open
+    # after the block is unlinked.
+    assert isinstance(_owner(out["y"].values), sharedmem._Mapping)
+    assert _owner(out["y"].values) is _owner(out["x"].values)
+    assert out["y"].sum() == data["y"].sum()
+
+
+def test_share_frame_without_fixed_width_columns() -> None:
+    data = pd.DataFrame({"c": list("abc")})
+    handle = sharedmem.share_frame(data)
+    assert handle.name is None
+    assert_frame_equal(sharedmem.open_frame(handle), data)
+
+
+@pytest.mark.parametrize("transport", ["shared_memory", "pickle"])
+def test_parallel_transport(data: pd.DataFrame, transport: str) -> None:
+    spec = normalize(
+        {
+            "window": [{"op": "sum", "field": "y", "as": "cumsum"}],
+            "sort": [{"field": "t"}],
+            "groupby": ["c"],
+        }
+    )
+    before = _segments()
+    expected = parallel.visit(spec, data.copy())
+    got = parallel.visit_parallel(spec, data.copy(), n_jobs=2, transport=transport)
+    assert_frame_equal(got, expected)
+    assert _segments() == before
+
+
+def _crash(*args: object) -> None:
+    os._exit(1)
+
+
+def test_parallel_worker_crash(data: pd.DataFrame, monkeypatch) -> None:
+    spec = normalize({"quantile": "y", "probs": [0.5], "groupby": ["c"]})
+    before = _segments()
+    monkeypatch.setattr(parallel, "_visit_shared", _crash)
+    with pytest.raises(BrokenProcessPool):
+        parallel.visit_parallel(spec, data, n_jobs=3)
+    assert _segments() == before
+    assert 3 not in parallel._executors
@@ -0,0 +1,162 @@
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import altair_transform
+from altair_transform.transform.partial import PartialAggregate
+from altair_transform.transform.sketch import (
+    HyperLogLog,
+    KLLSketch,
+    approximate,
+    is_approximate,
+)
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(42)
+    return pd.DataFrame(
+        {
+            "x": rand.randn(20000),
+            "u": rand.randint(0, 5000, 20000).astype(str),
+            "c": rand.choice(list("ABC"), 20000),
+        }
+    )
+
+
+@pytest.mark.parametrize("n", [0, 10, 1000, 100000])
+def test_hyperloglog(n: int):
+    values = np.arange(n).repeat(2)
+    sketch = HyperLogLog.from_error(0.02).update(values)
+    assert sketch.estimate() == pytest.approx(n, rel=0.06, abs=0.5)
+
+
+def test_hyperloglog_merge():
+    a = HyperLogLog(10).update(np.arange(0, 6000))
+    b = HyperLogLog(10).update(np.arange(4000, 10000))
+    merged = a.copy().merge(pickle.loads(pickle.dumps(b)))
+    expected = HyperLogLog(10).update(np.arange(10000))
+    np.testing.assert_array_equal(merged.registers, expected.registers)
+    with pytest.raises(ValueError, match="different precision"):
+        a.merge(HyperLogLog(11))
+
+
+def test_kll_sketch_exact_when_small():
+    values = np.random.RandomState(0).randn(100)
+    sketch = KLLSketch(k=200).update(values)
+    np.testing.assert_allclose(
+        sketch.quantile([0.1, 0.5, 0.9]), np.quantile(values, [0.1, 0.5, 0.9])
+    )
+    assert np.isnan(KLLSketch().quantile(0.5))
+
+
+@pytest.mark.parametrize("chunks", [1, 100])
+def test_kll_sketch_rank_error(chunks: int):
+    values = np.random.RandomState(0).rand(200000)
+    sketch = KLLSketch.from_error(0.01, seed=0)
+    for chunk in np.array_split(values, chunks):
+        sketch.update(chunk)
+    probs = np.linspace(0.01, 0.99, 99)
+    # The ranks of uniform values are their values.
+    assert np.abs(sketch.quantile(probs) - probs).max() < 0.015
+    assert sum(len(level) for level in sketch.levels) < 2000
+
+
+def test_kll_sketch_merge():
+    values = np.random.RandomState(0).rand(100000)
+    a = KLLSketch(seed=0).update(values[:60000])
+    b = KLLSketch(seed=1).update(values[60000:])
+    a.merge(pickle.loads(pickle.dumps(b)))
+    assert a.count == len(values)
+    assert np.abs(a.quantile([0.25, 0.5, 0.75]) - [0.25, 0.5, 0.75]).max() < 0.02
+
+
+@pytest.mark.parametrize("groupby", [None, ["c"]])
+def test_approximate_aggregate(data: pd.DataFrame, groupby: list):
+    transform = {
+        "aggregate": [
+            {"op": "distinct", "field": "u", "as": "d"},
+            {"op": "median", "field": "x", "as": "m"},
+            {"op": "q3", "field": "x", "as": "q3"},
+            {"op": "count", "as": "n"},
+        ],
+        "groupby": groupby or [],
+    }
+    expected = altair_transform.apply(data, transform)
+    with approximate(seed=0):
+        out = altair_transform.apply(data, transform)
+        streamed = altair_transform.apply(iter(np.array_split(data, 4)), transform)
+    assert out["d"].dtype == expected["d"].dtype
+    pd.testing.assert_series_equal(out["n"], expected["n"])
+    np.testing.assert_allclose(out["d"], expected["d"], rtol=0.06)
+    np.testing.assert_allclose(out[["m", "q3"]], expected[["m", "q3"]], atol=0.05)
+    np.testing.assert_allclose(streamed["d"], expected["d"], rtol=0.06)
+    np.testing.assert_allclose(streamed[["m", "q3"]], expected[["m", "q3"]], atol=0.05)
+
+
+def test_approximate_selected_ops(data: pd.DataFrame):
+    transform = {
+        "aggregate": [
+            {"op": "distinct", "field": "u", "as": "d"},
+            {"op": "median", "field": "x", "as": "m"},
+        ]
+    }
+    expected = altair_transform.apply(data, transform)
+    with approximate(["distinct"]):
+        out = altair_transform.apply(data, transform)
+    assert out["m"].tolist() == expected["m"].tolist()
+
+
+def test_approximate_joinaggregate(data: pd.DataFrame):
+    transform = {
+        "joinaggregate": [{"op": "distinct", "field": "u", "as": "d"}],
+        "groupby": ["c"],
+    }
+    expected = altair_transform.apply(data, transform)
+    with approximate():
+        out = altair_transform.apply(data, transform)
+    np.testing.assert_allclose(out["d"], expected["d"], rtol=0.06)
+
+
+def test_approximate_quantile(data: pd.DataFrame):
+    transform = {"quantile": "x", "probs": [0.1, 0.5, 0.9], "groupby": ["c"]}
+    expected = altair_transform.apply(data, transform)
+    with approximate(["quantile"], seed=0):
+        out = altair_transform.apply(data, transform)
+    pd.testing.assert_frame_equal(out[["c", "prob"]], expected[["c", "prob"]])
+    np.testing.assert_allclose(out["value"], expected["value"], atol=0.05)
+
+
+def test_partial_aggregate_sketches_merge(data: pd.DataFrame):
+    aggregates = [{"op": "distinct", "field": "u", "as": "d"}]
+    with approximate():
+        a = PartialAggregate(aggregates, ["c"]).update(data.iloc[:10000])
+        b = PartialAggregate(aggregates, ["c"]).update(data.iloc[10000:])
+    merged = a.merge(pickle.loads(pickle.dumps(b))).finalize()
+    expected = data.groupby("c")["u"].nunique().tolist()
+    np.testing.assert_allclose(merged["d"], expected, rtol=0.06)
+
+
+def test_approximate_thread_local():
+    # Options set in one thread do not apply to pipelines in other threads.
+    approximated = []
+    with approximate(["distinct"]):
+        thread = threading.Thread(
+            target=lambda: approximated.append(is_approximate("distinct"))
+        )
+        thread.start()
+        thread.join()
+        approximated.append(is_approximate("distinct"))
+    assert approximated == [False, True]
+
+
+def test_approximate_invalid():
+    with pytest.raises(ValueError, match="cannot be approximated"):
+        with approximate(["mean"]):
+            pass
+    with pytest.raises(ValueError, match="Error bounds"):
+        with approximate(relative_error=0):
+            pass
@@ -0,0 +1,79 @@
+import pickle
+
+import altair as alt
+import jsonschema
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+import altair_transform
+from altair_transform.transform.spec import (
+    AggregateSpec,
+    FilterSpec,
+    LookupSpec,
+    normalize,
+    normalize_list,
+)
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(42)
+    return pd.DataFrame({"x": rand.randint(0, 100, 12), "c": list("AAABBBCCCDDD")})
+
+
+def test_normalize_dict_and_altair() -> None:
+    dct = {"aggregate": [{"op": "sum", "field": "x", "as": "z"}], "groupby": ["c"]}
+    from_dict = normalize(dct)
+    from_alt = normalize(alt.Transform.from_dict(dct))
+    assert isinstance(from_dict, AggregateSpec)
+    assert from_dict == from_alt
+    assert from_dict["groupby"] == ["c"]
+    assert from_dict.get("missing", 1) == 1
+    assert normalize(from_dict) is from_dict
+
+
+def test_normalize_lookup_keeps_inline_data() -> None:
+    lookup = pd.DataFrame({"c": list("AB"), "z": [1, 2]})
+    chart = alt.Chart().transform_lookup(
+        lookup="c", from_=alt.LookupData(data=lookup, key="c", fields=["z"])
+    )
+    spec = normalize(chart.transform[0])
+    assert isinstance(spec, LookupSpec)
+    assert spec["from"]["data"] == {"values": [{"c": "A", "z": 1}, {"c": "B", "z": 2}]}
+
+
+def test_normalize_list() -> None:
+    specs = normalize_list([{"filter": "datum.x > 2"}, {"sample": 10}])
+    assert [type(s).__name__ for s in specs] == ["FilterSpec", "SampleSpec"]
+    assert normalize_list({"filter": "datum.x > 2"}) == [
+        FilterSpec({"filter": "datum.x > 2"})
+    ]
+
+
+def test_spec_pickle() -> None:
+    spec = normalize({"filter": {"field": "x", "lt": 3}})
+    assert pickle.loads(pickle.dumps(spec)) == spec
+
+
+def test_normalize_unknown_transform() -> None:
+    with pytest.raises(NotImplementedError):
+        normalize({"foo": "bar"}, validate=False)
+
+
+@pytest.mark.parametrize("validate", [True, False])
+def test_apply_trusted(data: pd.DataFrame, validate: bool) -> None:
+    transform = {
+        "aggregate": [{"op": "sum", "field": "x", "as": "z"}],
+        "groupby": ["c"],
+    }
+    out = altair_transform.apply(data, transform, validate=validate)
+    expected = data.groupby("c")["x"].sum().rename("z").reset_index()
+    assert_frame_equal(out, expected)
+
+
+def test_apply_validation_error(data: pd.DataFrame) -> None:
+    transform = {"sample": "ten"}
+    with pytest.raises(jsonschema.ValidationError):
+        altair_transform.apply(data, transform)
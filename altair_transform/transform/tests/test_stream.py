@@ -0,0 +1,141 @@
+from typing import Any, Dict, List
+
+import altair as alt
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+import altair_transform
+from altair_transform.transform.cache import TransformCache
+from altair_transform.transform.partial import PartialAggregate
+
+OPS = [
+    "count",
+    "valid",
+    "missing",
+    "sum",
+    "mean",
+    "variance",
+    "variancep",
+    "stdev",
+    "stdevp",
+    "stderr",
+    "min",
+    "max",
+    "distinct",
+    "median",
+    "q1",
+    "q3",
+]
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(42)
+    return pd.DataFrame(
+        {
+            "x": rand.randint(0, 100, 50),
+            "y": rand.randn(50),
+            "c": rand.choice(list("ABCDE"), 50),
+            "d": rand.choice([1, 2], 50),
+        }
+    )
+
+
+def chunks(df: pd.DataFrame, size: int) -> List[pd.DataFrame]:
+    return [df.iloc[i : i + size] for i in range(0, len(df), size)]
+
+
+PIPELINES: List[List[Dict[str, Any]]] = [
+    [{"calculate": "datum.x + datum.y", "as": "z"}, {"filter": "datum.z > 50"}],
+    [
+        {"filter": "datum.x > 20"},
+        {"aggregate": [{"op": "sum", "field": "y", "as": "y"}], "groupby": ["c"]},
+        {"calculate": "datum.y / 2", "as": "half"},
+    ],
+    [{"aggregate": [{"op": op, "field": "y", "as": op} for op in OPS]}],
+    [
+        {
+            "aggregate": [{"op": op, "field": "x", "as": op} for op in OPS],
+            "groupby": ["c", "d"],
+        }
+    ],
+    [
+        {"calculate": "2 * datum.x", "as": "x2"},
+        {
+            "joinaggregate": [{"op": "mean", "field": "x2", "as": "mean_x2"}],
+            "groupby": ["c"],
+        },
+    ],
+    [{"joinaggregate": [{"op": "max", "field": "y", "as": "max_y"}]}],
+    [
+        {"filter": "datum.x > 50"},
+        {"window": [{"op": "sum", "field": "x", "as": "cumsum"}]},
+    ],
+]
+
+
+@pytest.mark.parametrize("size", [1, 7, 100])
+@pytest.mark.parametrize("transform", PIPELINES)
+def test_stream_matches_in_memory(
+    data: pd.DataFrame, transform: List[Dict[str, Any]], size: int
+) -> None:
+    expected = altair_transform.apply(data, transform).reset_index(drop=True)
+    got = altair_transform.apply(chunks(data, size), transform)
+    assert_frame_equal(got, expected, check_dtype=False)
+
+
+def test_stream_sample(data: pd.DataFrame) -> None:
+    transform = [{"filter": "datum.x > 20"}, {"sample": 5}]
+    got = altair_transform.apply(chunks(data, 3), transform)
+    assert got.shape == (5, data.shape[1])
+    assert got.merge(data).shape == got.shape
+
+
+def test_stream_partial_merge(data: pd.DataFrame) -> None:
+    aggregates = [{"op": op, "field": "y", "as": op} for op in OPS]
+    expected = PartialAggregate(aggregates, ["c"]).update(data).finalize()
+    left = PartialAggregate(aggregates, ["c"]).update(data.iloc[:20])
+    right = PartialAggregate(aggregates, ["c"]).update(data.iloc[20:])
+    assert_frame_equal(left.merge(right).finalize(), expected)
+
+
+def test_stream_csv_reader(data: pd.DataFrame, tmp_path) -> None:
+    path = str(tmp_path / "data.csv")
+    data.to_csv(path, index=False)
+    transform = PIPELINES[1]
+    expected = altair_transform.apply(data, transform)
+    with pd.read_csv(path, chunksize=8) as reader:
+        got = altair_transform.apply(reader, transform)
+    assert_frame_equal(got, expected)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_stream_extract_data_from_url(data: pd.DataFrame, tmp_path, fmt: str) -> None:
+    path = str(tmp_path / f"data.{fmt}")
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+        data.to_parquet(path, index=False)
+    else:
+        data.to_csv(path, index=False)
+    chart = (
+        alt.Chart(alt.UrlData(path))
+        .transform_filter("datum.x > 20")
+        .mark_bar()
+        .encode(x="c:N", y="mean(y):Q")
+    )
+    expected = altair_transform.extract_data(chart)
+    got = altair_transform.extract_data(chart, chunksize=8)
+    assert_frame_equal(got, expected)
+
+    cache = TransformCache()
+    altair_transform.extract_data(chart, chunksize=8, cache=cache)
+    got = altair_transform.extract_data(chart, chunksize=8, cache=cache)
+    assert cache.info().hits == 1
+    assert_frame_equal(got, expected)
+
+
+def test_stream_cache_requires_dataframe(data: pd.DataFrame) -> None:
+    with pytest.raises(ValueError):
+        altair_transform.apply(chunks(data, 10), PIPELINES[0], cache=TransformCache())
@@ -2,6 +2,7 @@ import pytest
 
 import numpy as np
 import pandas as pd
+from dateutil.tz import tzlocal
 from pandas.testing import assert_frame_equal
 
 import altair_transform
@@ -67,6 +68,24 @@ def test_timeunit_transform(data: pd.DataFrame, timeUnit: str, fmt: str) -> None
     assert (out.unit == unit).all()
 
 
+def test_timeunit_of_date_strings(data: pd.DataFrame) -> None:
+    transform = {"timeUnit": "yearmonth", "field": "t", "as": "unit"}
+    expected = altair_transform.apply(data, transform)
+    data["t"] = data.t.dt.strftime("%Y-%m-%d %H:%M:%S")
+    out = altair_transform.apply(data, transform)
+    assert (out.unit == expected.unit).all()
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+@pytest.mark.parametrize("timeUnit", ["yearmonthdatehours", "utcyearmonthdate"])
+def test_timeunit_of_timestamps(data: pd.DataFrame, timeUnit: str) -> None:
+    transform = {"timeUnit": timeUnit, "field": "t", "as": "unit"}
+    expected = altair_transform.apply(data, transform)
+    data["t"] = data.t.dt.tz_localize(tzlocal()).astype("int64") // 1_000_000
+    out = altair_transform.apply(data, transform)
+    assert (out.unit == expected.unit).all()
+
+
 @pytest.mark.parametrize("timeUnit", TIMEUNITS)
 def test_timeunit_against_js(
     driver, data: pd.DataFrame, timezone: str, timeUnit: str
@@ -0,0 +1,135 @@
+import json
+import threading
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import altair_transform
+from altair_transform.transform import trace
+from altair_transform.transform.spec import normalize
+from altair_transform.transform.trace import (
+    TraceEvent,
+    add_tracer,
+    remove_tracer,
+    traced,
+)
+from altair_transform.transform.visitor import visit
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    rand = np.random.RandomState(42)
+    return pd.DataFrame({"x": rand.randint(0, 100, 12), "c": list("AAABBBCCCDDD")})
+
+
+TRANSFORM = [
+    {"calculate": "2 * datum.x", "as": "y"},
+    {"filter": "datum.y > 50"},
+    {"aggregate": [{"op": "sum", "field": "y", "as": "z"}], "groupby": ["c"]},
+]
+
+
+def test_trace_events(data: pd.DataFrame) -> None:
+    events = []
+    with altair_transform.trace(events.append):
+        out = altair_transform.apply(data, TRANSFORM)
+    assert [event.name for event in events] == ["calculate", "filter", "aggregate"]
+    assert all(isinstance(event, TraceEvent) for event in events)
+
+    calculate, filter, aggregate = events
+    assert calculate.rows_in == calculate.rows_out == len(data)
+    assert calculate.columns_in == ["x", "c"]
+    assert calculate.columns_out == ["x", "c", "y"]
+    assert calculate.memory_delta > 0
+    assert filter.rows_out == aggregate.rows_in
+    assert aggregate.rows_out == len(out)
+    assert aggregate.spec["groupby"] == ["c"]
+    assert all(event.wall_time >= 0 and event.cpu_time >= 0 for event in events)
+    assert calculate.start <= filter.start <= aggregate.start
+
+    # Tracers are unregistered at the end of the block.
+    altair_transform.apply(data, TRANSFORM)
+    assert len(events) == 3
+
+
+def test_trace_thread_local(data: pd.DataFrame) -> None:
+    # Tracers receive the events of the transforms of their own thread.
+    events = []
+    with altair_transform.trace(events.append):
+        thread = threading.Thread(
+            target=lambda: altair_transform.apply(data, TRANSFORM)
+        )
+        thread.start()
+        thread.join()
+        altair_transform.apply(data, TRANSFORM[:1])
+    assert [event.name for event in events] == ["calculate"]
+
+
+def test_trace_chunked(data: pd.DataFrame) -> None:
+    events = []
+    add_tracer(events.append)
+    try:
+        altair_transform.apply(data, TRANSFORM[:2], chunksize=5)
+    finally:
+        remove_tracer(events.append)
+    assert [event.name for event in events] == ["calculate", "filter"] * 3
+    assert sum(event.rows_in for event in events[::2]) == len(data)
+
+
+def test_trace_memory(data: pd.DataFrame) -> None:
+    events = []
+    with altair_transform.trace(events.append):
+        altair_transform.apply(data, TRANSFORM)
+    assert all(event.peak_memory is None for event in events)
+
+    events = []
+    data = pd.concat([data] * 1000, ignore_index=True)
+    transform = [{"fold": ["x", "c"]}, {"filter": {"field": "key", "equal": "x"}}]
+    with altair_transform.trace(events.append, memory=True):
+        out = altair_transform.apply(data, transform)
+    fold, filter = events
+    # The folded frame holds every input row twice.
+    assert fold.peak_memory > data.memory_usage(deep=True).sum()
+    assert fold.memory_usage > filter.memory_usage
+    assert filter.memory_usage == out.memory_usage(deep=True).sum()
+    assert not tracemalloc.is_tracing()
+
+
+def test_trace_memory_without_reset_peak(data: pd.DataFrame, monkeypatch) -> None:
+    # Before Python 3.9, tracemalloc cannot measure the peak of each transform.
+    monkeypatch.setattr(trace, "_RESET_PEAK", False)
+    events = []
+    with altair_transform.trace(events.append, memory=True):
+        altair_transform.apply(data, TRANSFORM)
+    assert all(event.peak_memory is None for event in events)
+    assert all(event.memory_usage > 0 for event in events)
+    assert not tracemalloc.is_tracing()
+
+
+def test_trace_memory_nested(data: pd.DataFrame) -> None:
+    # The peak of an enclosing transform includes that of nested transforms.
+    fold = normalize({"fold": ["x", "c"]})
+    outer = normalize({"sample": 10})
+    data = pd.concat([data] * 1000, ignore_index=True)
+    events = []
+    with altair_transform.trace(events.append, memory=True):
+        traced(outer, data, lambda: visit(fold, data).iloc[:0])
+    nested, enclosing = events
+    assert enclosing.peak_memory >= nested.peak_memory > 0
+
+
+def test_chrome_trace(data: pd.DataFrame, tmp_path) -> None:
+    chrome = altair_transform.ChromeTrace()
+    with altair_transform.trace(chrome):
+        altair_transform.apply(data, TRANSFORM)
+    path = str(tmp_path / "trace.json")
+    chrome.save(path)
+    with open(path) as f:
+        trace = json.load(f)
+    events = trace["traceEvents"]
+    assert [event["name"] for event in events] == ["calculate", "filter", "aggregate"]
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+    assert events[0]["args"]["spec"] == TRANSFORM[0]
+    assert events[2]["args"]["columns_out"] == ["c", "z"]
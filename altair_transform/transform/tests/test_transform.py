@@ -33,7 +33,7 @@ AGGREGATES = [
     "variancep",
 ]
 
-AGG_SKIP = ["ci0", "ci1", "values"]  # These require scipy.
+AGG_SKIP = ["values"]  # Records are not compared numerically.
 
 
 @pytest.fixture
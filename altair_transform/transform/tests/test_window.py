@@ -74,3 +74,192 @@ def test_window_against_js(
         check_index_type=False,
         check_less_precise=True,
     )
+
+
+RANKING = ["row_number", "rank", "dense_rank", "percent_rank", "cume_dist"]
+
+
+def test_window_ranking() -> None:
+    data = pd.DataFrame({"x": [3, 1, 3, 2, 5]})
+    transform = {
+        "window": [{"op": op, "as": op} for op in RANKING]
+        + [{"op": "ntile", "param": 2, "as": "ntile"}],
+        "sort": [{"field": "x"}],
+    }
+    out = altair_transform.apply(data, transform)
+    expected = data.assign(
+        row_number=[3, 1, 4, 2, 5],
+        rank=[3, 1, 3, 2, 5],
+        dense_rank=[3, 1, 3, 2, 4],
+        percent_rank=[0.5, 0.0, 0.5, 0.25, 1.0],
+        cume_dist=[0.8, 0.2, 0.8, 0.4, 1.0],
+        ntile=[2, 1, 2, 1, 2],
+    )
+    assert_frame_equal(out, expected)
+
+
+def test_window_ranking_grouped() -> None:
+    data = pd.DataFrame(
+        {"x": [2, None, 1, 2, 3, None, 2], "c": ["A", "A", "B", "A", None, "A", "B"]}
+    )
+    transform = {
+        "window": [{"op": op, "as": op} for op in RANKING],
+        "sort": [{"field": "x", "order": "descending"}],
+        "groupby": ["c"],
+    }
+    out = altair_transform.apply(data, transform)
+    expected = data.assign(
+        row_number=[1, 3, 2, 2, None, 4, 1],
+        rank=[1, 3, 2, 1, None, 3, 1],
+        dense_rank=[1, 2, 2, 1, None, 2, 1],
+        percent_rank=[0, 2 / 3, 1, 0, None, 2 / 3, 0],
+        cume_dist=[0.5, 1, 1, 0.5, None, 1, 0.5],
+    )
+    assert_frame_equal(out, expected)
+
+
+def test_window_ranking_unsorted(data: pd.DataFrame) -> None:
+    transform = {
+        "window": [{"op": op, "as": op} for op in RANKING],
+        "groupby": ["c"],
+    }
+    out = altair_transform.apply(data, transform)
+    position = data.groupby("c").cumcount()
+    assert (out["row_number"] == position + 1).all()
+    assert (out["rank"] == position + 1).all()
+    assert (out["dense_rank"] == position + 1).all()
+    assert (out["percent_rank"] == position / 2).all()
+    assert (out["cume_dist"] == (position + 1) / 3).all()
+
+
+@pytest.mark.parametrize("param", [{}, {"param": 0}])
+def test_window_ntile_invalid(data: pd.DataFrame, param: Dict[str, int]) -> None:
+    transform = {"window": [{"op": "ntile", "as": "n", **param}]}
+    with pytest.raises(ValueError, match="greater than zero"):
+        altair_transform.apply(data, transform)
+
+
+@pytest.mark.parametrize("groupby", [None, ["c"]])
+@pytest.mark.parametrize("op", RANKING + ["ntile"])
+def test_window_ranking_against_js(
+    driver, data: pd.DataFrame, groupby: Optional[List[str]], op: str
+) -> None:
+    window: Dict[str, Any] = {"op": op, "as": "r"}
+    if op == "ntile":
+        window["param"] = 4
+    transform: Dict[str, Any] = {"window": [window], "sort": [{"field": "x"}]}
+    if groupby is not None:
+        transform["groupby"] = groupby
+    got = altair_transform.apply(data, transform)
+    want = driver.apply(data, transform)
+    assert_frame_equal(
+        got[sorted(got.columns)],
+        want[sorted(want.columns)],
+        check_dtype=False,
+        check_index_type=False,
+    )
+
+
+VALUES = ["lag", "lead", "first_value", "last_value", "nth_value"]
+
+
+def test_window_values() -> None:
+    data = pd.DataFrame(
+        {"x": [2, 4, 1, 3, 5], "s": list("bdace"), "c": ["A", "A", "B", "A", None]}
+    )
+    transform = {
+        "window": [
+            {"op": op, "field": field, "as": op + field, "param": 2}
+            for op in VALUES
+            for field in "xs"
+        ],
+        "sort": [{"field": "x"}],
+        "groupby": ["c"],
+        "frame": [-1, 1],
+    }
+    out = altair_transform.apply(data, transform)
+    expected = data.assign(
+        lagx=[None, 2, None, None, None],
+        lags=[None, "b", None, None, None],
+        leadx=[4, None, None, None, None],
+        leads=["d", None, None, None, None],
+        first_valuex=[2, 3, 1, 2, None],
+        first_values=["b", "c", "a", "b", None],
+        last_valuex=[3, 4, 1, 4, None],
+        last_values=["c", "d", "a", "d", None],
+        nth_valuex=[3, 4, None, 3, None],
+        nth_values=["c", "d", None, "c", None],
+    )
+    assert_frame_equal(out, expected.astype(out.dtypes.to_dict()))
+
+
+@pytest.mark.parametrize("param", [{}, {"param": 0}])
+def test_window_nth_value_invalid(data: pd.DataFrame, param: Dict[str, int]) -> None:
+    transform = {"window": [{"op": "nth_value", "field": "x", "as": "n", **param}]}
+    with pytest.raises(ValueError, match="greater than zero"):
+        altair_transform.apply(data, transform)
+
+
+@pytest.mark.parametrize("frame", [[0, None], [-1, 3], [2, 0], [5, 5]])
+def test_window_frame_aggregates(
+    data: pd.DataFrame, frame: List[Optional[int]]
+) -> None:
+    data.loc[4, "x"] = np.nan
+    ops = ["sum", "mean", "valid", "missing", "count"]
+    transform = {
+        "window": [{"op": op, "field": "x", "as": op} for op in ops],
+        "groupby": ["c"],
+        "frame": frame,
+    }
+    out = altair_transform.apply(data, transform)
+    for i, row in out.iterrows():
+        group = data[data["c"] == row["c"]]["x"]
+        position = group.index.get_loc(i)
+        start = 0 if frame[0] is None else max(position - abs(frame[0]), 0)
+        end = len(group) if frame[1] is None else position + abs(frame[1]) + 1
+        values = group.iloc[start:end]
+        assert row["valid"] == values.count()
+        assert row["missing"] == values.isnull().sum()
+        assert row["count"] == len(values)
+        if values.count():
+            assert row["sum"] == values.sum()
+            assert row["mean"] == values.mean()
+        else:
+            assert np.isnan(row["sum"]) and np.isnan(row["mean"])
+
+
+def test_window_frame_unsupported(data: pd.DataFrame) -> None:
+    transform = {
+        "window": [{"op": "median", "field": "x", "as": "m"}],
+        "frame": [-1, 3],
+    }
+    with pytest.raises(NotImplementedError, match="frame"):
+        altair_transform.apply(data, transform)
+
+
+@pytest.mark.parametrize("groupby", [None, ["c"]])
+@pytest.mark.parametrize("frame", [None, [-1, 2], [0, None]])
+@pytest.mark.parametrize("op", VALUES)
+def test_window_values_against_js(
+    driver,
+    data: pd.DataFrame,
+    groupby: Optional[List[str]],
+    frame: Optional[List[Optional[int]]],
+    op: str,
+) -> None:
+    transform: Dict[str, Any] = {
+        "window": [{"op": op, "field": "x", "as": "v", "param": 2}],
+        "sort": [{"field": "x"}],
+    }
+    if groupby is not None:
+        transform["groupby"] = groupby
+    if frame is not None:
+        transform["frame"] = frame
+    got = altair_transform.apply(data, transform)
+    want = driver.apply(data, transform)
+    assert_frame_equal(
+        got[sorted(got.columns)],
+        want[sorted(want.columns)],
+        check_dtype=False,
+        check_index_type=False,
+    )
@@ -1,13 +1,17 @@
-import altair as alt
 import pandas as pd
 from .visitor import visit
+from .spec import TimeUnitSpec
 from ..utils.timeunit import compute_timeunit
 
 
-@visit.register(alt.TimeUnitTransform)
-def visit_timeunit(transform: alt.TimeUnitTransform, df: pd.DataFrame) -> pd.DataFrame:
-    transform = transform.to_dict()
-    df[transform["as"]] = compute_timeunit(
-        df[transform["field"]], transform["timeUnit"]
-    )
+@visit.register(TimeUnitSpec)
+def visit_timeunit(transform: TimeUnitSpec, df: pd.DataFrame) -> pd.DataFrame:
+    date = df[transform["field"]]
+    if pd.api.types.is_numeric_dtype(date):
+        # As in Vega, numbers are timestamps in milliseconds since the epoch.
+        date = pd.to_datetime(date, unit="ms", utc=True)
+    elif not pd.api.types.is_datetime64_any_dtype(date):
+        # As in Vega-Lite, fields with a timeUnit are parsed as dates.
+        date = pd.to_datetime(date)
+    df[transform["as"]] = compute_timeunit(date, transform["timeUnit"])
     return df
@@ -0,0 +1,260 @@
+"""Tracing of transform execution.
+
+Tracers are callables receiving a :class:`TraceEvent` for each transform
+executed by :func:`~altair_transform.transform.visit`. They are registered
+with :func:`add_tracer`, or for the duration of a block with :func:`trace`:
+
+>>> events = []
+>>> with trace(events.append):  # doctest: +SKIP
+...     altair_transform.apply(df, transforms)
+
+:class:`ChromeTrace` is a tracer collecting events in the Chrome trace-event
+format, which can be loaded in ``chrome://tracing`` or https://ui.perfetto.dev.
+When no tracer is registered, tracing costs a single check per transform.
+Tracers are registered for the current thread (or asyncio task), and receive
+the events of the transforms it executes.
+
+Memory accounting is opt-in, with ``trace(tracer, memory=True)``: each event
+then also records the peak memory allocated while the transform ran, as traced
+by :mod:`tracemalloc`, and the deep memory usage of its result. Tracing
+allocations slows execution down severalfold. :mod:`tracemalloc` traces the
+allocations of the whole process, so peaks include those of transforms run
+concurrently by other threads. Peaks are only measured from Python 3.9, which
+added ``tracemalloc.reset_peak``: before, ``peak_memory`` is None.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import os
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from .spec import TransformSpec
+
+__all__ = [
+    "TraceEvent",
+    "ChromeTrace",
+    "add_tracer",
+    "remove_tracer",
+    "trace",
+    "traced",
+]
+
+Tracer = Callable[["TraceEvent"], None]
+
+# The tracers registered in this context.
+_tracers: ContextVar[Tuple[Tracer, ...]] = ContextVar("tracers", default=())
+# Tracers which requested memory accounting.
+_memory_tracers: ContextVar[Tuple[Tracer, ...]] = ContextVar(
+    "memory_tracers", default=()
+)
+# For each transform being traced with memory accounting in this context, the
+# traced memory at its start and the highest peak of the transforms nested
+# within it.
+_memory_frames: ContextVar[Optional[List[List[int]]]] = ContextVar(
+    "memory_frames", default=None
+)
+# Transforms being traced with memory accounting in all threads, and whether
+# tracemalloc was started for them, rather than by the user.
+_memory_lock = threading.Lock()
+_memory_users = 0
+_started_tracemalloc = False
+# Whether peaks can be measured for each transform (Python 3.9+).
+_RESET_PEAK = hasattr(tracemalloc, "reset_peak")
+
+
+class TraceEvent(NamedTuple):
+    """Measurements of the execution of a single transform."""
+
+    #: The type of transform, e.g. "aggregate".
+    name: str
+    #: The normalized transform specification.
+    spec: TransformSpec
+    #: The start time, from ``time.perf_counter()``.
+    start: float
+    #: Elapsed wall-clock time, in seconds.
+    wall_time: float
+    #: Elapsed CPU time of this process, in seconds.
+    cpu_time: float
+    rows_in: int
+    rows_out: int
+    columns_in: List[str]
+    columns_out: List[str]
+    #: Change in the (shallow) memory usage of the dataframe, in bytes.
+    memory_delta: int
+    #: Peak memory allocated while the transform ran, in bytes, if memory
+    #: accounting was requested on Python 3.9+.
+    peak_memory: Optional[int] = None
+    #: Memory usage of the result, including the contents of object columns,
+    #: in bytes, if memory accounting was requested.
+    memory_usage: Optional[int] = None
+
+
+def add_tracer(tracer: Tracer, memory: bool = False) -> None:
+    """Register a tracer to receive an event for each transform executed.
+
+    If memory is True, events also account for the memory used by each
+    transform (see :class:`TraceEvent`).
+    """
+    _tracers.set(_tracers.get() + (tracer,))
+    if memory:
+        _memory_tracers.set(_memory_tracers.get() + (tracer,))
+
+
+def remove_tracer(tracer: Tracer) -> None:
+    """Unregister a tracer."""
+    _tracers.set(_without(_tracers.get(), tracer))
+    if tracer in _memory_tracers.get():
+        _memory_tracers.set(_without(_memory_tracers.get(), tracer))
+
+
+def _without(tracers: Tuple[Tracer, ...], tracer: Tracer) -> Tuple[Tracer, ...]:
+    # As list.remove, the first registration is removed.
+    index = tracers.index(tracer)
+    return tracers[:index] + tracers[index + 1 :]
+
+
+@contextmanager
+def trace(tracer: Tracer, memory: bool = False) -> Iterator[Tracer]:
+    """Register a tracer for the duration of a with block."""
+    add_tracer(tracer, memory=memory)
+    try:
+        yield tracer
+    finally:
+        remove_tracer(tracer)
+
+
+def traced(
+    spec: TransformSpec, df: pd.DataFrame, func: Callable[[], pd.DataFrame]
+) -> pd.DataFrame:
+    """Evaluate func(), the application of spec to df, notifying tracers."""
+    tracers = _tracers.get()
+    if not tracers:
+        return func()
+    rows_in, columns_in = len(df), list(df.columns)
+    nbytes_in = _nbytes(df)
+    memory = bool(_memory_tracers.get())
+    if memory:
+        _start_memory()
+    start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        out = func()
+    finally:
+        wall_time = time.perf_counter() - start
+        cpu_time = time.process_time() - cpu_start
+        peak_memory = _stop_memory() if memory else None
+    event = TraceEvent(
+        name=spec.key,
+        spec=spec,
+        start=start,
+        wall_time=wall_time,
+        cpu_time=cpu_time,
+        rows_in=rows_in,
+        rows_out=len(out),
+        columns_in=columns_in,
+        columns_out=list(out.columns),
+        memory_delta=_nbytes(out) - nbytes_in,
+        peak_memory=peak_memory,
+        memory_usage=_nbytes(out, deep=True) if memory else None,
+    )
+    for tracer in tracers:
+        tracer(event)
+    return out
+
+
+def _nbytes(df: pd.DataFrame, deep: bool = False) -> int:
+    return int(df.memory_usage(index=True, deep=deep).sum())
+
+
+def _frames() -> List[List[int]]:
+    frames = _memory_frames.get()
+    if frames is None:
+        frames = []
+        _memory_frames.set(frames)
+    return frames
+
+
+def _start_memory() -> None:
+    global _memory_users, _started_tracemalloc
+    with _memory_lock:
+        if not _memory_users and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracemalloc = True
+        _memory_users += 1
+    frames = _frames()
+    current, peak = tracemalloc.get_traced_memory()
+    if frames:
+        # The peak is reset below: keep the enclosing transform's peak so far.
+        frames[-1][1] = max(frames[-1][1], peak)
+    if _RESET_PEAK:
+        tracemalloc.reset_peak()
+    frames.append([current, current])
+
+
+def _stop_memory() -> Optional[int]:
+    global _memory_users, _started_tracemalloc
+    frames = _frames()
+    start, nested_peak = frames.pop()
+    peak = max(nested_peak, tracemalloc.get_traced_memory()[1])
+    if frames:
+        frames[-1][1] = max(frames[-1][1], peak)
+    with _memory_lock:
+        _memory_users -= 1
+        if not _memory_users and _started_tracemalloc:
+            tracemalloc.stop()
+            _started_tracemalloc = False
+    # Without reset_peak, the peak is that of all transforms traced so far.
+    return peak - start if _RESET_PEAK else None
+
+
+class ChromeTrace:
+    """Tracer collecting events in the Chrome trace-event format.
+
+    Example
+    -------
+    >>> chrome = ChromeTrace()
+    >>> with trace(chrome):  # doctest: +SKIP
+    ...     altair_transform.extract_data(chart)
+    >>> chrome.save("trace.json")  # doctest: +SKIP
+    """
+
+    def __init__(self) -> None:
+        self.events: List[Dict[str, Any]] = []
+        self._origin = time.perf_counter()
+
+    def __call__(self, event: TraceEvent) -> None:
+        self.events.append(
+            {
+                "name": event.name,
+                "cat": "transform",
+                "ph": "X",
+                "ts": (event.start - self._origin) * 1e6,
+                "dur": event.wall_time * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {
+                    "spec": json.loads(json.dumps(event.spec.to_dict(), default=str)),
+                    "cpu_time_ms": event.cpu_time * 1e3,
+                    "rows_in": event.rows_in,
+                    "rows_out": event.rows_out,
+                    "columns_in": [str(col) for col in event.columns_in],
+                    "columns_out": [str(col) for col in event.columns_out],
+                    "memory_delta": event.memory_delta,
+                    "peak_memory": event.peak_memory,
+                    "memory_usage": event.memory_usage,
+                },
+            }
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the trace as a JSON-serializable dict."""
+        return {"traceEvents": self.events, "displayTimeUnit": "ms"}
+
+    def save(self, path: str) -> None:
+        """Write the trace to a JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
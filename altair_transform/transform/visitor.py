@@ -1,23 +1,46 @@
 from functools import singledispatch
-from typing import Any
+from typing import Any, Callable
 
 import altair as alt
 import pandas as pd
 
+from .spec import TransformSpec, normalize
+from .trace import _tracers, traced
 
-@singledispatch
-def visit(transform: Any, df: pd.DataFrame) -> pd.DataFrame:
+
+class Visitor:
+    """Single-dispatch function applying a transform to a dataframe.
+
+    Implementations for each type of transform are registered with
+    ``@visit.register(SpecType)``, as with ``functools.singledispatch``.
+    When tracers are registered (see :mod:`.trace`), each application of a
+    normalized transform is measured and reported to them.
+    """
+
+    def __init__(self, default: Callable[..., pd.DataFrame]):
+        self._dispatch = singledispatch(default)
+
+    def register(self, cls: Any, func: Any = None) -> Any:
+        return self._dispatch.register(cls, func)
+
+    def dispatch(self, cls: Any) -> Callable[..., pd.DataFrame]:
+        return self._dispatch.dispatch(cls)
+
+    def __call__(self, transform: Any, df: pd.DataFrame, **kwargs: Any) -> pd.DataFrame:
+        func = self._dispatch.dispatch(type(transform))
+        if _tracers.get() and isinstance(transform, TransformSpec):
+            return traced(transform, df, lambda: func(transform, df, **kwargs))
+        return func(transform, df, **kwargs)
+
+
+def _visit_default(transform: Any, df: pd.DataFrame, **kwargs: Any) -> pd.DataFrame:
     raise NotImplementedError(f"transform of type {type(transform)}")
 
 
-@visit.register(list)
-def visit_list(transform: list, df: pd.DataFrame) -> pd.DataFrame:
-    for t in transform:
-        df = visit(t, df)
-    return df
+visit = Visitor(_visit_default)
 
 
 @visit.register(dict)
-def visit_dict(transform: dict, df: pd.DataFrame) -> pd.DataFrame:
-    transform = alt.Transform.from_dict(transform)
-    return visit(transform, df)
+@visit.register(alt.Transform)
+def visit_unnormalized(transform: Any, df: pd.DataFrame) -> pd.DataFrame:
+    return visit(normalize(transform), df)
@@ -1,14 +1,15 @@
-from typing import Dict
+from typing import Any, Callable, Dict, List, Optional
 
-import altair as alt
+import numpy as np
 import pandas as pd
 from .visitor import visit
+from .spec import WindowSpec
 from .aggregate import AGG_REPLACEMENTS
+from .grouping import GroupIndex, group_index
 
 
-@visit.register(alt.WindowTransform)
-def visit_window(transform: alt.WindowTransform, df: pd.DataFrame) -> pd.DataFrame:
-    transform = transform.to_dict()
+@visit.register(WindowSpec)
+def visit_window(transform: WindowSpec, df: pd.DataFrame) -> pd.DataFrame:
     window = transform["window"]
     frame = transform.get("frame", [None, 0])
     groupby = transform.get("groupby", [])
@@ -19,57 +20,273 @@ def visit_window(transform: alt.WindowTransform, df: pd.DataFrame) -> pd.DataFra
         raise NotImplementedError("Window transform with ignorePeers=True")
 
     # First sort the dataframe if required.
+    positions = None
     if sort:
         fields = [s["field"] for s in sort]
         ascending = [s.get("order", "ascending") == "ascending" for s in sort]
-        df2 = df.sort_values(fields, ascending=ascending)
+        positions = (
+            df[fields]
+            .reset_index(drop=True)
+            .sort_values(fields, ascending=ascending, kind="mergesort")
+            .index.to_numpy()
+        )
+        df2 = df.take(positions)
     else:
         df2 = df
 
     if groupby:
-        grouped = df2.groupby(groupby)
+        groups = group_index(df, groupby)
+        if positions is not None:
+            groups = groups.take(positions)
+        grouped = groups.groupby(df2)
     else:
         grouped = df2
-
-    # TODO: implement other frame options
-    if frame == [None, 0]:
-        rolling = grouped.rolling(len(df), min_periods=1)
-    elif frame[1] == 0:
-        rolling = grouped.rolling(frame[0] + 1, min_periods=1)
-    elif frame == [None, None]:
-        rolling = grouped.rolling(2 * len(df), min_periods=1, center=True)
-    elif abs(frame[0]) == abs(frame[1]):
-        # TODO: duplicate values may increase the effective window size
-        rolling = grouped.rolling(2 * abs(frame[0]) + 1, min_periods=1, center=True)
-    else:
-        raise NotImplementedError("frame={}".format(frame))
+    # Cumulative windows over contiguous groups, in the order of the rows, are
+    # computed by segmented cumulative sums.
+    cumulative = bool(groupby) and positions is None and frame == [None, 0]
+    rolling = None
+    peers = None
 
     for w in window:
-        # TODO: if field not specified, must be count, rank, or dense_rank
-        if "param" in w:
-            raise NotImplementedError("window function with param")
+        agg = w["op"]
         col = w.get("field", df2.columns[0])
         if col == "*" and col not in df2.columns:
             col = df2.columns[0]
-        agg = w["op"]
+        framed = agg in FRAMED and _rolling_frame(frame) is None
+        if agg in RANKING or agg in VALUES or agg == "count" or framed:
+            if peers is None:
+                partitions = groups if groupby else GroupIndex.single(len(df2))
+                peers = _Peers(partitions, df2, [s["field"] for s in sort])
+            if agg == "count":
+                values = _frame_count(peers, frame)
+            elif agg in RANKING:
+                values = RANKING[agg](peers, w.get("param"))
+            elif agg in VALUES:
+                if "field" not in w:
+                    raise ValueError(f"{agg} requires a field.")
+                rows, valid = VALUES[agg](peers, frame, w.get("param"))
+                values = _take(peers, df2[col], rows, valid)
+            else:
+                values = _frame_aggregate(peers, df2[col], frame, agg)
+            df2[w["as"]] = peers.scatter(values)
+            continue
+        if "param" in w:
+            raise NotImplementedError("window function with param")
         agg = WINDOW_AGG_REPLACEMENTS.get(agg, agg)
-        df2[w["as"]] = rolling[col].aggregate(agg).reset_index(groupby, drop=True)
+        if (
+            cumulative
+            and agg in ("sum", "count", "mean")
+            and groups.can_reduce(df2[col], agg)
+        ):
+            df2[w["as"]] = groups.accumulate(df2[col], agg)
+            continue
+        if rolling is None:
+            rolling = _rolling(grouped, frame, len(df))
+        result = rolling[col].aggregate(agg)
+        if groupby:
+            result = result.reset_index(level=0, drop=True)
+        df2[w["as"]] = result
 
     return df2.loc[df.index]
 
 
-# TODO: implement these.
-WINDOW_AGG_REPLACEMENTS: Dict[str, object] = {
-    "row_number": "row_number",
-    "rank": "rank",
-    "dense_rank": "dense_rank",
-    "percent_rank": "percent_rank",
-    "cume_dist": "cume_dist",
-    "ntile": "ntile",
-    "lag": "lag",
-    "lead": "lead",
-    "first_value": "first_value",
-    "last_value": "last_value",
-    "nth_value": "nth_value",
+def _rolling_frame(frame: List[Optional[int]]) -> Optional[Dict[str, Any]]:
+    """Return the rolling window arguments of a frame, or None if unsupported.
+
+    The window size of unbounded frames is filled in by :func:`_rolling`.
+    """
+    start, end = frame
+    if start is None and end == 0:
+        return {}
+    elif start is not None and end == 0:
+        return {"window": abs(start) + 1}
+    elif start is None and end is None:
+        return {"center": True}
+    elif start is not None and end is not None and abs(start) == abs(end):
+        # TODO: duplicate values may increase the effective window size
+        return {"window": 2 * abs(end) + 1, "center": True}
+    return None
+
+
+def _rolling(grouped: Any, frame: List[Optional[int]], n: int) -> Any:
+    # Frames that rolling windows cannot express are supported only by the
+    # FRAMED aggregates, which are computed over the bounds of each frame.
+    kwargs = _rolling_frame(frame)
+    if kwargs is None:
+        raise NotImplementedError("frame={}".format(frame))
+    window = kwargs.pop("window", 2 * n if kwargs else n)
+    return grouped.rolling(window, min_periods=1, **kwargs)
+
+
+class _Peers:
+    """Positions of the sorted rows of each partition, and of their peers.
+
+    Rows are peers if they are in the same partition and equal in all of the
+    sort fields (with nulls equal to each other); without sort fields, each
+    row is its own peer. Arrays are in the order of the partitioned rows,
+    :attr:`GroupIndex.order`.
+    """
+
+    def __init__(self, groups: GroupIndex, df: pd.DataFrame, fields: List[str]):
+        self.n = len(df)
+        self.order = groups.order
+        codes = groups.codes[self.order]
+        index = np.arange(len(self.order))
+        start = groups.bounds[codes]
+        self.size = groups.sizes[codes]
+        self.position = index - start
+
+        new = self.position == 0
+        if not fields:
+            new[:] = True
+        for field in fields:
+            values = df[field].to_numpy()[self.order]
+            null = pd.isna(values)
+            differ = (values[1:] != values[:-1]) & ~(null[1:] & null[:-1])
+            new[1:] |= differ
+        run = np.cumsum(new) - 1
+        ends = np.append(np.flatnonzero(new)[1:], len(new)) - 1
+        self.first = np.maximum.accumulate(np.where(new, index, 0)) - start
+        self.last = ends[run] - start
+        self.dense = run - run[start] + 1 if len(run) else run
+
+    def scatter(self, values: np.ndarray) -> np.ndarray:
+        """Return the values in the order of the rows, null outside partitions."""
+        if len(self.order) < self.n:
+            return pd.Series(values, index=self.order).reindex(range(self.n)).to_numpy()
+        out = np.empty(self.n, dtype=values.dtype)
+        out[self.order] = values
+        return out
+
+    def rows(self, positions: np.ndarray) -> np.ndarray:
+        """Return the rows at positions within the partition of each row."""
+        return np.arange(len(self.order)) - self.position + positions
+
+
+def _frame_bounds(peers: _Peers, frame: List[Optional[int]]) -> Any:
+    """Return the positions of the first and last row of the frame of each row.
+
+    Positions are within the partition of the row. As in Vega, the frame
+    offsets count rows before and after the row whatever their sign.
+    """
+    start, end = frame
+    first = np.zeros_like(peers.position)
+    if start is not None:
+        first = np.maximum(peers.position - abs(start), 0)
+    last = peers.size - 1
+    if end is not None:
+        last = np.minimum(peers.position + abs(end), last)
+    return first, last
+
+
+def _frame_count(peers: _Peers, frame: List[Optional[int]]) -> np.ndarray:
+    # As in Vega, count is the number of rows in the frame, valid or not.
+    first, last = _frame_bounds(peers, frame)
+    return np.maximum(last - first + 1, 0)
+
+
+def _frame_aggregate(
+    peers: _Peers, column: pd.Series, frame: List[Optional[int]], op: str
+) -> np.ndarray:
+    """Aggregate the frame of each row from cumulative sums over partitions."""
+    values = column.to_numpy(dtype=float, na_value=np.nan)[peers.order]
+    valid = ~np.isnan(values)
+    sums = np.append(0, np.cumsum(np.where(valid, values, 0)))
+    counts = np.append(0, np.cumsum(valid))
+    first, last = _frame_bounds(peers, frame)
+    lo = peers.rows(first)
+    hi = np.maximum(peers.rows(last) + 1, lo)
+    count = counts[hi] - counts[lo]
+    if op == "valid":
+        return count
+    if op == "missing":
+        return hi - lo - count
+    total = np.where(count > 0, sums[hi] - sums[lo], np.nan)
+    if op == "sum":
+        return total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return total / count
+
+
+# Aggregates that are supported over any frame.
+FRAMED = {"sum", "mean", "average", "valid", "missing"}
+
+
+def _take(
+    peers: _Peers, column: pd.Series, positions: np.ndarray, valid: np.ndarray
+) -> np.ndarray:
+    """Return the values at positions within partitions, null where not valid."""
+    rows = np.where(valid, peers.rows(positions), 0)
+    values = column.iloc[peers.order].reset_index(drop=True)
+    return values.take(rows).reset_index(drop=True).where(valid).to_numpy()
+
+
+def _offset(param: Any) -> int:
+    # As in Vega, lag and lead default to (and replace a zero) offset of one.
+    return int(param or 1)
+
+
+def _nth_value(peers: _Peers, frame: List[Optional[int]], nth: Any) -> Any:
+    if nth is None or not nth > 0:
+        raise ValueError("nth_value nth must be greater than zero.")
+    first, last = _frame_bounds(peers, frame)
+    positions = first + nth - 1
+    return positions, positions <= last
+
+
+def _percent_rank(peers: _Peers) -> np.ndarray:
+    # As in vega, partitions of a single row have a percent rank of NaN.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return peers.first / (peers.size - 1)
+
+
+def _ntile(peers: _Peers, num: Any) -> np.ndarray:
+    if num is None or not num > 0:
+        raise ValueError("ntile num must be greater than zero.")
+    return np.ceil(num * (peers.last + 1) / peers.size).astype(int)
+
+
+# Ranking functions of the peers of the rows, and the window function param.
+RANKING: Dict[str, Callable[[_Peers, Any], np.ndarray]] = {
+    "row_number": lambda peers, param: peers.position + 1,
+    "rank": lambda peers, param: peers.first + 1,
+    "dense_rank": lambda peers, param: peers.dense,
+    "percent_rank": lambda peers, param: _percent_rank(peers),
+    "cume_dist": lambda peers, param: (peers.last + 1) / peers.size,
+    "ntile": _ntile,
+}
+
+
+def _first_value(peers: _Peers, frame: List[Optional[int]], param: Any) -> Any:
+    first, last = _frame_bounds(peers, frame)
+    return first, first <= last
+
+
+def _last_value(peers: _Peers, frame: List[Optional[int]], param: Any) -> Any:
+    first, last = _frame_bounds(peers, frame)
+    return last, first <= last
+
+
+def _lag(peers: _Peers, frame: List[Optional[int]], param: Any) -> Any:
+    positions = peers.position - _offset(param)
+    return positions, positions >= 0
+
+
+def _lead(peers: _Peers, frame: List[Optional[int]], param: Any) -> Any:
+    positions = peers.position + _offset(param)
+    return positions, positions < peers.size
+
+
+# Value functions, given the peers of the rows, the frame and the window
+# function param: the positions of the values within the partitions, and
+# whether each position holds a value.
+VALUES: Dict[str, Callable[[_Peers, List[Optional[int]], Any], Any]] = {
+    "lag": _lag,
+    "lead": _lead,
+    "first_value": _first_value,
+    "last_value": _last_value,
+    "nth_value": _nth_value,
 }
-WINDOW_AGG_REPLACEMENTS.update(AGG_REPLACEMENTS)
+
+
+WINDOW_AGG_REPLACEMENTS: Dict[str, object] = dict(AGG_REPLACEMENTS)
@@ -1,5 +1,24 @@
 from ._parser import parser, Parser
 from ._evaljs import evaljs, undefined, JSRegex
-from .data import to_dataframe
+from .data import (
+    fingerprint,
+    flatten_records,
+    is_arrow,
+    is_polars,
+    iter_dataframes,
+    to_dataframe,
+)
 
-__all__ = ["parser", "Parser", "evaljs", "to_dataframe", "undefined", "JSRegex"]
+__all__ = [
+    "parser",
+    "Parser",
+    "evaljs",
+    "to_dataframe",
+    "iter_dataframes",
+    "flatten_records",
+    "is_arrow",
+    "is_polars",
+    "fingerprint",
+    "undefined",
+    "JSRegex",
+]
@@ -1,4 +1,9 @@
-from typing import Union, Optional
+import hashlib
+import json
+import math
+import os
+import sys
+from typing import Any, Iterable, Iterator, Union, Optional
 
 import altair as alt
 import numpy as np
@@ -12,6 +17,12 @@ def to_dataframe(data: DataType, context: Optional[ChartType] = None) -> pd.Data
     if isinstance(data, pd.DataFrame):
         return data
 
+    if is_arrow(data):
+        return data.to_pandas()
+
+    if is_polars(data):
+        return data.lazy().collect().to_pandas()
+
     if not isinstance(data, dict):
         data = data.to_dict()
 
@@ -20,11 +31,15 @@ def to_dataframe(data: DataType, context: Optional[ChartType] = None) -> pd.Data
 
     if "url" in data:
         url = data["url"]
-        fmt = data.get("format", url.split(".")[-1])
+        fmt = _url_format(data)
         if fmt == "csv":
             return pd.read_csv(url)
+        elif fmt == "tsv":
+            return pd.read_csv(url, sep="\t")
         elif fmt == "json":
             return pd.read_json(url)
+        elif fmt == "parquet":
+            return pd.read_parquet(url)
         else:
             raise ValueError(f"Unknown format for UrlData: '{fmt}'")
 
@@ -49,3 +64,200 @@ def to_dataframe(data: DataType, context: Optional[ChartType] = None) -> pd.Data
 
     data = alt.Data.from_dict(data)
     raise NotImplementedError(f"Data of type {type(data)}")
+
+
+def is_arrow(data: Any) -> bool:
+    """Return True if data is a pyarrow Table or RecordBatch."""
+    # pyarrow is optional: data cannot be Arrow unless it was imported.
+    pa = sys.modules.get("pyarrow")
+    return pa is not None and isinstance(data, (pa.Table, pa.RecordBatch))
+
+
+def is_polars(data: Any) -> bool:
+    """Return True if data is a Polars DataFrame or LazyFrame."""
+    pl = sys.modules.get("polars")
+    return pl is not None and isinstance(data, (pl.DataFrame, pl.LazyFrame))
+
+
+def flatten_records(
+    df: pd.DataFrame, columns: Optional[Iterable[str]] = None
+) -> pd.DataFrame:
+    """Expand columns of records into one column per field.
+
+    The ``argmin``, ``argmax`` aggregates return the selected row of each
+    group as a record; this replaces such a column ``col`` by the columns
+    ``col.field`` of a flat table. Missing records yield missing values.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The data.
+    columns : list of str, optional
+        The columns to expand. By default, all columns holding records.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        A new dataframe with the record columns expanded.
+    """
+    if columns is None:
+        columns = [
+            col
+            for col in df.columns
+            if df[col].dtype == object
+            and df[col].notnull().any()
+            and all(isinstance(v, dict) for v in df[col].dropna())
+        ]
+    columns = set(columns)
+    parts = []
+    for col in df.columns:
+        if col not in columns:
+            parts.append(df[[col]])
+            continue
+        records = [{} if value is None else value for value in df[col]]
+        expanded = pd.DataFrame.from_records(records, index=df.index)
+        parts.append(expanded.add_prefix(f"{col}."))
+    return pd.concat(parts, axis=1) if parts else df.copy()
+
+
+def iter_dataframes(
+    data: DataType, context: Optional[ChartType] = None, chunksize: int = 100000
+) -> Iterator[pd.DataFrame]:
+    """Iterate over a dataset in chunks of rows.
+
+    CSV and TSV files are read incrementally with pandas, and Parquet files
+    by record batch with pyarrow, so that the whole file is never loaded at
+    once. Other data are loaded with :func:`to_dataframe` and then split.
+
+    Parameters
+    ----------
+    data : pd.DataFrame, dict, or alt.Data
+        The data to read.
+    context : dict or alt.Chart, optional
+        The chart containing top-level datasets, used for named data.
+    chunksize : int
+        The maximum number of rows in each chunk. Default: 100000.
+
+    Yields
+    ------
+    chunk : pd.DataFrame
+    """
+    if chunksize < 1:
+        raise ValueError(f"chunksize must be positive; got {chunksize}")
+    if isinstance(data, alt.SchemaBase):
+        data = data.to_dict()
+    if isinstance(data, dict) and "url" in data:
+        url = data["url"]
+        fmt = _url_format(data)
+        if fmt in ("csv", "tsv"):
+            sep = "," if fmt == "csv" else "\t"
+            with pd.read_csv(url, sep=sep, chunksize=chunksize) as reader:
+                yield from reader
+            return
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            for batch in pq.ParquetFile(url).iter_batches(batch_size=chunksize):
+                yield batch.to_pandas()
+            return
+    df = to_dataframe(data, context)
+    for start in range(0, max(len(df), 1), chunksize):
+        yield df.iloc[start : start + chunksize]
+
+
+def _url_format(data: dict) -> str:
+    fmt = data.get("format", {})
+    if isinstance(fmt, dict):
+        fmt = fmt.get("type", data["url"].split(".")[-1])
+    return fmt
+
+
+def fingerprint(
+    data: DataType,
+    context: Optional[ChartType] = None,
+    sample_size: int = 1000,
+    exact: bool = False,
+) -> str:
+    """Compute a cheap fingerprint identifying a dataset.
+
+    Parameters
+    ----------
+    data : pd.DataFrame, dict, or alt.Data
+        The data to fingerprint. DataFrames are fingerprinted by their schema,
+        shape, the identity of their underlying buffers, and a hash of a strided
+        sample of their rows. URL data are fingerprinted by path, and for local
+        files by modification time and size. Inline, named, and sequence data
+        are fingerprinted by a hash of their specification.
+    context : dict or alt.Chart, optional
+        The chart containing top-level datasets, used for named data.
+    sample_size : int
+        The approximate number of rows of a DataFrame to hash. Default: 1000.
+    exact : bool
+        If True, hash all rows of a DataFrame and ignore buffer identity, so that
+        the fingerprint depends only on the contents. Default: False.
+
+    Returns
+    -------
+    fingerprint : str
+        A hex digest identifying the data.
+
+    Notes
+    -----
+    Unless ``exact=True``, in-place modifications of a DataFrame that do not
+    touch the sampled rows are not reflected in the fingerprint.
+    """
+    h = hashlib.sha1()
+    if isinstance(data, pd.DataFrame):
+        h.update(b"dataframe")
+        _hash_dataframe(h, data, sample_size=sample_size, exact=exact)
+        return h.hexdigest()
+
+    if not isinstance(data, dict):
+        data = data.to_dict()
+
+    if "url" in data:
+        url = data["url"]
+        h.update(repr(("url", url, data.get("format"))).encode())
+        if os.path.exists(url):
+            stat = os.stat(url)
+            h.update(repr((stat.st_mtime_ns, stat.st_size)).encode())
+        return h.hexdigest()
+
+    if "name" in data and context is not None:
+        if isinstance(context, dict):
+            datasets = context.get("datasets", {})
+        else:
+            datasets = context._get("datasets", {})
+        data = {"name": data["name"], "values": datasets.get(data["name"])}
+
+    h.update(json.dumps(data, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _hash_dataframe(h: Any, df: pd.DataFrame, sample_size: int, exact: bool) -> None:
+    h.update(repr((df.shape, list(df.columns), [str(t) for t in df.dtypes])).encode())
+    h.update(repr((type(df.index).__name__, str(df.index.dtype))).encode())
+    if exact or len(df) <= sample_size:
+        sample = df
+    else:
+        stride = math.ceil(len(df) / sample_size)
+        sample = df.iloc[np.append(np.arange(0, len(df), stride), len(df) - 1)]
+    if not exact:
+        h.update(repr(_buffer_addresses(df)).encode())
+    try:
+        hashes = pd.util.hash_pandas_object(sample, index=True)
+    except (TypeError, ValueError):
+        # Columns contain unhashable objects such as lists; hash their repr.
+        objects = sample.columns[sample.dtypes == object]
+        sample = sample.astype({col: str for col in objects})
+        hashes = pd.util.hash_pandas_object(sample, index=True)
+    h.update(hashes.values.tobytes())
+
+
+def _buffer_addresses(df: pd.DataFrame) -> list:
+    """Return the addresses of the numpy buffers backing a dataframe."""
+    arrays = [df.index.values] + [col.values for _, col in df.items()]
+    return [
+        arr.__array_interface__["data"][0] if isinstance(arr, np.ndarray) else None
+        for arr in arrays
+    ]
@@ -1,10 +1,18 @@
-import pandas as pd
+import os
 import tempfile
 
+import numpy as np
+import pandas as pd
+
 import pytest
 
 import altair as alt
-from altair_transform.utils import to_dataframe
+from altair_transform.utils import (
+    fingerprint,
+    flatten_records,
+    iter_dataframes,
+    to_dataframe,
+)
 
 
 @pytest.fixture
@@ -78,3 +86,81 @@ def test_named_to_dataframe(df, chart, named_data, data_type):
 def test_sequence_to_dataframe(df, sequence_data, data_type):
     data = data_type(sequence_data)
     assert df[["x"]].equals(to_dataframe(data))
+
+
+@pytest.mark.parametrize("chunksize", [1, 2, 5])
+@pytest.mark.parametrize("fixture", ["csv_data", "json_data", "inline_data"])
+def test_iter_dataframes(df, request, fixture, chunksize):
+    data = request.getfixturevalue(fixture)
+    chunks = list(iter_dataframes(data, chunksize=chunksize))
+    assert all(len(chunk) <= chunksize for chunk in chunks)
+    assert df.equals(pd.concat(chunks, ignore_index=True))
+
+
+@pytest.mark.parametrize("exact", [True, False])
+def test_fingerprint_dataframe(df, exact):
+    fp = fingerprint(df, exact=exact)
+    assert fp == fingerprint(df, exact=exact)
+
+    modified = df.copy()
+    modified.loc[1, "x"] = 10
+    assert fingerprint(modified, exact=exact) != fp
+
+    renamed = df.rename(columns={"x": "z"})
+    assert fingerprint(renamed, exact=exact) != fp
+
+    assert fingerprint(df.astype({"x": float}), exact=exact) != fp
+
+
+def test_fingerprint_buffer_identity(df):
+    # Equal contents in distinct buffers are only identified in exact mode.
+    assert fingerprint(df.copy(), exact=True) == fingerprint(df, exact=True)
+    assert fingerprint(df.copy()) != fingerprint(df)
+
+
+def test_fingerprint_sample_size():
+    df = pd.DataFrame({"x": np.arange(10000)})
+    fp = fingerprint(df, sample_size=100)
+
+    # Modifications outside the strided sample are only detected in exact mode.
+    exact_fp = fingerprint(df, exact=True)
+    df.loc[1, "x"] = -1
+    assert fingerprint(df, sample_size=100) == fp
+    assert fingerprint(df, exact=True) != exact_fp
+
+    df.loc[0, "x"] = -1
+    assert fingerprint(df, sample_size=100) != fp
+
+
+@pytest.mark.parametrize("data_type", [dict, alt.Data])
+def test_fingerprint_url_data(df, csv_data, data_type):
+    fp = fingerprint(data_type(csv_data))
+    assert fp == fingerprint(data_type(csv_data))
+
+    stat = os.stat(csv_data["url"])
+    os.utime(csv_data["url"], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert fingerprint(data_type(csv_data)) != fp
+
+
+@pytest.mark.parametrize("data_type", [dict, alt.Data])
+def test_fingerprint_inline_data(df, inline_data, data_type):
+    fp = fingerprint(data_type(inline_data))
+    assert fp == fingerprint(data_type(inline_data))
+    assert fp != fingerprint(data_type({"values": inline_data["values"][:2]}))
+
+
+def test_fingerprint_named_data(df, chart, named_data):
+    fp = fingerprint(named_data, context=chart)
+    assert fp == fingerprint(named_data, context=chart)
+    other = chart.properties(datasets={named_data["name"]: [{"x": 1}]})
+    assert fp != fingerprint(named_data, context=other)
+
+
+def test_flatten_records():
+    df = pd.DataFrame({"c": ["a", "b"], "r": [{"x": 1, "y": "u"}, None], "n": [2, 0]})
+    expected = pd.DataFrame(
+        {"c": ["a", "b"], "r.x": [1.0, np.nan], "r.y": ["u", np.nan], "n": [2, 0]}
+    )
+    pd.testing.assert_frame_equal(flatten_records(df), expected)
+    pd.testing.assert_frame_equal(flatten_records(df, ["r"]), expected)
+    pd.testing.assert_frame_equal(flatten_records(df, []), df)
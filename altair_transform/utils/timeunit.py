@@ -76,7 +76,7 @@ def _compute_timeunit(name: str, date: pd.DatetimeIndex) -> pd.DatetimeIndex:
     if not units:
         raise ValueError(f"{0!r} is not a recognized timeunit")
 
-    def quarter(month: pd.Int64Index) -> pd.Int64Index:
+    def quarter(month: pd.Index) -> pd.Index:
         return month - (month - 1) % 3
 
     Y = date.year.astype(str) if "year" in units else "2012"
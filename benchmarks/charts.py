@@ -0,0 +1,223 @@
+"""End-to-end benchmarks of extract_data over a corpus of realistic charts.
+
+The corpus is modeled on charts of the Altair gallery, over synthetic versions
+of their datasets (see :mod:`.datagen`) at a configurable number of rows. Data
+is passed either as dataframes (lookup tables inline), or as CSV files written
+to a cache directory.
+"""
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import altair as alt
+import pandas as pd
+
+from altair_transform import apply, extract_data, extract_transform, transform_chart
+from altair_transform.utils import to_dataframe
+
+try:
+    from altair_transform.transform.spec import normalize_list
+except ImportError:
+    # Older versions normalize transforms during execution.
+    normalize_list = None
+
+from . import datagen
+
+DATASETS: Dict[str, Callable[[int], pd.DataFrame]] = {
+    "stocks": datagen.stocks,
+    "movies": datagen.movies,
+    "weather": datagen.weather,
+    "people": datagen.people,
+    "people_lookup": datagen.people_lookup,
+}
+SOURCES = ["dataframe", "csv"]
+PHASES = ["extract", "load", "normalize", "execute"]
+
+ChartBuilder = Callable[[Dict[str, Any]], alt.TopLevelMixin]
+CORPUS: Dict[str, Tuple[List[str], ChartBuilder]] = {}
+
+
+def chart(*datasets: str) -> Callable[[ChartBuilder], ChartBuilder]:
+    """Register a chart of the corpus, built from the given datasets."""
+
+    def register(builder: ChartBuilder) -> ChartBuilder:
+        CORPUS[builder.__name__] = (list(datasets), builder)
+        return builder
+
+    return register
+
+
+@chart("stocks")
+def line_with_mean_rule(data: Dict[str, Any]) -> alt.TopLevelMixin:
+    base = alt.Chart(data["stocks"])
+    line = base.mark_line().encode(
+        x="yearmonth(date):T", y="mean(price):Q", color="symbol:N"
+    )
+    rule = base.mark_rule().encode(y="mean(price):Q")
+    return line + rule
+
+
+@chart("movies")
+def histogram(data: Dict[str, Any]) -> alt.TopLevelMixin:
+    return (
+        alt.Chart(data["movies"])
+        .mark_bar()
+        .encode(x=alt.X("IMDB_Rating:Q", bin=alt.Bin(maxbins=20)), y="count()")
+    )
+
+
+@chart("movies")
+def cumulative_count(data: Dict[str, Any]) -> alt.TopLevelMixin:
+    return (
+        alt.Chart(data["movies"])
+        .transform_window(cumulative_count="count()", sort=[{"field": "IMDB_Rating"}])
+        .mark_area()
+        .encode(x="IMDB_Rating:Q", y="cumulative_count:Q")
+    )
+
+
+@chart("movies")
+def top_k_items(data: Dict[str, Any]) -> alt.TopLevelMixin:
+    return (
+        alt.Chart(data["movies"])
+        .transform_window(
+            rating_rank="rank(IMDB_Rating)",
+            sort=[alt.SortField("IMDB_Rating", order="descending")],
+        )
+        .transform_filter(alt.datum.rating_rank < 10)
+        .mark_bar()
+        .encode(x="IMDB_Rating:Q", y=alt.Y("Title:N", sort="-x"))
+    )
+
+
+@chart("movies")
+def calculate_and_filter(data: Dict[str, Any]) -> alt.TopLevelMixin:
+    return (
+        alt.Chart(data["movies"])
+        .transform_filter("isValid(datum.Rotten_Tomatoes_Rating)")
+        .transform_calculate(rating_delta="datum.IMDB_Rating * 10 - 60")
+        .mark_point()
+        .encode(x="rating_delta:Q", y="Rotten_Tomatoes_Rating:Q")
+    )
+
+
+@chart("weather")
+def timeunit_heatmap(data: Dict[str, Any]) -> alt.TopLevelMixin:
+    return (
+        alt.Chart(data["weather"])
+        .mark_rect()
+        .encode(x="date(date):O", y="month(date):O", color="max(temp_max):Q")
+    )
+
+
+@chart("weather")
+def stacked_bar(data: Dict[str, Any]) -> alt.TopLevelMixin:
+    return (
+        alt.Chart(data["weather"])
+        .mark_bar()
+        .encode(x="month(date):O", y="count()", color="weather:N")
+    )
+
+
+@chart("people", "people_lookup")
+def lookup(data: Dict[str, Any]) -> alt.TopLevelMixin:
+    return (
+        alt.Chart(data["people"])
+        .transform_lookup(
+            lookup="person",
+            from_=alt.LookupData(
+                data=data["people_lookup"], key="name", fields=["age", "height"]
+            ),
+        )
+        .mark_point()
+        .encode(x="mean(age):Q", y="mean(height):Q", color="group:N")
+    )
+
+
+def make_chart(name: str, rows: int, source: str = "dataframe") -> alt.TopLevelMixin:
+    """Build a chart of the corpus over data with the given number of rows."""
+    datasets, builder = CORPUS[name]
+    data: Dict[str, Any] = {}
+    for dataset in datasets:
+        if source == "csv":
+            data[dataset] = alt.UrlData(_csv_path(dataset, rows))
+        elif source != "dataframe":
+            raise ValueError(f"Unknown source: {source!r}")
+        elif dataset.endswith("_lookup"):
+            df = DATASETS[dataset](rows)
+            data[dataset] = alt.InlineData(values=df.to_dict(orient="records"))
+        else:
+            data[dataset] = DATASETS[dataset](rows)
+    return builder(data)
+
+
+def _csv_path(dataset: str, rows: int) -> str:
+    # Data are deterministic, so files are written once and reused.
+    directory = os.path.join(tempfile.gettempdir(), "altair_transform_benchmarks")
+    path = os.path.join(directory, f"{dataset}-{rows}-v{datagen.VERSION}.csv")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        DATASETS[dataset](rows).to_csv(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def unit_charts(chart: alt.TopLevelMixin) -> Iterator[alt.Chart]:
+    """Yield the unit charts of a chart, with their (possibly inherited) data."""
+    if isinstance(chart, alt.LayerChart):
+        for layer in chart.layer:
+            if layer.data is alt.Undefined:
+                layer = layer.properties(data=chart.data)
+            yield from unit_charts(layer)
+    else:
+        yield chart
+
+
+def profile_chart(chart: alt.TopLevelMixin) -> Dict[str, float]:
+    """Return the time spent in each phase of extract_data, in seconds.
+
+    The phases are the extraction of encoding transforms, the loading of
+    data, the normalization (and validation) of transforms, and their
+    execution (including a copy of the data, as in extract_data); the times
+    are summed over the unit charts of a layered chart.
+    """
+    times = dict.fromkeys(PHASES, 0.0)
+    for unit in unit_charts(chart):
+        start = time.perf_counter()
+        unit = extract_transform(unit)
+        extracted = time.perf_counter()
+        df = to_dataframe(unit.data, unit)
+        loaded = time.perf_counter()
+        transform = unit.transform
+        if transform is not alt.Undefined and normalize_list is not None:
+            transform = normalize_list(transform)
+        normalized = time.perf_counter()
+        apply(df, transform)
+        executed = time.perf_counter()
+        times["extract"] += extracted - start
+        times["load"] += loaded - extracted
+        times["normalize"] += normalized - loaded
+        times["execute"] += executed - normalized
+    return times
+
+
+class Charts:
+    params = [list(CORPUS), [10 ** 3, 10 ** 5], SOURCES]
+    param_names = ["chart", "rows", "source"]
+    timeout = 600
+
+    def setup(self, name: str, rows: int, source: str) -> None:
+        self.chart = make_chart(name, rows, source)
+
+    def time_extract_data(self, *params: Any) -> None:
+        for unit in unit_charts(self.chart):
+            extract_data(unit)
+
+    def time_transform_chart(self, *params: Any) -> None:
+        for unit in unit_charts(self.chart):
+            transform_chart(unit)
+
+    def peakmem_extract_data(self, *params: Any) -> None:
+        for unit in unit_charts(self.chart):
+            extract_data(unit)
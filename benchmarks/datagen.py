@@ -0,0 +1,162 @@
+"""Deterministic synthetic data for benchmarks."""
+import numpy as np
+import pandas as pd
+
+# Incremented when generated data change, to invalidate files written from them.
+VERSION = 1
+
+KEY_DTYPES = ["int", "str", "category"]
+VALUE_DTYPES = ["int64", "float64"]
+
+# Number of distinct values of the "k" (impute key) and "p" (pivot) columns.
+NKEYS = 100
+NPIVOT = 5
+
+
+def make_keys(cardinality: int, key_dtype: str) -> np.ndarray:
+    """Return the distinct values of a group key column."""
+    keys = np.arange(cardinality)
+    if key_dtype == "int":
+        return keys
+    if key_dtype in ("str", "category"):
+        return np.array([f"group-{key:06d}" for key in keys], dtype=object)
+    raise ValueError(f"Unknown key dtype: {key_dtype!r}")
+
+
+def make_data(
+    rows: int,
+    cardinality: int = 10,
+    key_dtype: str = "str",
+    value_dtype: str = "float64",
+    lists: bool = False,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """Return a dataframe with the given number of rows.
+
+    Columns
+    -------
+    g : group key with ``cardinality`` distinct values, of type ``key_dtype``
+    x : values of type ``value_dtype`` in [0, 1000)
+    y : standard normal floats, linearly correlated with x
+    k : integer key with NKEYS distinct values
+    p : string column with NPIVOT distinct values
+    t : daily timestamps over about ten years
+    v : lists of zero to three integers (only if ``lists`` is True)
+    """
+    rand = np.random.RandomState(seed)
+    keys = make_keys(cardinality, key_dtype)
+    g = keys[rand.randint(0, cardinality, rows)]
+    x = rand.uniform(0, 1000, rows).astype(value_dtype)
+    df = pd.DataFrame(
+        {
+            "g": pd.Categorical(g) if key_dtype == "category" else g,
+            "x": x,
+            "y": 0.01 * x + rand.randn(rows),
+            "k": rand.randint(0, NKEYS, rows),
+            "p": np.array(list("abcde"))[rand.randint(0, NPIVOT, rows)],
+            "t": pd.Timestamp("2010-01-01")
+            + pd.to_timedelta(rand.randint(0, 3650, rows), unit="D"),
+        }
+    )
+    if lists:
+        lengths = rand.randint(0, 4, rows)
+        values = np.arange(lengths.sum()).tolist()
+        ends = np.cumsum(lengths).tolist()
+        df["v"] = [values[end - n : end] for n, end in zip(lengths.tolist(), ends)]
+    return df
+
+
+def make_lookup(cardinality: int, key_dtype: str = "str") -> pd.DataFrame:
+    """Return a lookup table with one row per group key."""
+    keys = make_keys(cardinality, key_dtype)
+    return pd.DataFrame(
+        {"g": keys, "label": [f"label {i}" for i in range(cardinality)]}
+    )
+
+
+# Datasets modeled on those of the Altair gallery (vega_datasets).
+
+SYMBOLS = ["MSFT", "AMZN", "IBM", "GOOG", "AAPL"]
+GENRES = ["Action", "Adventure", "Comedy", "Drama", "Horror", "Musical", "Thriller"]
+WEATHER = ["drizzle", "fog", "rain", "snow", "sun"]
+
+
+def stocks(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Daily prices of a few symbols, as in ``data.stocks``."""
+    rand = np.random.RandomState(seed)
+    ndates = -(-rows // len(SYMBOLS))
+    dates = pd.date_range("2000-01-01", periods=ndates, freq="D")
+    walk = 100 + np.cumsum(rand.randn(len(SYMBOLS), ndates), axis=1)
+    return pd.DataFrame(
+        {
+            "symbol": np.repeat(SYMBOLS, ndates)[:rows],
+            "date": np.tile(dates.values, len(SYMBOLS))[:rows],
+            "price": np.abs(walk).ravel()[:rows].round(2),
+        }
+    )
+
+
+def movies(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Ratings and genres of films, as in ``data.movies``.
+
+    Rotten Tomatoes ratings may be null.
+    """
+    rand = np.random.RandomState(seed)
+    imdb = rand.normal(6.5, 1.2, rows).clip(1, 10).round(1)
+    tomatoes = (10 * imdb + rand.normal(0, 15, rows)).clip(0, 100).round()
+    tomatoes[rand.random_sample(rows) < 0.1] = np.nan
+    return pd.DataFrame(
+        {
+            "Title": [f"Movie {i}" for i in range(rows)],
+            "IMDB_Rating": imdb,
+            "Rotten_Tomatoes_Rating": tomatoes,
+            "Major_Genre": np.array(GENRES, dtype=object)[
+                rand.randint(0, len(GENRES), rows)
+            ],
+        }
+    )
+
+
+def weather(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Daily weather of two cities, as in ``data.seattle_weather``."""
+    rand = np.random.RandomState(seed)
+    dates = pd.date_range("2012-01-01", periods=-(-rows // 2), freq="D")
+    dates = np.repeat(dates.values, 2)[:rows]
+    dayofyear = np.asarray(pd.DatetimeIndex(dates).dayofyear)
+    season = np.cos(2 * np.pi * (dayofyear - 200) / 365)
+    return pd.DataFrame(
+        {
+            "location": np.tile(["Seattle", "New York"], -(-rows // 2))[:rows],
+            "date": dates,
+            "temp_max": (15 + 10 * season + 3 * rand.randn(rows)).round(1),
+            "precipitation": rand.exponential(3, rows).round(1),
+            "weather": np.array(WEATHER, dtype=object)[
+                rand.randint(0, len(WEATHER), rows)
+            ],
+        }
+    )
+
+
+def people(rows: int, seed: int = 0) -> pd.DataFrame:
+    """People and their groups, as in ``data.lookup_groups``."""
+    rand = np.random.RandomState(seed)
+    npeople = max(1, rows // 10)
+    return pd.DataFrame(
+        {
+            "group": rand.randint(0, 20, rows),
+            "person": [f"person-{i}" for i in rand.randint(0, npeople, rows)],
+        }
+    )
+
+
+def people_lookup(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Ages and heights of the people in :func:`people`, as in ``data.lookup_people``."""
+    rand = np.random.RandomState(seed + 1)
+    npeople = max(1, rows // 10)
+    return pd.DataFrame(
+        {
+            "name": [f"person-{i}" for i in range(npeople)],
+            "age": rand.randint(18, 80, npeople),
+            "height": rand.normal(170, 10, npeople).round(),
+        }
+    )
@@ -0,0 +1,255 @@
+"""Run the benchmarks without asv, and compare results.
+
+Usage::
+
+    # Run all benchmarks at 1e3 rows, saving the results.
+    python benchmarks/run.py run -o head.json
+
+    # Run the aggregate benchmarks at 1e3, 1e5 and 1e7 rows.
+    python benchmarks/run.py run --rows 1e3,1e5,1e7 -k Aggregate
+
+    # Run against another checkout of altair_transform (e.g. a git worktree).
+    python benchmarks/run.py run --checkout ../altair-transform-0.2 -o base.json
+
+    # Compare two result files; exits with status 1 on regressions.
+    python benchmarks/run.py compare base.json head.json
+
+    # Break down the latency of extract_data on the chart corpus.
+    python benchmarks/run.py charts --rows 1e4 --source csv
+
+Run time is the minimum over repeated calls, and peak memory is the peak size
+of allocations traced by ``tracemalloc`` during a single call.
+"""
+import argparse
+import importlib
+import inspect
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+import warnings
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARK_DIR)
+MODULES = ["transforms", "charts"]
+
+Result = Dict[str, Any]
+
+
+def import_benchmarks(module: str) -> types.ModuleType:
+    """Import a benchmark module, independently of the checkout under test."""
+    if "benchmarks" not in sys.modules:
+        package = types.ModuleType("benchmarks")
+        package.__path__ = [BENCHMARK_DIR]  # type: ignore
+        sys.modules["benchmarks"] = package
+    return importlib.import_module(f"benchmarks.{module}")
+
+
+def iter_benchmarks(
+    module: types.ModuleType,
+) -> Iterator[Tuple[str, type, Tuple[Any, ...]]]:
+    """Yield (name, class, params) for each parametrized benchmark class."""
+    for name, cls in vars(module).items():
+        if name.startswith("_") or not inspect.isclass(cls):
+            continue
+        if not any(attr.startswith(("time_", "peakmem_")) for attr in dir(cls)):
+            continue
+        for params in itertools.product(*getattr(cls, "params", [[]])):
+            yield name, cls, params
+
+
+def measure_time(func: Callable[[], Any], min_time: float = 1.0) -> float:
+    """Return the minimum run time of calls of func repeated for min_time."""
+    times: List[float] = []
+    while len(times) < 3 or (sum(times) < min_time and len(times) < 1000):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+        if times[0] > min_time:
+            break
+    return min(times)
+
+
+def measure_peakmem(func: Callable[[], Any]) -> int:
+    """Return the peak size of traced allocations during a call of func."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(rows: List[int], pattern: Optional[str], output: Optional[str]) -> None:
+    import altair_transform
+
+    meta = {
+        "altair_transform": altair_transform.__version__,
+        "path": os.path.dirname(os.path.dirname(altair_transform.__file__)),
+        "commit": _git_commit(altair_transform.__file__),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+    print(f"altair_transform {meta['altair_transform']} from {meta['path']}")
+    warnings.simplefilter("ignore")
+    results: Dict[str, Result] = {}
+    for module_name in MODULES:
+        module = import_benchmarks(module_name)
+        for name, cls, params in iter_benchmarks(module):
+            if dict(zip(cls.param_names, params)).get("rows", rows[0]) not in rows:
+                continue
+            key = f"{module_name}.{name}({', '.join(map(str, params))})"
+            if pattern and pattern not in key:
+                continue
+            bench = cls()
+            try:
+                bench.setup(*params)
+            except NotImplementedError:
+                continue
+            result: Result = {}
+            try:
+                for attr in sorted(dir(bench)):
+                    method = getattr(bench, attr)
+                    if attr.startswith("time_"):
+                        result[attr] = measure_time(lambda: method(*params))
+                    elif attr.startswith("peakmem_"):
+                        result[attr] = measure_peakmem(lambda: method(*params))
+            except Exception as err:
+                print(f"{key:<60} failed: {type(err).__name__}: {err}")
+                continue
+            results[key] = result
+            print(f"{key:<60} {_format(result)}")
+    if output:
+        with open(output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+
+def charts(rows: List[int], source: str, pattern: Optional[str], repeat: int) -> None:
+    charts = import_benchmarks("charts")
+    phases = charts.PHASES + ["total"]
+    print(f"{'chart':<24} {'rows':>8} " + " ".join(f"{p:>10}" for p in phases))
+    for name in charts.CORPUS:
+        if pattern and pattern not in name:
+            continue
+        for n in rows:
+            chart = charts.make_chart(name, n, source)
+            try:
+                runs = [charts.profile_chart(chart) for _ in range(repeat)]
+            except Exception as err:
+                print(f"{name:<24} {n:>8} failed: {type(err).__name__}: {err}")
+                continue
+            # Report the phases of the fastest run.
+            best = min(runs, key=lambda times: sum(times.values()))
+            best["total"] = sum(best.values())
+            times = " ".join(f"{_value('time', best[p]):>10}" for p in phases)
+            print(f"{name:<24} {n:>8} {times}")
+
+
+def compare(base: str, head: str, factor: float) -> int:
+    with open(base) as f:
+        before = json.load(f)["results"]
+    with open(head) as f:
+        after = json.load(f)["results"]
+    regressions = 0
+    print(f"{'benchmark':<60} {'measure':<14} {'before':>10} {'after':>10} ratio")
+    for key in sorted(set(before) & set(after)):
+        for measure in sorted(set(before[key]) & set(after[key])):
+            old, new = before[key][measure], after[key][measure]
+            ratio = new / old if old else float("inf") if new else 1.0
+            flag = ""
+            if ratio > factor:
+                flag = "  REGRESSION"
+                regressions += 1
+            elif ratio < 1 / factor:
+                flag = "  improved"
+            print(
+                f"{key:<60} {measure:<14} {_value(measure, old):>10}"
+                f" {_value(measure, new):>10} {ratio:5.2f}{flag}"
+            )
+    return 1 if regressions else 0
+
+
+def _format(result: Result) -> str:
+    return "  ".join(f"{k}={_value(k, v)}" for k, v in sorted(result.items()))
+
+
+def _value(measure: str, value: float) -> str:
+    if measure.startswith("peakmem_"):
+        return f"{value / 2 ** 20:.2f}M"
+    return f"{value * 1e3:.2f}ms"
+
+
+def _git_commit(path: str) -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(path),
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run benchmarks")
+    run_parser.add_argument(
+        "--rows", default="1e3", help="comma-separated numbers of rows (default: 1e3)",
+    )
+    run_parser.add_argument("-k", dest="pattern", help="run benchmarks matching this")
+    run_parser.add_argument("-o", "--output", help="save results to this JSON file")
+    charts_parser = commands.add_parser(
+        "charts", help="break down the latency of extract_data on the chart corpus"
+    )
+    charts_parser.add_argument(
+        "--rows",
+        default="1e3,1e4",
+        help="comma-separated numbers of rows (default: 1e3,1e4)",
+    )
+    charts_parser.add_argument(
+        "--source", choices=["dataframe", "csv"], default="dataframe"
+    )
+    charts_parser.add_argument("-k", dest="pattern", help="run charts matching this")
+    charts_parser.add_argument(
+        "--repeat", type=int, default=3, help="number of runs (default: 3)"
+    )
+    for subparser in (run_parser, charts_parser):
+        subparser.add_argument(
+            "--checkout",
+            default=ROOT,
+            help="directory containing the altair_transform package to benchmark",
+        )
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.add_argument(
+        "--factor",
+        type=float,
+        default=1.2,
+        help="ratio above which a change is reported (default: 1.2)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        return compare(args.base, args.head, args.factor)
+    sys.path.insert(0, os.path.abspath(args.checkout))
+    rows = [int(float(n)) for n in args.rows.split(",")]
+    if args.command == "charts":
+        warnings.simplefilter("ignore")
+        charts(rows, args.source, args.pattern, args.repeat)
+    else:
+        run(rows, args.pattern, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""Benchmarks of each transform visitor, in asv format.
+
+Each class benchmarks ``altair_transform.apply`` of a single transform over
+synthetic data (see :mod:`.datagen`), parametrized by the number of rows and,
+for grouped transforms, by the number of groups and the dtype of the group key.
+``time_*`` methods measure run time, and ``peakmem_*`` methods peak memory.
+"""
+from functools import partial
+import inspect
+from typing import Any, Dict
+
+import pandas as pd
+
+import altair_transform
+
+from .datagen import KEY_DTYPES, VALUE_DTYPES, make_data, make_lookup
+
+ROWS = [10 ** 3, 10 ** 5, 10 ** 7]
+CARDINALITIES = [10, 10 ** 3]
+
+# Transforms evaluating Vega expressions row by row are skipped above this
+# size, where a single run takes many minutes.
+ROWWISE_MAX_ROWS = 10 ** 5
+
+# Skip schema validation, where supported by the version under test.
+apply = altair_transform.apply
+if "validate" in inspect.signature(apply).parameters:
+    apply = partial(apply, validate=False)
+
+
+class _Grouped:
+    """Base class of benchmarks of grouped transforms."""
+
+    params = [ROWS, CARDINALITIES, KEY_DTYPES]
+    param_names = ["rows", "cardinality", "key_dtype"]
+    timeout = 600
+
+    def setup(self, rows: int, cardinality: int, key_dtype: str) -> None:
+        self.df = make_data(rows, cardinality, key_dtype)
+        self.transform = self.make_transform(cardinality, key_dtype)
+
+    def make_transform(self, cardinality: int, key_dtype: str) -> Dict[str, Any]:
+        raise NotImplementedError()
+
+    def time_apply(self, *params: Any) -> None:
+        apply(self.df, self.transform)
+
+    def peakmem_apply(self, *params: Any) -> None:
+        apply(self.df, self.transform)
+
+
+class _Ungrouped(_Grouped):
+    """Base class of benchmarks of transforms without a groupby."""
+
+    params = [ROWS, VALUE_DTYPES]
+    param_names = ["rows", "value_dtype"]
+    rowwise = False
+    lists = False
+    transform: Dict[str, Any] = {}
+
+    def setup(self, rows: int, value_dtype: str) -> None:  # type: ignore
+        if self.rowwise and rows > ROWWISE_MAX_ROWS:
+            raise NotImplementedError("row-wise transform")
+        self.df = make_data(rows, value_dtype=value_dtype, lists=self.lists)
+
+
+class Aggregate(_Grouped):
+    def make_transform(self, cardinality: int, key_dtype: str) -> Dict[str, Any]:
+        return {
+            "aggregate": [
+                {"op": "count", "as": "count"},
+                {"op": "mean", "field": "y", "as": "mean_y"},
+                {"op": "max", "field": "x", "as": "max_x"},
+            ],
+            "groupby": ["g"],
+        }
+
+
+class AggregateMedian(_Grouped):
+    def make_transform(self, cardinality: int, key_dtype: str) -> Dict[str, Any]:
+        return {
+            "aggregate": [{"op": "median", "field": "y", "as": "median_y"}],
+            "groupby": ["g"],
+        }
+
+
+class Bin(_Ungrouped):
+    transform = {"bin": True, "field": "x", "as": "x_binned"}
+
+
+class Calculate(_Ungrouped):
+    rowwise = True
+    transform = {"calculate": "2 * datum.x + datum.y", "as": "z"}
+
+
+class FilterExpression(_Ungrouped):
+    rowwise = True
+    transform = {"filter": "datum.x < 500"}
+
+
+class FilterPredicate(_Ungrouped):
+    transform = {"filter": {"field": "x", "range": [0, 500]}}
+
+
+class Flatten(_Ungrouped):
+    rowwise = True
+    lists = True
+    transform = {"flatten": ["v"]}
+
+
+class Fold(_Ungrouped):
+    transform = {"fold": ["x", "y"]}
+
+
+class Impute(_Grouped):
+    def make_transform(self, cardinality: int, key_dtype: str) -> Dict[str, Any]:
+        return {"impute": "y", "key": "k", "groupby": ["g"], "method": "mean"}
+
+
+class JoinAggregate(_Grouped):
+    def make_transform(self, cardinality: int, key_dtype: str) -> Dict[str, Any]:
+        return {
+            "joinaggregate": [{"op": "mean", "field": "y", "as": "mean_y"}],
+            "groupby": ["g"],
+        }
+
+
+class Lookup(_Grouped):
+    def make_transform(self, cardinality: int, key_dtype: str) -> Dict[str, Any]:
+        lookup = make_lookup(cardinality, key_dtype)
+        if key_dtype == "category":
+            lookup["g"] = pd.Categorical(lookup["g"])
+        return {
+            "lookup": "g",
+            "from": {"data": lookup, "key": "g", "fields": ["label"]},
+        }
+
+
+class Pivot(_Grouped):
+    def make_transform(self, cardinality: int, key_dtype: str) -> Dict[str, Any]:
+        return {"pivot": "p", "value": "y", "groupby": ["g"]}
+
+
+class Quantile(_Grouped):
+    def make_transform(self, cardinality: int, key_dtype: str) -> Dict[str, Any]:
+        return {"quantile": "y", "probs": [0.25, 0.5, 0.75], "groupby": ["g"]}
+
+
+class Regression(_Grouped):
+    def setup(self, rows: int, cardinality: int, key_dtype: str) -> None:
+        if rows < 10 * cardinality:
+            raise NotImplementedError("too few rows per group to fit")
+        super().setup(rows, cardinality, key_dtype)
+
+    def make_transform(self, cardinality: int, key_dtype: str) -> Dict[str, Any]:
+        return {"regression": "y", "on": "x", "groupby": ["g"]}
+
+
+class Sample(_Ungrouped):
+    transform = {"sample": 1000}
+
+
+class TimeUnit(_Ungrouped):
+    transform = {"timeUnit": "yearmonth", "field": "t", "as": "month"}
+
+
+class Window(_Grouped):
+    def make_transform(self, cardinality: int, key_dtype: str) -> Dict[str, Any]:
+        return {
+            "window": [{"op": "sum", "field": "y", "as": "cumsum_y"}],
+            "sort": [{"field": "x"}],
+            "groupby": ["g"],
+        }